@@ -297,6 +297,9 @@ def main():
     # Aplica patches
     glfw.set_key_callback(app.window, patched_key_callback)
     app.render = patched_render
+    # Render próprio desenha direto na tela: sem frame acumulado, sem refinamento
+    app.accumulation = None
+    app.scene.set_progressive_refinement(False)
     
     # Patch de mouse para o menu
     original_mouse_button_callback = app._mouse_button_callback
@@ -342,6 +345,9 @@ def main():
     print(f"\n[EXECUTAR] Clique na janela para começar...")
     print("="*70 + "\n")
     
+    # Trem anima a cada frame: o loop não pode dormir esperando eventos
+    app.scheduler.set_animating('trem', True)
+    
     # Executa aplicação
     try:
         app.run()
@@ -2,6 +2,8 @@
 
 from .camera import Camera3D
 from .configuration import Configuration
+from .redraw_scheduler import RedrawScheduler
+from .scene import Scene, SceneLayer
 from .application import Viewer3DApplication
 
-__all__ = ['Camera3D', 'Configuration', 'Viewer3DApplication']
+__all__ = ['Camera3D', 'Configuration', 'RedrawScheduler', 'Scene', 'SceneLayer', 'Viewer3DApplication']
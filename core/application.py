@@ -6,17 +6,32 @@ Integra todos os componentes: câmera, renderizadores, UI, carregadores
 import glfw
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import os
 import sys
+import unicodedata
+import numpy as np
 
 from core.camera import Camera3D
 from core.configuration import Configuration
+from core.redraw_scheduler import RedrawScheduler
+from core.scene import Scene, SceneLayer
 from renderers.point_cloud import PointCloudRenderer, AxesRenderer, AxisIndicator
-from loaders.data_loader import DataLoaderFactory
+from renderers.accumulation import AccumulationBuffer
+from renderers.frame_budget import AdaptivePointBudget
+from renderers.tunnel_mesh import TunnelMesh, TunnelMeshRenderer
+from renderers.wall_view import WallPyramid, WallViewRenderer, default_column_m, wall_image
+from renderers.tile_streaming import TiledPointCloud
+from loaders.data_loader import DataLoaderFactory, UPLLoader
+from utils.section_grid import DEFAULT_BINS
+from utils.tunnel_templates import CLASS_NAMES, TemplateRegistry
 from ui.vector_font import VectorFont
 from ui.components import Panel, ColorButton, ToggleButton, Slider, Button
 from ui.font_editor import FontEditor
 from ui.menu_bar import MenuBar
 from ui.train_control_panel import TrainControlPanel
+from ui.km_window_panel import KmWindowPanel
+from ui.overview_panel import OverviewPanel
+from ui.layers_panel import LayersPanel
 from ui.train_selector_menu import TrainSelectorMenu
 
 
@@ -66,11 +81,35 @@ class Viewer3DApplication:
             yaw=cam_params["yaw"]
         )
         
-        self.point_renderer = PointCloudRenderer()
+        # Cena com camadas (uma nuvem por camada); point_renderer, loader e
+        # current_file são os da camada ativa. O orçamento de pontos por frame
+        # é da cena e repartido entre as camadas visíveis
+        gpu_budget = self.config.get('gpu_budget_mb')
+        host_budget = self.config.get('host_budget_mb')
+        self.scene = Scene(gpu_budget=gpu_budget * 1024 * 1024 if gpu_budget else None,
+                           host_budget=host_budget * 1024 * 1024 if host_budget else None)
+        if self.config.get('adaptive_budget', True):
+            target_fps = self.config.get('target_fps', 60)
+            self.scene.adaptive_budget = AdaptivePointBudget(target_fps=target_fps)
+            print(f"⚡ Orçamento adaptativo de pontos (alvo {target_fps:.0f} FPS)")
+        # Refinamento progressivo: com a câmera parada a cena é acumulada em um
+        # FBO e cada frame acrescenta um lote de pontos até a densidade total
+        self.accumulation = None
+        if self.config.get('progressive_refinement', True):
+            self.accumulation = AccumulationBuffer()
+            self.scene.set_progressive_refinement(True)
+        self.scene.add_layer(SceneLayer("vazia", self._new_point_renderer()))
+        self._accumulated_key = None  # Estado da cena no FBO (None = refazer)
+        self._refine_started = False
         self.axes_renderer = AxesRenderer()
         self.axis_indicator = AxisIndicator(self.width, self.height)
         self.font = VectorFont()
-        self.data_loader = DataLoaderFactory()
+        self.data_loader = DataLoaderFactory(
+            progressive_order=self.config.get('progressive_order', False),
+            section_grid_bins=self.config.get('section_grid_bins'),
+            curve_compensation=self.config.get('curve_compensation', False),
+            design_speed_kmh=self.config.get('design_speed_kmh', 60.0)
+        )
         
         # Estado da UI
         self.show_config_menu = False
@@ -99,6 +138,14 @@ class Viewer3DApplication:
         self.control_panel.on_velocity_change = lambda v, is_absolute=False: print(f"⚡ Velocidade: {v}")
         self.control_panel.on_y_position_change = lambda y: print(f"↕️  Posição Y: {y}")
         
+        # Janela de km (sliders de início e fim do trecho visível)
+        self.km_panel = KmWindowPanel(self.width, self.height, self.font)
+        self.km_panel.on_change = self._on_km_window_change
+        
+        # Visão geral da via vista de cima (clique leva a câmera ao km)
+        self.overview_panel = OverviewPanel(self.width, self.height, self.font)
+        self.overview_panel.on_jump = self._on_overview_jump
+        
         # Train Selector Menu
         self.train_selector = TrainSelectorMenu(self.width, self.height, self.font)
         self.train_selector.on_confirm_callback = self._on_train_selected
@@ -113,10 +160,10 @@ class Viewer3DApplication:
         # Show all points (toggle LOD)
         self.show_all_points = False
         
-        # FPS counter
-        self._fps_counter = 0
-        self._fps_last_time = glfw.get_time()
-        self._current_fps = 0
+        # Redesenho por eventos: só desenha quando algo mudou
+        self.scheduler = RedrawScheduler()
+        self._stats_last_time = glfw.get_time()
+        self._last_camera_state = None  # Detecta movimento (redesenho e orçamento adaptativo)
         
         # Estado do mouse
         self.last_mouse_x = 0
@@ -127,8 +174,28 @@ class Viewer3DApplication:
         self.right_drag = False
         self.ctrl_pressed = False
         
-        # Arquivo carregado
-        self.current_file = None
+        # Painel de camadas (visibilidade, camada ativa, memória de cada uma)
+        self.layers_panel = LayersPanel(self.width, self.height, self.font)
+        self.layers_panel.set_scene(self.scene)
+        self.layers_panel.on_toggle = self._toggle_layer_visible
+        self.layers_panel.on_select = self._select_layer
+        self.layer_nudge_m = self.config.get('layer_nudge_m', 0.05)
+        
+        # Seleção de ponto por clique (sem arrastar) na vista 3D
+        self.pick_tolerance_px = 4.0
+        self.picked_point = None
+        self._press_pos = None
+        
+        # Superfície triangulada do túnel (montada na primeira vez que é mostrada)
+        self.mesh_renderer = TunnelMeshRenderer()
+        self.display_mode = 'pontos'  # 'pontos', 'malha' ou 'malha+pontos'
+        
+        # Vista desenrolada da parede (pirâmide de tiles em disco, montada sob demanda)
+        self.wall_view = WallViewRenderer(self.font)
+        
+        # Filtros de visibilidade (classe e trecho em km) sem recarregar
+        self.km_filter = None  # (km_inicial, km_final) ou None
+        self.km_filter_window = self.config.get("km_filter_window", 0.5)  # km para cada lado
         
         # Registra callbacks
         self._register_callbacks()
@@ -141,6 +208,47 @@ class Viewer3DApplication:
         
         print("✅ Aplicação inicializada com sucesso!")
     
+    @property
+    def point_renderer(self):
+        """Renderer da camada ativa"""
+        return self.scene.active.renderer
+    
+    @property
+    def loader(self):
+        """Loader do arquivo da camada ativa (atributos dos pontos)"""
+        return self.scene.active.loader
+    
+    @property
+    def current_file(self):
+        """Arquivo da camada ativa"""
+        return self.scene.active.filepath
+    
+    def _new_point_renderer(self):
+        """PointCloudRenderer configurado para uma camada nova"""
+        renderer = PointCloudRenderer()
+        renderer.keep_host_copy = self.config.get('keep_host_copy', True)
+        if self.scene.active is not None:
+            renderer.point_size = self.scene.active.renderer.point_size
+        renderer.set_progressive_refinement(self.scene.refine_enabled)
+        return renderer
+    
+    def _new_tiled_renderer(self, store, stats):
+        """TiledPointCloud (tiles de km lidos sob demanda) configurado para uma camada"""
+        memory_mb = self.config.get('tile_memory_mb', 1024)
+        renderer = TiledPointCloud(store, stats,
+                                   radius_m=self.config.get('tile_radius_km', 1.0) * 1000.0,
+                                   max_bytes=memory_mb * 1024 * 1024 if memory_mb else None,
+                                   workers=self.config.get('tile_workers', 2))
+        renderer.keep_host_copy = self.config.get('keep_host_copy', True)
+        renderer.point_size = self.scene.active.renderer.point_size
+        renderer.set_progressive_refinement(self.scene.refine_enabled)
+        return renderer
+    
+    @property
+    def _tiled(self):
+        """True se a camada ativa lê os pontos em tiles (sem a nuvem inteira na RAM)"""
+        return isinstance(self.point_renderer, TiledPointCloud)
+    
     def _init_opengl(self):
         """Configura estado inicial do OpenGL"""
         glEnable(GL_DEPTH_TEST)
@@ -168,10 +276,7 @@ class Viewer3DApplication:
             height = 1
         
         glViewport(0, 0, width, height)
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluPerspective(45, width / height, 0.1, 2000.0)
-        glMatrixMode(GL_MODELVIEW)
+        self.camera.apply_projection(width / height)
     
     def _create_config_menu(self):
         """Cria menu de configuração"""
@@ -255,7 +360,8 @@ class Viewer3DApplication:
     def _on_point_size_change(self, value):
         """Callback de mudança de tamanho"""
         self.config.set_point_size(value)
-        self.point_renderer.set_point_size(value)
+        for layer in self.scene.layers:
+            layer.renderer.set_point_size(value)
     
     def _close_config_menu(self):
         """Fecha menu de configuração"""
@@ -263,12 +369,20 @@ class Viewer3DApplication:
         print("⚙️  Menu fechado")
     
     def _register_callbacks(self):
-        """Registra callbacks de input"""
-        glfw.set_key_callback(self.window, self._key_callback)
-        glfw.set_mouse_button_callback(self.window, self._mouse_button_callback)
-        glfw.set_cursor_pos_callback(self.window, self._cursor_pos_callback)
-        glfw.set_scroll_callback(self.window, self._scroll_callback)
-        glfw.set_window_size_callback(self.window, self._window_size_callback)
+        """Registra callbacks de input (todo evento marca o frame para redesenho)"""
+        glfw.set_key_callback(self.window, self._redraw_after(self._key_callback))
+        glfw.set_mouse_button_callback(self.window, self._redraw_after(self._mouse_button_callback))
+        glfw.set_cursor_pos_callback(self.window, self._redraw_after(self._cursor_pos_callback))
+        glfw.set_scroll_callback(self.window, self._redraw_after(self._scroll_callback))
+        glfw.set_window_size_callback(self.window, self._redraw_after(self._window_size_callback))
+        glfw.set_window_refresh_callback(self.window, lambda window: self.scheduler.request_redraw())
+    
+    def _redraw_after(self, callback):
+        """Envolve um callback de input para pedir redesenho"""
+        def wrapped(*args):
+            callback(*args)
+            self.scheduler.request_redraw()
+        return wrapped
     
     def _key_callback(self, window, key, scancode, action, mods):
         """Callback de teclado"""
@@ -373,9 +487,9 @@ class Viewer3DApplication:
             elif key == glfw.KEY_U and self.current_file:
                 self.load_file(self.current_file)
             
-            # O: Abrir arquivo
+            # O: Abrir arquivo / Shift+O: Abrir como nova camada
             elif key == glfw.KEY_O:
-                self._open_file_dialog()
+                self._open_file_dialog(as_layer=bool(mods & glfw.MOD_SHIFT))
             
             # T: Tabela de pontos / Shift+T: Seletor de Trem
             elif key == glfw.KEY_T:
@@ -432,6 +546,47 @@ class Viewer3DApplication:
                 else:
                     self.camera.set_view(0, 0)
             
+            # 1/2/3: Mostrar/esconder Seguro/Alerta/Invasão; 0: mostrar tudo
+            elif glfw.KEY_1 <= key <= glfw.KEY_3:
+                self.toggle_class_visible(key - glfw.KEY_1)
+            elif key == glfw.KEY_0:
+                self.clear_filters()
+            
+            # Q: Só o trecho em volta do ponto selecionado (ou do alvo da câmera)
+            elif key == glfw.KEY_Q:
+                self._toggle_km_window()
+            
+            # W: Sliders da janela de km
+            elif key == glfw.KEY_W:
+                self._toggle_km_panel()
+            
+            # M: Pontos / malha do túnel / malha + pontos
+            elif key == glfw.KEY_M:
+                self._cycle_display_mode()
+            
+            # N: Vista desenrolada da parede (folga / classe / desligada)
+            elif key == glfw.KEY_N:
+                self._cycle_wall_view()
+            
+            # B: Painel de visão geral (planta com densidade e pior classe)
+            elif key == glfw.KEY_B:
+                self._toggle_overview()
+            
+            # H: Painel de camadas / Delete: remove a camada ativa
+            elif key == glfw.KEY_H:
+                self.layers_panel.visible = not self.layers_panel.visible
+            elif key == glfw.KEY_DELETE and self.layers_panel.visible:
+                self._remove_active_layer()
+            
+            # Ctrl+setas/J/K: desloca a camada ativa (X, Z e Y)
+            elif self.ctrl_pressed and key in (glfw.KEY_LEFT, glfw.KEY_RIGHT, glfw.KEY_UP,
+                                               glfw.KEY_DOWN, glfw.KEY_J, glfw.KEY_K):
+                step = self.layer_nudge_m
+                delta = {glfw.KEY_LEFT: (-step, 0, 0), glfw.KEY_RIGHT: (step, 0, 0),
+                         glfw.KEY_UP: (0, 0, step), glfw.KEY_DOWN: (0, 0, -step),
+                         glfw.KEY_J: (0, -step, 0), glfw.KEY_K: (0, step, 0)}[key]
+                self._nudge_active_layer(delta)
+            
             # Movimento com setas (se menu fechado)
             elif not self.show_config_menu:
                 rotation_speed = 2.0  # graus por tecla
@@ -511,6 +666,18 @@ class Viewer3DApplication:
                     if self.control_panel.handle_click(mx, my_inverted):
                         return
                 
+                # Sliders da janela de km (arrasto segue em _cursor_pos_callback)
+                if self.km_panel.handle_click(mx, my_inverted):
+                    return
+                
+                # Visão geral: clique leva o alvo da câmera ao ponto
+                if self.overview_panel.handle_click(mx, my_inverted):
+                    return
+                
+                # Painel de camadas: visibilidade e camada ativa
+                if self.layers_panel.handle_click(mx, my_inverted):
+                    return
+                
                 # Verifica clique na UI
                 if self.show_config_menu:
                     if self.config_panel.on_click(mx, my_inverted):
@@ -518,10 +685,19 @@ class Viewer3DApplication:
                 
                 self.left_drag = True
                 self.last_mouse_x, self.last_mouse_y = glfw.get_cursor_pos(window)
+                self._press_pos = (mx, my)
             else:
                 # Release
                 if self.font_editor.active:
                     self.font_editor.on_release()
+                self.km_panel.handle_release()
+                
+                # Clique sem arrastar na vista 3D: seleciona o ponto sob o cursor
+                mx, my = glfw.get_cursor_pos(window)
+                if (self._press_pos is not None and not self.font_editor.active and not self.wall_view.visible
+                        and abs(mx - self._press_pos[0]) + abs(my - self._press_pos[1]) <= 3):
+                    self._pick_point(mx, self.height - my)
+                self._press_pos = None
                 self.left_drag = False
         
         elif button == glfw.MOUSE_BUTTON_RIGHT:
@@ -571,6 +747,20 @@ class Viewer3DApplication:
                 except Exception:
                     pass
         
+        # Arrasto de slider da janela de km
+        if self.km_panel.handle_drag(xpos, self.height - ypos):
+            self.last_mouse_x = xpos
+            self.last_mouse_y = ypos
+            return
+        
+        # Vista desenrolada: arrastar move ao longo da via
+        if self.wall_view.visible:
+            if self.left_drag:
+                self.wall_view.pan(dx)
+            self.last_mouse_x = xpos
+            self.last_mouse_y = ypos
+            return
+        
         # Processa drag da câmera
         if self.left_drag:
             if self.ctrl_pressed:
@@ -589,6 +779,10 @@ class Viewer3DApplication:
     
     def _scroll_callback(self, window, xoffset, yoffset):
         """Callback de scroll (zoom)"""
+        if self.wall_view.visible:
+            mx, _ = glfw.get_cursor_pos(window)
+            self.wall_view.zoom_at(1.25 ** yoffset, mx, self.width, self.height)
+            return
         self.camera.zoom(-yoffset * 20.0)
     
     def _window_size_callback(self, window, width, height):
@@ -608,19 +802,53 @@ class Viewer3DApplication:
             self.control_panel.update_size(width, height)
         except Exception:
             pass
+        self.km_panel.update_size(width, height)
+        self.overview_panel.update_size(width, height)
+        self.layers_panel.update_size(width, height)
     
-    def load_file(self, filepath):
+    def load_file(self, filepath, as_layer=False):
         """
         Carrega arquivo de dados
         
         Args:
             filepath: Caminho do arquivo
+            as_layer: True carrega numa camada nova (a camada ativa continua
+                na cena); False substitui os dados da camada ativa
+        
+        Returns:
+            True se o arquivo foi carregado
         """
         try:
             print(f"\n📂 Carregando arquivo: {filepath}")
-            vertices, colors = self.data_loader.load(filepath)
-            self.point_renderer.set_data(vertices, colors)
-            self.current_file = filepath
+            loader = self._loader_for(filepath)
+            store = None
+            if self.config.get('tile_km') and isinstance(loader, UPLLoader):
+                store = self._open_tiles(loader, filepath)
+            if store is None:
+                vertices, colors = loader.load(filepath)
+            if as_layer and self.point_renderer.n_vertices > 0:
+                self.scene.add_layer(SceneLayer(os.path.basename(filepath), self._new_point_renderer()))
+            layer = self.scene.active
+            if store is not None:
+                renderer = self._new_tiled_renderer(store, loader.stats)
+                layer.renderer.clear()
+                layer.renderer = renderer
+            else:
+                if not isinstance(layer.renderer, PointCloudRenderer):
+                    renderer = self._new_point_renderer()
+                    layer.renderer.clear()
+                    layer.renderer = renderer
+                layer.renderer.set_data(vertices, colors,
+                                        draw_order=getattr(loader, 'draw_order', None),
+                                        stats=getattr(loader, 'stats', None),
+                                        classes=getattr(loader, 'classifications', None),
+                                        sections=loader.section_table())
+            layer.name = os.path.basename(filepath)
+            layer.filepath = filepath
+            layer.loader = loader
+            self.scene.rebalance()
+            self._activate_layer()
+            self.scheduler.request_redraw()
             
             # Adiciona ao histórico de arquivos recentes
             self.config.add_recent_file(filepath)
@@ -630,16 +858,387 @@ class Viewer3DApplication:
             self.menu_bar.update_recent_files(self.config.get_recent_files())
             
             # Ajusta câmera para centralizar e cacheia centro para auto-rotação
-            center = self.point_renderer.get_center()
+            center = tuple(np.add(self.point_renderer.get_center(), layer.offset))
             self.camera.set_target(*center)
             self._auto_rotate_center = center  # Cacheia para auto-rotação
             
             print(f"✅ Arquivo carregado com sucesso!\n")
+            return True
         except Exception as e:
             print(f"❌ Erro ao carregar arquivo: {e}")
+            return False
+    
+    def _loader_for(self, filepath):
+        """Loader novo para um arquivo (cada camada guarda o seu)"""
+        return self.data_loader.create_loader(filepath)
+    
+    def _open_tiles(self, loader, filepath):
+        """
+        Abre (ou grava, na primeira vez) os tiles de km de um arquivo UPL
+        
+        A gravação lê o arquivo em fluxo uma vez, por lotes de seções (sem
+        carregar a nuvem); as aberturas seguintes leem só o índice, e os
+        pontos vêm tile a tile em threads de fundo.
+        
+        Returns:
+            KmTileStore ou None (arquivo sem tabela de seções: carga normal)
+        """
+        tile_m = float(self.config.get('tile_km')) * 1000.0
+        store = loader.open_tiles(filepath, tile_m)
+        if store is None:
+            start = glfw.get_time()
+            store = loader.stream_tiles(filepath, tile_m)
+            if store is None:
+                print("⚠️  Tiles indisponíveis (arquivo sem tabela de seções)")
+                return None
+            print(f"   Tiles gravados em {glfw.get_time() - start:.1f} s")
+        print(f"🧩 {store.n_tiles} tiles de {tile_m:g} m ({store.n_points:,} pontos, lidos sob demanda)")
+        return store
+    
+    def _activate_layer(self):
+        """Malha, vista da parede, visão geral e filtros passam a ser da camada ativa"""
+        loader = self.loader
+        self.picked_point = None
+        self.mesh_renderer.cleanup()
+        self.mesh_renderer.mesh = None
+        self._set_display_mode('pontos')
+        self.wall_view.cleanup()
+        self.wall_view.pyramid = None
+        self.wall_view.visible = False
+        self._show_overview(loader)
+        extent = loader.km_extent() if loader is not None else None
+        if extent is not None:
+            self.km_panel.set_range(*extent)
+        else:
+            self.km_panel.visible = False
+        self.clear_filters()
     
-    def _open_file_dialog(self):
-        """Abre diálogo para selecionar arquivo"""
+    def _show_overview(self, loader):
+        """Mostra no painel de visão geral o raster do loader (esconde se não houver)"""
+        overview = getattr(loader, 'overview', None)
+        if overview is not None:
+            origin = loader.km_to_z(0.0)
+            self.overview_panel.set_raster(overview, lambda z: (z - origin) / 1000.0)
+        else:
+            self.overview_panel.set_raster(None)
+            self.overview_panel.visible = False
+    
+    def _select_layer(self, index):
+        """Torna ativa uma camada (painel de camadas)"""
+        if index == self.scene.active_index:
+            return
+        self._set_display_mode('pontos')
+        self.scene.set_active(index)
+        self._activate_layer()
+        self.scheduler.request_redraw()
+        print(f"🗂️  Camada ativa: {self.scene.active.name}")
+    
+    def _toggle_layer_visible(self, index):
+        """Mostra/esconde uma camada (libera a GPU das escondidas acima do orçamento)"""
+        layer = self.scene.layers[index]
+        self.scene.set_visible(index, not layer.visible)
+        self.scheduler.request_redraw()
+        print(f"🗂️  Camada {layer.name}: {'visível' if layer.visible else 'escondida'}")
+    
+    def _remove_active_layer(self):
+        """Remove a camada ativa (a cena sempre fica com uma camada)"""
+        if len(self.scene.layers) == 1:
+            return
+        layer = self.scene.remove_layer(self.scene.active_index)
+        self._activate_layer()
+        self.scheduler.request_redraw()
+        print(f"🗂️  Camada removida: {layer.name}")
+    
+    def _nudge_active_layer(self, delta):
+        """Desloca a camada ativa (ex: alinhar duas passagens)"""
+        layer = self.scene.active
+        layer.offset += delta
+        self.scheduler.request_redraw()
+        x, y, z = layer.offset
+        print(f"↔️  Deslocamento de {layer.name}: X={x:+.2f} Y={y:+.2f} Z={z:+.2f} m")
+    
+    def toggle_class_visible(self, class_id):
+        """
+        Mostra/esconde uma classe (0 Seguro, 1 Alerta, 2 Invasão)
+        
+        Args:
+            class_id: Id da classe
+        """
+        renderer = self.point_renderer
+        if not renderer.has_classes():
+            print("⚠️  Filtro por classe indisponível (arquivo sem classificação)")
+            return
+        
+        visible = set(range(len(CLASS_NAMES))) if renderer.class_filter is None else set(renderer.class_filter)
+        visible ^= {class_id}
+        renderer.set_class_filter(None if visible == set(range(len(CLASS_NAMES))) else visible)
+        names = ", ".join(CLASS_NAMES[c] for c in sorted(visible)) or "nenhuma"
+        print(f"👁️  Classes visíveis: {names}")
+        self.scheduler.request_redraw()
+    
+    def set_km_filter(self, km_start, km_end, verbose=True):
+        """
+        Mostra só o trecho entre dois km (ex: 120 a 125)
+        
+        Args:
+            km_start, km_end: Limites do trecho (km)
+            verbose: Imprime o trecho (desligado ao arrastar os sliders)
+        
+        Returns:
+            True se o filtro foi aplicado
+        """
+        z_start = self.loader.km_to_z(km_start) if self.loader is not None else None
+        if z_start is None:
+            print("⚠️  Filtro por km indisponível (arquivo sem referência de km)")
+            return False
+        
+        self.point_renderer.set_z_range(z_start, self.loader.km_to_z(km_end))
+        self.km_filter = (min(km_start, km_end), max(km_start, km_end))
+        if self.km_panel.dragging is None:
+            self.km_panel.start_slider.value, self.km_panel.end_slider.value = self.km_filter
+        if verbose:
+            print(f"📏 Trecho visível: km {self.km_filter[0]:.3f} a {self.km_filter[1]:.3f}")
+        self.scheduler.request_redraw()
+        return True
+    
+    def clear_filters(self):
+        """Mostra todas as classes e o trecho inteiro"""
+        had_filter = (self.point_renderer.class_filter is not None
+                      or self.point_renderer.z_range is not None)
+        self.point_renderer.set_class_filter(None)
+        self._clear_km_filter()
+        if had_filter:
+            print("👁️  Filtros removidos: todos os pontos visíveis")
+    
+    def _clear_km_filter(self):
+        """Volta a mostrar a via inteira (sliders nos extremos)"""
+        self.point_renderer.set_z_range(None)
+        self.km_filter = None
+        self.km_panel.set_range(self.km_panel.km_min, self.km_panel.km_max)
+        self.scheduler.request_redraw()
+    
+    def _on_km_window_change(self, km_start, km_end):
+        """Callback dos sliders da janela de km"""
+        if self.km_panel.is_full():
+            self._clear_km_filter()
+        else:
+            self.set_km_filter(km_start, km_end, verbose=False)
+    
+    def _cycle_display_mode(self):
+        """Alterna entre pontos, malha do túnel e malha + pontos"""
+        modes = ('pontos', 'malha', 'malha+pontos')
+        mode = modes[(modes.index(self.display_mode) + 1) % len(modes)]
+        if mode != 'pontos' and self.mesh_renderer.mesh is None and not self._build_mesh():
+            return
+        self._set_display_mode(mode)
+        print(f"🔺 Exibição: {mode}")
+    
+    def _set_display_mode(self, mode):
+        """Mostra pontos e/ou malha conforme o modo"""
+        self.display_mode = mode
+        self.mesh_renderer.visible = mode != 'pontos'
+        self.point_renderer.visible = mode != 'malha'
+        self.scheduler.request_redraw()
+    
+    def _build_mesh(self):
+        """
+        Monta a malha do túnel a partir das seções do arquivo carregado
+        
+        Returns:
+            True se a malha foi montada
+        """
+        offsets = getattr(self.loader, 'section_offsets', None)
+        if offsets is None or self.point_renderer.n_vertices == 0:
+            print("⚠️  Malha indisponível (arquivo sem tabela de seções)")
+            return False
+        if self._tiled:
+            print("⚠️  Malha indisponível com o arquivo em tiles (tile_km)")
+            return False
+        
+        start = glfw.get_time()
+        positions, rgba = self.point_renderer.load_order_arrays()
+        mesh = TunnelMesh.build(positions, rgba, offsets,
+                                samples=self.config.get("mesh_profile_samples", 48),
+                                tolerance=self.config.get("mesh_tolerance", 0.02))
+        self.mesh_renderer.set_mesh(mesh)
+        print(f"   Montada em {glfw.get_time() - start:.1f} s "
+              f"({mesh.n_triangles:,} triângulos para {len(positions):,} pontos)")
+        return mesh.n_triangles > 0
+    
+    def _cycle_wall_view(self):
+        """Alterna a vista desenrolada: folga → classe → desligada"""
+        view = self.wall_view
+        if view.visible and view.pyramid.mode == 'classe':
+            view.visible = False
+            print("🧱 Vista desenrolada: desligada")
+            return
+        
+        mode = 'classe' if view.visible else 'folga'
+        template = getattr(self.loader, 'template', None) or TemplateRegistry.get('ferrovia')
+        if mode == 'folga' and np.isnan(template.clearance([0.0], [0.0])[0]):
+            mode = 'classe'  # Gabarito sem cálculo de folga
+        if not self._build_wall_view(mode, template):
+            return
+        view.visible = True
+        print(f"🧱 Vista desenrolada: {mode} (arraste para mover, scroll para zoom)")
+    
+    def _build_wall_view(self, mode, template):
+        """
+        Abre (ou grava, na primeira vez) a pirâmide da vista desenrolada do arquivo atual
+        
+        Returns:
+            True se a vista está pronta
+        """
+        loader = self.loader
+        if getattr(loader, 'section_offsets', None) is None or self.point_renderer.n_vertices == 0:
+            print("⚠️  Vista desenrolada indisponível (arquivo sem tabela de seções)")
+            return False
+        if self.wall_view.pyramid is not None and self.wall_view.pyramid.mode == mode:
+            return True
+        
+        column_m = self.config.get("wall_column_m") or default_column_m(loader.section_z)
+        grid = loader.section_grid
+        key = {
+            'sections': int(len(loader.section_offsets) - 1),
+            'points': int(loader.section_offsets[-1]),
+            'template': TemplateRegistry.key_of(template),
+            'bins': int(grid.bins if grid is not None else loader.section_grid_bins or DEFAULT_BINS),
+            'column_m': float(column_m),
+        }
+        directory = loader.cache_dir_for(self.current_file, f"parede_{mode}")
+        pyramid = WallPyramid.open(directory, key)
+        if pyramid is None and grid is None and self._tiled:
+            print("⚠️  Vista desenrolada indisponível com o arquivo em tiles sem grade (section_grid_bins)")
+            return False
+        if pyramid is None:
+            start = glfw.get_time()
+            if grid is None:
+                grid = loader.ensure_section_grid(self.point_renderer.load_order_arrays()[0])
+            image = wall_image(grid, loader.section_z, template, mode, column_m)
+            pyramid = WallPyramid.build(image, directory, mode, loader.section_z[0], column_m, key)
+            print(f"   Pirâmide gravada em {glfw.get_time() - start:.1f} s "
+                  f"({pyramid.width:,} colunas × {pyramid.height} bins, {pyramid.levels} níveis)")
+        
+        self.wall_view.set_pyramid(pyramid, self.width, self.height)
+        return True
+    
+    def _toggle_overview(self):
+        """Mostra/esconde o painel de visão geral"""
+        if self.overview_panel.raster is None:
+            print("⚠️  Visão geral indisponível (arquivo sem tabela de seções)")
+            return
+        self.overview_panel.visible = not self.overview_panel.visible
+    
+    def _on_overview_jump(self, x, z):
+        """
+        Clique na visão geral: leva o alvo da câmera ao ponto (mesma altura)
+        
+        Args:
+            x: X no referencial do gabarito (o desvio lateral da seção é somado)
+            z: Z dos vértices (o deslocamento da camada ativa é somado)
+        """
+        dx, _, dz = self.scene.active.offset
+        self.camera.set_target(x + self.loader.lateral_offset(z) + dx, self.camera.target_y, z + dz)
+        km = self.overview_panel.z_to_km(z)
+        print(f"🗺️  Câmera no km {km:.3f}")
+        self.scheduler.request_redraw()
+    
+    def _toggle_km_panel(self):
+        """Mostra/esconde os sliders da janela de km"""
+        if self.loader is None or self.loader.km_extent() is None:
+            print("⚠️  Janela de km indisponível (arquivo sem referência de km)")
+            return
+        self.km_panel.visible = not self.km_panel.visible
+    
+    def _toggle_km_window(self):
+        """Liga/desliga o filtro de km_filter_window km em volta do ponto selecionado"""
+        if self.km_filter is not None:
+            self._clear_km_filter()
+            print("📏 Trecho visível: via inteira")
+            return
+        if self.loader is None or self.loader.km_to_z(0.0) is None:
+            print("⚠️  Filtro por km indisponível (arquivo sem referência de km)")
+            return
+        
+        if self.picked_point is not None and self.picked_point.get('km') is not None:
+            km = self.picked_point['km']
+        else:
+            # Alvo da câmera: Z do buffer de volta para km
+            km = (self.camera.target_z - self.loader.km_to_z(0.0)) / 1000.0
+        self.set_km_filter(km - self.km_filter_window, km + self.km_filter_window)
+    
+    def _pick_point(self, x, y):
+        """
+        Seleciona o ponto da nuvem sob um pixel e mostra seus atributos
+        
+        Args:
+            x, y: Pixel com origem no canto inferior esquerdo
+        """
+        if self.scene.total_points() == 0 or self.auto_rotate_x:
+            return
+        
+        start = glfw.get_time()
+        origin, direction = self.camera.screen_ray(x, y, self.width, self.height)
+        tolerance = self.pick_tolerance_px / self.camera.pixels_per_radian(self.height)
+        found = self.scene.pick(origin, direction, tolerance)
+        elapsed_ms = 1000.0 * (glfw.get_time() - start)
+        
+        if found is None:
+            self.picked_point = None
+            print(f"🎯 Nenhum ponto sob o cursor ({elapsed_ms:.1f} ms)")
+            return
+        
+        # Posição e atributos no referencial da camada atingida
+        index, hit = found
+        layer = self.scene.layers[index]
+        if layer.loader is not None:
+            # Sem apagar o que o renderer já trouxe (ex: classe lida do tile)
+            info = layer.loader.point_info(hit['index'], hit['position'])
+            hit.update({key: value for key, value in info.items() if value is not None or key not in hit})
+        if len(self.scene.layers) > 1:
+            hit['layer'] = layer.name
+        self.picked_point = hit
+        
+        x, y, z = hit['position']
+        message = f"🎯 Ponto {hit['index']:,}: X={x:.3f} Y={y:.3f} Z={z:.3f}"
+        if hit.get('layer') is not None:
+            message += f" | Camada: {hit['layer']}"
+        if hit.get('class_name') is not None:
+            message += f" | Classe: {hit['class_name']}"
+        if hit.get('km') is not None:
+            message += f" | km {hit['km']:.3f}"
+        if hit.get('clearance') is not None:
+            message += f" | Folga: {hit['clearance']:+.3f} m"
+        print(f"{message} ({elapsed_ms:.1f} ms)")
+    
+    def _render_pick_info(self):
+        """Mostra os atributos do ponto selecionado no canto superior esquerdo"""
+        hit = self.picked_point
+        x, y, z = hit['position']
+        lines = [f"PONTO {hit['index']}", f"X {x:.3f}  Y {y:.3f}  Z {z:.3f}"]
+        if hit.get('class_name') is not None:
+            # Fonte vetorial só tem ASCII: remove acentos
+            name = unicodedata.normalize('NFKD', hit['class_name']).encode('ascii', 'ignore').decode()
+            lines.append(f"CLASSE {name}")
+        if hit.get('km') is not None:
+            km = hit['km']
+            lines.append(f"KM {int(km)}+{(km - int(km)) * 1000:05.1f}")
+        if hit.get('clearance') is not None:
+            lines.append(f"FOLGA {hit['clearance']:+.3f} M")
+        if hit.get('layer') is not None:
+            lines.append(f"CAMADA {hit['layer'].upper()}")
+        
+        top = self.height - 60  # Abaixo da barra de menu
+        for row, line in enumerate(lines):
+            self.font.draw_text(10, top - row * 20, line, color=(1, 1, 0.6), font_size=0.8)
+    
+    def _open_file_dialog(self, as_layer=False):
+        """
+        Abre diálogo para selecionar arquivo
+        
+        Args:
+            as_layer: True abre o arquivo numa camada nova (ver load_file)
+        """
         try:
             import tkinter as tk
             from tkinter import filedialog
@@ -667,22 +1266,26 @@ class Viewer3DApplication:
             
             # Carrega arquivo se selecionado
             if filepath:
-                self.load_file(filepath)
+                self.load_file(filepath, as_layer=as_layer)
         except Exception as e:
             print(f"❌ Erro ao abrir diálogo: {e}")
     
     def _open_points_table(self):
         """Abre janela com tabela de pontos"""
-        if not hasattr(self.point_renderer, 'vertices') or self.point_renderer.vertices is None:
+        if self.point_renderer.n_vertices == 0:
             print("⚠️  Nenhum dado carregado!")
             return
+        if self._tiled:
+            print("⚠️  Tabela de pontos indisponível com o arquivo em tiles (tile_km)")
+            return
         
         # Importa módulo de tabela
         from ui.points_table import PointsTableWindow
         
         # Cria janela de tabela (passa self para poder mover câmera)
+        # (lidos sob demanda: podem vir do VBO se a cópia em RAM foi liberada)
         vertices = self.point_renderer.vertices
-        colors = self.point_renderer.colors if hasattr(self.point_renderer, 'colors') else None
+        colors = self.point_renderer.colors
         
         table_window = PointsTableWindow(vertices, colors, self.current_file, app=self)
         table_window.run()
@@ -699,7 +1302,7 @@ class Viewer3DApplication:
     def _on_train_selector_cancel(self):
         """Callback quando seletor de trem é cancelado"""
         print("❌ Seleção de trem cancelada")
-
+    
     def _process_menu_action(self, action):
         """Processa ações vindas da MenuBar"""
         if action == 'open_file':
@@ -781,36 +1384,18 @@ class Viewer3DApplication:
         # Limpa tela
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         
-        # Aplica câmera
-        self.camera.apply()
-        
-        # Renderiza cena 3D
-        if self.config.get_show_axes():
-            self.axes_renderer.render()
-        
-        # Se auto-rotacionar ativo, aplica transformação ao redor do centro da nuvem
-        if self.auto_rotate_x and hasattr(self.point_renderer, 'vertices') and self.point_renderer.n_vertices > 0:
-            try:
-                # Usa centro em cache (calculado apenas quando carrega arquivo)
-                if self._auto_rotate_center is None:
-                    self._auto_rotate_center = self.point_renderer.get_center()
-                
-                center = self._auto_rotate_center
-                glPushMatrix()
-                glTranslatef(center[0], center[1], center[2])
-                glRotatef(self._auto_rotate_angle_x, 1.0, 0.0, 0.0)
-                glTranslatef(-center[0], -center[1], -center[2])
-                self.point_renderer.render()
-                glPopMatrix()
-            except Exception:
-                # Fallback: renderiza sem transformação
-                self.point_renderer.render()
-        else:
-            self.point_renderer.render()
-        
-        # Renderiza indicador de eixos
-        pitch, yaw = self.camera.get_rotation_matrix()
-        self.axis_indicator.render(pitch, yaw)
+        # Renderiza cena 3D (acumulada no FBO se houver refinamento progressivo);
+        # a vista desenrolada ocupa a tela no lugar dela
+        if not self.wall_view.visible:
+            if self.accumulation is not None:
+                self._render_scene_accumulated()
+            else:
+                self.camera.apply()
+                self._render_scene()
+            
+            # Renderiza indicador de eixos
+            pitch, yaw = self.camera.get_rotation_matrix()
+            self.axis_indicator.render(pitch, yaw)
         
         # Modo 2D para UI
         glMatrixMode(GL_PROJECTION)
@@ -824,6 +1409,9 @@ class Viewer3DApplication:
         
         glDisable(GL_DEPTH_TEST)
         
+        # Vista desenrolada (tiles visíveis no nível de zoom atual)
+        self.wall_view.render(self.width, self.height)
+        
         # Renderiza UI (se menu aberto)
         if self.show_config_menu:
             self._render_config_menu_content()
@@ -832,13 +1420,32 @@ class Viewer3DApplication:
         if self.control_panel.visible:
             self.control_panel.render()
         
+        # Sliders da janela de km
+        self.km_panel.render()
+        
+        # Camadas com a memória de cada uma
+        self.layers_panel.render()
+        
+        # Visão geral com a posição da câmera
+        if self.overview_panel.visible:
+            camera = self.scene.active.camera(self.camera)
+            ex, _, ez = camera.get_position()
+            tx, tz = camera.target_x, camera.target_z
+            self.overview_panel.set_camera((ex - self.loader.lateral_offset(ez), ez),
+                                           (tx - self.loader.lateral_offset(tz), tz))
+            self.overview_panel.render()
+        
+        # Atributos do ponto selecionado por clique
+        if self.picked_point is not None:
+            self._render_pick_info()
+        
         # Renderiza Train Selector Menu (se ativo)
         self.train_selector.render()
         
         # Renderiza Font Editor (tem prioridade)
         if self.font_editor.active:
             self.font_editor.render()
-
+        
         # Renderiza barra de menu sempre por cima
         try:
             self.menu_bar.render()
@@ -852,6 +1459,82 @@ class Viewer3DApplication:
         glMatrixMode(GL_MODELVIEW)
         glPopMatrix()
     
+    def _render_scene_accumulated(self):
+        """
+        Renderiza a cena 3D no FBO de acumulação e copia para a tela
+        
+        Se câmera, dados ou janela mudaram desde o frame anterior, limpa o FBO
+        e desenha a seleção de LOD. Nos frames seguintes sem mudança desenha só
+        o próximo lote de refinamento por cima, até a densidade total.
+        """
+        resized = self.accumulation.ensure_size(self.width, self.height)
+        if not self.accumulation.available:
+            # Sem FBO: desenho direto (densidade total ao parar, como antes)
+            self.accumulation = None
+            self.scene.set_progressive_refinement(False)
+            self.camera.apply()
+            self._render_scene()
+            return
+        
+        key = self._scene_key()
+        self.accumulation.bind()
+        if resized or key != self._accumulated_key:
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            self.camera.apply()
+            self._render_scene()
+            self._accumulated_key = key
+            self._refine_started = False
+        else:
+            # Mesma cena do frame anterior: câmera parada, refina
+            if not self._refine_started:
+                self.scene.start_refinement(self.camera)
+                self._refine_started = True
+            self.camera.apply()
+            self.scene.render_refinement_batch()
+        self.accumulation.unbind()
+        
+        self.accumulation.present()
+    
+    def _scene_key(self):
+        """Estado que define a imagem 3D acumulada (qualquer mudança recomeça o refinamento)"""
+        camera_state = (self.camera.get_position(), self.camera.target_x, self.camera.target_y,
+                        self.camera.target_z, self.camera.fov_y, self.camera.aspect)
+        return (camera_state, self.scene.version_key(),
+                self.mesh_renderer.visible, self.mesh_renderer.version,
+                self.config.get_show_axes(),
+                tuple(self.config.get_background_color()),
+                self.auto_rotate_x and self._auto_rotate_angle_x)
+    
+    def _render_scene(self):
+        """Renderiza eixos, malha e nuvem de pontos (câmera já aplicada)"""
+        if self.config.get_show_axes():
+            self.axes_renderer.render()
+        
+        # Se auto-rotacionar ativo, aplica transformação ao redor do centro da nuvem
+        if self.auto_rotate_x and hasattr(self.point_renderer, 'vertices') and self.point_renderer.n_vertices > 0:
+            try:
+                # Usa centro em cache (calculado apenas quando carrega arquivo)
+                if self._auto_rotate_center is None:
+                    self._auto_rotate_center = self.point_renderer.get_center()
+                
+                center = self._auto_rotate_center
+                glPushMatrix()
+                glTranslatef(center[0], center[1], center[2])
+                glRotatef(self._auto_rotate_angle_x, 1.0, 0.0, 0.0)
+                glTranslatef(-center[0], -center[1], -center[2])
+                self._render_geometry()
+                glPopMatrix()
+            except Exception:
+                # Fallback: renderiza sem transformação
+                self._render_geometry()
+        else:
+            self._render_geometry(self.camera)
+    
+    def _render_geometry(self, camera=None):
+        """Camadas visíveis, com a malha do túnel (se visível) na camada ativa"""
+        self.scene.render(camera, lambda layer_camera: self.mesh_renderer.render(
+            layer_camera, self.point_renderer.z_range))
+    
     def _render_config_menu_content(self):
         """Renderiza conteúdo do menu de configuração"""
         glEnable(GL_BLEND)
@@ -896,10 +1579,43 @@ class Viewer3DApplication:
         self._print_controls()
         
         while not glfw.window_should_close(self.window):
-            # Atualiza tempo e ângulo de rotação automática
             current_time = glfw.get_time()
+            
+            # Câmera mudou (por evento ou programaticamente): redesenha
+            camera_state = (self.camera.get_position(), self.camera.target_x,
+                            self.camera.target_y, self.camera.target_z)
+            camera_moving = camera_state != self._last_camera_state or self.auto_rotate_x
+            self._last_camera_state = camera_state
+            if camera_moving:
+                self.scheduler.request_redraw()
+            
+            # Fontes contínuas: animação e trabalho do renderer (envio à GPU, orçamento)
+            self.scheduler.set_animating('auto_rotate', self.auto_rotate_x)
+            self.scheduler.set_animating('point_cloud', self.scene.needs_redraw())
+            self.scheduler.set_animating('wall_view', self.wall_view.needs_redraw())
+            
+            # Título com FPS e stats de renderização (também enquanto ocioso)
+            # (e orçamentos de memória: camadas terminam de subir à GPU entre frames)
+            if current_time - self._stats_last_time >= 1.0:
+                self._update_title(current_time)
+                self._stats_last_time = current_time
+                for name in self.scene.enforce_memory():
+                    print(f"🧹 Memória liberada da camada {name} (orçamento)")
+            
+            if not self.scheduler.needs_redraw():
+                # Nada mudou: bloqueia até um evento (ou max_wait)
+                timeout = self.scheduler.max_wait
+                glfw.wait_events_timeout(timeout)
+                self.scheduler.record_wait(glfw.get_time() - current_time, timeout)
+                # Tempo ocioso não conta como duração de frame
+                self._last_frame_time = glfw.get_time()
+                continue
+            
             dt = current_time - self._last_frame_time
             
+            # Orçamento de pontos pelo tempo real do último frame (inclui espera da GPU no swap)
+            self.scene.update_frame_budget(dt, camera_moving, current_time)
+            
             # Limita dt para evitar pulos grandes (ex: quando pausa debugger)
             dt = min(dt, 0.1)  # Máximo 100ms entre frames
             
@@ -909,31 +1625,12 @@ class Viewer3DApplication:
             
             self._last_frame_time = current_time
             
-            # FPS counter
-            self._fps_counter += 1
-            if current_time - self._fps_last_time >= 1.0:
-                self._current_fps = self._fps_counter
-                
-                # Monta título com FPS e stats de renderização
-                title = f"{self.title} | FPS: {self._current_fps}"
-                
-                # Adiciona info de LOD se ativo
-                if hasattr(self.point_renderer, 'get_render_stats'):
-                    stats = self.point_renderer.get_render_stats()
-                    if stats['lod_active']:
-                        title += f" | Pontos: {stats['rendered_points']:,}/{stats['total_points']:,} ({stats['percentage']:.0f}%)"
-                    elif stats['total_points'] > 0:
-                        title += f" | Pontos: {stats['total_points']:,}"
-                
-                glfw.set_window_title(self.window, title)
-                self._fps_counter = 0
-                self._fps_last_time = current_time
-
             # Renderiza
             self.render()
             
             # Swap buffers
             glfw.swap_buffers(self.window)
+            self.scheduler.frame_drawn()
             
             # Processa eventos sem bloquear
             # poll_events é rápido, mas processar cada evento de mouse tem custo
@@ -944,8 +1641,41 @@ class Viewer3DApplication:
         self.config.set_camera_params(self.camera.distance, cam_params[0], cam_params[1])
         self.config.save()
         
+        # Cancela leituras de tiles ainda na fila
+        for layer in self.scene.layers:
+            if isinstance(layer.renderer, TiledPointCloud):
+                layer.renderer.clear()
+        
         glfw.terminate()
     
+    def _update_title(self, now):
+        """Atualiza título da janela com FPS, tempo ocioso e stats de renderização"""
+        frame_stats = self.scheduler.take_stats(now)
+        title = f"{self.title} | FPS: {frame_stats['fps']:.0f} | Ocioso: {frame_stats['idle_percent']:.0f}%"
+        
+        # Adiciona info de LOD se ativo
+        if hasattr(self.point_renderer, 'get_render_stats'):
+            stats = self.point_renderer.get_render_stats()
+            if stats['lod_active']:
+                title += f" | Pontos: {stats['rendered_points']:,}/{stats['total_points']:,} ({stats['percentage']:.0f}%)"
+                adaptive = self.scene.adaptive_budget.get_stats() if self.scene.adaptive_budget is not None else None
+                if adaptive is not None:
+                    title += f" | Orçamento: {adaptive['budget']:,} ({adaptive['state']}, alvo {adaptive['target_fps']:.0f} FPS)"
+            elif stats['total_points'] > 0:
+                title += f" | Pontos: {stats['total_points']:,}"
+            if stats.get('refining'):
+                title += " | Refinando"
+            if stats['uploaded_points'] < stats['total_points']:
+                title += f" | Enviando à GPU: {100.0 * stats['uploaded_points'] / stats['total_points']:.0f}%"
+            if 'tiles' in stats:
+                title += f" | Tiles: {stats['resident_tiles']}/{stats['tiles']}"
+                if stats['pending_tiles']:
+                    title += f" (lendo {stats['pending_tiles']})"
+        if len(self.scene.layers) > 1:
+            title += f" | Camadas: {len(self.scene.visible_layers())}/{len(self.scene.layers)}"
+        
+        glfw.set_window_title(self.window, title)
+    
     def _print_controls(self):
         """Imprime controles no console"""
         print("\n" + "="*60)
@@ -953,6 +1683,7 @@ class Viewer3DApplication:
         print("="*60)
         print("\n[Mouse]")
         print("  Arrastar Esq:         Rotacionar câmera")
+        print("  Clique Esq:           Selecionar ponto (coordenadas, classe, km, folga)")
         print("  Ctrl + Arrastar Esq:  Pan (mover lateral)")
         print("  Ctrl + Arrastar Dir:  Mover frente/trás")
         print("  Scroll:               Zoom in/out")
@@ -972,6 +1703,17 @@ class Viewer3DApplication:
         print("  C:                    Menu configuração")
         print("  F:                    ✏️  Editor de Fontes")
         print("  P:                    🎛️  Painel de Controle")
+        print("  1/2/3:                Mostrar/esconder Seguro/Alerta/Invasão")
+        print("  Q:                    Só o trecho em volta do ponto selecionado")
+        print("  W:                    Sliders de início/fim do trecho em km")
+        print("  M:                    Pontos / malha do túnel / malha + pontos")
+        print("  N:                    Vista desenrolada da parede (folga / classe / desligada)")
+        print("  B:                    Visão geral da via (clique leva a câmera ao km)")
+        print("  0:                    Remover filtros (mostrar tudo)")
+        print("  Shift + O:            Abrir arquivo como nova camada")
+        print("  H:                    Painel de camadas (clique: visibilidade / camada ativa)")
+        print("  Delete:               Remover a camada ativa (com o painel aberto)")
+        print("  Ctrl + ←→/↑↓/J K:     Deslocar a camada ativa em X / Z / Y")
         if self.current_file:
             print("  U:                    Recarregar arquivo")
         print("  ESC:                  Sair")
@@ -6,6 +6,7 @@ Suporta rotação, zoom, pan e posicionamento baseado em target
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import math
+import numpy as np
 
 
 class Camera3D:
@@ -30,6 +31,12 @@ class Camera3D:
         # Distância ao target (zoom)
         self.distance = distance
         
+        # Projeção perspectiva (usada por apply_projection e no frustum culling)
+        self.fov_y = 45.0
+        self.near = 0.1
+        self.far = 2000.0
+        self.aspect = 1.0
+        
         # Ponto de interesse (onde a câmera olha)
         self.target_x = 0.0
         self.target_y = 0.0
@@ -294,6 +301,107 @@ class Camera3D:
             0, 1, 0                                        # Vetor "up"
         )
     
+    def apply_projection(self, aspect):
+        """
+        Configura a projeção perspectiva (GL_PROJECTION)
+        
+        Args:
+            aspect: Razão largura/altura do viewport
+        """
+        self.aspect = aspect
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(self.fov_y, aspect, self.near, self.far)
+        glMatrixMode(GL_MODELVIEW)
+    
+    def get_view_matrix(self):
+        """
+        Matriz de visualização 4x4 (equivalente ao gluLookAt de apply)
+        
+        Returns:
+            np.array (4, 4) em convenção de coluna (v_olho = M @ v_mundo)
+        """
+        eye = np.array(self.get_position(), dtype=np.float64)
+        target = np.array([self.target_x, self.target_y, self.target_z])
+        
+        forward = target - eye
+        forward /= np.linalg.norm(forward)
+        side = np.cross(forward, [0.0, 1.0, 0.0])
+        side /= np.linalg.norm(side)
+        up = np.cross(side, forward)
+        
+        view = np.eye(4)
+        view[0, :3] = side
+        view[1, :3] = up
+        view[2, :3] = -forward
+        view[:3, 3] = -view[:3, :3] @ eye
+        return view
+    
+    def get_projection_matrix(self):
+        """
+        Matriz de projeção 4x4 (equivalente ao gluPerspective de apply_projection)
+        
+        Returns:
+            np.array (4, 4)
+        """
+        f = 1.0 / math.tan(math.radians(self.fov_y) / 2.0)
+        near, far = self.near, self.far
+        
+        proj = np.zeros((4, 4))
+        proj[0, 0] = f / self.aspect
+        proj[1, 1] = f
+        proj[2, 2] = (far + near) / (near - far)
+        proj[2, 3] = 2.0 * far * near / (near - far)
+        proj[3, 2] = -1.0
+        return proj
+    
+    def get_frustum_planes(self):
+        """
+        Planos do frustum de visão em coordenadas do mundo
+        
+        Extraídos das linhas de projeção × visualização; cada plano (a, b, c, d)
+        tem normal unitária para dentro (ponto visível: a*x + b*y + c*z + d >= 0).
+        
+        Returns:
+            np.array (6, 4): esquerda, direita, baixo, cima, perto, longe
+        """
+        m = self.get_projection_matrix() @ self.get_view_matrix()
+        planes = np.array([
+            m[3] + m[0], m[3] - m[0],
+            m[3] + m[1], m[3] - m[1],
+            m[3] + m[2], m[3] - m[2],
+        ])
+        return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+    
+    def screen_ray(self, x, y, width, height):
+        """
+        Raio do mundo que passa por um pixel da janela (desfaz projeção × visualização)
+        
+        Args:
+            x, y: Posição do pixel com origem no canto inferior esquerdo
+                (mesma convenção de glViewport)
+            width, height: Tamanho do viewport
+        
+        Returns:
+            Tupla (origin, direction): posição da câmera e direção unitária
+        """
+        ndc_x = 2.0 * x / max(width, 1) - 1.0
+        ndc_y = 2.0 * y / max(height, 1) - 1.0
+        inverse = np.linalg.inv(self.get_projection_matrix() @ self.get_view_matrix())
+        
+        near = inverse @ np.array([ndc_x, ndc_y, -1.0, 1.0])
+        far = inverse @ np.array([ndc_x, ndc_y, 1.0, 1.0])
+        near = near[:3] / near[3]
+        far = far[:3] / far[3]
+        
+        direction = far - near
+        direction /= np.linalg.norm(direction)
+        return np.array(self.get_position(), dtype=np.float64), direction
+    
+    def pixels_per_radian(self, height):
+        """Pixels por radiano no centro da tela (converte tolerâncias em pixels)"""
+        return height / (2.0 * math.tan(math.radians(self.fov_y) / 2.0))
+    
     def get_rotation_matrix(self):
         """
         Retorna a matriz de rotação da câmera (útil para indicadores)
@@ -33,6 +33,25 @@ class Configuration:
         # Configurações de performance
         "max_points": 500000,
         "enable_antialiasing": True,
+        "progressive_order": False,  # Ordem de desenho progressiva (LOD por prefixo)
+        "adaptive_budget": True,  # Ajusta pontos por frame para manter target_fps
+        "target_fps": 60,
+        "keep_host_copy": True,  # False: libera posições da RAM após envio à GPU
+        "progressive_refinement": True,  # Parada: completa a densidade em lotes por frame
+        "km_filter_window": 0.5,  # Tecla Q: km para cada lado do ponto selecionado
+        "mesh_profile_samples": 48,  # Tecla M: amostras por perfil da malha do túnel
+        "mesh_tolerance": 0.02,  # Desvio (m) aceito ao simplificar trechos planos da malha
+        "section_grid_bins": None,  # Bins angulares por seção (ex: 180); None = sem grade
+        "curve_compensation": False,  # Ajusta o gabarito por seção em curvas (superelevação e sobrelargura)
+        "design_speed_kmh": 60.0,  # Velocidade de projeto usada na superelevação das curvas
+        "wall_column_m": None,  # Tecla N: metros por coluna da vista desenrolada (None = espaçamento das seções)
+        "gpu_budget_mb": 2048,  # Orçamento de VBOs somando as camadas (None = sem limite)
+        "host_budget_mb": None,  # Orçamento de RAM das nuvens somando as camadas (None = sem limite)
+        "layer_nudge_m": 0.05,  # Ctrl+setas: passo (m) ao deslocar a camada ativa
+        "tile_km": None,  # Km de via por tile em disco (ex: 0.25); None = arquivo inteiro na RAM
+        "tile_radius_km": 1.0,  # Km de cada lado do alvo da câmera mantidos em memória
+        "tile_memory_mb": 1024,  # Orçamento de RAM dos tiles de uma camada (None = sem limite)
+        "tile_workers": 2,  # Threads de leitura de tiles
         
         # Presets de cores de fundo
         "background_presets": [
@@ -0,0 +1,97 @@
+"""
+Agendador de redesenho orientado a eventos
+Só desenha quando algo mudou; com a cena parada o loop principal bloqueia em
+glfw.wait_events_timeout em vez de redesenhar a cada iteração
+"""
+
+
+class RedrawScheduler:
+    """
+    Decide, a cada iteração do loop, se desenha um frame ou espera eventos
+    
+    Fontes pontuais (entrada do usuário, câmera, dados novos) chamam
+    request_redraw() e valem um frame. Fontes contínuas (auto-rotação, trem,
+    envio à GPU, refinamento) ficam ligadas com set_animating(nome, True) até
+    serem desligadas. O tempo bloqueado esperando eventos é contado como ocioso.
+    """
+    
+    def __init__(self, max_wait=0.5):
+        """
+        Args:
+            max_wait: Máximo bloqueado por espera (s); acorda mesmo sem eventos
+                para tarefas periódicas (título, arquivos observados)
+        """
+        self.max_wait = max_wait
+        self._dirty = True  # Primeiro frame sempre desenha
+        self._animating = set()
+        
+        # Estatísticas desde a última take_stats()
+        self._frames = 0
+        self._idle_time = 0.0
+        self._stats_start = None
+    
+    def request_redraw(self):
+        """Marca o próximo frame como necessário"""
+        self._dirty = True
+    
+    def set_animating(self, name, active):
+        """
+        Liga/desliga uma fonte contínua de frames
+        
+        Args:
+            name: Identificador da fonte (ex: 'auto_rotate', 'trem')
+            active: True enquanto a fonte precisa de um frame por iteração
+        """
+        if active:
+            self._animating.add(name)
+        else:
+            self._animating.discard(name)
+    
+    def needs_redraw(self):
+        """True se há frame pendente ou alguma fonte contínua ativa"""
+        return self._dirty or bool(self._animating)
+    
+    def frame_drawn(self):
+        """Registra um frame desenhado (limpa o pedido pontual)"""
+        self._dirty = False
+        self._frames += 1
+    
+    def record_wait(self, waited, timeout):
+        """
+        Registra uma espera por eventos
+        
+        Acordar antes do timeout significa que chegou um evento; como callbacks
+        podem ter sido trocados por scripts (sem request_redraw), redesenha.
+        
+        Args:
+            waited: Tempo efetivamente bloqueado (s)
+            timeout: Timeout pedido a glfw.wait_events_timeout (s)
+        """
+        self._idle_time += waited
+        if waited < 0.9 * timeout:  # Folga para imprecisão do timer
+            self._dirty = True
+    
+    def take_stats(self, now):
+        """
+        Estatísticas desde a chamada anterior (ex: uma vez por segundo)
+        
+        Args:
+            now: Tempo atual (s)
+        
+        Returns:
+            Dict com frames, fps, idle_time (s), idle_percent e fontes contínuas
+        """
+        if self._stats_start is None:
+            self._stats_start = now
+        elapsed = max(now - self._stats_start, 1e-9)
+        stats = {
+            'frames': self._frames,
+            'fps': self._frames / elapsed,
+            'idle_time': self._idle_time,
+            'idle_percent': min(100.0, 100.0 * self._idle_time / elapsed),
+            'animating': sorted(self._animating),
+        }
+        self._frames = 0
+        self._idle_time = 0.0
+        self._stats_start = now
+        return stats
@@ -0,0 +1,359 @@
+"""
+Cena com várias camadas de nuvem de pontos
+Cada camada (uma passagem, uma geometria de referência) tem seu renderer,
+loader, deslocamento e visibilidade; um orçamento global de pontos por frame
+e de memória (GPU e RAM) é repartido entre as camadas visíveis
+"""
+
+import numpy as np
+
+from OpenGL.GL import glPushMatrix, glPopMatrix, glTranslatef
+
+
+# Mínimo de pontos por frame de cada camada visível (mesmo as pequenas)
+MIN_LAYER_POINTS = 50000
+
+
+class LayerCamera:
+    """
+    Câmera vista do referencial de uma camada deslocada
+    
+    Repassa tudo à câmera original, subtraindo o deslocamento da posição e do
+    alvo; os planos do frustum (a, b, c, d) passam a d + (a, b, c)·offset.
+    Os renderers usam LOD e culling nas coordenadas dos próprios dados.
+    """
+    
+    def __init__(self, camera, offset):
+        self._camera = camera
+        self._offset = np.asarray(offset, dtype=np.float64)
+    
+    def __getattr__(self, name):
+        return getattr(self._camera, name)
+    
+    @property
+    def target_x(self):
+        return self._camera.target_x - self._offset[0]
+    
+    @property
+    def target_y(self):
+        return self._camera.target_y - self._offset[1]
+    
+    @property
+    def target_z(self):
+        return self._camera.target_z - self._offset[2]
+    
+    def get_position(self):
+        """Posição da câmera no referencial da camada"""
+        x, y, z = self._camera.get_position()
+        return (x - self._offset[0], y - self._offset[1], z - self._offset[2])
+    
+    def get_frustum_planes(self):
+        """Planos do frustum no referencial da camada"""
+        planes = np.array(self._camera.get_frustum_planes(), dtype=np.float64)
+        planes[:, 3] += planes[:, :3] @ self._offset
+        return planes
+
+
+class SceneLayer:
+    """
+    Uma nuvem carregada na cena
+    
+    Atributos:
+        name: Nome mostrado no painel de camadas
+        renderer: PointCloudRenderer com os dados da camada
+        loader: Loader do arquivo (atributos dos pontos) ou None
+        filepath: Arquivo de origem ou None
+        offset: Deslocamento (3,) em metros aplicado aos dados ao desenhar
+        visible: Camada mostrada (renderer.visible fica para o modo de
+            exibição da camada ativa, ex: só a malha)
+    """
+    
+    def __init__(self, name, renderer, loader=None, filepath=None):
+        self.name = name
+        self.renderer = renderer
+        self.loader = loader
+        self.filepath = filepath
+        self.offset = np.zeros(3, dtype=np.float64)
+        self.visible = True
+        self.hidden_since = None  # Ordem em que foi escondida (libera a GPU da mais antiga)
+    
+    @property
+    def translated(self):
+        """True se a camada tem deslocamento"""
+        return bool(np.any(self.offset))
+    
+    def camera(self, camera):
+        """Câmera no referencial da camada (a própria se não há deslocamento)"""
+        if camera is None or not self.translated:
+            return camera
+        return LayerCamera(camera, self.offset)
+    
+    def to_layer(self, point):
+        """Ponto do mundo no referencial da camada"""
+        return np.asarray(point, dtype=np.float64) - self.offset
+    
+    def memory_usage(self):
+        """Dict com gpu e host (bytes) ocupados pela camada"""
+        return self.renderer.memory_usage()
+    
+    def push_transform(self):
+        """Aplica o deslocamento à matriz MODELVIEW (par com pop_transform)"""
+        glPushMatrix()
+        glTranslatef(*self.offset)
+    
+    @staticmethod
+    def pop_transform():
+        glPopMatrix()
+
+
+class Scene:
+    """
+    Camadas de nuvem de pontos e a camada ativa
+    
+    A camada ativa é a que recebe filtros, malha, vista da parede e recarga
+    de arquivo. rebalance() reparte o orçamento de pontos por frame entre as
+    camadas visíveis pelo tamanho de cada uma; enforce_memory() libera VBOs
+    de camadas escondidas (a mais antiga primeiro) acima do orçamento de GPU
+    e as cópias na RAM de camadas já enviadas acima do orçamento de RAM.
+    
+    Atributos:
+        layers: Lista de SceneLayer
+        active_index: Índice da camada ativa
+        point_budget: Pontos por frame somando todas as camadas
+        gpu_budget, host_budget: Orçamentos de memória (bytes; None = sem limite)
+        adaptive_budget: AdaptivePointBudget que ajusta point_budget pelo
+            tempo de frame (None = fixo)
+    """
+    
+    def __init__(self, point_budget=2000000, gpu_budget=None, host_budget=None):
+        self.layers = []
+        self.active_index = 0
+        self.point_budget = int(point_budget)
+        self.gpu_budget = gpu_budget
+        self.host_budget = host_budget
+        self.adaptive_budget = None
+        self.refine_enabled = False
+        self._hide_counter = 0
+    
+    @property
+    def active(self):
+        """Camada ativa (None se a cena está vazia)"""
+        if not self.layers:
+            return None
+        return self.layers[min(self.active_index, len(self.layers) - 1)]
+    
+    def add_layer(self, layer):
+        """
+        Acrescenta uma camada e a torna ativa
+        
+        Returns:
+            Índice da camada
+        """
+        self.layers.append(layer)
+        self.active_index = len(self.layers) - 1
+        self.rebalance()
+        return self.active_index
+    
+    def remove_layer(self, index):
+        """Remove uma camada (libera os dados dela)"""
+        layer = self.layers.pop(index)
+        layer.renderer.clear()
+        if self.active_index >= index and self.active_index > 0:
+            self.active_index -= 1
+        self.rebalance()
+        return layer
+    
+    def set_active(self, index):
+        """Troca a camada ativa"""
+        if 0 <= index < len(self.layers):
+            self.active_index = index
+    
+    def set_visible(self, index, visible):
+        """Mostra/esconde uma camada e reparte o orçamento de novo"""
+        layer = self.layers[index]
+        if layer.visible == bool(visible):
+            return
+        layer.visible = bool(visible)
+        if visible:
+            layer.hidden_since = None
+        else:
+            self._hide_counter += 1
+            layer.hidden_since = self._hide_counter
+        self.rebalance()
+        self.enforce_memory()
+    
+    def visible_layers(self):
+        """Camadas visíveis com pontos"""
+        return [layer for layer in self.layers if layer.visible and layer.renderer.n_vertices > 0]
+    
+    def total_points(self):
+        """Pontos somando as camadas visíveis"""
+        return sum(layer.renderer.n_vertices for layer in self.visible_layers())
+    
+    def rebalance(self, point_budget=None):
+        """
+        Reparte o orçamento de pontos por frame entre as camadas visíveis
+        
+        Cada camada recebe a fração do orçamento igual à sua fração dos
+        pontos visíveis (no mínimo MIN_LAYER_POINTS, no máximo o seu total).
+        
+        Args:
+            point_budget: Novo total (None = mantém point_budget)
+        """
+        if point_budget is not None:
+            self.point_budget = int(point_budget)
+        layers = self.visible_layers()
+        total = sum(layer.renderer.n_vertices for layer in layers)
+        if self.adaptive_budget is not None:
+            self.adaptive_budget.set_max_points(max(total, 1))
+        for layer in layers:
+            n = layer.renderer.n_vertices
+            share = int(self.point_budget * n // max(total, 1))
+            layer.renderer.max_points_render = max(1, min(n, max(share, MIN_LAYER_POINTS)))
+    
+    def update_frame_budget(self, frame_time, camera_moving, now):
+        """
+        Informa a duração do último frame (orçamento global e lotes de refinamento)
+        
+        Args:
+            frame_time: Duração do último frame (s)
+            camera_moving: Se a câmera mudou desde o frame anterior
+            now: Tempo atual (s)
+        """
+        for layer in self.layers:
+            layer.renderer.update_frame_budget(frame_time, camera_moving, now)
+        if self.adaptive_budget is not None and any(layer.renderer.enable_lod for layer in self.visible_layers()):
+            budget = self.adaptive_budget.update(frame_time, camera_moving, now)
+            if budget != self.point_budget:
+                self.rebalance(budget)
+    
+    def set_progressive_refinement(self, enabled):
+        """
+        Liga/desliga o refinamento progressivo em todas as camadas
+        
+        Com ele o orçamento global não salta para a densidade total ao parar
+        (ver PointCloudRenderer.set_progressive_refinement).
+        """
+        self.refine_enabled = enabled
+        for layer in self.layers:
+            layer.renderer.set_progressive_refinement(enabled)
+        if self.adaptive_budget is not None:
+            self.adaptive_budget.full_density_when_still = not enabled
+    
+    def memory_usage(self):
+        """Lista de dicts (gpu, host em bytes) por camada"""
+        return [layer.memory_usage() for layer in self.layers]
+    
+    def enforce_memory(self):
+        """
+        Cumpre os orçamentos de memória
+        
+        GPU: libera o VBO das camadas escondidas, da escondida há mais tempo
+        para a mais recente, até caber (voltam ao ficar visíveis). RAM: libera
+        as posições de camadas visíveis já inteiras na GPU (a maior primeiro);
+        camadas com VBO liberado precisam da cópia e não entram.
+        
+        Returns:
+            Lista de nomes das camadas liberadas
+        """
+        released = []
+        usage = self.memory_usage()
+        
+        if self.gpu_budget is not None:
+            gpu = sum(u['gpu'] for u in usage)
+            hidden = sorted((i for i, layer in enumerate(self.layers)
+                             if not layer.visible and usage[i]['gpu'] > 0),
+                            key=lambda i: self.layers[i].hidden_since or 0)
+            for i in hidden:
+                if gpu <= self.gpu_budget:
+                    break
+                if self.layers[i].renderer.release_gpu():
+                    gpu -= usage[i]['gpu']
+                    released.append(self.layers[i].name)
+        
+        if self.host_budget is not None:
+            usage = self.memory_usage()
+            host = sum(u['host'] for u in usage)
+            shown = sorted((i for i, layer in enumerate(self.layers) if layer.visible),
+                           key=lambda i: -usage[i]['host'])
+            for i in shown:
+                if host <= self.host_budget:
+                    break
+                if self.layers[i].renderer.release_host_copy():
+                    host -= usage[i]['host'] - self.layers[i].memory_usage()['host']
+                    released.append(self.layers[i].name)
+        return released
+    
+    def needs_redraw(self):
+        """True se alguma camada ainda muda sem entrada ou o orçamento não assentou"""
+        if any(layer.renderer.needs_redraw() for layer in self.visible_layers()):
+            return True
+        budget = self.adaptive_budget
+        return (budget is not None and budget.state != 'parado'
+                and any(layer.renderer.enable_lod for layer in self.visible_layers()))
+    
+    def version_key(self):
+        """Estado de todas as camadas que muda a imagem (para o frame acumulado)"""
+        return tuple((layer.renderer.scene_version, layer.renderer.max_points_render,
+                      layer.renderer.visible, layer.visible, tuple(layer.offset))
+                     for layer in self.layers)
+    
+    def render(self, camera=None, before_active=None):
+        """
+        Desenha as camadas visíveis, cada uma com seu deslocamento
+        
+        Args:
+            camera: Camera3D para LOD e culling (None = sem culling)
+            before_active: Função(camera_da_camada) chamada dentro do
+                referencial da camada ativa antes dos pontos dela (ex: malha)
+        """
+        for index, layer in enumerate(self.layers):
+            if not layer.visible:
+                continue
+            layer_camera = layer.camera(camera)
+            layer.push_transform()
+            if index == self.active_index and before_active is not None:
+                before_active(layer_camera)
+            layer.renderer.render(layer_camera)
+            layer.pop_transform()
+    
+    def start_refinement(self, camera=None):
+        """start_refinement de cada camada (ver PointCloudRenderer.start_refinement)"""
+        for layer in self.visible_layers():
+            layer.renderer.start_refinement(layer.camera(camera))
+    
+    def render_refinement_batch(self):
+        """
+        Desenha o próximo lote de refinamento de cada camada visível
+        
+        Returns:
+            Número de pontos desenhados
+        """
+        drawn = 0
+        for layer in self.visible_layers():
+            if not layer.renderer.refinement_pending():
+                continue
+            layer.push_transform()
+            drawn += layer.renderer.render_refinement_batch()
+            layer.pop_transform()
+        return drawn
+    
+    def pick(self, origin, direction, tolerance):
+        """
+        Ponto mais próximo da câmera entre as camadas visíveis
+        
+        Args:
+            origin, direction, tolerance: Ver PointCloudRenderer.pick
+        
+        Returns:
+            Tupla (índice da camada, hit) com a posição no referencial da
+            camada, ou None
+        """
+        best = None
+        for index, layer in enumerate(self.layers):
+            if not layer.visible or layer.renderer.n_vertices == 0:
+                continue
+            hit = layer.renderer.pick(layer.to_layer(origin), direction, tolerance)
+            if hit is not None and (best is None or hit['distance'] < best[1]['distance']):
+                best = (index, hit)
+        return best
@@ -3,5 +3,6 @@
 from .data_loader import (
     DataLoader, UPLLoader, CSVLoader, DataLoaderFactory
 )
+from .km_tiles import KmTileStore
 
-__all__ = ['DataLoader', 'UPLLoader', 'CSVLoader', 'DataLoaderFactory']
+__all__ = ['DataLoader', 'UPLLoader', 'CSVLoader', 'DataLoaderFactory', 'KmTileStore']
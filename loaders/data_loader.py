@@ -3,10 +3,13 @@ Sistema genérico de carregamento de dados para visualização 3D
 Suporta múltiplos formatos de arquivo (UPL, CSV, JSON, etc)
 """
 
+import copy
 import numpy as np
 import os
 from abc import ABC, abstractmethod
 
+from loaders.km_tiles import DEFAULT_TILE_M
+
 
 class DataLoader(ABC):
     """Classe base abstrata para carregadores de dados"""
@@ -38,6 +41,49 @@ class DataLoader(ABC):
             True se suporta
         """
         pass
+    
+    def point_info(self, index, position):
+        """
+        Atributos de um ponto carregado (seleção por clique na vista 3D)
+        
+        Args:
+            index: Índice do ponto no array retornado por load()
+            position: Coordenadas (x, y, z) do ponto
+            
+        Returns:
+            Dicionário com os atributos conhecidos pelo formato (vazio por padrão)
+        """
+        return {}
+    
+    def km_to_z(self, km):
+        """
+        Coordenada Z dos vértices carregados correspondente a uma posição em km
+        
+        Args:
+            km: Posição ao longo da via (km)
+            
+        Returns:
+            Z (m) ou None se o formato não tem referência de km
+        """
+        return None
+    
+    def km_extent(self):
+        """
+        Primeiro e último km do arquivo carregado
+        
+        Returns:
+            Tupla (km_min, km_max) ou None se o formato não tem referência de km
+        """
+        return None
+    
+    def section_table(self):
+        """
+        Z de cada seção (coordenadas dos vértices) e início dela nos vértices
+        
+        Returns:
+            Tupla (z (S,), offsets (S+1,)) ou None se o formato não tem seções
+        """
+        return None
 
 
 class UPLLoader(DataLoader):
@@ -46,14 +92,55 @@ class UPLLoader(DataLoader):
     Formato específico com cabeçalhos EFVM e dados de seção transversal
     """
     
-    def __init__(self, max_points=None, template=None):
+    # Seções agregadas por lote no cálculo de estatísticas por km
+    STATS_SECTION_BATCH = 4096
+    # Pontos acumulados antes de cada escrita no temporário de stream_tiles
+    STREAM_BUFFER = 1 << 18
+    
+    def __init__(self, max_points=None, template=None, classify_all_templates=False,
+                 stats_bin_size=100.0, curve_compensation=False, design_speed_kmh=60.0,
+                 progressive_order=False, section_grid_bins=None):
         """
         Args:
             max_points: Limite de pontos para performance (None = sem limite)
             template: Gabarito para classificação (None = usa padrão ferrovia)
+            classify_all_templates: Classifica contra todos os gabaritos do
+                TemplateRegistry numa única passada e guarda uma coluna de
+                classes por gabarito em self.class_columns
+            stats_bin_size: Tamanho (m) dos bins de estatísticas por km
+                em self.section_stats (None = não calcula)
+            curve_compensation: Ajusta o gabarito por seção em curvas
+                (superelevação e sobrelargura estimadas pela curvatura GPS)
+            design_speed_kmh: Velocidade de projeto usada na superelevação
+            progressive_order: Calcula (e guarda em cache) uma ordem de desenho
+                em que qualquer prefixo é uma amostra uniforme (self.draw_order)
+            section_grid_bins: Reamostra cada seção em tantos bins angulares em
+                torno do centro do gabarito (self.section_grid; None = não calcula)
         """
         self.max_points = max_points
         self.template = template
+        self.classify_all_templates = classify_all_templates
+        self.stats_bin_size = stats_bin_size
+        self.curve_compensation = curve_compensation
+        self.design_speed_kmh = design_speed_kmh
+        self.progressive_order = progressive_order
+        self.section_grid_bins = section_grid_bins
+        
+        # Resultados da última carga
+        self.classifications = None  # Classes (uint8) do gabarito atual
+        self.class_columns = {}      # {chave_gabarito: classes uint8} (classify_all_templates)
+        self.class_hashes = {}       # {chave_gabarito: hash do gabarito com que a coluna foi calculada}
+        self.section_z = None        # Posição (m) de cada seção ao longo da via
+        self.section_offsets = None  # Início de cada seção no array de pontos (S+1,)
+        self.section_desvios = None  # Desvio lateral GPS de cada seção (m)
+        self.section_lats = None     # Latitude média de cada seção
+        self.section_lons = None     # Longitude média de cada seção
+        self.section_stats = None    # SectionStatsAggregator por bin de km
+        self.draw_order = None       # Permutação progressiva para o renderer
+        self.stats = None            # DatasetStats (limites, centro, percentis, seções)
+        self.section_grid = None     # SectionGrid (raio por seção × bin angular)
+        self.overview = None         # OverviewRaster (densidade e pior classe vistas de cima)
+        self._gps_sections = None    # (z, lat, lon) por seção, antes da filtragem
     
     def supports(self, filepath):
         """Suporta arquivos .upl"""
@@ -71,16 +158,37 @@ class UPLLoader(DataLoader):
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Arquivo '{filepath}' não encontrado!")
         
-        # Verifica se existe cache
+        # Verifica se existe cache (da mesma versão do arquivo)
         cache_path = self._get_cache_path(filepath)
+        source = self._source_key(filepath)
         if os.path.exists(cache_path):
             try:
-                print(f"[CACHE] Carregando do cache: {cache_path}")
                 cached = np.load(cache_path)
-                vertices = cached['vertices']
-                colors = cached['colors']
-                print(f"📊 Carregamento completo (cache): {len(vertices):,} pontos")
-                return vertices, colors
+                restored = None
+                if not self._cache_source_matches(cached, source):
+                    print("[CACHE] Cache de outra versão do arquivo, reprocessando")
+                elif self._cache_gauge_options_match(cached):
+                    print(f"[CACHE] Carregando do cache: {cache_path}")
+                    vertices = cached['vertices']
+                    self._restore_section_layout(cached)
+                    restored = self._restore_class_columns(cached, vertices)
+                else:
+                    print("[CACHE] Cache calculado com outra compensação de curva, reprocessando")
+                
+                if restored is not None:
+                    colors, stale = restored
+                    if not stale:
+                        self._compute_section_stats_from_cache(vertices)
+                    
+                    # Cache anterior às opções: completa para as próximas cargas
+                    stale |= self._restore_dataset_stats(cached, vertices)
+                    stale |= self._restore_draw_order(cached, vertices)
+                    stale |= self._restore_section_grid(cached, vertices)
+                    stale |= self._restore_overview(cached, vertices)
+                    if stale:
+                        self._save_cache(cache_path, vertices, colors, source)
+                    print(f"📊 Carregamento completo (cache): {len(vertices):,} pontos")
+                    return vertices, colors
             except Exception as e:
                 print(f"⚠️  Erro ao carregar cache, reprocessando: {e}")
         
@@ -103,17 +211,27 @@ class UPLLoader(DataLoader):
         # Filtragem e amostragem
         xs, ys, zs, desvios_laterais = self._filter_and_sample(xs, ys, zs, desvios_laterais)
         
+        # Garante pontos de cada seção contíguos e em ordem de km
+        xs, ys, zs, desvios_laterais = self._sort_by_section(xs, ys, zs, desvios_laterais)
+        self._build_section_layout(zs, desvios_laterais)
+        
         # Normalização de coordenadas
         xs, ys, zs_norm = self._normalize_coordinates(xs, ys, zs)
         
-        # Calcula cores por classificação (usando X relativo - sem desvio lateral)
-        colors = self._calculate_colors(xs, ys, zs_norm, desvios_laterais)
-        
         # Monta arrays de retorno
-        vertices = np.column_stack((xs, ys, zs_norm)).astype(np.float32)
+        vertices = np.empty((len(xs), 3), dtype=np.float32)
+        vertices[:, 0], vertices[:, 1], vertices[:, 2] = xs, ys, zs_norm
+        del xs, ys, zs, zs_norm, desvios_laterais
+        
+        # Calcula cores por classificação (usando X relativo - sem desvio lateral)
+        colors = self._calculate_colors(vertices)
+        self.stats = self._compute_dataset_stats(vertices)
+        self.draw_order = self._compute_draw_order(vertices)
+        self.section_grid = self._compute_section_grid(vertices)
+        self.overview = self._compute_overview(vertices)
         
         # Salva cache
-        self._save_cache(cache_path, vertices, colors)
+        self._save_cache(cache_path, vertices, colors, source)
         
         print(f"📊 Carregamento completo: {len(vertices):,} pontos")
         return vertices, colors
@@ -127,142 +245,709 @@ class UPLLoader(DataLoader):
         cache_name = os.path.splitext(base_name)[0] + ".npz"
         return os.path.join(cache_dir, cache_name)
     
-    def _save_cache(self, cache_path, vertices, colors):
-        """Salva dados processados em cache"""
+    def cache_dir_for(self, filepath, suffix):
+        """Diretório de cache derivado do arquivo (ex: pirâmide da vista desenrolada)"""
+        return os.path.splitext(self._get_cache_path(filepath))[0] + '_' + suffix
+    
+    def _save_cache(self, cache_path, vertices, colors, source):
+        """Salva dados processados em cache (source: ver _source_key)"""
+        from utils.tunnel_templates import TemplateRegistry
+        
+        arrays = {'vertices': vertices, 'colors': colors}
+        arrays.update(self._layout_arrays())
+        
+        # Tamanho e data do arquivo de origem: o nome do cache é só o basename
+        for name, value in source.items():
+            arrays['source_' + name] = np.array(value)
+        
+        # Ordem progressiva de desenho (calculada uma vez por arquivo)
+        if self.draw_order is not None:
+            arrays['draw_order'] = self.draw_order
+        
+        # Referencial do gabarito com que as classes foram calculadas
+        for name, value in self._gauge_options().items():
+            arrays[name] = np.array(value if value is not None else np.nan)
+        
+        # Colunas de classe por gabarito (permitem trocar de gabarito sem reprocessar);
+        # sem classify_all_templates, só a do gabarito atual (filtros por classe)
+        class_columns = dict(self.class_columns)
+        if not class_columns and self.classifications is not None:
+            template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
+            class_columns[TemplateRegistry.key_of(template)] = self.classifications
+        if class_columns:
+            keys = list(class_columns.keys())
+            arrays['class_keys'] = np.array(keys)
+            arrays['class_columns'] = np.stack([class_columns[k] for k in keys])
+            arrays['class_hashes'] = np.array([self.class_hashes[k] if k in self.class_hashes
+                                               else self._class_hash(TemplateRegistry.get(k))
+                                               for k in keys])
+        
         try:
-            np.savez_compressed(cache_path, vertices=vertices, colors=colors)
+            np.savez_compressed(cache_path, **arrays)
             print(f"[CACHE] Dados salvos em: {cache_path}")
         except Exception as e:
             print(f"⚠️  Não foi possível salvar cache: {e}")
     
+    def _layout_arrays(self):
+        """Arrays por seção e por arquivo (sem os pontos) para np.savez"""
+        arrays = {}
+        
+        # Tabela de seções (km, offsets e desvio lateral de cada seção)
+        if self.section_z is not None:
+            arrays['section_z'] = self.section_z
+            arrays['section_offsets'] = self.section_offsets
+            arrays['section_desvios'] = self.section_desvios
+            arrays['section_lats'] = self.section_lats
+            arrays['section_lons'] = self.section_lons
+        
+        # Limites, centro e percentis (lidos pela câmera/HUD sem varrer os pontos)
+        if self.stats is not None:
+            arrays.update(self.stats.to_arrays())
+        
+        # Grade angular das seções
+        if self.section_grid is not None:
+            arrays.update(self.section_grid.to_arrays())
+        
+        # Visão geral de cima (densidade e pior classe do gabarito com que foi calculada)
+        if self.overview is not None:
+            arrays.update(self.overview.to_arrays())
+            arrays['overview_template'] = np.array(self._overview_template_key())
+        return arrays
+    
+    def _gauge_options(self):
+        """Opções que mudam o referencial do gabarito de cada seção (e as classes)"""
+        return {
+            'curve_compensation': bool(self.curve_compensation),
+            'design_speed_kmh': float(self.design_speed_kmh) if self.curve_compensation else None,
+        }
+    
+    @staticmethod
+    def _class_hash(template):
+        """
+        Hash do conteúdo do gabarito gravado junto de cada coluna de classes
+        
+        Mesmo content_hash usado pelo TemplateReclassifier; gabaritos sem ele
+        (os definidos em código) ficam com '' e são identificados só pela chave.
+        """
+        return getattr(template, 'content_hash', None) or ''
+    
+    def _cache_gauge_options_match(self, cached):
+        """True se o cache foi calculado com as mesmas opções (caches antigos: sem compensação)"""
+        options = {'curve_compensation': False, 'design_speed_kmh': None}
+        if 'curve_compensation' in cached.files:
+            options['curve_compensation'] = bool(cached['curve_compensation'])
+            speed = float(cached['design_speed_kmh'])
+            options['design_speed_kmh'] = None if np.isnan(speed) else speed
+        return options == self._gauge_options()
+    
+    def _source_key(self, filepath):
+        """Tamanho e data de modificação do arquivo (identificam a versão em cache)"""
+        info = os.stat(filepath)
+        return {'size': int(info.st_size), 'mtime': float(info.st_mtime)}
+    
+    def _cache_source_matches(self, cached, source):
+        """True se o cache foi gravado a partir desta versão do arquivo (caches antigos: não)"""
+        if not all('source_' + name in cached.files for name in source):
+            return False
+        return all(cached['source_' + name].item() == value for name, value in source.items())
+    
+    def _tiles_key(self, filepath, tile_m):
+        """Origem e opções dos tiles de km de um arquivo (ver KmTileStore.open)"""
+        key = self._source_key(filepath)
+        key.update({
+            'tile_m': float(tile_m),
+            'template': self._overview_template_key(), 'max_points': self.max_points,
+        })
+        key.update(self._gauge_options())
+        return key
+    
+    def build_tiles(self, filepath, vertices, colors, tile_m=DEFAULT_TILE_M):
+        """
+        Grava os tiles de km de um arquivo carregado por load() (uma vez por arquivo)
+        
+        Junto dos tiles vai um index.npz com a tabela de seções, estatísticas,
+        grade angular e visão geral: open_tiles() restaura tudo sem os pontos.
+        
+        Args:
+            filepath: Arquivo carregado
+            vertices, colors: Arrays retornados por load() (colors None:
+                cores das classes, ver KmTileStore.build)
+            tile_m: Comprimento (m) de via por tile
+        
+        Returns:
+            KmTileStore ou None sem tabela de seções
+        """
+        from loaders.km_tiles import KmTileStore
+        
+        if self.section_offsets is None:
+            return None
+        directory = self.cache_dir_for(filepath, 'tiles')
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, 'index.npz'), **self._layout_arrays())
+        return KmTileStore.build(directory, vertices, colors, self.section_z, self.section_offsets,
+                                 classes=self.classifications, tile_m=tile_m,
+                                 key=self._tiles_key(filepath, tile_m))
+    
+    def stream_tiles(self, filepath, tile_m=DEFAULT_TILE_M):
+        """
+        Grava os tiles de km lendo o arquivo em fluxo, sem carregar a nuvem
+        
+        Mesmo resultado de load() + build_tiles(), em duas passadas:
+        1. Lê os registros em fluxo e grava os pontos filtrados (Y <= 10 m)
+           num arquivo temporário, guardando só Z, GPS e contagens por registro
+        2. Monta a tabela de seções em ordem de km e, por lotes de seções
+           (ver _section_batches), junta os pontos de cada lote, classifica
+           e grava em arrays temporários mapeados em disco
+        Os tiles são gravados a partir desses arrays, um tile por vez; a
+        memória fica limitada a um lote de seções, não à nuvem.
+        
+        Args:
+            filepath: Arquivo UPL
+            tile_m: Comprimento (m) de via por tile
+        
+        Returns:
+            KmTileStore aberto por open_tiles()
+        """
+        import shutil
+        
+        print(f"[LENDO] Lendo arquivo UPL em fluxo: {filepath}...")
+        
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Arquivo '{filepath}' não encontrado!")
+        
+        scratch = self.cache_dir_for(filepath, 'stream')
+        os.makedirs(scratch, exist_ok=True)
+        try:
+            self._stream_build_tiles(filepath, scratch, tile_m)
+        finally:
+            # Solta os arrays mapeados antes de apagar os temporários
+            self.classifications = None
+            shutil.rmtree(scratch, ignore_errors=True)
+        return self.open_tiles(filepath, tile_m)
+    
+    def _stream_build_tiles(self, filepath, scratch, tile_m):
+        """Passadas de stream_tiles() com os temporários em scratch"""
+        from renderers.octree import expand_ranges
+        from utils.tunnel_templates import TemplateRegistry, classify_points_with_template
+        
+        raw_path = os.path.join(scratch, 'raw.bin')
+        record_z, record_lats, record_lons, record_counts, record_filtered = (
+            self._scan_upl_file(filepath, raw_path))
+        if record_counts.sum() == 0 or record_filtered.sum() == 0:
+            raise ValueError("Nenhum ponto válido encontrado no arquivo UPL!")
+        print(f"[OK] {int(record_counts.sum()):,} pontos extraidos")
+        
+        desvios = self._lateral_offsets(record_z, record_lats, record_lons, record_counts)
+        if desvios is None:
+            desvios = np.zeros(len(record_z))
+        
+        # Amostragem de _filter_and_sample sobre a ordem do arquivo: mantém
+        # as linhas múltiplas de step abaixo de limit
+        n = int(record_filtered.sum())
+        step, limit = 1, n
+        if self.max_points is not None and n > self.max_points:
+            print(f"⚠️  Arquivo muito grande ({n:,} pontos)")
+            print(f"   Limitando para {self.max_points:,} pontos")
+            step = n // self.max_points
+            limit = step * self.max_points
+        ends = np.cumsum(record_filtered)
+        first_sample = -(-np.minimum(ends - record_filtered, limit) // step)
+        kept = -(-np.minimum(ends, limit) // step) - first_sample
+        
+        # Registros em ordem de km (estável, como _sort_by_section); cada
+        # seção é um trecho de registros com o mesmo Z
+        order = np.argsort(record_z, kind='stable')
+        order = order[kept[order] > 0]
+        zs, kept, first_sample, desvios = record_z[order], kept[order], first_sample[order], desvios[order]
+        starts = np.concatenate(([0], np.flatnonzero(zs[1:] != zs[:-1]) + 1))
+        record_bounds = np.append(starts, len(zs))
+        record_offsets = np.concatenate(([0], np.cumsum(kept)))
+        self._set_section_layout(zs[starts], desvios[starts], record_offsets[record_bounds])
+        
+        n_points = int(record_offsets[-1])
+        raw = np.memmap(raw_path, dtype=np.float64, mode='r', shape=(n, 2))
+        vertices = np.lib.format.open_memmap(os.path.join(scratch, 'vertices.npy'), mode='w+',
+                                             dtype=np.float32, shape=(n_points, 3))
+        z_min = self.section_z[0]
+        for first, last, start, stop in self._section_batches():
+            records = slice(record_bounds[first], record_bounds[last])
+            rows = expand_ranges(first_sample[records], kept[records]) * step
+            block = raw[rows]
+            vertices[start:stop, 0] = block[:, 0] + np.repeat(desvios[records], kept[records])
+            vertices[start:stop, 1] = block[:, 1]
+            vertices[start:stop, 2] = np.repeat(zs[records] - z_min, kept[records])
+        del raw, block
+        print(f"[OK] {n_points:,} pontos em {len(self.section_z):,} seções")
+        
+        # Classes e coordenadas no referencial do gabarito (grade e visão geral)
+        template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
+        xs = np.lib.format.open_memmap(os.path.join(scratch, 'gauge_x.npy'), mode='w+',
+                                       dtype=np.float64, shape=(n_points,))
+        ys = (np.lib.format.open_memmap(os.path.join(scratch, 'gauge_y.npy'), mode='w+',
+                                        dtype=np.float64, shape=(n_points,))
+              if self.curve_compensation else vertices[:, 1])
+        classes = np.lib.format.open_memmap(os.path.join(scratch, 'classes.npy'), mode='w+',
+                                            dtype=np.uint8, shape=(n_points,))
+        counts = np.zeros(3, dtype=np.int64)
+        for first, last, batch_xs, batch_ys in self._gauge_coordinate_batches(vertices):
+            start, stop = self.section_offsets[first], self.section_offsets[last]
+            xs[start:stop] = batch_xs
+            if self.curve_compensation:
+                ys[start:stop] = batch_ys
+            classes[start:stop] = classify_points_with_template(batch_xs, batch_ys, template)
+            counts += np.bincount(np.minimum(classes[start:stop], 2), minlength=3)
+        self.classifications = classes
+        print(f"[STATS] Classificacao (gabarito: {template.name}): "
+              f"{counts[0]:,} seguros, {counts[1]:,} em alerta, {counts[2]:,} invasões")
+        
+        self.stats = self._compute_dataset_stats(vertices)
+        self.section_grid = self._compute_section_grid(vertices, coordinates=(xs, ys))
+        self.overview = self._compute_overview(vertices, coordinates=(xs, ys))
+        self.build_tiles(filepath, vertices, None, tile_m)
+    
+    def open_tiles(self, filepath, tile_m=DEFAULT_TILE_M):
+        """
+        Abre os tiles de km gravados por build_tiles sem ler os pontos
+        
+        Restaura a tabela de seções, estatísticas, grade angular e visão geral;
+        classes, ordem de desenho e estatísticas por km ficam None (estão nos
+        tiles, lidos sob demanda).
+        
+        Returns:
+            KmTileStore ou None se faltar ou for de outra versão do arquivo/opções
+        """
+        from loaders.km_tiles import KmTileStore
+        from utils.dataset_stats import DatasetStats
+        from utils.overview_raster import OverviewRaster
+        from utils.section_grid import SectionGrid
+        
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Arquivo '{filepath}' não encontrado!")
+        directory = self.cache_dir_for(filepath, 'tiles')
+        store = KmTileStore.open(directory, self._tiles_key(filepath, tile_m))
+        if store is None:
+            return None
+        try:
+            with np.load(os.path.join(directory, 'index.npz')) as cached:
+                self._restore_section_layout(cached)
+                self.stats = DatasetStats.from_arrays(cached)
+                self.overview = OverviewRaster.from_arrays(cached)
+                grid = SectionGrid.from_arrays(cached)
+        except (OSError, ValueError):
+            return None
+        if self.section_z is None:
+            return None
+        self.section_grid = grid if grid is not None and grid.bins == self.section_grid_bins else None
+        
+        self.classifications = None
+        self.class_columns = {}
+        self.class_hashes = {}
+        self.draw_order = None
+        self.section_stats = None
+        return store
+    
+    def _restore_section_layout(self, cached):
+        """Restaura tabela de seções do cache (None em caches antigos)"""
+        if 'section_z' in cached.files:
+            self.section_z = cached['section_z']
+            self.section_offsets = cached['section_offsets']
+            self.section_desvios = cached['section_desvios']
+            self.section_lats = cached['section_lats']
+            self.section_lons = cached['section_lons']
+        else:
+            self.section_z = self.section_offsets = self.section_desvios = None
+            self.section_lats = self.section_lons = None
+    
+    def _restore_class_columns(self, cached, vertices):
+        """
+        Restaura colunas de classe do cache e recolore com o gabarito atual
+        
+        Cache sem a coluna do gabarito atual (ou, com classify_all_templates,
+        sem a de algum gabarito registrado) conta como falta para as classes:
+        os vértices em cache são reclassificados pela tabela de seções, sem
+        reler o arquivo. Coluna calculada com outro conteúdo do gabarito
+        registrado na mesma chave (hash diferente) também conta como falta.
+        As demais colunas em cache são mantidas.
+        
+        Returns:
+            Tupla (colors, reclassified), ou None se for preciso reler o
+            arquivo (cache sem tabela de seções)
+        """
+        from utils.tunnel_templates import TemplateRegistry, colors_from_classification
+        
+        self.class_columns = {}
+        self.class_hashes = {}
+        self.classifications = None
+        if 'class_keys' in cached.files:
+            keys = [str(k) for k in cached['class_keys']]
+            columns = cached['class_columns']
+            # Caches antigos, sem hash: vale só para gabaritos sem content_hash
+            hashes = ([str(h) for h in cached['class_hashes']] if 'class_hashes' in cached.files
+                      else [''] * len(keys))
+            for row, key in enumerate(keys):
+                registered = TemplateRegistry.get(key)
+                if registered is not None and hashes[row] != self._class_hash(registered):
+                    continue  # Gabarito mudou desde o cache: reclassifica
+                self.class_columns[key] = columns[row]
+                self.class_hashes[key] = hashes[row]
+        
+        template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
+        key = TemplateRegistry.key_of(template)
+        missing = key is None or key not in self.class_columns
+        if self.classify_all_templates:
+            missing |= not set(TemplateRegistry.list_all()) <= set(self.class_columns)
+        if not missing:
+            self.classifications = self.class_columns[key]
+            return colors_from_classification(self.classifications), False
+        
+        coordinates = self.get_gauge_coordinates(vertices)
+        if coordinates is None:
+            print("[CACHE] Cache sem tabela de seções para reclassificar, reprocessando")
+            return None
+        print(f"[CACHE] Cache sem classes do gabarito '{template.name}', reclassificando")
+        cached_columns, cached_hashes = self.class_columns, self.class_hashes
+        colors = self._classify_gauge_points(*coordinates)
+        self.class_columns = {**cached_columns, **self.class_columns}
+        self.class_hashes = {**cached_hashes, **self.class_hashes}
+        if key is not None:
+            self.class_columns[key] = self.classifications
+        return colors, True
+    
+    def _compute_draw_order(self, vertices):
+        """Ordem progressiva dos pontos (None se progressive_order desativado)"""
+        from renderers.octree import progressive_order
+        
+        if not self.progressive_order:
+            return None
+        print("[LOD] Calculando ordem progressiva de desenho...")
+        return progressive_order(vertices)
+    
+    def _restore_draw_order(self, cached, vertices):
+        """
+        Restaura ordem progressiva do cache (calcula se faltar)
+        
+        Returns:
+            True se foi calculada agora (cache precisa ser regravado)
+        """
+        self.draw_order = None
+        if not self.progressive_order:
+            return False
+        if 'draw_order' in cached.files:
+            self.draw_order = cached['draw_order']
+            return False
+        
+        self.draw_order = self._compute_draw_order(vertices)
+        return True
+    
+    def _compute_section_grid(self, vertices, bins=None, coordinates=None):
+        """
+        Grade (seções × bins) de raios em torno do centro do gabarito atual
+        
+        coordinates: (xs, ys) já no referencial do gabarito (None = calcula)
+        """
+        from utils.section_grid import SectionGrid
+        from utils.tunnel_templates import TemplateRegistry
+        
+        bins = bins or self.section_grid_bins
+        if not bins or self.section_offsets is None:
+            return None
+        template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
+        xs, ys = coordinates if coordinates is not None else self.get_gauge_coordinates(vertices)
+        print(f"[GRADE] Reamostrando {len(self.section_offsets) - 1:,} seções "
+              f"em {bins} bins angulares...")
+        return SectionGrid.compute(xs, ys, self.section_offsets, bins,
+                                   center=template.gauge_center())
+    
+    def ensure_section_grid(self, vertices):
+        """
+        Grade angular das seções, calculada agora (DEFAULT_BINS) se a carga não a gerou
+        
+        Args:
+            vertices: Array (N, 3) retornado por load()
+        
+        Returns:
+            SectionGrid ou None sem tabela de seções
+        """
+        from utils.section_grid import DEFAULT_BINS
+        
+        if self.section_grid is None:
+            self.section_grid = self._compute_section_grid(vertices, self.section_grid_bins or DEFAULT_BINS)
+        return self.section_grid
+    
+    def _restore_section_grid(self, cached, vertices):
+        """
+        Restaura grade angular do cache (calcula se faltar ou se o número de
+        bins, de seções ou o centro do gabarito mudaram)
+        
+        Returns:
+            True se foi calculada agora (cache precisa ser regravado)
+        """
+        from utils.section_grid import SectionGrid
+        from utils.tunnel_templates import TemplateRegistry
+        
+        self.section_grid = None
+        if not self.section_grid_bins or self.section_offsets is None:
+            return False
+        
+        grid = SectionGrid.from_arrays(cached)
+        template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
+        if (grid is not None and grid.bins == self.section_grid_bins
+                and grid.n_sections == len(self.section_offsets) - 1
+                and np.allclose(grid.center, template.gauge_center())):
+            self.section_grid = grid
+            return False
+        
+        self.section_grid = self._compute_section_grid(vertices)
+        return True
+    
+    def _overview_template_key(self):
+        """Chave do gabarito cujas classes entram no raster de visão geral"""
+        from utils.tunnel_templates import TemplateRegistry
+        
+        return TemplateRegistry.key_of(self.template) if self.template is not None else 'ferrovia'
+    
+    def _compute_overview(self, vertices, coordinates=None):
+        """
+        Raster de visão geral (X no referencial do gabarito × Z) com a pior classe por célula
+        
+        coordinates: (xs, ys) já no referencial do gabarito (None = calcula)
+        """
+        from utils.overview_raster import OverviewRaster
+        
+        if self.section_offsets is None:
+            return None
+        xs, _ = coordinates if coordinates is not None else self.get_gauge_coordinates(vertices)
+        return OverviewRaster.compute(xs, vertices[:, 2], self.classifications)
+    
+    def _restore_overview(self, cached, vertices):
+        """
+        Restaura raster de visão geral do cache (calcula se faltar ou se as
+        classes forem de outro gabarito)
+        
+        Returns:
+            True se foi calculado agora (cache precisa ser regravado)
+        """
+        from utils.overview_raster import OverviewRaster
+        
+        self.overview = None
+        if self.section_offsets is None:
+            return False
+        if ('overview_template' in cached.files
+                and str(cached['overview_template']) == self._overview_template_key()):
+            self.overview = OverviewRaster.from_arrays(cached)
+            if self.overview is not None:
+                return False
+        
+        self.overview = self._compute_overview(vertices)
+        return True
+    
+    def _restore_dataset_stats(self, cached, vertices):
+        """
+        Restaura estatísticas da nuvem do cache (calcula se faltar)
+        
+        Returns:
+            True se foram calculadas agora (cache precisa ser regravado)
+        """
+        from utils.dataset_stats import DatasetStats
+        
+        self.stats = DatasetStats.from_arrays(cached)
+        if self.stats is not None and self.stats.count == len(vertices):
+            return False
+        
+        self.stats = self._compute_dataset_stats(vertices)
+        return True
+    
+    def _compute_dataset_stats(self, vertices):
+        """Limites, centro, percentis e extensão por seção em uma passada"""
+        from utils.dataset_stats import DatasetStats
+        
+        offsets = self.section_offsets
+        if offsets is not None and offsets[-1] != len(vertices):
+            offsets = None  # Tabela de seções não corresponde aos pontos
+        return DatasetStats.compute(vertices, offsets)
+    
+    def _iter_upl_records(self, linhas):
+        """
+        Registros (cabeçalho EFVM + linha de dados) de linhas já sem espaços
+        
+        Args:
+            linhas: Iterável de linhas não vazias (lista ou leitura em fluxo)
+        
+        Yields:
+            Tuplas (z, lat, lon, xs, ys): km (m) e lat/lon do cabeçalho e
+            listas com os pontos do registro em metros (sem os (0, 0))
+        """
+        cabecalho = None
+        for linha in linhas:
+            if cabecalho is not None:
+                yield self._parse_upl_record(cabecalho, linha)
+                cabecalho = None
+            elif linha.startswith("EFVM") and "RH-" in linha:
+                cabecalho = linha
+    
+    def _parse_upl_record(self, linha_cabecalho, linha_dados):
+        """Extrai Z, lat/lon e os pares X, Y de um registro (ver _iter_upl_records)"""
+        partes = linha_cabecalho.split(";")
+        
+        # Extrai coordenada Z (KM + metros)
+        if len(partes) >= 13:
+            try:
+                unidade = float(partes[11])
+                subunidade = float(partes[12])
+                z_val = unidade * 1000.0 + subunidade
+            except:
+                z_val = 0.0
+        else:
+            z_val = 0.0
+        
+        # Extrai latitude e longitude (campos 15 e 16 = índices 14 e 15)
+        lat, lon = 0.0, 0.0
+        try:
+            if len(partes) >= 16:
+                lat = float(partes[14].replace(',', '.'))
+                lon = float(partes[15].replace(',', '.'))
+        except:
+            pass
+        
+        # Processa pares X, Y
+        xs = []
+        ys = []
+        dados_raw = [p.strip() for p in linha_dados.split(';') if p.strip() != '']
+        for j in range(0, len(dados_raw) - 1, 2):
+            try:
+                x = float(dados_raw[j].replace(',', '.'))
+                y = float(dados_raw[j + 1].replace(',', '.'))
+                
+                if not (x == 0 and y == 0):
+                    xs.append(x / 1000.0)  # mm para metros
+                    ys.append(y / 1000.0)
+            except ValueError:
+                continue
+        return z_val, lat, lon, xs, ys
+    
     def _parse_upl_lines(self, linhas):
         """Extrai coordenadas X, Y, Z e lat/lon das linhas do arquivo"""
         xs_global = []
         ys_global = []
-        zs_global = []
-        lats = []  # Latitude de cada seção
-        lons = []  # Longitude de cada seção
+        registros = []  # (z, lat, lon, pontos) de cada registro
         
-        i = 0
-        while i + 1 < len(linhas):
-            linha_cabecalho = linhas[i]
-            
-            if linha_cabecalho.startswith("EFVM") and "RH-" in linha_cabecalho:
-                partes = linha_cabecalho.split(";")
-                
-                # Extrai coordenada Z (KM + metros)
-                if len(partes) >= 13:
-                    try:
-                        unidade = float(partes[11])
-                        subunidade = float(partes[12])
-                        z_val = unidade * 1000.0 + subunidade
-                    except:
-                        z_val = 0.0
-                else:
-                    z_val = 0.0
-                
-                # Extrai latitude e longitude (campos 15 e 16 = índices 14 e 15)
-                lat, lon = 0.0, 0.0
-                try:
-                    if len(partes) >= 16:
-                        lat = float(partes[14].replace(',', '.'))
-                        lon = float(partes[15].replace(',', '.'))
-                except:
-                    pass
-                
-                # Lê linha de dados
-                linha_dados = linhas[i + 1]
-                dados_raw = [p.strip() for p in linha_dados.split(';') if p.strip() != '']
-                
-                # Processa pares X, Y
-                for j in range(0, len(dados_raw) - 1, 2):
-                    try:
-                        x = float(dados_raw[j].replace(',', '.'))
-                        y = float(dados_raw[j + 1].replace(',', '.'))
-                        
-                        if not (x == 0 and y == 0):
-                            xs_global.append(x / 1000.0)  # mm para metros
-                            ys_global.append(y / 1000.0)
-                            zs_global.append(z_val)
-                            lats.append(lat)
-                            lons.append(lon)
-                    except ValueError:
-                        continue
-                
-                i += 2
-                continue
-            
-            i += 1
+        for z_val, lat, lon, xs, ys in self._iter_upl_records(linhas):
+            xs_global.extend(xs)
+            ys_global.extend(ys)
+            registros.append((z_val, lat, lon, len(xs)))
         
         xs = np.array(xs_global)
         ys = np.array(ys_global)
-        zs = np.array(zs_global)
-        lats = np.array(lats)
-        lons = np.array(lons)
+        record_z, record_lats, record_lons, record_counts = (
+            np.array(coluna, dtype=dtype) for coluna, dtype in
+            zip(zip(*registros) if registros else ([], [], [], []),
+                (np.float64, np.float64, np.float64, np.int64)))
+        zs = np.repeat(record_z, record_counts)
         
         # Aplica transformação lateral no eixo X baseado em lat/lon
         # Retorna também os desvios aplicados
-        xs, desvios_laterais = self._apply_lateral_transform(xs, ys, zs, lats, lons)
+        desvios = self._lateral_offsets(record_z, record_lats, record_lons, record_counts)
+        if desvios is None:
+            return xs, ys, zs, np.zeros_like(xs)
+        desvios_laterais = np.repeat(desvios, record_counts)
+        xs_new = xs + desvios_laterais
+        print(f"   X original: [{xs.min():.1f}, {xs.max():.1f}] m")
+        print(f"   X com desvio: [{xs_new.min():.1f}, {xs_new.max():.1f}] m")
+        return xs_new, ys, zs, desvios_laterais
+    
+    def _scan_upl_file(self, filepath, raw_path):
+        """
+        Primeira passada de stream_tiles(): lê os registros em fluxo
         
-        return xs, ys, zs, desvios_laterais
+        Os pontos com Y <= 10 m (filtro de _filter_and_sample) vão, em metros
+        e na ordem do arquivo, para raw_path como pares (x, y) float64.
+        
+        Returns:
+            Tupla (z, lat, lon, pontos, filtrados) de arrays por registro
+        """
+        # Mesmo critério de load(): UTF-8 e, se não decodificar, latin-1
+        try:
+            return self._scan_upl_records(filepath, 'utf-8', raw_path)
+        except UnicodeDecodeError:
+            return self._scan_upl_records(filepath, 'latin-1', raw_path)
     
-    def _apply_lateral_transform(self, xs, ys, zs, lats, lons):
+    def _scan_upl_records(self, filepath, encoding, raw_path):
+        """Lê os registros de _scan_upl_file com um encoding"""
+        from array import array
+        
+        record_z, record_lats, record_lons = array('d'), array('d'), array('d')
+        record_counts, record_filtered = array('q'), array('q')
+        pontos = array('d')  # Pares x, y intercalados (float64 nativo, como o memmap)
+        with open(filepath, 'r', encoding=encoding) as f, open(raw_path, 'wb') as raw:
+            linhas = (linha.strip() for linha in f if linha.strip())
+            for z_val, lat, lon, xs, ys in self._iter_upl_records(linhas):
+                antes = len(pontos)
+                pontos.extend(v for x, y in zip(xs, ys) if y <= 10.0 for v in (x, y))
+                record_z.append(z_val)
+                record_lats.append(lat)
+                record_lons.append(lon)
+                record_counts.append(len(xs))
+                record_filtered.append((len(pontos) - antes) // 2)
+                if len(pontos) >= 2 * self.STREAM_BUFFER:
+                    pontos.tofile(raw)
+                    pontos = array('d')
+            pontos.tofile(raw)
+        return tuple(np.array(values) for values in
+                     (record_z, record_lats, record_lons, record_counts, record_filtered))
+    
+    def _lateral_offsets(self, record_z, record_lats, record_lons, record_counts):
         """
-        Aplica desvio lateral no eixo X baseado em latitude/longitude
+        Desvio lateral no eixo X de cada registro baseado em latitude/longitude
         
         Lógica:
         1. Lê todas as seções com lat/lon
         2. Pega primeira e última seção
         3. Cria linha reta imaginária (referência)
         4. Para cada seção, calcula desvio perpendicular à linha reta
-        5. Adiciona esse desvio no eixo X de todos os pontos da seção
+        5. Esse desvio é somado ao eixo X de todos os pontos da seção
+        
+        Lat/lon de uma seção é a média dos seus pontos: cada registro pesa
+        pelo número de pontos (registros do mesmo Z formam uma seção).
         
         Args:
-            xs, ys, zs: Coordenadas originais
-            lats, lons: Latitude e longitude de cada ponto
+            record_z: Z de cada registro
+            record_lats, record_lons: Latitude e longitude de cada registro
+            record_counts: Pontos de cada registro
             
         Returns:
-            xs_new: Coordenadas X transformadas
+            Array com o desvio (m) de cada registro, ou None sem GPS utilizável
         """
         # Fator de escala para desvio lateral (ajustável)
         # Valores pequenos (0.001 - 0.1) para não distorcer muito
         # 0.01 = 1% do desvio real
         FATOR_ESCALA = 1
-        # Se não há lat/lon válido, retorna X original
+        self._gps_sections = None
+        # Se não há lat/lon válido, mantém X original
+        com_pontos = record_counts > 0
+        lats, lons = record_lats[com_pontos], record_lons[com_pontos]
         if len(lats) == 0 or np.all(lats == 0) or np.all(lons == 0):
             print("⚠️  Lat/Lon não disponível, mantendo coordenadas originais")
-            desvios = np.zeros_like(xs)
-            return xs, desvios
+            return None
         
         # Agrupa por seção (Z único)
-        unique_z = np.unique(zs)
+        unique_z, section_of_record = np.unique(record_z[com_pontos], return_inverse=True)
         
         if len(unique_z) < 2:
             print("⚠️  Menos de 2 seções, mantendo coordenadas originais")
-            desvios = np.zeros_like(xs)
-            return xs, desvios
-        
-        # 1. Coleta lat/lon de cada seção
-        secoes = []
-        for z_val in unique_z:
-            mask = zs == z_val
-            lat_media = np.mean(lats[mask])
-            lon_media = np.mean(lons[mask])
-            secoes.append({
-                'z': z_val,
-                'lat': lat_media,
-                'lon': lon_media,
-                'mask': mask
-            })
+            return None
         
-        # 2. Primeira e última seção
-        primeira = secoes[0]
-        ultima = secoes[-1]
+        # 1. Coleta lat/lon média de cada seção (vetorizado sobre as seções)
+        counts = record_counts[com_pontos].astype(np.float64)
+        points_per_section = np.bincount(section_of_record, weights=counts)
+        section_lats = np.bincount(section_of_record, weights=lats * counts) / points_per_section
+        section_lons = np.bincount(section_of_record, weights=lons * counts) / points_per_section
+        self._gps_sections = (unique_z, section_lats, section_lons)
         
-        lat_start = primeira['lat']
-        lon_start = primeira['lon']
-        lat_end = ultima['lat']
-        lon_end = ultima['lon']
+        # 2. Primeira e última seção
+        lat_start = section_lats[0]
+        lon_start = section_lons[0]
+        lat_end = section_lats[-1]
+        lon_end = section_lons[-1]
         
         print(f"📍 Transformação lateral baseada em GPS:")
         print(f"   Início: lat={lat_start:.6f}, lon={lon_start:.6f}")
@@ -281,8 +966,7 @@ class UPLLoader(DataLoader):
         
         if dist_reta < 0.001:  # Linha muito curta (< 1mm)
             print("⚠️  Trajeto muito curto, mantendo coordenadas originais")
-            desvios = np.zeros_like(xs)
-            return xs, desvios
+            return None
         
         # Normaliza vetor da linha reta
         dx_reta_norm = dx_reta / dist_reta
@@ -296,32 +980,72 @@ class UPLLoader(DataLoader):
         print(f"   Vetor perpendicular: ({perp_x:.3f}, {perp_y:.3f})")
         
         # 4. Para cada seção, calcula desvio lateral
-        xs_new = xs.copy()
-        desvios = np.zeros_like(xs)  # Armazena desvio de cada ponto
+        # Posição real de cada seção em relação ao início (metros)
+        dx_real = (section_lons - lon_start) * 111000 * np.cos(np.radians(lat_mid))
+        dy_real = (section_lats - lat_start) * 111000
         
-        for secao in secoes:
-            lat_secao = secao['lat']
-            lon_secao = secao['lon']
-            mask = secao['mask']
-            
-            # Posição real da seção em relação ao início (metros)
-            dx_real = (lon_secao - lon_start) * 111000 * np.cos(np.radians(lat_mid))
-            dy_real = (lat_secao - lat_start) * 111000
-            
-            # Desvio perpendicular = produto escalar com vetor perpendicular
-            # Isso dá a distância lateral da seção em relação à linha reta
-            desvio_lateral = dx_real * perp_x + dy_real * perp_y
-            
-            # 5. Adiciona desvio lateral ao eixo X (com fator de escala)
-            xs_new[mask] += desvio_lateral * FATOR_ESCALA
-            desvios[mask] = desvio_lateral * FATOR_ESCALA
+        # Desvio perpendicular = produto escalar com vetor perpendicular
+        # Isso dá a distância lateral da seção em relação à linha reta
+        desvio_secao = (dx_real * perp_x + dy_real * perp_y) * FATOR_ESCALA
+        
+        # 5. Desvio de cada registro (registros sem pontos ficam com 0)
+        desvios = np.zeros(len(record_z))
+        desvios[com_pontos] = desvio_secao[section_of_record]
         
         print(f"   ✅ Desvio lateral aplicado (escala={FATOR_ESCALA})!")
-        print(f"   X original: [{xs.min():.1f}, {xs.max():.1f}] m")
-        print(f"   X com desvio: [{xs_new.min():.1f}, {xs_new.max():.1f}] m")
-        print(f"   Desvio aplicado: ±{abs(desvios).max():.2f} m")
+        print(f"   Desvio aplicado: ±{abs(desvio_secao).max():.2f} m")
         
-        return xs_new, desvios
+        return desvios
+    
+    def _sort_by_section(self, xs, ys, zs, desvios_laterais):
+        """Ordena pontos por Z (estável) se o arquivo não estiver em ordem de km"""
+        if len(zs) < 2 or np.all(zs[1:] >= zs[:-1]):
+            return xs, ys, zs, desvios_laterais
+        
+        print("[ORDENAR] Seções fora de ordem, ordenando por km...")
+        order = np.argsort(zs, kind='stable')
+        return xs[order], ys[order], zs[order], desvios_laterais[order]
+    
+    def _build_section_layout(self, zs, desvios_laterais):
+        """
+        Monta tabela de seções a partir de Z ordenado
+        
+        Cada seção é um trecho contíguo de pontos com o mesmo Z;
+        self.section_offsets[i]:self.section_offsets[i+1] são os pontos da seção i.
+        """
+        changes = np.flatnonzero(zs[1:] != zs[:-1]) + 1
+        starts = np.concatenate(([0], changes))
+        self._set_section_layout(zs[starts], desvios_laterais[starts], np.append(starts, len(zs)))
+    
+    def _set_section_layout(self, section_z, section_desvios, section_offsets):
+        """Grava a tabela de seções e busca o lat/lon de cada seção"""
+        self.section_offsets = np.asarray(section_offsets).astype(np.int64)
+        self.section_z = np.asarray(section_z).astype(np.float64)
+        self.section_desvios = np.asarray(section_desvios).astype(np.float64)
+        
+        # Lat/lon de cada seção (zeros se o arquivo não tem GPS)
+        self.section_lats = np.zeros(len(self.section_z))
+        self.section_lons = np.zeros(len(self.section_z))
+        if self._gps_sections is not None:
+            gps_z, gps_lats, gps_lons = self._gps_sections
+            idx = np.clip(np.searchsorted(gps_z, self.section_z), 0, len(gps_z) - 1)
+            self.section_lats = gps_lats[idx]
+            self.section_lons = gps_lons[idx]
+    
+    def get_section_gauge_params(self):
+        """
+        Parâmetros do gabarito por seção (deslocamento, rotação, sobrelargura)
+        estimados pela curvatura da via
+        
+        Returns:
+            Dicionário de arrays (S,) ou None sem tabela de seções
+        """
+        from utils.tunnel_templates import estimate_section_curvature, curve_gauge_params
+        
+        if self.section_lats is None:
+            return None
+        curvature = estimate_section_curvature(self.section_lats, self.section_lons)
+        return curve_gauge_params(curvature, speed_kmh=self.design_speed_kmh)
     
     def _filter_and_sample(self, xs, ys, zs, desvios_laterais):
         """Filtra outliers e reduz pontos se necessário"""
@@ -359,19 +1083,51 @@ class UPLLoader(DataLoader):
         
         return xs, ys, zs_norm
     
-    def _calculate_colors(self, xs, ys, zs, desvios_laterais):
+    def _calculate_colors(self, vertices):
         """Calcula cores por classificação de túnel (Verde/Amarelo/Vermelho)"""
-        from utils.tunnel_templates import FerroviaTunel, classify_points_with_template, colors_from_classification
+        if self.curve_compensation:
+            params = self.get_section_gauge_params()
+            n_curve = int(np.count_nonzero(params['widening'] > 0.001))
+            print(f"[CURVA] Gabarito ajustado por seção ({n_curve:,} seções em curva)")
         
-        # Se não fornecido um gabarito, usa o padrão (ferrovia)
-        template = self.template if self.template is not None else FerroviaTunel()
+        # X relativo (sem desvio lateral; o gabarito está sempre centrado em X=0)
+        # e, em curvas, no referencial do gabarito de cada seção: calculado por
+        # lotes de seções, como na reclassificação a partir do cache
+        xs_relative, ys = self.get_gauge_coordinates(vertices)
+        return self._classify_gauge_points(xs_relative, ys)
+    
+    def _classify_gauge_points(self, xs_relative, ys):
+        """
+        Classifica pontos já no referencial do gabarito e calcula as cores
         
-        # Calcula X relativo (sem desvio lateral) para classificação correta
-        # O gabarito está sempre centrado em X=0
-        xs_relative = xs - desvios_laterais
+        Preenche classifications, class_columns (classify_all_templates) e
+        section_stats.
+        """
+        from utils.tunnel_templates import (
+            TemplateRegistry, classify_points_with_template,
+            classify_points_multi, colors_from_classification
+        )
+        
+        # Se não fornecido um gabarito, usa o padrão (ferrovia)
+        template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
         
         # Classifica pontos: 0=seguro, 1=alerta, 2=invasão
-        classifications = classify_points_with_template(xs_relative, ys, template)
+        self.class_columns = {}
+        self.class_hashes = {}
+        if self.classify_all_templates:
+            keys, columns = classify_points_multi(xs_relative, ys)
+            self.class_columns = {key: columns[row] for row, key in enumerate(keys)}
+            self.class_hashes = {key: self._class_hash(TemplateRegistry.get(key)) for key in keys}
+            print(f"[STATS] {len(keys)} gabaritos classificados numa única passada")
+        
+        key = TemplateRegistry.key_of(template)
+        if key is not None:
+            self.class_hashes[key] = self._class_hash(template)
+        if key in self.class_columns:
+            classifications = self.class_columns[key]
+        else:
+            classifications = classify_points_with_template(xs_relative, ys, template)
+        self.classifications = classifications
         
         # Converte classificações para cores RGB
         colors = colors_from_classification(classifications)
@@ -388,7 +1144,251 @@ class UPLLoader(DataLoader):
         print(f"   [INVASAO] {n_invasao:,} ({n_invasao/total*100:.1f}%)")
         print(f"   Classificação usa X relativo (descontando desvio lateral)")
         
+        batches = ((first, last, xs_relative[start:stop], ys[start:stop])
+                   for first, last, start, stop in self._section_batches())
+        self._compute_section_stats(batches, template, classifications)
+        
         return colors.astype(np.float32)
+    
+    def _section_batches(self):
+        """
+        Lotes de STATS_SECTION_BATCH seções consecutivas
+        
+        Yields:
+            Tuplas (first, last, start, stop): seções [first, last) com os
+            pontos [start, stop)
+        """
+        offsets = self.section_offsets
+        n_sections = len(offsets) - 1
+        for first in range(0, n_sections, self.STATS_SECTION_BATCH):
+            last = min(first + self.STATS_SECTION_BATCH, n_sections)
+            yield first, last, int(offsets[first]), int(offsets[last])
+    
+    def _gauge_coordinate_batches(self, vertices):
+        """
+        Coordenadas dos vértices no referencial do gabarito, lote a lote
+        
+        Desvio lateral e compensação de curva são expandidos só sobre os
+        pontos do lote (ver _section_batches).
+        
+        Yields:
+            Tuplas (first, last, xs, ys) com os pontos das seções [first, last)
+        """
+        from utils.tunnel_templates import apply_section_transform
+        
+        params = self.get_section_gauge_params() if self.curve_compensation else None
+        for first, last, start, stop in self._section_batches():
+            local = self.section_offsets[first:last + 1] - start
+            xs = vertices[start:stop, 0] - np.repeat(self.section_desvios[first:last], np.diff(local))
+            ys = vertices[start:stop, 1]
+            if params is not None:
+                batch = {key: values[first:last] for key, values in params.items()}
+                xs, ys = apply_section_transform(xs, ys, local, batch)
+            yield first, last, xs, ys
+    
+    def _compute_section_stats(self, batches, template, classifications):
+        """
+        Agrega contagens e folga mínima por bin de km (self.section_stats)
+        
+        Percorre as seções em lotes, calculando a folga apenas dos pontos do
+        lote, para não materializar arrays temporários do tamanho da nuvem.
+        
+        Args:
+            batches: Tuplas (first, last, xs, ys) no referencial do gabarito
+                (ver _gauge_coordinate_batches)
+            template: Gabarito da folga
+            classifications: Classe de cada ponto
+        """
+        from utils.clearance_stats import SectionStatsAggregator
+        
+        self.section_stats = None
+        if self.stats_bin_size is None or self.section_offsets is None or classifications is None:
+            return
+        
+        stats = SectionStatsAggregator(self.stats_bin_size)
+        offsets = self.section_offsets
+        
+        for first, last, xs, ys in batches:
+            start, stop = offsets[first], offsets[last]
+            clearance = template.clearance(xs, ys)
+            stats.add_sections(self.section_z[first:last], offsets[first:last + 1] - start,
+                               classifications[start:stop], clearance)
+        
+        self.section_stats = stats
+        n_bins = len(stats.get_bins()['z_start'])
+        print(f"[STATS] Estatísticas por km: {n_bins} bins de {self.stats_bin_size:g} m")
+    
+    def _compute_section_stats_from_cache(self, vertices):
+        """Recalcula estatísticas por km a partir do cache (requer tabela de seções)"""
+        from utils.tunnel_templates import TemplateRegistry
+        
+        self.section_stats = None
+        if self.section_offsets is None or self.classifications is None:
+            return
+        
+        template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
+        self._compute_section_stats(self._gauge_coordinate_batches(vertices), template, self.classifications)
+    
+    def apply_classification(self, template, classifications, vertices):
+        """
+        Troca as classes da nuvem carregada sem reler o arquivo
+        
+        Usado ao trocar de gabarito ou quando uma reclassificação em segundo
+        plano termina: estatísticas por km e visão geral passam a refletir
+        as classes novas.
+        
+        Args:
+            template: TunnelTemplate das classes
+            classifications: Classe de cada ponto (ordem de load())
+            vertices: Array (N, 3) retornado por load()
+        """
+        from utils.tunnel_templates import TemplateRegistry
+        
+        key = TemplateRegistry.key_of(template)
+        self.template = template
+        self.classifications = classifications
+        self.class_columns[key] = classifications
+        self.class_hashes[key] = self._class_hash(template)
+        self._compute_section_stats_from_cache(vertices)
+        self.overview = self._compute_overview(vertices)
+    
+    def get_gauge_coordinates(self, vertices):
+        """
+        Coordenadas (x, y) dos vértices carregados no referencial do gabarito
+        
+        Desfaz o desvio lateral de cada seção (e aplica a compensação de curva,
+        se ativa), permitindo reclassificar a nuvem sem reler o arquivo.
+        
+        Args:
+            vertices: Array (N, 3) retornado por load()
+        
+        Returns:
+            Tupla (xs, ys) ou None sem tabela de seções
+        """
+        if self.section_offsets is None:
+            return None
+        # Preenchidas lote a lote: sem temporários por ponto além das saídas
+        xs = np.empty(len(vertices))
+        ys = np.empty(len(vertices)) if self.curve_compensation else vertices[:, 1]
+        for first, last, batch_xs, batch_ys in self._gauge_coordinate_batches(vertices):
+            start, stop = self.section_offsets[first], self.section_offsets[last]
+            xs[start:stop] = batch_xs
+            if self.curve_compensation:
+                ys[start:stop] = batch_ys
+        return xs, ys
+    
+    def point_info(self, index, position):
+        """
+        Classe, km e folga de um ponto carregado (seleção por clique na vista 3D)
+        
+        Args:
+            index: Índice do ponto no array retornado por load()
+            position: Coordenadas (x, y, z) do ponto
+            
+        Returns:
+            Dicionário com class_id, class_name, km e clearance (m, negativa
+            = invasão); chaves sem dado disponível ficam None
+        """
+        from utils.tunnel_templates import TemplateRegistry, CLASS_NAMES, apply_section_transform
+        
+        info = {'class_id': None, 'class_name': None, 'km': None, 'clearance': None}
+        if self.classifications is not None and 0 <= index < len(self.classifications):
+            info['class_id'] = int(self.classifications[index])
+            info['class_name'] = CLASS_NAMES[info['class_id']]
+        
+        if self.section_offsets is None or not 0 <= index < self.section_offsets[-1]:
+            return info
+        section = int(np.searchsorted(self.section_offsets, index, side='right')) - 1
+        info['km'] = float(self.section_z[section]) / 1000.0
+        
+        # Mesmo referencial da classificação (desvio lateral e curva da seção)
+        xs = np.array([position[0] - self.section_desvios[section]])
+        ys = np.array([position[1]])
+        params = self.get_section_gauge_params() if self.curve_compensation else None
+        if params is not None:
+            single = {key: values[section:section + 1] for key, values in params.items()}
+            xs, ys = apply_section_transform(xs, ys, np.array([0, 1]), single)
+        
+        template = self.template if self.template is not None else TemplateRegistry.get('ferrovia')
+        clearance = float(template.clearance(xs, ys)[0])
+        info['clearance'] = None if np.isnan(clearance) else clearance
+        return info
+    
+    def km_to_z(self, km):
+        """
+        Coordenada Z dos vértices carregados correspondente a uma posição em km
+        
+        Os vértices têm Z relativo à primeira seção (ver _normalize_coordinates).
+        
+        Args:
+            km: Posição ao longo da via (km)
+            
+        Returns:
+            Z (m) ou None sem tabela de seções
+        """
+        if self.section_z is None or len(self.section_z) == 0:
+            return None
+        return float(km) * 1000.0 - float(self.section_z[0])
+    
+    def km_extent(self):
+        """
+        Primeiro e último km do arquivo carregado
+        
+        Returns:
+            Tupla (km_min, km_max) ou None sem tabela de seções
+        """
+        if self.section_z is None or len(self.section_z) == 0:
+            return None
+        return float(self.section_z[0]) / 1000.0, float(self.section_z[-1]) / 1000.0
+    
+    def section_table(self):
+        """
+        Z de cada seção (coordenadas dos vértices) e início dela nos vértices
+        
+        Returns:
+            Tupla (z (S,), offsets (S+1,)) ou None sem tabela de seções
+        """
+        if self.section_z is None or len(self.section_z) == 0:
+            return None
+        return self.section_z - float(self.section_z[0]), self.section_offsets
+    
+    def section_z_range(self, first, last):
+        """
+        Trecho em Z dos vértices que cobre as seções first..last (inclusive)
+        
+        Args:
+            first, last: Índices de seção (na ordem de km)
+            
+        Returns:
+            Tupla (z_min, z_max) ou None sem tabela de seções
+        """
+        if self.section_z is None or len(self.section_z) == 0:
+            return None
+        n = len(self.section_z)
+        first, last = sorted((int(np.clip(first, 0, n - 1)), int(np.clip(last, 0, n - 1))))
+        origin = float(self.section_z[0])
+        return float(self.section_z[first]) - origin, float(self.section_z[last]) - origin
+    
+    def lateral_offset(self, z):
+        """
+        Desvio lateral GPS da seção mais próxima de um Z dos vértices
+        
+        Somado ao X do referencial do gabarito dá o X dos vértices (ver
+        get_gauge_coordinates, sem a compensação de curva).
+        
+        Args:
+            z: Z (m) dos vértices carregados
+            
+        Returns:
+            Desvio (m); 0 sem tabela de seções
+        """
+        if self.section_z is None or len(self.section_z) == 0:
+            return 0.0
+        section_z = self.section_z - self.section_z[0]
+        index = int(np.clip(np.searchsorted(section_z, z), 0, len(section_z) - 1))
+        if index > 0 and z - section_z[index - 1] < section_z[index] - z:
+            index -= 1
+        return float(self.section_desvios[index])
 
 
 class PTSLoader(DataLoader):
@@ -490,10 +1490,20 @@ class DataLoaderFactory:
     Factory para criar loaders apropriados baseado no tipo de arquivo
     """
     
-    def __init__(self):
-        """Inicializa factory com loaders disponíveis"""
+    def __init__(self, progressive_order=False, section_grid_bins=None,
+                 curve_compensation=False, design_speed_kmh=60.0):
+        """
+        Inicializa factory com loaders disponíveis
+        
+        Args:
+            progressive_order: Repassado ao UPLLoader (ordem de desenho progressiva)
+            section_grid_bins: Repassado ao UPLLoader (grade angular das seções)
+            curve_compensation: Repassado ao UPLLoader (gabarito ajustado em curvas)
+            design_speed_kmh: Repassado ao UPLLoader (superelevação das curvas)
+        """
         self.loaders = [
-            UPLLoader(),
+            UPLLoader(progressive_order=progressive_order, section_grid_bins=section_grid_bins,
+                      curve_compensation=curve_compensation, design_speed_kmh=design_speed_kmh),
             PTSLoader(),
             CSVLoader(),
         ]
@@ -517,6 +1527,18 @@ class DataLoaderFactory:
         
         raise ValueError(f"Formato de arquivo não suportado: {filepath}")
     
+    def create_loader(self, filepath):
+        """
+        Loader próprio (mesmas opções) para um arquivo
+        
+        Cada carga guarda os seus resultados (tabela de seções, classes,
+        estatísticas) sem sobrescrever os de outro arquivo aberto.
+        
+        Raises:
+            ValueError se formato não suportado
+        """
+        return copy.copy(self.get_loader(filepath))
+    
     def load(self, filepath):
         """
         Carrega arquivo automaticamente com loader apropriado
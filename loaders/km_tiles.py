@@ -0,0 +1,181 @@
+"""
+Conjunto de dados em tiles de km fixos em disco
+Cada tile é um trecho contíguo de seções ([k·tile_m, (k+1)·tile_m) em km
+absoluto) gravado num .npz com posições, cores, classes e a ordem progressiva
+do trecho; o meta.json com a caixa e o intervalo de pontos de cada tile é
+gravado por último. Abrir o conjunto lê só o meta.json: os pontos são lidos
+tile a tile (ver renderers.tile_streaming.KmTileManager)
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+# Versão do formato (muda quando os arrays de um tile mudam)
+TILE_FORMAT = 1
+
+# Comprimento padrão (m) de via por tile
+DEFAULT_TILE_M = 250.0
+
+
+class KmTileStore:
+    """
+    Tiles de km de uma nuvem com seções contíguas
+    
+    Grave com KmTileStore.build() (uma vez por arquivo) e abra com
+    KmTileStore.open(); read() pode ser chamado de qualquer thread.
+    
+    Atributos:
+        directory: Diretório do conjunto
+        tile_m: Comprimento (m) de via por tile
+        z_origin: Km absoluto (m) do Z = 0 dos vértices (primeira seção)
+        index: Array (T,) com o número do tile em km absoluto (k de k·tile_m)
+        start, count: Arrays (T,) com o intervalo de pontos de cada tile no
+            array original (índices globais)
+        mins, maxs: Arrays (T, 3) com a caixa de cada tile
+    """
+    
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.tile_m = float(meta['tile_m'])
+        self.z_origin = float(meta['z_origin'])
+        tiles = meta['tiles']
+        self.index = np.array([t['index'] for t in tiles], dtype=np.int64)
+        self.start = np.array([t['start'] for t in tiles], dtype=np.int64)
+        self.count = np.array([t['count'] for t in tiles], dtype=np.int64)
+        self.mins = np.array([t['mins'] for t in tiles], dtype=np.float64).reshape(-1, 3)
+        self.maxs = np.array([t['maxs'] for t in tiles], dtype=np.float64).reshape(-1, 3)
+    
+    @classmethod
+    def build(cls, directory, vertices, colors, section_z, section_offsets, classes=None,
+              tile_m=DEFAULT_TILE_M, key=None, progressive=True):
+        """
+        Grava os tiles de uma nuvem carregada
+        
+        Um tile por vez: os temporários (cores empacotadas, ordem progressiva)
+        têm o tamanho de um tile, não da nuvem.
+        
+        Args:
+            vertices: Array (N, 3) float32 com seções contíguas em ordem de km
+            colors: Array (N, 3) de cores float (0-1); None = cores das
+                classes, calculadas tile a tile
+            section_z: Km absoluto (m) de cada seção (S,)
+            section_offsets: Offsets (S + 1,) das seções no array de pontos
+            classes: Classe uint8 de cada ponto (N,) ou None
+            tile_m: Comprimento (m) de via por tile
+            key: Dicionário JSON que identifica a origem (ver open)
+            progressive: Grava a ordem progressiva de cada tile (LOD por prefixo)
+        
+        Returns:
+            KmTileStore
+        """
+        from renderers.octree import progressive_order
+        from renderers.point_cloud import pack_rgba
+        from utils.tunnel_templates import colors_from_classification
+        
+        # Sem meta.json até o fim: uma gravação interrompida não é aberta
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        # Tiles de uma gravação anterior (ex: outro tile_m) não ficam para trás
+        for name in os.listdir(directory):
+            stem, ext = os.path.splitext(name)
+            if ext == '.npz' and stem.lstrip('-').isdigit():
+                os.remove(os.path.join(directory, name))
+        
+        section_z = np.asarray(section_z, dtype=np.float64)
+        offsets = np.asarray(section_offsets, dtype=np.int64)
+        section_tile = np.floor(section_z / tile_m).astype(np.int64)
+        # Primeira seção de cada tile (seções em ordem de km)
+        firsts = np.flatnonzero(np.diff(section_tile, prepend=section_tile[0] - 1))
+        bounds = np.append(firsts, len(section_z))
+        
+        tiles = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            start, stop = int(offsets[first]), int(offsets[last])
+            if stop <= start:
+                continue
+            positions = np.ascontiguousarray(vertices[start:stop], dtype=np.float32)
+            tile_colors = (colors[start:stop] if colors is not None
+                           else colors_from_classification(classes[start:stop]))
+            arrays = {'positions': positions, 'rgba': pack_rgba(tile_colors)}
+            if classes is not None:
+                arrays['classes'] = np.asarray(classes[start:stop], dtype=np.uint8)
+            if progressive:
+                arrays['order'] = progressive_order(positions)
+            number = int(section_tile[first])
+            np.savez(os.path.join(directory, f"{number}.npz"), **arrays)
+            tiles.append({
+                'index': number, 'start': start, 'count': stop - start,
+                'mins': positions.min(axis=0).tolist(), 'maxs': positions.max(axis=0).tolist(),
+            })
+        
+        meta = {
+            'format': TILE_FORMAT, 'key': key, 'tile_m': float(tile_m),
+            'z_origin': float(section_z[0]), 'classes': classes is not None, 'tiles': tiles,
+        }
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return cls(directory, meta)
+    
+    @classmethod
+    def open(cls, directory, key=None):
+        """
+        Abre um conjunto gravado (só o meta.json)
+        
+        Returns:
+            KmTileStore ou None se faltar, for de outro formato ou de outra origem
+        """
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != TILE_FORMAT or meta.get('key') != key:
+            return None
+        return cls(directory, meta)
+    
+    @property
+    def n_tiles(self):
+        """Número de tiles (com pontos)"""
+        return len(self.index)
+    
+    @property
+    def n_points(self):
+        """Pontos somando todos os tiles"""
+        return int(self.count.sum())
+    
+    def z_range(self, tile):
+        """(z inicial, z final) do trecho do tile no Z dos vértices"""
+        z0 = self.index[tile] * self.tile_m - self.z_origin
+        return float(z0), float(z0 + self.tile_m)
+    
+    def tiles_near(self, z, radius):
+        """
+        Tiles cujo trecho fica a até radius metros de z
+        
+        Args:
+            z: Z dos vértices (ex: alvo da câmera)
+            radius: Distância (m) ao longo da via
+        
+        Returns:
+            Array de tiles, do mais próximo ao mais distante
+        """
+        z0 = self.index * self.tile_m - self.z_origin
+        distance = np.maximum(np.maximum(z0 - z, z - (z0 + self.tile_m)), 0.0)
+        near = np.flatnonzero(distance <= radius)
+        return near[np.argsort(distance[near], kind='stable')]
+    
+    def read(self, tile):
+        """
+        Lê os arrays de um tile (chamado pelas threads de leitura)
+        
+        Returns:
+            Dicionário com positions, rgba e, se gravados, classes e order
+        """
+        with np.load(os.path.join(self.directory, f"{int(self.index[tile])}.npz")) as data:
+            return {name: data[name] for name in data.files}
@@ -15,7 +15,9 @@ from OpenGL.GL import *
 
 from core.application import Viewer3DApplication
 from loaders.data_loader import UPLLoader
-from utils.tunnel_templates import TemplateRegistry, FerroviaTunel
+from renderers.point_cloud import PointCloudRenderer
+from utils.tunnel_templates import TemplateRegistry, FerroviaTunel, colors_from_classification
+from utils.template_config import TemplateFileWatcher, TemplateReclassifier
 from ui.gabarit_selector_menu import GabaritSelectorMenu
 from ui.train_model_selector_menu import TrainModelSelectorMenu
 from ui.train_control_panel import TrainControlPanel
@@ -23,17 +25,30 @@ from utils.ore_train_simulator import OreTrainSimulator
 from renderers.train_renderer import TrainRenderer
 
 
+# Arquivo de gabaritos observado (recarregado automaticamente ao salvar)
+DEFAULT_TEMPLATES_FILE = 'gabaritos.json'
+
+
 class GabaritVisualizerApp(Viewer3DApplication):
     """Aplicação com sistema de gabaritos e simulação de trem"""
     
-    def __init__(self):
-        """Inicializa a aplicação"""
+    def __init__(self, templates_file=DEFAULT_TEMPLATES_FILE):
+        """
+        Args:
+            templates_file: Arquivo JSON/YAML de gabaritos observado em tempo real
+        """
         super().__init__()
         
         # Estado do gabarito
         self.current_gabarit = None  # Será selecionado no menu
         self.current_gabarit_key = 'ferrovia'
         self.upl_data_loaded = False
+        self.class_columns = {}  # {chave_gabarito: classes uint8} da camada ativa (do loader dela)
+        self._shown_classes = None  # Coluna com que a camada ativa está colorida
+        
+        # Gabaritos em arquivo: recarga automática + reclassificação em segundo plano
+        self.template_watcher = TemplateFileWatcher(templates_file, self._on_templates_changed)
+        self.reclassifier = None  # Criado ao carregar um arquivo UPL
         
         # Estado do trem
         self.ore_train = None
@@ -63,8 +78,9 @@ class GabaritVisualizerApp(Viewer3DApplication):
         self.start_time = 0
         self.paused_time = 0
         
-        # Carrega gabarito padrão
+        # Carrega gabarito padrão e gabaritos do arquivo (se existir)
         self._load_default_gabarit()
+        self.template_watcher.poll(glfw.get_time())
         
         print("\n" + "="*70)
         print("🔧 Visualizador com Sistema de Gabaritos de Túnel")
@@ -88,32 +104,84 @@ class GabaritVisualizerApp(Viewer3DApplication):
         self.current_gabarit_key = gabarit_key
         print(f"✅ Gabarito selecionado: {self.current_gabarit.name}")
         
-        # Recarrega arquivo UPL com novo gabarito se já estava carregado
-        if self.upl_data_loaded and self.current_file:
+        # Troca apenas a coluna de classes que alimenta a LUT de cores
+        if self.upl_data_loaded and gabarit_key in self.class_columns:
+            self._show_class_column(self.class_columns[gabarit_key])
+            print(f"🎨 Cores trocadas para gabarito '{self.current_gabarit.name}'")
+        # Gabarito sem coluna pré-calculada: recarrega arquivo UPL
+        elif self.upl_data_loaded and self.current_file:
             self._reload_upl_with_gabarit()
     
+    def _on_templates_changed(self, templates):
+        """Callback quando o arquivo de gabaritos muda: registra e reclassifica"""
+        for key, template in templates.items():
+            TemplateRegistry.register(key, template)
+            if key == self.current_gabarit_key:
+                self.current_gabarit = template
+            
+            if self.reclassifier is not None:
+                classes = self.reclassifier.request(key, template)
+                # Versão já calculada antes: troca imediata
+                if classes is not None:
+                    self._apply_class_column(key, classes)
+        
+        self.gabarit_menu.refresh()
+    
+    def _apply_class_column(self, key, classes):
+        """Guarda a coluna de classes e atualiza as cores se for o gabarito atual"""
+        self.class_columns[key] = classes
+        if key == self.current_gabarit_key:
+            self._show_class_column(classes)
+            print(f"🎨 Cores atualizadas para gabarito '{self.current_gabarit.name}'")
+    
+    def _show_class_column(self, classes):
+        """
+        Recolore a camada ativa com uma coluna de classes (ordem do arquivo)
+        
+        Só os pontos que mudaram de classe são recoloridos (update_colors); o
+        loader passa a ter as classes do gabarito atual, com estatísticas por
+        km e visão geral recalculadas.
+        """
+        shown = self._shown_classes
+        if shown is not None and len(shown) == len(classes):
+            changed = np.flatnonzero(shown != classes)
+            if len(changed) > 0:
+                self.point_renderer.update_colors(changed, colors_from_classification(classes[changed]))
+        else:
+            self.point_renderer.set_colors(colors_from_classification(classes))
+        self._shown_classes = classes
+        
+        loader = self.loader
+        loader.apply_classification(self.current_gabarit, classes,
+                                    self.point_renderer.vertices.reshape(-1, 3))
+        self._show_overview(loader)
+        self.scheduler.request_redraw()
+    
+    def _start_reclassifier(self, loader, vertices):
+        """Prepara reclassificação em segundo plano da nuvem carregada"""
+        if self.reclassifier is not None:
+            self.reclassifier.shutdown()
+            self.reclassifier = None
+        
+        coords = loader.get_gauge_coordinates(vertices)
+        if coords is None:
+            return
+        self.reclassifier = TemplateReclassifier(*coords)
+        
+        # Colunas já calculadas no carregamento entram no cache
+        for key, classes in self.class_columns.items():
+            template = TemplateRegistry.get(key)
+            if template is not None:
+                self.reclassifier.seed(template, classes)
+    
     def _reload_upl_with_gabarit(self):
-        """Recarrega o arquivo UPL com o gabarito atual"""
+        """Recarrega o arquivo UPL da camada ativa com o gabarito atual"""
         if not self.current_file:
             return
         
         print(f"🔄 Recarregando {self.current_file} com gabarito '{self.current_gabarit.name}'...")
-        
-        try:
-            # Carrega com novo gabarito
-            loader = UPLLoader(template=self.current_gabarit)
-            vertices, colors = loader.load(self.current_file)
-            
-            # Atualiza dados
-            self.vertices = vertices
-            self.colors = colors
-            self.n_vertices = len(vertices)
-            
-            # Cria/atualiza VBO
-            self._setup_vbo()
+        if self.load_file(self.current_file):
             print(f"✅ Arquivo recarregado com novas cores")
-        except Exception as e:
-            print(f"❌ Erro ao recarregar: {e}")
     
     def _on_train_selected(self, model_name, vagons):
         """Callback quando modelo de trem é selecionado"""
@@ -229,56 +297,44 @@ class GabaritVisualizerApp(Viewer3DApplication):
         # Passa para aplicação base
         super().on_mouse_button(window, button, action, mods)
     
-    def load_file(self, filepath):
-        """Carrega arquivo com gabarito atual"""
-        print(f"\n📂 Carregando arquivo: {filepath}")
-        print(f"   Com gabarito: {self.current_gabarit.name}")
-        
-        try:
-            loader = UPLLoader(template=self.current_gabarit)
-            vertices, colors = loader.load(filepath)
-            
-            self.vertices = vertices
-            self.colors = colors
-            self.n_vertices = len(vertices)
-            self.current_file = filepath
-            self.upl_data_loaded = True
-            
-            self._setup_vbo()
-            
-            # Ajusta câmera
-            if len(vertices) > 0:
-                center = vertices.mean(axis=0)
-                extent = (vertices.max(axis=0) - vertices.min(axis=0)).max()
-                self.camera.look_at(
-                    eye=center + np.array([extent, extent*0.5, extent]),
-                    target=center,
-                    up=np.array([0, 1, 0])
-                )
-            
-            print(f"✅ Arquivo carregado com sucesso!")
-        except Exception as e:
-            print(f"❌ Erro ao carregar: {e}")
+    def _loader_for(self, filepath):
+        """UPL classificado com o gabarito atual e com todos os registrados (troca sem recarregar)"""
+        loader = super()._loader_for(filepath)
+        if isinstance(loader, UPLLoader):
+            loader.template = self.current_gabarit
+            loader.classify_all_templates = True
+        return loader
+    
+    def load_file(self, filepath, as_layer=False):
+        """Carrega arquivo com gabarito atual (ver Viewer3DApplication.load_file)"""
+        print(f"\n📋 Gabarito: {self.current_gabarit.name}")
+        return super().load_file(filepath, as_layer)
     
-    def _setup_vbo(self):
-        """Cria VBO para renderização eficiente"""
-        # ... implementação similar ao aplicativo anterior ...
-        pass
+    def _activate_layer(self):
+        """Colunas de classe e reclassificação em segundo plano passam a ser as da camada ativa"""
+        super()._activate_layer()
+        loader = self.loader
+        self.upl_data_loaded = (isinstance(loader, UPLLoader) and isinstance(self.point_renderer, PointCloudRenderer)
+                                and self.point_renderer.n_vertices > 0)
+        if not self.upl_data_loaded:
+            self.class_columns = {}
+            self._shown_classes = None
+            if self.reclassifier is not None:
+                self.reclassifier.shutdown()
+                self.reclassifier = None
+            return
+        self.class_columns = loader.class_columns
+        self._shown_classes = loader.classifications
+        self._start_reclassifier(loader, self.point_renderer.load_order_arrays()[0])
     
     def render(self):
         """Renderiza a cena"""
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         
-        # Renderiza nuvem de pontos
-        if self.show_cloud and self.n_vertices > 0:
-            glPointSize(2.0)
-            glBegin(GL_POINTS)
-            for i in range(min(self.n_vertices, 100000)):  # Limita por performance
-                color = self.colors[i] if i < len(self.colors) else [1, 1, 1]
-                vertex = self.vertices[i] if i < len(self.vertices) else [0, 0, 0]
-                glColor3f(*color)
-                glVertex3f(*vertex)
-            glEnd()
+        # Renderiza nuvem de pontos (camadas da cena: VBO, LOD e filtros)
+        if self.show_cloud and self.point_renderer.n_vertices > 0:
+            self.camera.apply()
+            self.scene.render(self.camera)
         
         # Renderiza trem
         if self.show_train and self.ore_train:
@@ -320,12 +376,32 @@ class GabaritVisualizerApp(Viewer3DApplication):
         glfw.set_key_callback(self.window, self.on_key)
         glfw.set_mouse_button_callback(self.window, self.on_mouse_button)
         
-        # Loop principal
+        # Loop principal (redesenha só com eventos, cores novas ou trem andando)
         while not glfw.window_should_close(self.window):
+            current_time = glfw.get_time()
+            if self.template_watcher.poll(current_time):
+                self.scheduler.request_redraw()
+            if self.reclassifier is not None:
+                for key, classes in self.reclassifier.poll():
+                    self._apply_class_column(key, classes)
+                    self.scheduler.request_redraw()
+            
+            self.scheduler.set_animating(
+                'trem', self.show_train and self.ore_train is not None and not self.train_paused)
+            self.scheduler.set_animating('point_cloud', self.show_cloud and self.scene.needs_redraw())
+            if not self.scheduler.needs_redraw():
+                timeout = self.scheduler.max_wait
+                glfw.wait_events_timeout(timeout)
+                self.scheduler.record_wait(glfw.get_time() - current_time, timeout)
+                continue
+            
             self.render()
             glfw.swap_buffers(self.window)
+            self.scheduler.frame_drawn()
             glfw.poll_events()
         
+        if self.reclassifier is not None:
+            self.reclassifier.shutdown()
         glfw.terminate()
 
 
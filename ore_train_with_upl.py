@@ -292,6 +292,9 @@ def main():
     print(f"\n[INICIAR] Clique na janela e use os controles acima")
     print("="*70 + "\n")
     
+    # Trem anima a cada frame: o loop não pode dormir esperando eventos
+    app.scheduler.set_animating('trem', True)
+    
     try:
         app.run()
     except KeyboardInterrupt:
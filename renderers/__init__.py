@@ -3,5 +3,14 @@
 from .point_cloud import (
     PointCloudRenderer, AxesRenderer, AxisIndicator
 )
+from .octree import PointOctree
+from .culling import ChunkIndex
+from .frame_budget import AdaptivePointBudget
+from .accumulation import AccumulationBuffer
+from .tunnel_mesh import TunnelMesh, TunnelMeshRenderer
+from .wall_view import WallPyramid, WallViewRenderer
+from .tile_streaming import KmTileManager, TiledPointCloud
 
-__all__ = ['PointCloudRenderer', 'AxesRenderer', 'AxisIndicator']
+__all__ = ['PointCloudRenderer', 'AxesRenderer', 'AxisIndicator', 'PointOctree', 'ChunkIndex',
+           'AdaptivePointBudget', 'AccumulationBuffer', 'TunnelMesh', 'TunnelMeshRenderer',
+           'WallPyramid', 'WallViewRenderer', 'KmTileManager', 'TiledPointCloud']
@@ -0,0 +1,143 @@
+"""
+Framebuffer de acumulação para refinamento progressivo
+Com a câmera parada, lotes extras de pontos são desenhados sobre a imagem dos
+frames anteriores; o double buffering da janela não preserva o back buffer
+entre swaps, então a cena 3D é acumulada em um FBO próprio e copiada para a
+tela a cada frame
+"""
+
+from OpenGL.GL import *
+
+
+class AccumulationBuffer:
+    """
+    FBO com textura de cor e renderbuffer de profundidade do tamanho da janela
+    
+    A profundidade é mantida entre frames: lotes novos respeitam a oclusão dos
+    pontos já desenhados. Sem suporte a framebuffer objects (ou se a criação
+    falhar), available fica False e o chamador desenha direto na tela.
+    """
+    
+    def __init__(self):
+        self.fbo = None
+        self.color_texture = None
+        self.depth_buffer = None
+        self.width = 0
+        self.height = 0
+        self.available = True
+    
+    def ensure_size(self, width, height):
+        """
+        Cria ou recria o FBO para o tamanho da janela
+        
+        Args:
+            width, height: Tamanho do viewport em pixels
+        
+        Returns:
+            True se o FBO foi (re)criado (conteúdo acumulado perdido)
+        """
+        width, height = max(1, int(width)), max(1, int(height))
+        if self.fbo is not None and (width, height) == (self.width, self.height):
+            return False
+        
+        self.cleanup()
+        try:
+            self.color_texture = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, self.color_texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0,
+                         GL_RGBA, GL_UNSIGNED_BYTE, None)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            
+            self.depth_buffer = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depth_buffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+            glBindRenderbuffer(GL_RENDERBUFFER, 0)
+            
+            self.fbo = glGenFramebuffers(1)
+            glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0,
+                                   GL_TEXTURE_2D, self.color_texture, 0)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT,
+                                      GL_RENDERBUFFER, self.depth_buffer)
+            status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+            if status != GL_FRAMEBUFFER_COMPLETE:
+                raise RuntimeError(f"FBO incompleto (status 0x{int(status):x})")
+        except Exception as e:
+            print(f"⚠️  Refinamento progressivo indisponível: {e}")
+            self.cleanup()
+            self.available = False
+            return False
+        
+        self.width, self.height = width, height
+        return True
+    
+    def bind(self):
+        """Direciona o desenho para o FBO"""
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+    
+    def unbind(self):
+        """Volta a desenhar na janela"""
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    
+    def present(self):
+        """
+        Copia a imagem acumulada para a janela (quad com textura na tela toda)
+        
+        Usa um quad em vez de glBlitFramebuffer porque a janela pode ser
+        multisample. Não escreve profundidade: o que vier depois (indicador de
+        eixos, UI) é desenhado por cima.
+        """
+        glPushAttrib(GL_ENABLE_BIT | GL_TEXTURE_BIT | GL_CURRENT_BIT | GL_DEPTH_BUFFER_BIT)
+        glDisable(GL_DEPTH_TEST)
+        glDepthMask(GL_FALSE)
+        glDisable(GL_BLEND)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.color_texture)
+        glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)
+        
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, 1, 0, 1, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0)
+        glVertex2f(0, 0)
+        glTexCoord2f(1, 0)
+        glVertex2f(1, 0)
+        glTexCoord2f(1, 1)
+        glVertex2f(1, 1)
+        glTexCoord2f(0, 1)
+        glVertex2f(0, 1)
+        glEnd()
+        
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPopMatrix()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glPopAttrib()
+    
+    def cleanup(self):
+        """Libera FBO, textura e renderbuffer"""
+        try:
+            if self.fbo is not None:
+                glDeleteFramebuffers(1, [self.fbo])
+            if self.color_texture is not None:
+                glDeleteTextures([self.color_texture])
+            if self.depth_buffer is not None:
+                glDeleteRenderbuffers(1, [self.depth_buffer])
+        except Exception:
+            pass
+        self.fbo = None
+        self.color_texture = None
+        self.depth_buffer = None
+        self.width = self.height = 0
@@ -0,0 +1,119 @@
+"""
+Frustum culling da nuvem de pontos por blocos contíguos do buffer
+Túneis são estruturas finas e longas: com os pontos ordenados por Z, cada bloco
+cobre um trecho curto da via e só os trechos visíveis são desenhados
+"""
+
+import numpy as np
+
+
+def boxes_in_frustum(planes, mins, maxs):
+    """
+    Testa caixas alinhadas aos eixos contra o frustum
+    
+    Args:
+        planes: Array (6, 4) de planos (a, b, c, d) com normal para dentro
+        mins, maxs: Arrays (M, 3) com os cantos de cada caixa
+    
+    Returns:
+        Máscara (M,) True para caixas total ou parcialmente visíveis
+    """
+    visible = np.ones(len(mins), dtype=bool)
+    for a, b, c, d in planes:
+        # Canto mais à frente do plano (vértice positivo)
+        px = np.where(a > 0, maxs[:, 0], mins[:, 0])
+        py = np.where(b > 0, maxs[:, 1], mins[:, 1])
+        pz = np.where(c > 0, maxs[:, 2], mins[:, 2])
+        visible &= a * px + b * py + c * pz + d >= 0
+    return visible
+
+
+class ChunkIndex:
+    """
+    Blocos contíguos do buffer de pontos com caixa envolvente
+    
+    Espera o buffer ordenado por Z (ver z_order); cada bloco de chunk_size
+    pontos vira um intervalo [start, start + count) desenhável direto do VBO.
+    """
+    
+    def __init__(self, vertices, chunk_size=32768, order=None, batch_chunks=32):
+        """
+        Args:
+            vertices: Array (N, 3) na ordem do buffer, ou na ordem original
+                com order
+            chunk_size: Pontos por bloco
+            order: Permutação do buffer (buffer[i] = vertices[order[i]]);
+                os vértices são reunidos batch_chunks blocos por vez, sem
+                cópia permutada da nuvem inteira
+            batch_chunks: Blocos por lote quando há order
+        """
+        n = len(vertices)
+        self.chunk_size = chunk_size
+        self.starts = np.arange(0, n, chunk_size, dtype=np.int64)
+        self.counts = np.diff(np.append(self.starts, n))
+        if n == 0:
+            self.mins = self.maxs = np.zeros((0, 3))
+            return
+        if order is None:
+            self.mins = np.minimum.reduceat(vertices, self.starts, axis=0)
+            self.maxs = np.maximum.reduceat(vertices, self.starts, axis=0)
+            return
+        
+        self.mins = np.empty((len(self.starts), 3), dtype=vertices.dtype)
+        self.maxs = np.empty((len(self.starts), 3), dtype=vertices.dtype)
+        for first in range(0, len(self.starts), batch_chunks):
+            last = min(first + batch_chunks, len(self.starts))
+            end = self.starts[last] if last < len(self.starts) else n
+            points = vertices[order[self.starts[first]:end]]
+            local = self.starts[first:last] - self.starts[first]
+            self.mins[first:last] = np.minimum.reduceat(points, local, axis=0)
+            self.maxs[first:last] = np.maximum.reduceat(points, local, axis=0)
+    
+    @property
+    def n_chunks(self):
+        return len(self.starts)
+    
+    def z_span(self, z_min, z_max):
+        """
+        Blocos que podem ter pontos no trecho z_min <= z <= z_max
+        
+        Com o buffer ordenado por Z os limites dos blocos crescem junto com
+        o índice: o trecho vira um único intervalo de blocos (busca binária).
+        
+        Returns:
+            Tupla (first, last): blocos [first, last)
+        """
+        first = int(np.searchsorted(self.maxs[:, 2], z_min, side='left'))
+        last = int(np.searchsorted(self.mins[:, 2], z_max, side='right'))
+        return first, max(first, last)
+    
+    def visible_ranges(self, planes, z_range=None):
+        """
+        Intervalos do buffer dentro do frustum
+        
+        Args:
+            planes: Array (6, 4) de Camera3D.get_frustum_planes()
+            z_range: (z_min, z_max) opcional; só os blocos do trecho são testados
+        
+        Returns:
+            Tupla (starts, counts) dos blocos visíveis
+        """
+        first, last = self.z_span(*z_range) if z_range is not None else (0, self.n_chunks)
+        visible = boxes_in_frustum(planes, self.mins[first:last], self.maxs[first:last])
+        return self.starts[first:last][visible], self.counts[first:last][visible]
+
+
+def z_order(vertices):
+    """
+    Permutação que ordena os pontos por Z (None se já estão ordenados)
+    
+    Args:
+        vertices: Array (N, 3)
+    
+    Returns:
+        Array de índices ou None
+    """
+    zs = vertices[:, 2]
+    if len(zs) < 2 or np.all(zs[1:] >= zs[:-1]):
+        return None
+    return np.argsort(zs, kind='stable')
@@ -0,0 +1,125 @@
+"""
+Orçamento adaptativo de pontos por frame
+Ajusta max_points_render pelo tempo de frame medido, mirando um FPS alvo
+"""
+
+import math
+
+
+class AdaptivePointBudget:
+    """
+    Controlador do número de pontos desenhados por frame
+    
+    Enquanto a câmera se move, compara o tempo de frame (média móvel) com o
+    alvo: acima da faixa de histerese reduz o orçamento proporcionalmente,
+    abaixo dela aumenta aos poucos, e dentro dela mantém. Com a câmera parada
+    por settle_time segundos sobe para densidade total; ao voltar a mover,
+    retoma o último orçamento interativo. Com full_density_when_still=False o
+    estado 'parado' mantém o orçamento interativo (o refinamento progressivo
+    completa a imagem em vários frames).
+    """
+    
+    def __init__(self, target_fps=60.0, min_points=100000, max_points=2000000,
+                 hysteresis=0.15, settle_time=0.3, growth=1.1, quantum=50000,
+                 full_density_when_still=True):
+        """
+        Args:
+            target_fps: FPS desejado durante a interação
+            min_points: Orçamento mínimo
+            max_points: Orçamento máximo (normalmente o total de pontos)
+            hysteresis: Faixa relativa em torno do alvo sem ajuste (0.15 = ±15%)
+            settle_time: Segundos parada até liberar densidade total
+            growth: Fator de aumento por frame quando sobra tempo
+            quantum: Arredondamento do orçamento (evita refazer a seleção de
+                nós a cada pequena variação)
+            full_density_when_still: False mantém o orçamento interativo com
+                a câmera parada
+        """
+        self.target_fps = target_fps
+        self.min_points = min_points
+        self.max_points = max_points
+        self.hysteresis = hysteresis
+        self.settle_time = settle_time
+        self.growth = growth
+        self.quantum = quantum
+        self.full_density_when_still = full_density_when_still
+        
+        self.interactive_budget = min(max_points, 1000000)
+        self.budget = self.interactive_budget
+        self.state = 'estável'
+        self._frame_time = None  # Média móvel exponencial (s)
+        self._still_since = None
+    
+    def set_max_points(self, max_points):
+        """Atualiza o teto (ex: ao carregar outra nuvem)"""
+        self.max_points = max(self.min_points, int(max_points))
+        self.interactive_budget = min(self.interactive_budget, self.max_points)
+        self.budget = min(self.budget, self.max_points)
+    
+    def update(self, frame_time, camera_moving, now):
+        """
+        Atualiza o orçamento com a medição do último frame
+        
+        Args:
+            frame_time: Duração do último frame (s)
+            camera_moving: Se a câmera mudou desde o frame anterior
+            now: Tempo atual (s)
+        
+        Returns:
+            Orçamento de pontos para o próximo frame
+        """
+        if camera_moving:
+            self._still_since = None
+        elif self._still_since is None:
+            self._still_since = now
+        
+        # Câmera parada: densidade total (não mede frames lentos de propósito)
+        if self._still_since is not None and now - self._still_since >= self.settle_time:
+            self.state = 'parado'
+            self.budget = self.max_points if self.full_density_when_still else self.interactive_budget
+            self._frame_time = None
+            return self.budget
+        
+        # Frames parados (densidade total ou refinamento) não dizem nada sobre
+        # o orçamento interativo
+        if self.state == 'parado':
+            self.state = 'estável'
+            self.budget = self.interactive_budget
+            return self.budget
+        
+        # Parada recente (antes de settle_time): mantém o orçamento
+        if not camera_moving:
+            return self.budget
+        
+        if self._frame_time is None:
+            self._frame_time = frame_time
+        else:
+            self._frame_time += 0.2 * (frame_time - self._frame_time)
+        
+        target = 1.0 / self.target_fps
+        budget = self.interactive_budget
+        if self._frame_time > target * (1 + self.hysteresis):
+            # Reduz proporcionalmente ao excesso (no máximo pela metade por frame)
+            budget *= max(0.5, target / self._frame_time)
+            self.state = 'reduzindo'
+        elif self._frame_time < target * (1 - self.hysteresis):
+            budget *= self.growth
+            self.state = 'aumentando'
+        else:
+            self.state = 'estável'
+        
+        # Arredonda no sentido do ajuste (senão passos pequenos se anulam)
+        rounding = math.ceil if self.state == 'aumentando' else math.floor
+        budget = int(rounding(budget / self.quantum)) * self.quantum
+        self.interactive_budget = max(self.min_points, min(self.max_points, budget))
+        self.budget = self.interactive_budget
+        return self.budget
+    
+    def get_stats(self):
+        """Estado atual para exibição"""
+        return {
+            'budget': self.budget,
+            'state': self.state,
+            'target_fps': self.target_fps,
+            'frame_ms': None if self._frame_time is None else 1000.0 * self._frame_time,
+        }
@@ -0,0 +1,516 @@
+"""
+Octree de nível de detalhe (LOD) para nuvens de pontos
+Cada nó guarda uma subamostra dos pontos da sua célula; desenhar um nó e seus
+ancestrais dá uma amostra com espaçamento uniforme na resolução daquele nível
+"""
+
+import numpy as np
+
+from renderers.culling import boxes_in_frustum
+from renderers.picking import ray_box_interval
+
+
+# Bits por eixo do código Morton (3 × 21 = 63 bits cabem em uint64)
+MORTON_BITS = 21
+
+# Pontos por lote na construção da octree (limita os temporários por ponto)
+BUILD_BATCH = 1 << 20
+
+
+def _spread_bits(values):
+    """Intercala 2 zeros entre os bits (entrada até 21 bits, uint64)"""
+    v = values.astype(np.uint64) & np.uint64(0x1FFFFF)
+    v = (v | (v << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return v
+
+
+def morton_codes(vertices, origin, size):
+    """
+    Código Morton (Z-order) de cada ponto dentro do cubo [origin, origin + size]
+    
+    Args:
+        vertices: Array (N, 3)
+        origin: Canto mínimo do cubo
+        size: Lado do cubo
+    
+    Returns:
+        Array (N,) uint64
+    """
+    cells = 1 << MORTON_BITS
+    grid = np.floor((vertices - origin) * (cells / size)).astype(np.int64)
+    np.clip(grid, 0, cells - 1, out=grid)
+    return (_spread_bits(grid[:, 0])
+            | (_spread_bits(grid[:, 1]) << np.uint64(1))
+            | (_spread_bits(grid[:, 2]) << np.uint64(2)))
+
+
+def _batched_bounds(vertices):
+    """Mínimo e máximo por eixo (float64), BUILD_BATCH pontos por vez"""
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    for start in range(0, len(vertices), BUILD_BATCH):
+        batch = vertices[start:start + BUILD_BATCH]
+        mins = np.minimum(mins, batch.min(axis=0))
+        maxs = np.maximum(maxs, batch.max(axis=0))
+    return mins, maxs
+
+
+def point_levels(codes, sample_bits):
+    """
+    Nível de refinamento de cada ponto (códigos Morton já ordenados)
+    
+    Um ponto é do nível L se é o primeiro da sua célula na grade de
+    2^(L + sample_bits) células por eixo, mas não da grade do nível anterior.
+    
+    Args:
+        codes: Array (N,) uint64 ordenado
+        sample_bits: log2 da grade de amostragem por nó
+    
+    Returns:
+        Array (N,) uint8 com níveis 0..MORTON_BITS - sample_bits
+    """
+    max_level = MORTON_BITS - sample_bits
+    levels = np.full(len(codes), max_level, dtype=np.uint8)
+    
+    # Bits que mudam em relação ao ponto anterior: quanto mais alto, mais cedo
+    # o ponto abre uma célula nova (em lotes de BUILD_BATCH pontos)
+    for start in range(0, len(codes), BUILD_BATCH):
+        end = min(start + BUILD_BATCH, len(codes))
+        diff = np.empty(end - start, dtype=np.uint64)
+        if start == 0:
+            diff[0] = np.uint64(0xFFFFFFFFFFFFFFFF)
+        else:
+            diff[0] = codes[start] ^ codes[start - 1]
+        np.bitwise_xor(codes[start + 1:end], codes[start:end - 1], out=diff[1:])
+        
+        batch = levels[start:end]
+        for level in range(max_level, -1, -1):
+            shift = np.uint64(3 * (MORTON_BITS - level - sample_bits))
+            batch[(diff >> shift) != 0] = level
+    return levels
+
+
+def progressive_order(vertices, seed=0):
+    """
+    Ordem progressiva: qualquer prefixo é uma subamostra espacialmente uniforme
+    
+    Os pontos são agrupados por nível de refinamento da grade Morton (um ponto
+    por célula do nível 0, depois um por célula nova do nível 1, ...) e
+    embaralhados dentro de cada nível, de modo que cortar o buffer no meio de
+    um nível ainda dá uma amostra uniforme. LOD vira glDrawArrays(0, budget).
+    
+    Args:
+        vertices: Array (N, 3)
+        seed: Semente do embaralhamento (ordem reprodutível)
+    
+    Returns:
+        Array (N,) de índices (uint32 se couber)
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    n = len(vertices)
+    index_dtype = np.uint32 if n < 2 ** 32 else np.int64
+    if n == 0:
+        return np.zeros(0, dtype=index_dtype)
+    
+    mins = vertices.min(axis=0)
+    size = max(float((vertices.max(axis=0) - mins).max()), 1e-6) * (1 + 1e-9)
+    codes = morton_codes(vertices, mins, size)
+    morton_order = np.argsort(codes, kind='stable')
+    levels = point_levels(codes[morton_order], sample_bits=0)
+    
+    shuffle = np.random.default_rng(seed).random(n)
+    by_level = np.lexsort((shuffle, levels))
+    return morton_order[by_level].astype(index_dtype)
+
+
+class PointOctree:
+    """
+    Octree com subamostra por nó, construída em uma passada vetorizada
+    
+    Os pontos são ordenados por código Morton; um ponto pertence ao nível L se
+    é o primeiro da sua subcélula de grade (2^sample_bits por eixo dentro de cada
+    nó de nível L) e não era o primeiro da subcélula do nível anterior. Assim a
+    união dos níveis 0..L tem um ponto por subcélula do nível L.
+    
+    O buffer reordenado (order) deixa os pontos de cada nó contíguos, então
+    cada nó é um intervalo [start, start + count) do VBO.
+    """
+    
+    def __init__(self, vertices, sample_bits=7):
+        """
+        Args:
+            vertices: Array (N, 3) de coordenadas (float32 usado sem cópia)
+            sample_bits: log2 da grade de amostragem por nó (7 = 128³ subcélulas)
+        
+        A construção percorre os pontos em lotes de BUILD_BATCH: têm o tamanho
+        da nuvem só códigos Morton (uint64), níveis (uint8), a ordem Morton e
+        order (int32 enquanto couber; argsort cria um int64 temporário).
+        """
+        vertices = np.asarray(vertices)
+        if not np.issubdtype(vertices.dtype, np.floating):
+            vertices = vertices.astype(np.float32)
+        n = len(vertices)
+        index_dtype = np.int32 if n < 2 ** 31 else np.int64
+        self.sample_bits = sample_bits
+        self.max_level = MORTON_BITS - sample_bits
+        
+        mins, maxs = _batched_bounds(vertices)
+        self.origin = mins
+        self.size = max(float((maxs - mins).max()), 1e-6) * (1 + 1e-9)
+        
+        # Códigos Morton por lote, na precisão dos vértices
+        codes = np.empty(n, dtype=np.uint64)
+        origin = mins.astype(vertices.dtype)
+        for start in range(0, n, BUILD_BATCH):
+            codes[start:start + BUILD_BATCH] = morton_codes(vertices[start:start + BUILD_BATCH],
+                                                            origin, self.size)
+        morton_order = np.argsort(codes, kind='stable').astype(index_dtype)
+        codes.sort()  # Mesmo resultado de codes[morton_order], sem outra cópia
+        
+        levels = point_levels(codes, sample_bits)
+        self._group_by_level(codes, levels, morton_order)
+        del codes, levels, morton_order
+        
+        self.node_count = np.diff(np.append(self.node_start, n))
+        
+        # Caixa envolvente real dos pontos de cada nó (mais justa que a célula)
+        self.node_min, self.node_max = self._node_bounds(vertices)
+        
+        self.node_parent = self._find_parents()
+        self._level_nodes = [np.flatnonzero(self.node_level == level)
+                             for level in range(1, self.max_level + 1)]
+        self._ray_cache = None  # Índice de seleção por raio (ver _ray_index)
+    
+    def _group_by_level(self, codes, levels, morton_order):
+        """
+        Agrupa os pontos por nível mantendo a ordem Morton (cada nó fica contíguo)
+        
+        Preenche order, node_start, node_level e node_key. Equivale a uma
+        ordenação estável por nível, feita lote a lote: cada nível tem sua
+        faixa do buffer (contagem de pontos por nível) e os pontos do lote
+        são copiados para o fim da faixa de cada nível.
+        
+        Args:
+            codes: Códigos Morton ordenados (N,)
+            levels: Nível de cada ponto (N,), ver point_levels
+            morton_order: Índice original de cada código
+        """
+        level_counts = np.bincount(levels, minlength=self.max_level + 1)
+        cursor = np.cumsum(level_counts) - level_counts  # Próxima posição livre de cada nível
+        self.order = np.empty(len(codes), dtype=morton_order.dtype)
+        
+        node_starts = [[] for _ in range(self.max_level + 1)]
+        node_keys = [[] for _ in range(self.max_level + 1)]
+        last_key = [None] * (self.max_level + 1)  # Chave do último nó de cada nível
+        for start in range(0, len(codes), BUILD_BATCH):
+            batch_levels = levels[start:start + BUILD_BATCH]
+            batch_codes = codes[start:start + BUILD_BATCH]
+            batch_order = morton_order[start:start + BUILD_BATCH]
+            for level in np.flatnonzero(np.bincount(batch_levels, minlength=self.max_level + 1)):
+                sel = np.flatnonzero(batch_levels == level)
+                first = cursor[level]
+                self.order[first:first + len(sel)] = batch_order[sel]
+                
+                # Nó novo onde a chave (célula do nível) muda
+                keys = batch_codes[sel] >> np.uint64(3 * (MORTON_BITS - level))
+                new_node = np.ones(len(keys), dtype=bool)
+                new_node[1:] = keys[1:] != keys[:-1]
+                if last_key[level] is not None:
+                    new_node[0] = keys[0] != last_key[level]
+                node_starts[level].append(first + np.flatnonzero(new_node))
+                node_keys[level].append(keys[new_node])
+                last_key[level] = keys[-1]
+                cursor[level] += len(sel)
+        
+        nodes_per_level = [sum(len(part) for part in parts) for parts in node_starts]
+        self.node_start = np.concatenate([np.zeros(0, dtype=np.int64)] +
+                                         [part for parts in node_starts for part in parts]).astype(np.int64)
+        self.node_key = np.concatenate([np.zeros(0, dtype=np.uint64)] +
+                                       [part for parts in node_keys for part in parts])
+        self.node_level = np.repeat(np.arange(self.max_level + 1, dtype=np.int64), nodes_per_level)
+    
+    def _node_bounds(self, vertices):
+        """
+        Caixa (mín, máx) dos pontos de cada nó, reunidos BUILD_BATCH por vez
+        
+        Nós que atravessam o limite de um lote acumulam as caixas parciais.
+        
+        Returns:
+            Tupla (node_min, node_max) arrays (n_nodes, 3) no dtype dos vértices
+        """
+        node_min = np.full((self.n_nodes, 3), np.inf, dtype=vertices.dtype)
+        node_max = np.full((self.n_nodes, 3), -np.inf, dtype=vertices.dtype)
+        for start in range(0, len(self.order), BUILD_BATCH):
+            end = min(start + BUILD_BATCH, len(self.order))
+            points = vertices[self.order[start:end]]
+            first = int(np.searchsorted(self.node_start, start, side='right')) - 1
+            last = int(np.searchsorted(self.node_start, end, side='left'))
+            local = np.maximum(self.node_start[first:last], start) - start
+            np.minimum(node_min[first:last], np.minimum.reduceat(points, local, axis=0),
+                       out=node_min[first:last])
+            np.maximum(node_max[first:last], np.maximum.reduceat(points, local, axis=0),
+                       out=node_max[first:last])
+        return node_min, node_max
+    
+    def _find_parents(self):
+        """Índice do nó ancestral mais próximo existente (-1 para a raiz)"""
+        n_nodes = len(self.node_start)
+        parents = np.full(n_nodes, -1, dtype=np.int64)
+        
+        # Nós estão ordenados por (nível, chave): busca binária por nível
+        level_start = np.searchsorted(self.node_level, np.arange(self.max_level + 2))
+        
+        pending = np.flatnonzero(self.node_level > 0)
+        cand_level = self.node_level[pending] - 1
+        cand_key = self.node_key[pending] >> np.uint64(3)
+        while len(pending):
+            found = np.zeros(len(pending), dtype=bool)
+            for level in np.unique(cand_level):
+                sel = np.flatnonzero(cand_level == level)
+                lo, hi = level_start[level], level_start[level + 1]
+                keys = self.node_key[lo:hi]
+                pos = np.searchsorted(keys, cand_key[sel])
+                pos_ok = pos < len(keys)
+                hit = np.zeros(len(sel), dtype=bool)
+                hit[pos_ok] = keys[pos[pos_ok]] == cand_key[sel][pos_ok]
+                parents[pending[sel[hit]]] = lo + pos[hit]
+                found[sel[hit]] = True
+            
+            # Sem nó no nível imediatamente acima: sobe mais um nível
+            keep = ~found
+            pending = pending[keep]
+            cand_level = cand_level[keep] - 1
+            cand_key = cand_key[keep] >> np.uint64(3)
+        return parents
+    
+    @property
+    def n_nodes(self):
+        return len(self.node_start)
+    
+    def node_spacing(self):
+        """Espaçamento entre pontos acumulado até cada nó (m)"""
+        return self.size / (1 << self.sample_bits) / (2.0 ** self.node_level)
+    
+    def rank(self, camera_position, pixels_per_radian, frustum=None):
+        """
+        Ordena os nós por prioridade de refinamento para uma posição de câmera
+        
+        A prioridade de um nó é o espaçamento projetado (em pixels) da amostra
+        que ele refina; nós próximos à câmera têm prioridade alta. A prioridade
+        efetiva é limitada pela do ancestral, de modo que qualquer prefixo da
+        ordem é uma subárvore conexa.
+        
+        Args:
+            camera_position: Posição (x, y, z) da câmera
+            pixels_per_radian: altura_viewport / (2 tan(fov/2))
+            frustum: Planos (6, 4) opcionais; nós fora do frustum ficam de fora
+        
+        Returns:
+            Tupla (nodes, spacing): índices dos nós em ordem de prioridade e o
+            espaçamento projetado efetivo (px) de cada um, decrescente
+        """
+        cam = np.asarray(camera_position, dtype=np.float64)
+        
+        # Distância da câmera à caixa de cada nó (0 se dentro)
+        delta = np.maximum(self.node_min - cam, 0.0) + np.maximum(cam - self.node_max, 0.0)
+        distance = np.maximum(np.sqrt((delta * delta).sum(axis=1)), 1e-3)
+        
+        # Espaçamento do pai = 2× o do nó
+        priority = 2.0 * self.node_spacing() * pixels_per_radian / distance
+        priority[self.node_parent < 0] = np.inf
+        
+        # Limita pela prioridade do ancestral (processa níveis em ordem)
+        effective = priority
+        for sel in self._level_nodes:
+            if len(sel):
+                effective[sel] = np.minimum(effective[sel], effective[self.node_parent[sel]])
+        
+        order = np.lexsort((self.node_level, -effective))
+        if frustum is not None:
+            # A caixa de um nó cobre só os pontos dele: ancestral fora da tela não
+            # deixa buraco nos filhos visíveis
+            order = order[boxes_in_frustum(frustum, self.node_min, self.node_max)[order]]
+        return order, effective[order]
+    
+    def prefix_length(self, nodes, spacing, budget, min_spacing_px=1.0):
+        """
+        Quantos nós do início de rank() cabem no orçamento
+        
+        Args:
+            nodes, spacing: Resultado de rank()
+            budget: Máximo de pontos
+            min_spacing_px: Espaçamento projetado abaixo do qual não refina
+        
+        Returns:
+            Número de nós do prefixo
+        """
+        within = (np.cumsum(self.node_count[nodes]) <= budget) & (spacing >= min_spacing_px)
+        # Soma acumulada cresce e o espaçamento decresce: within é um prefixo
+        return int(np.count_nonzero(within))
+    
+    def node_ranges(self, nodes):
+        """
+        Intervalos do buffer de um conjunto de nós
+        
+        Returns:
+            Tupla (starts, counts) em ordem crescente
+        """
+        chosen = np.sort(nodes)
+        return self.node_start[chosen], self.node_count[chosen]
+    
+    def select(self, camera_position, budget, pixels_per_radian, min_spacing_px=1.0,
+               frustum=None):
+        """
+        Escolhe os nós a desenhar para uma posição de câmera
+        
+        Os nós entram na ordem de rank() até esgotar budget pontos ou o
+        espaçamento já ficar abaixo de min_spacing_px.
+        
+        Args:
+            camera_position: Posição (x, y, z) da câmera
+            budget: Máximo de pontos a desenhar
+            pixels_per_radian: altura_viewport / (2 tan(fov/2))
+            min_spacing_px: Espaçamento projetado abaixo do qual não refina
+            frustum: Planos (6, 4) opcionais; nós fora do frustum não gastam orçamento
+        
+        Returns:
+            Tupla (starts, counts) de intervalos do buffer, em ordem crescente
+        """
+        nodes, spacing = self.rank(camera_position, pixels_per_radian, frustum)
+        return self.node_ranges(nodes[:self.prefix_length(nodes, spacing, budget, min_spacing_px)])
+    
+    
+    def visible_ranges(self, frustum):
+        """
+        Todos os nós dentro do frustum (densidade total, sem orçamento)
+        
+        Args:
+            frustum: Planos (6, 4) de Camera3D.get_frustum_planes()
+        
+        Returns:
+            Tupla (starts, counts) em ordem crescente
+        """
+        visible = boxes_in_frustum(frustum, self.node_min, self.node_max)
+        return self.node_start[visible], self.node_count[visible]
+    
+    def z_ranges(self, z_min, z_max):
+        """
+        Nós com pontos no trecho z_min <= z <= z_max (caixa dos pontos cruza o trecho)
+        
+        Returns:
+            Tupla (starts, counts) em ordem crescente (nível, depois Morton)
+        """
+        inside = (self.node_min[:, 2] <= z_max) & (self.node_max[:, 2] >= z_min)
+        return self.node_start[inside], self.node_count[inside]
+    
+    def ray_nodes(self, origin, direction, tolerance, t_min=0.0, t_max=np.inf):
+        """
+        Nós com pontos possivelmente dentro do cone de um raio (seleção por clique)
+        
+        Desce a árvore nível a nível testando a caixa de cada subárvore: só os
+        filhos de subárvores atingidas no trecho [t_min, t_max) são testados,
+        então o custo acompanha o trecho percorrido e não o tamanho da nuvem.
+        
+        Args:
+            origin: Origem do raio (3,)
+            direction: Direção unitária (3,)
+            tolerance: Semiabertura do cone (radianos)
+            t_min, t_max: Trecho do raio considerado
+        
+        Returns:
+            Tupla (nodes, entry): nós cuja própria caixa é atingida, em ordem
+            de distância de entrada no raio, e essas distâncias
+        """
+        subtree_min, subtree_max, child_order, child_start = self._ray_index()
+        
+        frontier = np.flatnonzero(self.node_parent < 0)
+        found = []
+        while len(frontier):
+            entry, leave = ray_box_interval(origin, direction, subtree_min[frontier],
+                                            subtree_max[frontier], tolerance)
+            frontier = frontier[(entry < t_max) & (leave >= t_min)]
+            found.append(frontier)
+            first = child_start[frontier]
+            frontier = child_order[expand_ranges(first, child_start[frontier + 1] - first)]
+        
+        nodes = np.concatenate(found)
+        entry, leave = ray_box_interval(origin, direction, self.node_min[nodes],
+                                        self.node_max[nodes], tolerance)
+        hit = (entry < t_max) & (leave >= t_min)
+        nodes, entry = nodes[hit], entry[hit]
+        order = np.argsort(entry, kind='stable')
+        return nodes[order], entry[order]
+    
+    def _ray_index(self):
+        """
+        Caixas das subárvores e lista de filhos (calculadas no primeiro clique)
+        
+        Returns:
+            Tupla (subtree_min, subtree_max, child_order, child_start): os
+            filhos do nó i são child_order[child_start[i]:child_start[i + 1]]
+        """
+        if self._ray_cache is not None:
+            return self._ray_cache
+        
+        subtree_min = self.node_min.copy()
+        subtree_max = self.node_max.copy()
+        # Do nível mais fundo para a raiz: o pai (nível menor) já recebeu todos
+        # os descendentes quando chega a vez dele
+        for sel in reversed(self._level_nodes):
+            if len(sel) == 0:
+                continue
+            parents = self.node_parent[sel]
+            by_parent = np.argsort(parents, kind='stable')
+            parents = parents[by_parent]
+            first = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+            owners = parents[first]
+            children = sel[by_parent]
+            subtree_min[owners] = np.minimum(subtree_min[owners],
+                                             np.minimum.reduceat(subtree_min[children], first, axis=0))
+            subtree_max[owners] = np.maximum(subtree_max[owners],
+                                             np.maximum.reduceat(subtree_max[children], first, axis=0))
+        
+        child_order = np.argsort(self.node_parent, kind='stable')
+        child_start = np.searchsorted(self.node_parent[child_order], np.arange(self.n_nodes + 1))
+        self._ray_cache = (subtree_min, subtree_max, child_order, child_start)
+        return self._ray_cache
+
+
+def expand_ranges(starts, counts):
+    """
+    Índices de todos os elementos de um conjunto de intervalos
+    
+    Args:
+        starts, counts: Intervalos [start, start + count)
+    
+    Returns:
+        Array (counts.sum(),) com os índices, na ordem dos intervalos
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.asarray(starts, dtype=np.int64) - (np.cumsum(counts) - counts)
+    return np.arange(int(counts.sum()), dtype=np.int64) + np.repeat(offsets, counts)
+
+
+def merge_ranges(starts, counts):
+    """
+    Junta intervalos adjacentes do buffer (reduz chamadas de desenho)
+    
+    Args:
+        starts, counts: Intervalos ordenados por início
+    
+    Returns:
+        Tupla (starts, counts) com intervalos contíguos fundidos
+    """
+    if len(starts) == 0:
+        return starts, counts
+    ends = starts + counts
+    new_run = np.ones(len(starts), dtype=bool)
+    new_run[1:] = starts[1:] != ends[:-1]
+    run_index = np.cumsum(new_run) - 1
+    merged_starts = starts[new_run]
+    merged_counts = np.bincount(run_index, weights=counts).astype(np.int64)
+    return merged_starts, merged_counts
@@ -0,0 +1,64 @@
+"""
+Seleção de pontos por raio (clique na vista 3D)
+O raio do mouse é testado contra caixas envolventes de um índice espacial
+(nós da octree ou blocos em Z) e só os pontos das caixas atingidas são medidos
+"""
+
+import numpy as np
+
+
+def ray_box_interval(origin, direction, mins, maxs, tolerance):
+    """
+    Trecho do raio (distâncias de entrada e saída) dentro de cada caixa
+    
+    A tolerância é angular (cone em torno do raio): cada caixa é expandida
+    pelo raio do cone na distância do seu canto mais afastado, o que é
+    conservador (nenhum ponto dentro do cone fica de fora).
+    
+    Args:
+        origin: Origem do raio (3,)
+        direction: Direção unitária (3,)
+        mins, maxs: Arrays (M, 3) com os cantos das caixas
+        tolerance: Semiabertura do cone (radianos)
+    
+    Returns:
+        Tupla (t_near, t_far) de arrays (M,); t_near é 0 se a origem está
+        dentro e inf se o raio não atinge a caixa
+    """
+    origin = np.asarray(origin, dtype=np.float64)
+    direction = np.where(np.abs(direction) < 1e-12, 1e-12, direction)
+    
+    center = (mins + maxs) * 0.5
+    reach = np.linalg.norm(center - origin, axis=1) + np.linalg.norm(maxs - center, axis=1)
+    margin = (tolerance * reach)[:, None]
+    
+    t1 = (mins - margin - origin) / direction
+    t2 = (maxs + margin - origin) / direction
+    t_near = np.maximum(np.minimum(t1, t2).max(axis=1), 0.0)
+    t_far = np.maximum(t1, t2).min(axis=1)
+    return np.where(t_far >= t_near, t_near, np.inf), t_far
+
+
+def nearest_on_ray(points, origin, direction, tolerance, t_min=0.0, t_max=np.inf):
+    """
+    Ponto mais próximo da origem dentro do cone do raio
+    
+    Args:
+        points: Array (N, 3)
+        origin: Origem do raio (3,)
+        direction: Direção unitária (3,)
+        tolerance: Semiabertura do cone (radianos)
+        t_min, t_max: Trecho do raio considerado
+    
+    Returns:
+        Tupla (índice em points, distância ao longo do raio) ou None
+    """
+    # float32 como os vértices (resolução de mm a dezenas de km da origem)
+    v = points - np.asarray(origin, dtype=np.float32)
+    t = v @ np.asarray(direction, dtype=np.float32)
+    perp2 = np.einsum('ij,ij->i', v, v) - t * t
+    inside = (t > max(t_min, 0.0)) & (t < t_max) & (perp2 <= (tolerance * t) ** 2)
+    if not inside.any():
+        return None
+    best = int(np.argmin(np.where(inside, t, np.inf)))
+    return best, float(t[best])
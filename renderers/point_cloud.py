@@ -5,8 +5,90 @@ Suporta grandes volumes de dados com VBOs (Vertex Buffer Objects)
 
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import ctypes
+import time
 import numpy as np
 
+from renderers.octree import PointOctree, merge_ranges, expand_ranges
+from renderers.picking import ray_box_interval, nearest_on_ray
+from renderers.culling import ChunkIndex, z_order
+from renderers.frame_budget import AdaptivePointBudget
+from utils.dataset_stats import DatasetStats
+
+
+# Layout do VBO em blocos: XYZ float32 de todos os pontos, depois RGBA uint8
+# normalizado (16 bytes/ponto). Com as cores contíguas, recolorir reenvia só
+# 4 bytes/ponto e as posições nunca saem da GPU
+POSITION_BYTES = 12
+COLOR_BYTES = 4
+POINT_BYTES = POSITION_BYTES + COLOR_BYTES
+PACK_CHUNK = 1 << 20  # Pontos por fatia ao converter cores
+
+
+def pack_colors(colors):
+    """Converte cores float (0-1) para uint8 (0-255)"""
+    return (np.clip(colors, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def pack_rgba(colors):
+    """
+    Monta o bloco de cores do VBO
+    
+    Args:
+        colors: Array (N, 3) de cores float (0-1)
+    
+    Returns:
+        Array (N, 4) uint8 com alfa 255
+    """
+    packed = np.empty((len(colors), 4), dtype=np.uint8)
+    # Em fatias: o temporário float não chega ao tamanho da nuvem inteira
+    for start in range(0, len(colors), PACK_CHUNK):
+        packed[start:start + PACK_CHUNK, :3] = pack_colors(colors[start:start + PACK_CHUNK])
+    packed[:, 3] = 255
+    return packed
+
+
+def clip_ranges(starts, counts, limit):
+    """
+    Corta intervalos do buffer em um limite (ex: prefixo já enviado à GPU)
+    
+    Args:
+        starts, counts: Intervalos do buffer
+        limit: Índice a partir do qual nada é desenhado
+    
+    Returns:
+        Tupla (starts, counts) sem os trechos >= limit (intervalos vazios saem)
+    """
+    ends = np.minimum(starts + counts, limit)
+    keep = ends > starts
+    return starts[keep], (ends - starts)[keep]
+
+
+def enable_z_clip(z_range):
+    """
+    Liga dois planos de recorte que deixam só z_min <= z <= z_max
+    
+    Args:
+        z_range: (z_min, z_max) em coordenadas do objeto (None = nada a fazer;
+            limites infinitos não usam plano)
+    """
+    if z_range is None:
+        return
+    z_min, z_max = z_range
+    if np.isfinite(z_min):
+        glClipPlane(GL_CLIP_PLANE0, (0.0, 0.0, 1.0, -z_min))
+        glEnable(GL_CLIP_PLANE0)
+    if np.isfinite(z_max):
+        glClipPlane(GL_CLIP_PLANE1, (0.0, 0.0, -1.0, z_max))
+        glEnable(GL_CLIP_PLANE1)
+
+
+def disable_z_clip(z_range):
+    """Desfaz enable_z_clip"""
+    if z_range is not None:
+        glDisable(GL_CLIP_PLANE0)
+        glDisable(GL_CLIP_PLANE1)
+
 
 class PointCloudRenderer:
     """
@@ -16,92 +98,619 @@ class PointCloudRenderer:
     
     def __init__(self):
         """Inicializa o renderizador"""
-        self.vertices = None
-        self.colors = None
+        self._positions = None  # (N, 3) float32 (None após liberar); ver _host_load_order
+        self._rgba = None  # (N, 4) uint8, na mesma ordem das posições
         self.n_vertices = 0
         self.point_size = 3.0
         self.visible = True
         
-        # VBO handles
-        self.vbo_vertices = None
-        self.vbo_colors = None
+        # VBO (bloco de posições + bloco de cores) e VAO com os ponteiros já configurados
+        self.vbo = None
+        self.vao = None
         self.use_vbo = True
+        self.keep_host_copy = True  # False: libera as posições na RAM após o envio
+        self.verbose = True  # False: sem mensagens ao configurar (ex: tiles carregados em fundo)
         
         # LOD (Level of Detail) - renderiza apenas uma fração dos pontos quando há muitos
         self.enable_lod = False
         self.lod_threshold = 1000000  # Acima de 1M pontos, usa LOD
         self.max_points_render = 2000000  # Máximo de pontos a renderizar por frame
         
-        # Cache de centro (evita recalcular média a cada frame)
-        self._cached_center = None
+        # Octree de LOD: nós escolhidos por espaçamento projetado na tela
+        self.octree = None
+        self.lod_min_spacing_px = 1.0  # Não refina abaixo deste espaçamento projetado
+        self._lod_selection = None
+        self._lod_selection_key = None
+        self._last_rendered_points = 0
+        
+        # Frustum culling: desenha só nós da octree / blocos em Z visíveis
+        self.enable_culling = True
+        self.chunks = None
+        self.chunk_points = 32768  # Pontos por bloco em Z (ChunkIndex)
+        self._buffer_order = None  # Permutação aplicada ao buffer (None = original)
+        # Nuvens em VBO guardam posições e cores na RAM na ordem original e só
+        # o VBO é permutado (bloco a bloco no envio); em vertex arrays a RAM é
+        # o próprio buffer desenhado e fica na ordem do buffer
+        self._host_load_order = False
+        
+        # Filtros de visibilidade sem recarregar: dentro de cada unidade do
+        # índice (nó da octree, bloco em Z ou o buffer todo na ordem
+        # progressiva) os pontos ficam agrupados por classe, e o filtro vira
+        # só uma escolha de intervalos para glMultiDrawArrays
+        self.class_filter = None  # Classes visíveis (None = todas)
+        self.z_range = None  # (z_min, z_max) visível (None = tudo); ver set_z_range
+        self._unit_start = None  # Início de cada unidade no buffer
+        self._class_offsets = None  # (U, C + 1): classe c da unidade u em [off[u, c], off[u, c + 1])
+        self._sections = None  # (z (S,), offsets (S+1,)) das seções na ordem original; ver set_data
+        self._buffer_classes = None  # Classe de cada ponto na ordem do buffer (uint8)
+        
+        # Ordem progressiva (ex: UPLLoader.draw_order): LOD = prefixo do buffer
+        self.progressive = False
+        
+        # Orçamento adaptativo: ajusta max_points_render pelo tempo de frame
+        self.adaptive_budget = None
+        
+        # Envio incremental à GPU: o VBO é alocado inteiro e preenchido em blocos
+        # a cada frame; o que já foi enviado é desenhado de imediato
+        self.upload_chunk_points = 262144  # 4 MB por glBufferSubData
+        self.upload_time_budget = 0.004  # Segundos de envio por frame
+        self._uploaded = 0  # Prefixo do buffer já enviado
+        self._capacity = 0  # Pontos que cabem no VBO alocado
+        self._indexed_points = 0  # Pontos de set_data (append_data fica depois deles)
+        self._buffer_inverse = None  # Posição no buffer de cada ponto (inverso de _buffer_order)
+        self._gpu_released = False  # VBO a alocar no próximo render (release_gpu, defer_vbo)
+        
+        # Atualização parcial de cores: trechos separados por menos que isto
+        # vão em um único glBufferSubData
+        self.color_update_gap = 4096
+        
+        # Estatísticas da nuvem (limites, centro): calculadas uma vez por carga
+        self.stats = None
+        
+        # Seleção por clique: primeiro trecho do raio percorrido (m); cresce ×4
+        # até achar um ponto
+        self.pick_first_depth = 50.0
+        
+        # Refinamento progressivo com a câmera parada: depois do frame de LOD,
+        # lotes com o restante dos pontos visíveis são desenhados sobre a imagem
+        # acumulada (ver AccumulationBuffer), um por frame
+        self.refine_enabled = False
+        self.refine_batch_points = 1000000  # Ajustado pelo tempo de frame
+        self.refine_min_batch = 50000
+        self.refine_frame_time = None  # Tempo por frame do lote (None = 1 / target_fps)
+        self._refine_starts = None  # Intervalos restantes em ordem de prioridade
+        self._refine_counts = None
+        self._refine_cursor = 0
+        self._refine_drawn = 0  # Pontos desenhados no frame acumulado
+        self._refine_waiting = False  # Frame de LOD desenhado, falta start_refinement()
+        self._refine_batch_done = False  # Lote desenhado no último frame
+        
+        # Muda sempre que a imagem da nuvem muda sem a câmera mexer (dados,
+        # cores, LOD): invalida o frame acumulado
+        self.scene_version = 0
     
-    def set_data(self, vertices, colors):
+    def set_data(self, vertices, colors, draw_order=None, stats=None, classes=None, sections=None,
+                 defer_vbo=False):
         """
         Define os dados a serem renderizados
         
         Args:
             vertices: np.array shape (N, 3) com coordenadas X, Y, Z
-            colors: np.array shape (N, 3) com cores R, G, B (0-1)
+            colors: np.array shape (N, 3) com cores R, G, B (0-1), ou (N, 4)
+                uint8 já no formato do VBO (ver pack_rgba)
+            draw_order: Permutação progressiva opcional (qualquer prefixo é uma
+                amostra uniforme); substitui octree e blocos de culling
+            stats: DatasetStats já calculado (ex: UPLLoader.stats, do cache);
+                None = calcula aqui
+            classes: Classe de cada ponto (ex: UPLLoader.classifications);
+                agrupa o buffer por classe para set_class_filter()
+            sections: Tupla (z, offsets) com o Z crescente de cada seção e o
+                início dela nos vértices (ex: UPLLoader.section_table());
+                set_z_range() vira um único intervalo enquanto o buffer
+                fica na ordem original
+            defer_vbo: Não aloca o VBO aqui; o primeiro render() aloca (permite
+                chamar set_data numa thread sem contexto OpenGL)
+        
+        Vértices float32 contíguos (inclusive np.memmap) são usados sem cópia;
+        as cores ficam só como RGBA uint8. Com VBO a reordenação do buffer é
+        aplicada só no envio, bloco a bloco; em vertex arrays (até 100k
+        pontos) a RAM guarda uma cópia reordenada.
         """
         if vertices.shape[1] != 3:
             raise ValueError("Vertices devem ter shape (N, 3)")
-        if colors.shape[1] != 3:
+        packed = colors.dtype == np.uint8 and colors.shape[1] == 4
+        if colors.shape[1] != 3 and not packed:
             raise ValueError("Colors devem ter shape (N, 3)")
         if len(vertices) != len(colors):
             raise ValueError("Vertices e colors devem ter mesmo comprimento")
         
         # Limpa VBOs antigos se existirem
         self._cleanup_vbo()
+        self.octree = None
+        self.chunks = None
+        self._buffer_order = None
+        self._buffer_inverse = None
+        self._host_load_order = False
+        self._unit_start = None
+        self._class_offsets = None
+        self._sections = None
+        self._buffer_classes = None
+        self._lod_selection_key = None
+        self._refine_starts = None
+        self.scene_version += 1
+        self.progressive = draw_order is not None
         
-        # Flatten para formato OpenGL
-        self.vertices = vertices.flatten().astype(np.float32)
-        self.colors = colors.flatten().astype(np.float32)
-        self.n_vertices = len(vertices)
+        # Sem cópia se já for float32 contíguo
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        rgba = colors if packed else pack_rgba(colors)
+        if stats is None or stats.count != len(vertices):
+            stats = DatasetStats.compute(vertices)
+        self.stats = stats
+        
+        if self.progressive:
+            # Ordem já calculada (e guardada em cache) pelo loader
+            self._buffer_order = draw_order
+        elif self.use_vbo and len(vertices) > self.lod_threshold:
+            # Nuvens grandes: octree de LOD (reordena o buffer com os nós contíguos)
+            self.octree = PointOctree(vertices)
+            self._buffer_order = self.octree.order
+            if self.verbose:
+                print(f"🌳 Octree de LOD: {self.octree.n_nodes:,} nós, {self.octree.max_level + 1} níveis")
+        elif self.use_vbo and len(vertices) > 100000:
+            # Demais nuvens em VBO: blocos ordenados por Z para frustum culling
+            self._buffer_order = z_order(vertices)
+        
+        if classes is not None and len(classes) == len(vertices):
+            self._group_by_class(np.asarray(classes, dtype=np.uint8), len(vertices))
+        if sections is not None and len(sections[1]) > 0 and sections[1][-1] == len(vertices):
+            self._sections = (np.asarray(sections[0]), np.asarray(sections[1], dtype=np.int64))
         
-        # Calcula e cacheia o centro AGORA (uma vez só)
-        verts = vertices  # vertices original em (N, 3)
-        self._cached_center = tuple(verts.mean(axis=0))
+        vbo_path = self.use_vbo and len(vertices) > 100000
+        if self._buffer_order is not None and not vbo_path:
+            vertices = vertices[self._buffer_order]
+            rgba = rgba[self._buffer_order]
+        self._host_load_order = vbo_path and self._buffer_order is not None
+        if self.octree is None and not self.progressive and vbo_path:
+            self.chunks = ChunkIndex(vertices, self.chunk_points, order=self._buffer_order)
+        
+        self._positions = vertices
+        self._rgba = rgba
+        self.n_vertices = len(vertices)
+        self._indexed_points = self.n_vertices
+        if self.adaptive_budget is not None:
+            self.adaptive_budget.set_max_points(self.n_vertices)
         
         # Cria VBOs para dados grandes (>100k pontos)
         if self.use_vbo and self.n_vertices > 100000:
-            self._create_vbo()
-            
-            # Info sobre LOD
-            if self.enable_lod and self.n_vertices > self.lod_threshold:
-                stride = max(1, self.n_vertices // self.max_points_render)
-                points_rendered = self.n_vertices // stride
-                print(f"✅ Renderer configurado: {self.n_vertices:,} pontos (usando VBO)")
-                print(f"⚡ LOD ativo: renderizando {points_rendered:,} pontos (~{100*points_rendered/self.n_vertices:.1f}%) para melhor desempenho")
+            if defer_vbo:
+                self._gpu_released = True
             else:
-                print(f"✅ Renderer configurado: {self.n_vertices:,} pontos (usando VBO)")
-        else:
+                self._create_vbo()
+            
+            if self.verbose:
+                n_chunks = -(-self.n_vertices // self.upload_chunk_points)
+                print(f"✅ Renderer configurado: {self.n_vertices:,} pontos "
+                      f"(usando VBO, envio em {n_chunks} blocos)")
+                
+                # Info sobre LOD
+                if self.enable_lod and self.n_vertices > self.lod_threshold:
+                    print(f"⚡ LOD ativo: até {self.max_points_render:,} pontos/frame, "
+                          f"densidade total perto da câmera")
+        elif self.verbose:
             print(f"✅ Renderer configurado: {self.n_vertices:,} pontos (usando vertex arrays)")
     
-    def _create_vbo(self):
-        """Cria Vertex Buffer Objects para os dados"""
-        # Gera buffers
-        self.vbo_vertices = glGenBuffers(1)
-        self.vbo_colors = glGenBuffers(1)
+    def _group_by_class(self, classes, n):
+        """
+        Agrupa os pontos por classe dentro de cada unidade do índice
+        
+        Compõe a permutação em _buffer_order (aplicada uma vez só): nós
+        da octree e blocos em Z continuam com os mesmos pontos (caixas e
+        prefixos por nível não mudam), e a ordem progressiva passa a ser uma
+        por classe, cada uma ainda uniforme em qualquer prefixo.
+        
+        Args:
+            classes: Classe de cada ponto na ordem original (uint8)
+            n: Número de pontos
+        """
+        if self.octree is not None:
+            unit_start = self.octree.node_start
+        elif self.progressive or not self.use_vbo or n <= 100000:
+            unit_start = np.zeros(1, dtype=np.int64)
+        else:
+            unit_start = np.arange(0, n, self.chunk_points, dtype=np.int64)
+        
+        order = self._buffer_order if self._buffer_order is not None else np.arange(n)
+        buffer_classes = classes[order]
+        n_classes = int(buffer_classes.max()) + 1 if n > 0 else 1
+        units = np.repeat(np.arange(len(unit_start), dtype=np.int64),
+                          np.diff(np.append(unit_start, n)))
+        key = units * n_classes + buffer_classes
+        del units
+        
+        # Estável: a ordem de nível/progressiva se mantém dentro de cada classe
+        grouped = np.argsort(key, kind='stable')
+        sizes = np.bincount(key, minlength=len(unit_start) * n_classes)
+        sizes = sizes.reshape(len(unit_start), n_classes)
+        del key
+        
+        self._buffer_order = order[grouped]
+        self._buffer_classes = buffer_classes[grouped]
+        self._unit_start = unit_start
+        self._class_offsets = unit_start[:, None] + np.concatenate(
+            [np.zeros((len(unit_start), 1), dtype=np.int64), np.cumsum(sizes, axis=1)], axis=1)
+    
+    @property
+    def vertices(self):
+        """
+        Coordenadas achatadas (N*3,) float32 na ordem original dos pontos
+        
+        Sem cópia para nuvens em VBO enquanto as posições estão na RAM; em
+        vertex arrays com buffer reordenado desfaz a permutação (cópia).
+        Depois de liberadas (keep_host_copy=False) são lidas de volta do VBO
+        a cada acesso.
+        """
+        if self.n_vertices == 0 or (self._positions is None and self.vbo is None):
+            return None
+        positions = self._host_positions()
+        if self._host_permuted():
+            positions = positions[self._buffer_positions(np.arange(len(positions)))]
+        return positions.reshape(-1)
+    
+    @property
+    def colors(self):
+        """Cores achatadas (N*3,) float 0-1 na ordem original (calculadas a cada acesso)"""
+        if self._rgba is None:
+            return None
+        rgba = self._rgba
+        if self._host_permuted():
+            rgba = rgba[self._buffer_positions(np.arange(len(rgba)))]
+        return (rgba[:, :3] / np.float32(255.0)).reshape(-1)
+    
+    def _host_permuted(self):
+        """True se os arrays na RAM estão na ordem do buffer (vertex arrays reordenados)"""
+        return self._buffer_order is not None and not self._host_load_order
+    
+    def _host_positions(self):
+        """Posições (N, 3) na ordem dos arrays da RAM (lidas do VBO se liberadas)"""
+        if self._positions is not None:
+            return self._positions
+        positions = self._read_back(0, self._uploaded * POSITION_BYTES).view(np.float32).reshape(-1, 3)
+        if self._host_load_order:
+            # VBO na ordem do buffer; a RAM guarda a ordem original
+            positions = positions[self._buffer_positions(np.arange(len(positions)))]
+        return positions
+    
+    def _host_rows(self, array, start, end):
+        """Linhas [start, end) do buffer tiradas de um array da RAM (posições ou cores)"""
+        head_end = min(end, self._indexed_points)
+        if not self._host_load_order or start >= head_end:
+            return array[start:end]
+        # Permutação cobre só os pontos de set_data; append_data vem depois
+        rows = array[self._buffer_order[start:head_end]]
+        if end > head_end:
+            rows = np.concatenate([rows, array[head_end:end]])
+        return rows
+    
+    def _read_back(self, offset, nbytes):
+        """Lê bytes do VBO para a RAM"""
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        data = glGetBufferSubData(GL_ARRAY_BUFFER, offset, nbytes)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        return np.asarray(data, dtype=np.uint8).reshape(-1)
+    
+    def release_host_copy(self):
+        """
+        Libera as posições na RAM se já estão todas no VBO
+        
+        Returns:
+            True se liberou
+        """
+        if self.vbo is None or self._uploaded < self.n_vertices:
+            return False
+        self._positions = None
+        return True
+    
+    def memory_usage(self):
+        """
+        Memória ocupada pela nuvem
+        
+        Na RAM contam as posições (exceto np.memmap, que fica no cache de
+        páginas do arquivo), as cores e os índices do buffer; na GPU, o VBO
+        alocado.
+        
+        Returns:
+            Dict com gpu e host (bytes)
+        """
+        host = 0
+        if self._positions is not None and not isinstance(self._positions, np.memmap):
+            host += self._positions.nbytes
+        for array in (self._rgba, self._buffer_order, self._buffer_inverse, self._buffer_classes):
+            if array is not None:
+                host += array.nbytes
+        gpu = self._capacity * POINT_BYTES if self.vbo is not None else 0
+        return {'gpu': gpu, 'host': host}
+    
+    def release_gpu(self):
+        """
+        Libera o VBO mantendo os dados na RAM (ex: camada escondida)
+        
+        O próximo render() visível aloca o VBO de novo e o reenvia em blocos.
+        Sem a cópia na RAM (release_host_copy) o VBO é a única cópia e fica.
+        
+        Returns:
+            True se liberou
+        """
+        if self.vbo is None or self._positions is None or self._rgba is None:
+            return False
+        self._cleanup_vbo()
+        self._refine_starts = None
+        self._gpu_released = True
+        self.scene_version += 1
+        return True
+    
+    def set_colors(self, colors):
+        """
+        Troca apenas as cores (mesmos vértices), sem reconstruir octree/blocos
+        
+        Args:
+            colors: np.array shape (N, 3) na ordem original dos vértices
+        """
+        if len(colors) != self.n_vertices:
+            raise ValueError("Colors devem ter o mesmo comprimento dos vértices")
+        if self._host_permuted():
+            # Permutação cobre só os pontos de set_data; append_data vem depois
+            colors = np.concatenate([colors[:self._indexed_points][self._buffer_order],
+                                     colors[self._indexed_points:]])
+        self._rgba = pack_rgba(colors)
+        self.scene_version += 1
+        
+        # Reenvia só o bloco de cores do que já estava na GPU; o restante
+        # sai com as cores novas em upload_pending()
+        if self.vbo is not None and self._uploaded > 0:
+            self._upload_colors(0, self._uploaded)
+    
+    def update_colors(self, indices, colors):
+        """
+        Troca as cores de alguns pontos (ex: destaque de seleção)
+        
+        Só os trechos do buffer que contêm pontos alterados são reenviados, e
+        só o bloco de cores (4 bytes/ponto); posições ficam na GPU.
+        
+        Args:
+            indices: Índices dos pontos na ordem original (array ou slice)
+            colors: np.array shape (M, 3) com as novas cores (0-1)
+        """
+        if isinstance(indices, slice):
+            indices = np.arange(self.n_vertices)[indices]
+        indices = np.asarray(indices, dtype=np.int64)
+        positions = self._buffer_positions(indices)
+        if len(positions) == 0:
+            return
+        if not self._rgba.flags.writeable:
+            self._rgba = self._rgba.copy()  # Ex: cores de um np.memmap somente leitura
+        self._rgba[positions if self._host_permuted() else indices] = \
+            pack_rgba(np.asarray(colors).reshape(-1, 3))
+        self.scene_version += 1
+        
+        if self.vbo is None:
+            return
+        positions = np.unique(positions[positions < self._uploaded])
+        if len(positions) == 0:
+            return
+        
+        # Agrupa em trechos; o intervalo mínimo cresce com a extensão para
+        # limitar o número de chamadas em seleções espalhadas
+        gap = max(self.color_update_gap, (positions[-1] - positions[0]) // 256)
+        breaks = np.flatnonzero(np.diff(positions) > gap)
+        run_starts = positions[np.r_[0, breaks + 1]]
+        run_ends = positions[np.r_[breaks, len(positions) - 1]] + 1
+        for start, end in zip(run_starts, run_ends):
+            self._upload_colors(int(start), int(end))
+    
+    def _buffer_positions(self, indices):
+        """Posição no buffer de índices na ordem original (desfaz _buffer_order)"""
+        if self._buffer_order is None:
+            return indices
+        if self._buffer_inverse is None:
+            n = len(self._buffer_order)
+            index_dtype = np.int32 if n < 2 ** 31 else np.int64
+            self._buffer_inverse = np.empty(n, dtype=index_dtype)
+            self._buffer_inverse[self._buffer_order] = np.arange(n, dtype=index_dtype)
         
-        # Buffer de vértices
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_vertices)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        # Pontos de append_data não foram permutados
+        positions = indices.copy()
+        head = indices < self._indexed_points
+        positions[head] = self._buffer_inverse[indices[head]]
+        return positions
+    
+    def _create_vbo(self):
+        """
+        Aloca o VBO (16 bytes/ponto, posições e cores em blocos) e o VAO
         
-        # Buffer de cores
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_colors)
-        glBufferData(GL_ARRAY_BUFFER, self.colors.nbytes, self.colors, GL_STATIC_DRAW)
+        O conteúdo não é enviado aqui: upload_pending() preenche o buffer em
+        blocos ao longo dos frames, sem travar a aplicação em nuvens grandes.
+        """
+        self.vbo = self._allocate_vbo(self.n_vertices)
+        self._capacity = self.n_vertices
+        self._uploaded = 0
         
-        # Desliga binding
+        # VAO grava buffer, ponteiros e arrays habilitados uma única vez
+        # (contextos sem VAO configuram os ponteiros a cada frame)
+        try:
+            self.vao = glGenVertexArrays(1)
+            glBindVertexArray(self.vao)
+            self._set_array_pointers()
+            glBindVertexArray(0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+        except Exception:
+            self.vao = None
+    
+    @staticmethod
+    def _allocate_vbo(capacity):
+        """Cria um VBO com espaço para capacity pontos (sem dados)"""
+        vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glBufferData(GL_ARRAY_BUFFER, capacity * POINT_BYTES, None, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        return vbo
+    
+    def _color_offset(self):
+        """Início do bloco de cores no VBO (bytes)"""
+        return self._capacity * POSITION_BYTES
+    
+    def _upload_range(self, start, end):
+        """Envia posições e cores dos pontos [start, end) do buffer ao VBO"""
+        positions = self._host_rows(self._positions, start, end)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, start * POSITION_BYTES, positions.nbytes, positions)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self._upload_colors(start, end)
+    
+    def _upload_colors(self, start, end):
+        """Envia só as cores dos pontos [start, end) do buffer ao VBO"""
+        packed = self._host_rows(self._rgba, start, end)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, self._color_offset() + start * COLOR_BYTES,
+                        packed.nbytes, packed)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
     
+    def upload_pending(self, time_budget=None):
+        """
+        Envia à GPU mais blocos do buffer, até esgotar o tempo do frame
+        
+        Chamado por render() a cada frame; envia pelo menos um bloco por chamada.
+        Com octree o buffer é ordenado por nível, então a nuvem aparece grossa
+        e vai refinando; com blocos em Z aparece trecho a trecho ao longo da via.
+        
+        Args:
+            time_budget: Segundos disponíveis (None = upload_time_budget)
+        
+        Returns:
+            True se ainda restam pontos a enviar
+        """
+        if self.vbo is None:
+            return False
+        if time_budget is None:
+            time_budget = self.upload_time_budget
+        
+        deadline = time.perf_counter() + time_budget
+        while self._uploaded < self.n_vertices:
+            end = min(self.n_vertices, self._uploaded + self.upload_chunk_points)
+            self._upload_range(self._uploaded, end)
+            self._uploaded = end
+            self.scene_version += 1  # Pontos novos desenháveis
+            if time.perf_counter() >= deadline:
+                break
+        
+        if self._uploaded >= self.n_vertices:
+            if not self.keep_host_copy and self.release_host_copy():
+                print(f"🧹 Posições liberadas da RAM ({self.n_vertices:,} pontos no VBO)")
+            return False
+        return True
+    
+    def append_data(self, vertices, colors):
+        """
+        Acrescenta pontos ao fim da nuvem (carregamento em streaming)
+        
+        Os pontos novos entram no buffer depois dos de set_data, sem reconstruir
+        octree/blocos: são sempre desenhados inteiros (sem LOD nem culling) e
+        enviados à GPU pelos mesmos blocos de upload_pending().
+        
+        Args:
+            vertices: np.array shape (M, 3)
+            colors: np.array shape (M, 3) com cores R, G, B (0-1)
+        """
+        if self.n_vertices == 0:
+            self.set_data(vertices, colors)
+            return
+        if len(vertices) != len(colors):
+            raise ValueError("Vertices e colors devem ter mesmo comprimento")
+        if len(vertices) == 0:
+            return
+        
+        n_old = self.n_vertices
+        # Posições liberadas voltam do VBO (streaming deve manter keep_host_copy)
+        self._positions = np.concatenate([self._host_positions(),
+                                          np.asarray(vertices, dtype=np.float32)])
+        self._rgba = np.concatenate([self._rgba, pack_rgba(colors)])
+        self.n_vertices = n_old + len(vertices)
+        self.stats = None  # Recalculadas no próximo acesso
+        self.scene_version += 1
+        if self.adaptive_budget is not None:
+            self.adaptive_budget.set_max_points(self.n_vertices)
+        
+        if self.vbo is not None:
+            if self.n_vertices > self._capacity:
+                self._grow_vbo(max(self.n_vertices, 2 * self._capacity))
+        elif self.use_vbo and self.n_vertices > 100000:
+            self._create_vbo()
+    
+    def _grow_vbo(self, capacity):
+        """Realoca o VBO maior, copiando na GPU o que já foi enviado"""
+        old_vbo = self.vbo
+        old_color_offset = self._color_offset()
+        self.vbo = self._allocate_vbo(capacity)
+        self._capacity = capacity
+        
+        try:
+            # Blocos de posições e de cores mudam de lugar com a capacidade
+            glBindBuffer(GL_COPY_READ_BUFFER, old_vbo)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, self.vbo)
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0,
+                                self._uploaded * POSITION_BYTES)
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER,
+                                old_color_offset, self._color_offset(),
+                                self._uploaded * COLOR_BYTES)
+            glBindBuffer(GL_COPY_READ_BUFFER, 0)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        except Exception:
+            # Sem cópia entre buffers (OpenGL < 3.1): reenvia aos poucos
+            self._uploaded = 0
+        glDeleteBuffers(1, [old_vbo])
+        
+        # O VAO guardou o buffer antigo nos ponteiros
+        if self.vao is not None:
+            glBindVertexArray(self.vao)
+            self._set_array_pointers()
+            glBindVertexArray(0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+    
+    def _set_array_pointers(self, stride=1):
+        """Aponta vertex/color arrays para os blocos do VBO (stride em pontos)"""
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, stride * POSITION_BYTES, ctypes.c_void_p(0))
+        glColorPointer(4, GL_UNSIGNED_BYTE, stride * COLOR_BYTES,
+                       ctypes.c_void_p(self._color_offset()))
+    
+    def _bind_arrays(self, stride=1):
+        """Ativa os arrays do VBO (VAO quando disponível)"""
+        if self.vao is not None and stride == 1:
+            glBindVertexArray(self.vao)
+        else:
+            self._set_array_pointers(stride)
+    
+    def _unbind_arrays(self, stride=1):
+        """Desfaz _bind_arrays"""
+        if self.vao is not None and stride == 1:
+            glBindVertexArray(0)
+        else:
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            glDisableClientState(GL_VERTEX_ARRAY)
+            glDisableClientState(GL_COLOR_ARRAY)
+    
     def _cleanup_vbo(self):
-        """Libera VBOs antigos"""
-        if self.vbo_vertices is not None:
-            glDeleteBuffers(1, [self.vbo_vertices])
-            self.vbo_vertices = None
-        if self.vbo_colors is not None:
-            glDeleteBuffers(1, [self.vbo_colors])
-            self.vbo_colors = None
+        """Libera VBO e VAO antigos"""
+        self._gpu_released = False
+        if self.vao is not None:
+            glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+        self._uploaded = 0
+        self._capacity = 0
     
     def set_point_size(self, size):
         """
@@ -111,6 +720,7 @@ class PointCloudRenderer:
             size: Tamanho em pixels (1.0 - 10.0)
         """
         self.point_size = max(1.0, min(10.0, size))
+        self.scene_version += 1
         glPointSize(self.point_size)
     
     def get_point_size(self):
@@ -125,6 +735,7 @@ class PointCloudRenderer:
             enabled: True para ativar LOD, False para desativar
         """
         self.enable_lod = enabled
+        self.scene_version += 1
         if enabled:
             print(f"⚡ LOD ativado (max {self.max_points_render:,} pontos/frame)")
         else:
@@ -140,6 +751,359 @@ class PointCloudRenderer:
         self.max_points_render = max(100000, int(max_points))
         print(f"⚡ LOD: máximo de {self.max_points_render:,} pontos por frame")
     
+    def set_class_filter(self, classes):
+        """
+        Mostra só algumas classes (ex: {2} = só invasões)
+        
+        Sem custo por ponto: troca apenas os intervalos desenhados. Precisa das
+        classes em set_data; pontos de append_data são sempre desenhados.
+        
+        Args:
+            classes: Iterável de ids de classe visíveis (None = todas)
+        """
+        self.class_filter = None if classes is None else frozenset(int(c) for c in classes)
+        self._lod_selection_key = None
+        self.scene_version += 1
+    
+    def load_order_arrays(self):
+        """
+        Posições e cores RGBA dos pontos de set_data na ordem original (cópias)
+        
+        Returns:
+            Tupla (positions (N, 3) float32, rgba (N, 4) uint8)
+        """
+        positions = self._host_positions()[:self._indexed_points]
+        rgba = self._rgba[:self._indexed_points]
+        if not self._host_permuted():
+            return np.array(positions), rgba.copy()
+        inverse = self._buffer_positions(np.arange(self._indexed_points))
+        return positions[inverse], rgba[inverse]
+    
+    def has_classes(self):
+        """True se set_data recebeu classes (set_class_filter disponível)"""
+        return self._class_offsets is not None
+    
+    def set_z_range(self, z_min=None, z_max=None):
+        """
+        Mostra só o trecho z_min <= z <= z_max (km ou seções, ver UPLLoader.km_to_z)
+        
+        Com o buffer na ordem original e a tabela de seções de set_data, o
+        trecho é um único intervalo (busca binária nos offsets das seções);
+        em blocos ordenados por Z, um intervalo de blocos (ChunkIndex.z_span);
+        com octree, os intervalos dos nós cuja caixa cruza o trecho
+        (PointOctree.z_ranges). A ordem progressiva permuta a nuvem inteira,
+        então o trecho fica espalhado pelo buffer: aí só os planos do trecho
+        descartam pontos. O corte exato é sempre feito na GPU por dois planos
+        de recorte.
+        
+        Args:
+            z_min, z_max: Limites em Z do buffer (None nos dois = sem filtro)
+        """
+        if z_min is None and z_max is None:
+            self.z_range = None
+        else:
+            z_min = -np.inf if z_min is None else float(z_min)
+            z_max = np.inf if z_max is None else float(z_max)
+            self.z_range = (min(z_min, z_max), max(z_min, z_max))
+        self._lod_selection_key = None
+        self.scene_version += 1
+    
+    def _section_span(self):
+        """
+        Intervalos do buffer que contêm o trecho em Z
+        
+        Buffer na ordem das seções ou em blocos por Z: um único intervalo.
+        Octree: os nós do trecho, em ordem de nível (qualquer prefixo ainda é
+        uma amostra uniforme do trecho).
+        
+        Returns:
+            Tupla (starts, counts) ordenada, ou None sem trecho ou sem índice
+            que localize o trecho (sem tabela de seções, ordem progressiva)
+        """
+        if self.z_range is None:
+            return None
+        z_min, z_max = self.z_range
+        if self.octree is not None:
+            return merge_ranges(*self.octree.z_ranges(z_min, z_max))
+        if self.chunks is not None:
+            first, last = self.chunks.z_span(z_min, z_max)
+            start = int(self.chunks.starts[first]) if first < last else 0
+            end = start + int(self.chunks.counts[first:last].sum())
+        elif self._sections is not None and self._buffer_order is None:
+            section_z, offsets = self._sections
+            first = int(np.searchsorted(section_z, z_min, side='left'))
+            last = int(np.searchsorted(section_z, z_max, side='right'))
+            start, end = int(offsets[first]), int(offsets[max(first, last)])
+        else:
+            return None
+        return np.array([start], dtype=np.int64), np.array([end - start], dtype=np.int64)
+    
+    def _filter_ranges(self, starts, counts):
+        """
+        Restringe intervalos do índice às classes visíveis
+        
+        Args:
+            starts, counts: Intervalos ordenados e disjuntos dentro dos pontos
+                de set_data
+        
+        Returns:
+            Tupla (starts, counts) só com os trechos das classes de class_filter
+        """
+        if self.class_filter is None or self._class_offsets is None or len(starts) == 0:
+            return starts, counts
+        return merge_ranges(*self._class_pieces(starts, counts))
+    
+    def _class_pieces(self, starts, counts):
+        """
+        Trechos das classes visíveis de cada intervalo, na ordem dos intervalos
+        
+        Returns:
+            Tupla (starts, counts) sem juntar trechos vizinhos
+        """
+        if self.class_filter is None or self._class_offsets is None or len(starts) == 0:
+            return starts, counts
+        visible = [c for c in sorted(self.class_filter) if c < self._class_offsets.shape[1] - 1]
+        if not visible:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = starts + np.asarray(counts, dtype=np.int64)
+        first = np.searchsorted(self._unit_start, starts, side='right') - 1
+        last = np.searchsorted(self._unit_start, ends, side='left')
+        units = expand_ranges(first, last - first)
+        lo = np.repeat(starts, last - first)[:, None]
+        hi = np.repeat(ends, last - first)[:, None]
+        
+        # Linha a linha: unidades na ordem dos intervalos, classes crescentes
+        offsets = self._class_offsets[units]
+        visible = np.array(visible)
+        piece_starts = np.maximum(offsets[:, visible], lo).ravel()
+        piece_ends = np.minimum(offsets[:, visible + 1], hi).ravel()
+        keep = piece_ends > piece_starts
+        return piece_starts[keep], (piece_ends - piece_starts)[keep]
+    
+    def _prefix_ranges(self, budget):
+        """
+        Amostra uniforme de budget pontos na ordem progressiva
+        
+        Com o buffer agrupado por classe, cada classe contribui com um
+        prefixo proporcional ao seu tamanho.
+        
+        Returns:
+            Tupla (starts, counts)
+        """
+        if self._class_offsets is None:
+            return np.array([0], dtype=np.int64), np.array([budget], dtype=np.int64)
+        first, last = self._class_offsets[0, :-1], self._class_offsets[0, 1:]
+        sizes = last - first
+        counts = -(-sizes * budget // max(self._indexed_points, 1))
+        return first, np.minimum(counts, sizes)
+    
+    def _culling_planes(self, camera):
+        """Planos do frustum (se culling ativo) mais os dois do trecho em Z"""
+        planes = camera.get_frustum_planes() if self.enable_culling and camera is not None else None
+        if self.z_range is None:
+            return planes
+        z_min, z_max = self.z_range
+        cut = np.array([[0.0, 0.0, 1.0, -z_min], [0.0, 0.0, -1.0, z_max]])
+        cut = cut[np.isfinite(cut[:, 3])]
+        return cut if planes is None else np.vstack([planes, cut])
+    
+    def _enable_z_clip(self):
+        """Liga os planos de recorte do trecho em Z (coordenadas do objeto)"""
+        enable_z_clip(self.z_range)
+    
+    def _disable_z_clip(self):
+        """Desfaz _enable_z_clip"""
+        disable_z_clip(self.z_range)
+    
+    def set_adaptive_budget(self, enabled, target_fps=60.0):
+        """
+        Ativa/desativa o orçamento de pontos adaptativo (substitui max_points_render fixo)
+        
+        Args:
+            enabled: True para ajustar o orçamento pelo tempo de frame
+            target_fps: FPS alvo durante a interação
+        """
+        if enabled:
+            self.adaptive_budget = AdaptivePointBudget(
+                target_fps=target_fps,
+                max_points=max(self.n_vertices, self.max_points_render),
+                full_density_when_still=not self.refine_enabled
+            )
+            print(f"⚡ Orçamento adaptativo de pontos (alvo {target_fps:.0f} FPS)")
+        else:
+            self.adaptive_budget = None
+    
+    def update_frame_budget(self, frame_time, camera_moving, now):
+        """
+        Informa a duração do último frame ao orçamento adaptativo
+        
+        Args:
+            frame_time: Duração do último frame (s)
+            camera_moving: Se a câmera mudou desde o frame anterior
+            now: Tempo atual (s)
+        """
+        if self._refine_batch_done and not camera_moving:
+            self._update_refine_batch(frame_time)
+        self._refine_batch_done = False
+        
+        if self.adaptive_budget is None or not self.enable_lod:
+            return
+        self.max_points_render = self.adaptive_budget.update(frame_time, camera_moving, now)
+    
+    def set_progressive_refinement(self, enabled):
+        """
+        Ativa/desativa o refinamento progressivo com a câmera parada
+        
+        Quem chama precisa acumular os frames (sem limpar a tela entre eles) e
+        chamar start_refinement()/render_refinement_batch(); com o refinamento
+        ativo o orçamento adaptativo não salta para a densidade total ao parar.
+        
+        Args:
+            enabled: True para completar a imagem em lotes ao longo dos frames
+        """
+        self.refine_enabled = enabled
+        self._refine_starts = None
+        self._refine_waiting = False
+        if self.adaptive_budget is not None:
+            self.adaptive_budget.full_density_when_still = not enabled
+    
+    def start_refinement(self, camera=None):
+        """
+        Prepara os lotes de refinamento para a imagem já desenhada por render()
+        
+        Os lotes seguem a ordem de prioridade da octree a partir de onde a
+        seleção de LOD parou (ou continuam o prefixo da ordem progressiva),
+        até todos os pontos visíveis. Chame depois de render(camera) com a
+        mesma câmera e o mesmo orçamento.
+        
+        Args:
+            camera: Camera3D usada no render (None = prefixo sem culling)
+        """
+        self._refine_starts = None
+        self._refine_waiting = False
+        self._refine_cursor = 0
+        self._refine_drawn = self._last_rendered_points
+        if (not self.refine_enabled or not self.enable_lod or self.vbo is None
+                or self._uploaded < self.n_vertices):
+            return
+        
+        if self.octree is not None and camera is not None:
+            viewport_height = glGetIntegerv(GL_VIEWPORT)[3]
+            pixels_per_radian = camera.pixels_per_radian(viewport_height)
+            planes = self._culling_planes(camera)
+            nodes, spacing = self.octree.rank(camera.get_position(), pixels_per_radian, planes)
+            base = self.octree.prefix_length(nodes, spacing, self.max_points_render,
+                                             self.lod_min_spacing_px)
+            rest = nodes[base:]
+            starts, counts = self.octree.node_start[rest], self.octree.node_count[rest]
+            # Trechos das classes visíveis, mantendo a ordem de prioridade dos nós
+            starts, counts = self._class_pieces(starts, counts)
+        elif self.progressive:
+            # Desenhado um prefixo (por classe): o restante é o fim de cada classe
+            budget = min(self._indexed_points, self.max_points_render)
+            first, drawn = self._prefix_ranges(budget)
+            end = first + drawn
+            stop = self._class_offsets[0, 1:] if self._class_offsets is not None else [self._indexed_points]
+            starts, counts = self._filter_ranges(end, np.asarray(stop) - end)
+        elif self.octree is not None:
+            # Desenhado um prefixo do buffer: o restante é um intervalo só
+            base = min(self._indexed_points, self.max_points_render)
+            starts, counts = self._filter_ranges(np.array([base], dtype=np.int64),
+                                                 np.array([self._indexed_points - base], dtype=np.int64))
+        else:
+            return  # Blocos em Z já desenham densidade total
+        
+        keep = counts > 0
+        if keep.any():
+            self._refine_starts = np.asarray(starts[keep], dtype=np.int64)
+            self._refine_counts = np.asarray(counts[keep], dtype=np.int64)
+    
+    def refinement_pending(self):
+        """True enquanto restam lotes de refinamento a desenhar"""
+        return self._refine_starts is not None and self._refine_cursor < len(self._refine_starts)
+    
+    def _next_refine_batch(self):
+        """
+        Retira da fila os próximos intervalos, até refine_batch_points pontos
+        
+        Returns:
+            Tupla (starts, counts) em ordem crescente, prontos para glMultiDrawArrays
+        """
+        cursor = self._refine_cursor
+        starts = self._refine_starts[cursor:]
+        counts = self._refine_counts[cursor:]
+        take = int(np.searchsorted(np.cumsum(counts), self.refine_batch_points, side='right'))
+        
+        if take == 0:
+            # Intervalo maior que o lote: desenha o começo e deixa o resto na fila
+            part = self.refine_batch_points
+            batch = starts[:1].copy(), np.array([part], dtype=np.int64)
+            self._refine_starts[cursor] += part
+            self._refine_counts[cursor] -= part
+            return batch
+        
+        self._refine_cursor = cursor + take
+        order = np.argsort(starts[:take], kind='stable')
+        return merge_ranges(starts[:take][order], counts[:take][order])
+    
+    def render_refinement_batch(self):
+        """
+        Desenha o próximo lote de refinamento sobre o frame acumulado
+        
+        Returns:
+            Número de pontos desenhados
+        """
+        if not self.visible or not self.refinement_pending():
+            return 0
+        
+        starts, counts = self._next_refine_batch()
+        glPointSize(self.point_size)
+        self._enable_z_clip()
+        self._render_vbo_ranges(starts, counts)
+        self._disable_z_clip()
+        
+        drawn = int(counts.sum())
+        self._refine_drawn += drawn
+        self._refine_batch_done = True
+        return drawn
+    
+    def _update_refine_batch(self, frame_time):
+        """Ajusta o tamanho do lote para o frame caber em refine_frame_time"""
+        target = self.refine_frame_time
+        if target is None:
+            fps = self.adaptive_budget.target_fps if self.adaptive_budget is not None else 60.0
+            target = 1.0 / fps
+        
+        # Mesma faixa de histerese do orçamento adaptativo (com VSync o frame
+        # nunca mede menos que o intervalo de tela)
+        batch = self.refine_batch_points
+        if frame_time > target * 1.15:
+            batch *= max(0.5, target / frame_time)
+        elif frame_time < target * 0.85:
+            batch *= 1.25
+        self.refine_batch_points = int(max(self.refine_min_batch, min(batch, max(self.n_vertices, 1))))
+    
+    def needs_redraw(self):
+        """
+        Se a imagem ainda muda sem entrada do usuário (para o loop não dormir)
+        
+        Returns:
+            True com envio à GPU pendente, refinamento em andamento ou
+            orçamento adaptativo ainda não assentado
+        """
+        if self.vbo is not None and self._uploaded < self.n_vertices:
+            return True
+        if self._gpu_released and self.visible:
+            return True  # VBO a alocar e enviar
+        if self._refine_waiting or self.refinement_pending():
+            return True
+        budget = self.adaptive_budget
+        return (budget is not None and self.enable_lod and self.n_vertices > 0
+                and budget.state != 'parado')
+    
     def get_render_stats(self):
         """
         Retorna estatísticas de renderização
@@ -150,7 +1114,13 @@ class PointCloudRenderer:
         stride = 1
         points_rendered = self.n_vertices
         
-        if self.enable_lod and self.n_vertices > self.lod_threshold:
+        if self._refine_starts is not None:
+            points_rendered = self._refine_drawn
+        elif self.vbo is not None and (self.octree is not None or self.chunks is not None):
+            points_rendered = self._last_rendered_points
+        elif self.progressive or (self.class_filter is not None and self._class_offsets is not None):
+            points_rendered = self._last_rendered_points
+        elif self.enable_lod and self.n_vertices > self.lod_threshold:
             stride = max(1, self.n_vertices // self.max_points_render)
             points_rendered = self.n_vertices // stride
         
@@ -159,17 +1129,80 @@ class PointCloudRenderer:
             'rendered_points': points_rendered,
             'stride': stride,
             'percentage': 100.0 * points_rendered / max(1, self.n_vertices),
-            'lod_active': self.enable_lod and self.n_vertices > self.lod_threshold
+            'lod_active': self.enable_lod and (self.progressive or self.n_vertices > self.lod_threshold),
+            'adaptive': self.adaptive_budget.get_stats() if self.adaptive_budget is not None else None,
+            'uploaded_points': self._uploaded if self.vbo is not None else self.n_vertices,
+            'refining': self.refinement_pending(),
+            'filtered': self.class_filter is not None or self.z_range is not None
         }
     
-    def render(self):
-        """Renderiza a nuvem de pontos"""
-        if not self.visible or self.vertices is None:
+    def render(self, camera=None):
+        """
+        Renderiza a nuvem de pontos
+        
+        Args:
+            camera: Camera3D para LOD por distância e frustum culling
+                (None = sem culling; com LOD desenha um prefixo uniforme)
+        """
+        if not self.visible or self.n_vertices == 0:
             return
         
+        # VBO liberado enquanto escondida: realoca e reenvia em blocos
+        if self._gpu_released:
+            self._gpu_released = False
+            self._create_vbo()
+        
+        # Imagem redesenhada do zero: lotes de refinamento anteriores não valem
+        self._refine_starts = None
+        self._refine_waiting = self.refine_enabled and self.enable_lod and self.vbo is not None
+        
+        # Envia mais um pedaço do buffer (só o que já está na GPU é desenhado)
+        self.upload_pending()
+        
         # Configura tamanho dos pontos
         glPointSize(self.point_size)
         
+        self._enable_z_clip()
+        self._render_points(camera)
+        self._disable_z_clip()
+    
+    def _render_points(self, camera):
+        """Escolhe os pontos do frame (LOD, culling, filtros) e desenha"""
+        # Buffer indexado (octree ou blocos em Z): desenha só intervalos necessários
+        if self.vbo is not None and (self.octree is not None or self.chunks is not None):
+            starts, counts = self._drawable_ranges(*self._select_ranges(camera))
+            self._last_rendered_points = int(counts.sum())
+            self._render_vbo_ranges(starts, counts)
+            return
+        
+        if self.progressive or (self.class_filter is not None and self._class_offsets is not None):
+            # Ordem progressiva: o prefixo do buffer (de cada classe) já é uma
+            # amostra uniforme; sem LOD, o buffer inteiro. Pontos de
+            # append_data vão inteiros
+            budget = self._indexed_points
+            if self.progressive and self.enable_lod:
+                budget = min(budget, self.max_points_render)
+            ranges = self._filter_ranges(*self._prefix_ranges(budget))
+            starts, counts = self._drawable_ranges(*ranges)
+            self._last_rendered_points = int(counts.sum())
+            if self.vbo is not None:
+                self._render_vbo_ranges(starts, counts)
+            else:
+                self._render_vertex_array_ranges(starts, counts)
+            return
+        
+        # Trecho em Z com o buffer na ordem das seções (um único intervalo)
+        # ou com octree em vertex arrays (intervalos dos nós do trecho)
+        span = self._section_span()
+        if span is not None and (not self.enable_lod or span[1].sum() <= self.lod_threshold):
+            starts, counts = self._drawable_ranges(*span)
+            self._last_rendered_points = int(counts.sum())
+            if self.vbo is not None:
+                self._render_vbo_ranges(starts, counts)
+            else:
+                self._render_vertex_array_ranges(starts, counts)
+            return
+        
         # Calcula quantos pontos renderizar (LOD)
         points_to_render = self.n_vertices
         stride = 1  # Passo entre pontos (1 = todos, 2 = metade, etc)
@@ -180,11 +1213,68 @@ class PointCloudRenderer:
             points_to_render = self.n_vertices // stride
         
         # Renderiza usando VBO ou vertex arrays
-        if self.vbo_vertices is not None:
+        if self.vbo is not None:
             self._render_vbo(points_to_render, stride)
         else:
             self._render_vertex_array(points_to_render, stride)
     
+    def _select_ranges(self, camera):
+        """Intervalos do buffer a desenhar (reaproveitados enquanto a câmera não se move)"""
+        lod = self.enable_lod and self.octree is not None
+        
+        if camera is None:
+            # Com octree o buffer é ordenado por nível: qualquer prefixo (do
+            # buffer ou dos nós do trecho em Z) é uma amostra uniforme
+            span = self._section_span()
+            starts, counts = span if span is not None else (np.array([0]), np.array([self._indexed_points]))
+            if lod:
+                before = np.cumsum(counts) - counts
+                counts = np.clip(self.max_points_render - before, 0, counts)
+                starts, counts = starts[counts > 0], counts[counts > 0]
+            return self._filter_ranges(starts, counts)
+        
+        viewport_height = glGetIntegerv(GL_VIEWPORT)[3]
+        position = camera.get_position()
+        target = (camera.target_x, camera.target_y, camera.target_z)
+        key = (position, target, camera.aspect, viewport_height, lod, self.enable_culling,
+               self.max_points_render, self.lod_min_spacing_px, self.class_filter, self.z_range)
+        if key == self._lod_selection_key:
+            return self._lod_selection
+        
+        planes = self._culling_planes(camera)
+        if lod:
+            pixels_per_radian = camera.pixels_per_radian(viewport_height)
+            starts, counts = self.octree.select(position, self.max_points_render,
+                                                pixels_per_radian, self.lod_min_spacing_px,
+                                                frustum=planes)
+        elif planes is None:
+            starts, counts = np.array([0]), np.array([self._indexed_points])
+        elif self.octree is not None:
+            starts, counts = self.octree.visible_ranges(planes)
+        else:
+            starts, counts = self.chunks.visible_ranges(planes, self.z_range)
+        
+        self._lod_selection = self._filter_ranges(*merge_ranges(starts, counts))
+        self._lod_selection_key = key
+        return self._lod_selection
+    
+    def _drawable_ranges(self, starts, counts):
+        """Acrescenta os pontos de append_data e corta no prefixo já enviado à GPU"""
+        if self.n_vertices > self._indexed_points:
+            starts = np.append(starts, self._indexed_points)
+            counts = np.append(counts, self.n_vertices - self._indexed_points)
+        limit = self._uploaded if self.vbo is not None else self.n_vertices
+        return clip_ranges(np.asarray(starts), np.asarray(counts), limit)
+    
+    def _render_vbo_ranges(self, starts, counts):
+        """Renderiza intervalos [start, start + count) do VBO com uma chamada"""
+        if len(starts) == 0:
+            return
+        
+        self._bind_arrays()
+        glMultiDrawArrays(GL_POINTS, starts.astype(np.int32), counts.astype(np.int32), len(starts))
+        self._unbind_arrays()
+    
     def _render_vbo(self, points_to_render=None, stride=1):
         """Renderiza usando VBOs (mais eficiente para muitos pontos)
         
@@ -194,25 +1284,15 @@ class PointCloudRenderer:
         """
         if points_to_render is None:
             points_to_render = self.n_vertices
-            
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glEnableClientState(GL_COLOR_ARRAY)
-        
-        # Bind vertex buffer
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_vertices)
-        glVertexPointer(3, GL_FLOAT, stride * 3 * 4, None)  # stride em bytes
         
-        # Bind color buffer
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_colors)
-        glColorPointer(3, GL_FLOAT, stride * 3 * 4, None)  # stride em bytes
+        # Só pontos já enviados (com passo s, o elemento i é o ponto i * s)
+        points_to_render = min(points_to_render, -(-self._uploaded // stride))
+        if points_to_render <= 0:
+            return
         
-        # Desenha
+        self._bind_arrays(stride)
         glDrawArrays(GL_POINTS, 0, points_to_render)
-        
-        # Cleanup
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_COLOR_ARRAY)
+        self._unbind_arrays(stride)
     
     def _render_vertex_array(self, points_to_render=None, stride=1):
         """Renderiza usando vertex arrays (para poucos pontos)
@@ -228,8 +1308,8 @@ class PointCloudRenderer:
         glEnableClientState(GL_COLOR_ARRAY)
         
         # Define ponteiros para os dados com stride
-        glVertexPointer(3, GL_FLOAT, stride * 3 * 4, self.vertices)
-        glColorPointer(3, GL_FLOAT, stride * 3 * 4, self.colors)
+        glVertexPointer(3, GL_FLOAT, stride * POSITION_BYTES, self._positions)
+        glColorPointer(4, GL_UNSIGNED_BYTE, stride * COLOR_BYTES, self._rgba)
         
         # Renderiza
         glDrawArrays(GL_POINTS, 0, points_to_render)
@@ -238,6 +1318,137 @@ class PointCloudRenderer:
         glDisableClientState(GL_VERTEX_ARRAY)
         glDisableClientState(GL_COLOR_ARRAY)
     
+    def _render_vertex_array_ranges(self, starts, counts):
+        """Renderiza intervalos dos arrays na RAM com uma chamada"""
+        if len(starts) == 0:
+            return
+        
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, self._positions)
+        glColorPointer(4, GL_UNSIGNED_BYTE, 0, self._rgba)
+        glMultiDrawArrays(GL_POINTS, starts.astype(np.int32), counts.astype(np.int32), len(starts))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisableClientState(GL_COLOR_ARRAY)
+    
+    def pick(self, origin, direction, tolerance, batch_points=16384):
+        """
+        Ponto mais próximo da câmera dentro do cone de um raio
+        
+        Usa o índice espacial do buffer: nós da octree (descida pelas caixas
+        das subárvores) ou blocos em Z; sem índice mede todos os pontos. O raio
+        é percorrido em trechos crescentes (pick_first_depth, ×4, ...) e, em
+        cada trecho, as caixas atingidas são medidas em lotes da mais próxima
+        para a mais distante; o primeiro ponto achado encerra a busca, então o
+        custo acompanha a distância até o ponto e não o tamanho da nuvem.
+        Pontos escondidos por set_class_filter/set_z_range são ignorados.
+        
+        Args:
+            origin: Origem do raio (ex: Camera3D.screen_ray)
+            direction: Direção unitária
+            tolerance: Semiabertura do cone (radianos; pixels / pixels_per_radian)
+            batch_points: Pontos medidos por lote
+        
+        Returns:
+            Dict com index (ordem original de set_data), position e distance,
+            ou None se nenhum ponto cair no cone
+        """
+        if self.n_vertices == 0:
+            return None
+        origin = np.asarray(origin, dtype=np.float64)
+        direction = np.asarray(direction, dtype=np.float64)
+        
+        # Além do canto mais distante da nuvem não há o que achar
+        stats = self.get_stats()
+        corners = np.array(np.meshgrid(*zip(stats.mins, stats.maxs))).reshape(3, -1).T
+        reach = float(np.linalg.norm(corners - origin, axis=1).max())
+        
+        t_min, t_max = 0.0, self.pick_first_depth
+        while True:
+            found = self._pick_between(origin, direction, tolerance, t_min, t_max, batch_points)
+            if found is not None or t_max >= reach:
+                break
+            t_min, t_max = t_max, t_max * 4.0
+        if found is None:
+            return None
+        
+        best, distance = found
+        position = self._positions_at([best], [1])[0]
+        index = best
+        if self._buffer_order is not None and best < self._indexed_points:
+            index = int(self._buffer_order[best])
+        return {'index': index, 'position': tuple(float(v) for v in position), 'distance': distance}
+    
+    def _pick_between(self, origin, direction, tolerance, t_min, t_max, batch_points):
+        """
+        Busca de pick() restrita ao trecho [t_min, t_max) do raio
+        
+        Returns:
+            Tupla (índice no buffer, distância) ou None
+        """
+        if self.octree is not None:
+            nodes, entry = self.octree.ray_nodes(origin, direction, tolerance, t_min, t_max)
+            starts, counts = self.octree.node_start[nodes], self.octree.node_count[nodes]
+        elif self.chunks is not None:
+            entry, leave = ray_box_interval(origin, direction, self.chunks.mins,
+                                            self.chunks.maxs, tolerance)
+            hit = np.flatnonzero((entry < t_max) & (leave >= t_min))
+            hit = hit[np.argsort(entry[hit], kind='stable')]
+            starts, counts, entry = self.chunks.starts[hit], self.chunks.counts[hit], entry[hit]
+        else:
+            span = self._section_span()
+            if span is None:
+                span = np.array([0], dtype=np.int64), np.array([self._indexed_points], dtype=np.int64)
+            starts, counts = span
+            entry = np.zeros(len(starts))
+        
+        if self.n_vertices > self._indexed_points:
+            # Pontos de append_data não estão no índice: sempre medidos
+            starts = np.r_[self._indexed_points, starts]
+            counts = np.r_[self.n_vertices - self._indexed_points, counts]
+            entry = np.r_[0.0, entry]
+        if len(starts) == 0:
+            return None
+        
+        best = None
+        best_t = t_max
+        group = (np.cumsum(counts) - counts) // batch_points
+        bounds = np.flatnonzero(np.r_[True, group[1:] != group[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if entry[lo] > best_t:
+                break  # Caixas restantes começam atrás do ponto já achado
+            indices = expand_ranges(starts[lo:hi], counts[lo:hi])
+            points = self._positions_at(starts[lo:hi], counts[lo:hi])
+            shown = self._shown_mask(indices, points)
+            if shown is not None:
+                indices, points = indices[shown], points[shown]
+            found = nearest_on_ray(points, origin, direction, tolerance, t_min, best_t)
+            if found is not None:
+                best, best_t = int(indices[found[0]]), found[1]
+        
+        return None if best is None else (best, best_t)
+    
+    def _shown_mask(self, indices, points):
+        """Máscara dos pontos visíveis com os filtros atuais (None = todos)"""
+        shown = None
+        if self.z_range is not None:
+            shown = (points[:, 2] >= self.z_range[0]) & (points[:, 2] <= self.z_range[1])
+        if self.class_filter is not None and self._buffer_classes is not None:
+            head = indices < self._indexed_points
+            classes = self._buffer_classes[np.where(head, indices, 0)]
+            in_class = ~head | np.isin(classes, list(self.class_filter))
+            shown = in_class if shown is None else shown & in_class
+        return shown
+    
+    def _positions_at(self, starts, counts):
+        """Posições (M, 3) de intervalos do buffer (lê do VBO se a cópia na RAM foi liberada)"""
+        if self._positions is not None:
+            return np.concatenate([self._host_rows(self._positions, start, start + count)
+                                   for start, count in zip(starts, counts)])
+        parts = [self._read_back(int(start) * POSITION_BYTES, int(count) * POSITION_BYTES)
+                 for start, count in zip(starts, counts)]
+        return np.concatenate(parts).view(np.float32).reshape(-1, 3)
+    
     def get_bounds(self):
         """
         Retorna os limites (bounding box) dos dados
@@ -245,16 +1456,10 @@ class PointCloudRenderer:
         Returns:
             Tupla ((min_x, min_y, min_z), (max_x, max_y, max_z))
         """
-        if self.vertices is None:
+        if self.n_vertices == 0:
             return ((0, 0, 0), (0, 0, 0))
         
-        # Reshape para (N, 3)
-        verts = self.vertices.reshape(-1, 3)
-        
-        mins = verts.min(axis=0)
-        maxs = verts.max(axis=0)
-        
-        return (tuple(mins), tuple(maxs))
+        return self.get_stats().bounds()
     
     def get_center(self):
         """
@@ -263,18 +1468,43 @@ class PointCloudRenderer:
         Returns:
             Tupla (x, y, z) do centro
         """
-        if self._cached_center is None:
+        if self.n_vertices == 0:
             return (0, 0, 0)
         
-        return self._cached_center
+        return tuple(self.get_stats().center)
+    
+    def get_stats(self):
+        """
+        Estatísticas da nuvem (DatasetStats), recalculadas só se os dados mudaram
+        
+        Returns:
+            DatasetStats ou None sem dados
+        """
+        if self.stats is None and self.n_vertices > 0:
+            self.stats = DatasetStats.compute(self._host_positions())
+        return self.stats
     
     def clear(self):
         """Remove todos os dados"""
         self._cleanup_vbo()
-        self.vertices = None
-        self.colors = None
+        self._positions = None
+        self._rgba = None
         self.n_vertices = 0
-        self._cached_center = None
+        self.stats = None
+        self.octree = None
+        self.chunks = None
+        self._buffer_order = None
+        self._buffer_inverse = None
+        self._host_load_order = False
+        self._unit_start = None
+        self._class_offsets = None
+        self._sections = None
+        self._buffer_classes = None
+        self._lod_selection_key = None
+        self._refine_starts = None
+        self.scene_version += 1
+        self.progressive = False
+        self._indexed_points = 0
     
     def __del__(self):
         """Destrutor - limpa VBOs"""
@@ -0,0 +1,456 @@
+"""
+Nuvem em tiles de km carregados sob demanda
+Os tiles em torno do alvo da câmera são lidos e preparados (ordem por classe,
+cores) em threads de fundo; o frame só adota os que já ficaram prontos e
+nunca espera o disco. Tiles longe do alvo saem da memória do mais antigo
+para o mais recente (LRU) quando o orçamento de RAM é excedido
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from renderers.culling import boxes_in_frustum
+from renderers.point_cloud import PointCloudRenderer
+from utils.tunnel_templates import CLASS_NAMES
+
+
+# Bytes por ponto de um tile residente (posições, RGBA, ordem e classes)
+TILE_POINT_BYTES = 32
+
+
+class StreamedTile:
+    """Tile residente: renderer com os pontos e classes na ordem do tile"""
+    
+    __slots__ = ('renderer', 'classes')
+    
+    def __init__(self, renderer, classes=None):
+        self.renderer = renderer
+        self.classes = classes
+
+
+class KmTileManager:
+    """
+    Tiles residentes em torno de um Z, lidos em threads de fundo
+    
+    update(z) pede os tiles a até radius_m de z (do mais próximo ao mais
+    distante) e cancela os pedidos ainda na fila que deixaram de interessar;
+    collect() adota os prontos sem bloquear e libera os menos usados fora do
+    raio enquanto a memória passa de max_bytes. Chame os dois na thread de
+    desenho: load roda nas threads de fundo, release na de desenho.
+    
+    Atributos:
+        store: KmTileStore com os tiles
+        resident: OrderedDict tile -> objeto carregado (do menos ao mais usado)
+        version: Muda quando um tile entra ou sai
+    """
+    
+    def __init__(self, store, load, release=None, size_of=None,
+                 radius_m=1000.0, max_bytes=None, workers=2):
+        """
+        Args:
+            store: KmTileStore
+            load: Função(tile) -> objeto residente (roda numa thread de fundo)
+            release: Função(objeto) chamada ao tirar um tile da memória
+            size_of: Função(objeto) -> bytes (None = estimativa por ponto)
+            radius_m: Distância (m) ao longo da via mantida em memória
+            max_bytes: Orçamento de RAM dos tiles (None = sem limite)
+            workers: Threads de leitura
+        """
+        self.store = store
+        self.load = load
+        self.release = release
+        self.size_of = size_of
+        self.radius_m = float(radius_m)
+        self.max_bytes = max_bytes
+        self.max_in_flight = 2 * workers
+        self.resident = OrderedDict()
+        self.version = 0
+        self.loaded_count = 0
+        self.evicted_count = 0
+        self.wanted = np.zeros(0, dtype=np.int64)
+        self._sizes = {}
+        self._pending = OrderedDict()  # tile -> Future
+        self._failed = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='km-tiles')
+    
+    @property
+    def resident_bytes(self):
+        """Memória ocupada pelos tiles residentes (bytes)"""
+        return sum(self._sizes.values())
+    
+    @property
+    def pending(self):
+        """True se há tiles sendo lidos"""
+        return bool(self._pending)
+    
+    @property
+    def n_pending(self):
+        """Tiles sendo lidos"""
+        return len(self._pending)
+    
+    def _estimate(self, tile):
+        return int(self.store.count[tile]) * TILE_POINT_BYTES
+    
+    def update(self, z):
+        """
+        Pede os tiles em torno de z (não bloqueia)
+        
+        Args:
+            z: Z dos vértices (ex: alvo da câmera no referencial da camada)
+        """
+        self.wanted = self.store.tiles_near(z, self.radius_m)
+        wanted = set(self.wanted.tolist())
+        
+        # Mais próximos por último: são os mais recentes no LRU
+        for tile in self.wanted[::-1].tolist():
+            if tile in self.resident:
+                self.resident.move_to_end(tile)
+        
+        for tile in list(self._pending):
+            if tile not in wanted and self._pending[tile].cancel():
+                del self._pending[tile]
+        
+        for tile in self.wanted.tolist():
+            if len(self._pending) >= self.max_in_flight:
+                break
+            if tile in self.resident or tile in self._pending or tile in self._failed:
+                continue
+            if not self._make_room(self._estimate(tile), wanted):
+                break
+            self._pending[tile] = self._executor.submit(self.load, tile)
+    
+    def _make_room(self, size, wanted):
+        """Libera tiles fora do raio (o menos usado primeiro) até caber size bytes"""
+        if self.max_bytes is None:
+            return True
+        in_flight = sum(self._estimate(tile) for tile in self._pending)
+        used = self.resident_bytes + in_flight
+        for tile in list(self.resident):
+            if used + size <= self.max_bytes:
+                break
+            if tile not in wanted:
+                used -= self._sizes[tile]
+                self._evict(tile)
+        return used + size <= self.max_bytes
+    
+    def _evict(self, tile):
+        obj = self.resident.pop(tile)
+        self._sizes.pop(tile, None)
+        if self.release is not None:
+            self.release(obj)
+        self.evicted_count += 1
+        self.version += 1
+    
+    def collect(self):
+        """
+        Adota os tiles já lidos (não bloqueia)
+        
+        Returns:
+            Lista dos tiles adotados
+        """
+        adopted = []
+        for tile, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[tile]
+            if future.cancelled():
+                continue
+            try:
+                obj = future.result()
+            except Exception as e:
+                self._failed.add(tile)  # Não tenta de novo a cada frame
+                print(f"⚠️  Erro ao ler tile {int(self.store.index[tile])}: {e}")
+                continue
+            self.resident[tile] = obj
+            self._sizes[tile] = self.size_of(obj) if self.size_of else self._estimate(tile)
+            self.loaded_count += 1
+            self.version += 1
+            adopted.append(tile)
+        
+        if adopted and self.max_bytes is not None:
+            wanted = set(self.wanted.tolist())
+            for tile in list(self.resident):
+                if self.resident_bytes <= self.max_bytes:
+                    break
+                if tile not in wanted:
+                    self._evict(tile)
+        return adopted
+    
+    def shutdown(self):
+        """Cancela as leituras pendentes e libera todos os tiles"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
+        for tile in list(self.resident):
+            self._evict(tile)
+
+
+class TiledPointCloud:
+    """
+    Nuvem de um KmTileStore com a interface de PointCloudRenderer usada pela cena
+    
+    Cada tile residente é um PointCloudRenderer próprio (montado na thread de
+    leitura, VBO alocado no primeiro desenho); o orçamento de pontos por
+    frame é repartido entre os tiles visíveis pelo tamanho e pela distância
+    ao alvo. Índices de pick são os do array original (início do tile + índice
+    no tile), como os de UPLLoader.point_info.
+    """
+    
+    def __init__(self, store, stats=None, radius_m=1000.0, max_bytes=None, workers=2):
+        """
+        Args:
+            store: KmTileStore
+            stats: DatasetStats da nuvem inteira (None = caixas dos tiles)
+            radius_m, max_bytes, workers: Ver KmTileManager
+        """
+        self.store = store
+        self.stats = stats
+        self.manager = KmTileManager(store, self._load_tile, release=self._release_tile,
+                                     size_of=lambda tile: tile.renderer.memory_usage()['host'],
+                                     radius_m=radius_m, max_bytes=max_bytes, workers=workers)
+        self.n_vertices = store.n_points
+        self.visible = True
+        self.point_size = 3.0
+        self.enable_lod = False
+        self.max_points_render = 2000000
+        self.keep_host_copy = True
+        self.class_filter = None
+        self.z_range = None
+        self.refine_enabled = False
+        self._target_z = float(self.get_center()[2])
+        self._drawn = []  # Tiles desenhados no último frame
+        self._version = 0
+    
+    # ---- Tiles ----
+    
+    def _load_tile(self, tile):
+        """Lê e prepara um tile (thread de fundo, sem OpenGL)"""
+        arrays = self.store.read(tile)
+        renderer = PointCloudRenderer()
+        renderer.verbose = False
+        renderer.set_data(arrays['positions'], arrays['rgba'], draw_order=arrays.get('order'),
+                          classes=arrays.get('classes'), defer_vbo=True)
+        return StreamedTile(renderer, arrays.get('classes'))
+    
+    @staticmethod
+    def _release_tile(tile):
+        tile.renderer.clear()
+    
+    def _configure(self, renderer):
+        """Aplica ao tile recém-adotado as opções atuais da nuvem"""
+        renderer.point_size = self.point_size
+        renderer.enable_lod = self.enable_lod
+        renderer.keep_host_copy = self.keep_host_copy
+        renderer.set_progressive_refinement(self.refine_enabled)
+        renderer.set_class_filter(self.class_filter)
+        if self.z_range is not None:
+            renderer.set_z_range(*self.z_range)
+    
+    def _renderers(self):
+        return [tile.renderer for tile in self.manager.resident.values()]
+    
+    def _visible_tiles(self, camera):
+        """Tiles residentes no trecho do filtro de km e no frustum"""
+        tiles = np.fromiter(self.manager.resident.keys(), dtype=np.int64)
+        if len(tiles) and self.z_range is not None:
+            z_min, z_max = self.z_range
+            tiles = tiles[(self.store.maxs[tiles, 2] >= z_min) & (self.store.mins[tiles, 2] <= z_max)]
+        if len(tiles) and camera is not None and hasattr(camera, 'get_frustum_planes'):
+            planes = np.asarray(camera.get_frustum_planes(), dtype=np.float64)
+            tiles = tiles[boxes_in_frustum(planes, self.store.mins[tiles], self.store.maxs[tiles])]
+        return tiles
+    
+    def _share_budget(self, tiles):
+        """Reparte max_points_render pelo tamanho dos tiles, pesando os perto do alvo"""
+        if not len(tiles):
+            return
+        z0 = np.array([self.store.z_range(tile)[0] for tile in tiles])
+        distance = np.maximum(np.maximum(z0 - self._target_z, self._target_z - z0 - self.store.tile_m), 0.0)
+        count = self.store.count[tiles]
+        weight = count / (1.0 + distance / self.store.tile_m)
+        share = self.max_points_render * weight / weight.sum()
+        for tile, n, points in zip(tiles.tolist(), count, share):
+            self.manager.resident[tile].renderer.max_points_render = int(max(1, min(n, points)))
+    
+    # ---- Desenho ----
+    
+    def render(self, camera=None):
+        """
+        Pede os tiles em torno do alvo, adota os prontos e desenha os visíveis
+        
+        Args:
+            camera: Camera3D (no referencial da camada) para o alvo e o culling
+        """
+        if not self.visible or self.n_vertices == 0:
+            self._drawn = []
+            return
+        if camera is not None:
+            self._target_z = float(camera.target_z)
+        self.manager.update(self._target_z)
+        for tile in self.manager.collect():
+            self._configure(self.manager.resident[tile].renderer)
+        
+        tiles = self._visible_tiles(camera)
+        self._share_budget(tiles)
+        self._drawn = [self.manager.resident[tile].renderer for tile in tiles.tolist()]
+        for renderer in self._drawn:
+            renderer.render(camera)
+    
+    @property
+    def scene_version(self):
+        """Muda quando tiles entram/saem ou a imagem de algum tile muda"""
+        return (self._version, self.manager.version,
+                sum(renderer.scene_version for renderer in self._renderers()))
+    
+    def needs_redraw(self):
+        """True enquanto há tiles sendo lidos ou algum tile desenhado ainda muda"""
+        if not self.visible:
+            return False
+        return self.manager.pending or any(renderer.needs_redraw() for renderer in self._drawn)
+    
+    def update_frame_budget(self, frame_time, camera_moving, now):
+        """Repassa a duração do frame aos tiles desenhados (lotes de refinamento)"""
+        for renderer in self._drawn:
+            renderer.update_frame_budget(frame_time, camera_moving, now)
+    
+    def set_progressive_refinement(self, enabled):
+        """Refinamento progressivo em todos os tiles"""
+        self.refine_enabled = enabled
+        for renderer in self._renderers():
+            renderer.set_progressive_refinement(enabled)
+    
+    def start_refinement(self, camera=None):
+        for renderer in self._drawn:
+            renderer.start_refinement(camera)
+    
+    def refinement_pending(self):
+        return any(renderer.refinement_pending() for renderer in self._drawn)
+    
+    def render_refinement_batch(self):
+        """Próximo lote de refinamento de cada tile desenhado (pontos desenhados)"""
+        return sum(renderer.render_refinement_batch() for renderer in self._drawn
+                   if renderer.refinement_pending())
+    
+    # ---- Opções ----
+    
+    def set_point_size(self, size):
+        self.point_size = max(1.0, min(10.0, size))
+        for renderer in self._renderers():
+            renderer.set_point_size(self.point_size)
+        self._version += 1
+    
+    def get_point_size(self):
+        """Retorna tamanho atual dos pontos"""
+        return self.point_size
+    
+    def set_lod_enabled(self, enabled):
+        self.enable_lod = enabled
+        for renderer in self._renderers():
+            renderer.enable_lod = enabled
+        self._version += 1
+    
+    def has_classes(self):
+        """True se os tiles foram gravados com classes"""
+        return bool(self.store.meta.get('classes'))
+    
+    def set_class_filter(self, classes):
+        """Ver PointCloudRenderer.set_class_filter (vale também para tiles lidos depois)"""
+        self.class_filter = None if classes is None else frozenset(int(c) for c in classes)
+        for renderer in self._renderers():
+            renderer.set_class_filter(self.class_filter)
+        self._version += 1
+    
+    def set_z_range(self, z_min=None, z_max=None):
+        """Ver PointCloudRenderer.set_z_range (tiles fora do trecho nem são desenhados)"""
+        if z_min is None and z_max is None:
+            self.z_range = None
+        else:
+            z_min = -np.inf if z_min is None else float(z_min)
+            z_max = np.inf if z_max is None else float(z_max)
+            self.z_range = (min(z_min, z_max), max(z_min, z_max))
+        for renderer in self._renderers():
+            renderer.set_z_range(*(self.z_range or (None, None)))
+        self._version += 1
+    
+    # ---- Memória ----
+    
+    def memory_usage(self):
+        """Dict com gpu e host (bytes) somando os tiles residentes"""
+        usage = [renderer.memory_usage() for renderer in self._renderers()]
+        return {'gpu': sum(u['gpu'] for u in usage), 'host': sum(u['host'] for u in usage)}
+    
+    def release_gpu(self):
+        """Libera os VBOs dos tiles (realocados ao desenhar de novo)"""
+        released = [renderer.release_gpu() for renderer in self._renderers()]
+        return any(released)
+    
+    def release_host_copy(self):
+        """Libera as posições na RAM dos tiles já enviados à GPU"""
+        released = [renderer.release_host_copy() for renderer in self._renderers()]
+        return any(released)
+    
+    # ---- Consultas ----
+    
+    def pick(self, origin, direction, tolerance):
+        """
+        Ponto visível mais próximo da câmera entre os tiles residentes
+        
+        Returns:
+            Dict como PointCloudRenderer.pick, com index no array original e
+            class_id/class_name lidos do tile, ou None
+        """
+        best = None
+        for tile, streamed in self.manager.resident.items():
+            hit = streamed.renderer.pick(origin, direction, tolerance)
+            if hit is None or (best is not None and hit['distance'] >= best['distance']):
+                continue
+            if streamed.classes is not None:
+                hit['class_id'] = int(streamed.classes[hit['index']])
+                hit['class_name'] = CLASS_NAMES[hit['class_id']]
+            hit['index'] += int(self.store.start[tile])
+            best = hit
+        return best
+    
+    def get_bounds(self):
+        """Limites ((min), (max)) da nuvem inteira"""
+        if self.stats is not None:
+            return self.stats.bounds()
+        if self.store.n_tiles == 0:
+            return ((0, 0, 0), (0, 0, 0))
+        return tuple(self.store.mins.min(axis=0)), tuple(self.store.maxs.max(axis=0))
+    
+    def get_center(self):
+        """Centro (x, y, z) da nuvem inteira"""
+        if self.stats is not None:
+            return tuple(self.stats.center)
+        bounds_min, bounds_max = self.get_bounds()
+        return tuple((np.asarray(bounds_min) + np.asarray(bounds_max)) / 2.0)
+    
+    def get_stats(self):
+        """DatasetStats da nuvem inteira (None se não foi dado)"""
+        return self.stats
+    
+    def get_render_stats(self):
+        """Estatísticas do último frame somando os tiles desenhados, e dos tiles"""
+        rendered = sum(renderer.get_render_stats()['rendered_points'] for renderer in self._drawn)
+        return {
+            'total_points': self.n_vertices,
+            'rendered_points': rendered,
+            'percentage': 100.0 * rendered / max(1, self.n_vertices),
+            'lod_active': self.enable_lod,
+            'uploaded_points': self.n_vertices,
+            'refining': self.refinement_pending(),
+            'filtered': self.class_filter is not None or self.z_range is not None,
+            'tiles': self.store.n_tiles,
+            'resident_tiles': len(self.manager.resident),
+            'pending_tiles': self.manager.n_pending,
+            'drawn_tiles': len(self._drawn),
+        }
+    
+    def clear(self):
+        """Cancela as leituras e libera todos os tiles"""
+        self.manager.shutdown()
+        self._drawn = []
+        self.n_vertices = 0
+        self._version += 1
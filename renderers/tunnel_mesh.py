@@ -0,0 +1,382 @@
+"""
+Malha triangulada da superfície do túnel a partir de seções consecutivas
+Cada seção UPL é um perfil ordenado (ordem de varredura): os perfis são
+reamostrados com o mesmo número de amostras, perfis vizinhos são ligados em
+faixas de triângulos e seções de trechos planos são descartadas
+"""
+
+from OpenGL.GL import *
+import ctypes
+import numpy as np
+
+from renderers.culling import boxes_in_frustum
+from renderers.octree import merge_ranges
+from renderers.point_cloud import enable_z_clip, disable_z_clip
+
+
+# Layout do VBO em blocos: XYZ float32, normais float32, RGBA uint8
+POSITION_BYTES = 12
+NORMAL_BYTES = 12
+COLOR_BYTES = 4
+INTERVAL_BATCH = 1 << 20  # Amostras de perfil medidas por lote na simplificação
+
+
+def resample_profiles(vertices, offsets, samples):
+    """
+    Reamostra cada seção por comprimento de arco com o mesmo número de amostras
+    
+    O perfil é percorrido na ordem dos pontos (ordem de varredura do
+    scanner), medindo o comprimento no plano XY da seção.
+    
+    Args:
+        vertices: Array (N, 3) com as seções contíguas (ver UPLLoader.section_offsets)
+        offsets: Array (S + 1,) com o início de cada seção
+        samples: Amostras por perfil
+    
+    Returns:
+        Tupla (sections, left, frac): seções com perfil (>= 2 pontos e
+        comprimento > 0) e, para cada amostra, o ponto à esquerda e a fração
+        até o seguinte (arrays (S', samples)); a amostra é
+        vertices[left] * (1 - frac) + vertices[left + 1] * frac
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sizes = np.diff(offsets)
+    section_of = np.repeat(np.arange(len(sizes)), sizes)
+    
+    step = np.zeros(len(vertices))
+    step[1:] = np.hypot(*np.diff(vertices[:, :2], axis=0).T)
+    step[offsets[:-1][sizes > 0]] = 0.0
+    arc = np.cumsum(step)
+    del step
+    arc -= arc[offsets[:-1]][section_of]
+    
+    length = np.zeros(len(sizes))
+    length[sizes > 0] = arc[offsets[1:][sizes > 0] - 1]
+    sections = np.flatnonzero((sizes >= 2) & (length > 0))
+    
+    # Chave crescente no buffer todo: 2 * seção + fração do arco (0 a 1)
+    key = 2.0 * section_of + arc / np.where(length > 0, length, 1.0)[section_of]
+    del arc, section_of
+    u = np.linspace(0.0, 1.0, samples)
+    targets = 2.0 * sections[:, None] + u[None, :]
+    
+    left = np.searchsorted(key, targets.ravel(), side='right').reshape(targets.shape) - 1
+    left = np.clip(left, offsets[sections][:, None], offsets[sections + 1][:, None] - 2)
+    span = key[left + 1] - key[left]
+    frac = np.clip((targets - key[left]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+    return sections, left, frac
+
+
+def simplify_sections(grid, colors, z, tolerance, color_tolerance, max_gap):
+    """
+    Descarta seções de trechos planos
+    
+    Em níveis (como uma decimação por 2): a cada passada, uma seção sim e
+    outra não entre as mantidas sai se a interpolação linear em Z entre as
+    vizinhas mantidas reproduz, dentro das tolerâncias, todas as seções
+    originais do intervalo. O erro é medido contra as seções originais, então
+    não acumula entre níveis.
+    
+    Args:
+        grid: Perfis reamostrados (S, K, 3)
+        colors: Cores das amostras (S, K, 3) float
+        z: Posição de cada seção (S,), crescente
+        tolerance: Desvio máximo de posição (m)
+        color_tolerance: Desvio máximo de cor (0-1)
+        max_gap: Distância máxima em Z entre seções mantidas (m)
+    
+    Returns:
+        Máscara (S,) das seções mantidas (primeira e última sempre)
+    """
+    keep = np.ones(len(grid), dtype=bool)
+    kept = np.arange(len(grid))
+    while len(kept) > 2:
+        prev, candidates, nxt = kept[0:-2:2], kept[1:-1:2], kept[2::2]
+        removable = (z[nxt] - z[prev]) <= max_gap
+        removable[removable] = _interval_fits(grid, colors, z, prev[removable], nxt[removable],
+                                              tolerance, color_tolerance)
+        if not removable.any():
+            break
+        keep[candidates[removable]] = False
+        kept = np.flatnonzero(keep)
+    return keep
+
+
+def _interval_fits(grid, colors, z, prev, nxt, tolerance, color_tolerance):
+    """True para os intervalos (prev, nxt) em que a interpolação cobre as seções internas"""
+    fits = np.ones(len(prev), dtype=bool)
+    inner = nxt - prev - 1
+    
+    # Lotes de intervalos com até INTERVAL_BATCH amostras internas
+    group = (np.cumsum(inner) - inner) // max(1, INTERVAL_BATCH // grid.shape[1])
+    bounds = np.flatnonzero(np.r_[True, group[1:] != group[:-1], True])
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        counts = inner[start:stop]
+        owner = np.repeat(np.arange(start, stop), counts)
+        sections = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts) + prev[owner] + 1
+        
+        a, b = prev[owner], nxt[owner]
+        w = ((z[sections] - z[a]) / (z[b] - z[a]))[:, None, None]
+        error = np.linalg.norm(grid[a] + w * (grid[b] - grid[a]) - grid[sections], axis=2).max(axis=1)
+        color_error = np.abs(colors[a] + w * (colors[b] - colors[a]) - colors[sections]).max(axis=(1, 2))
+        bad = (error > tolerance) | (color_error > color_tolerance)
+        fits[owner[bad]] = False
+    return fits
+
+
+def grid_normals(grid):
+    """
+    Normais por vértice da grade de perfis (S, K, 3)
+    
+    Produto vetorial das tangentes ao longo do perfil e ao longo da via.
+    """
+    along_profile = np.gradient(grid, axis=1)
+    if len(grid) > 1:
+        along_track = np.gradient(grid, axis=0)
+    else:
+        along_track = np.zeros_like(grid)
+        along_track[..., 2] = 1.0
+    normals = np.cross(along_profile, along_track)
+    norm = np.linalg.norm(normals, axis=2, keepdims=True)
+    return (normals / np.where(norm > 0, norm, 1.0)).astype(np.float32)
+
+
+class TunnelMesh:
+    """
+    Superfície do túnel: grade de perfis reamostrados ligada em triângulos
+    
+    Os triângulos ficam em ordem de par de seções, então cada bloco de
+    block_pairs pares é um intervalo contíguo do índice com caixa envolvente
+    (frustum culling como nos blocos em Z da nuvem).
+    """
+    
+    def __init__(self, positions, normals, rgba, indices, block_starts, block_counts,
+                 block_mins, block_maxs):
+        self.positions = positions  # (V, 3) float32
+        self.normals = normals  # (V, 3) float32
+        self.rgba = rgba  # (V, 4) uint8
+        self.indices = indices  # (T * 3,) uint32
+        self.block_starts = block_starts  # Início de cada bloco em indices
+        self.block_counts = block_counts
+        self.block_mins = block_mins
+        self.block_maxs = block_maxs
+    
+    @property
+    def n_triangles(self):
+        return len(self.indices) // 3
+    
+    @classmethod
+    def build(cls, vertices, rgba, offsets, samples=48, min_spacing=0.5, tolerance=0.02,
+              color_tolerance=0.1, max_gap=20.0, max_edge=1.5, block_pairs=64):
+        """
+        Monta a malha a partir dos pontos na ordem do loader
+        
+        Args:
+            vertices: Array (N, 3) com as seções contíguas, em ordem de Z
+            rgba: Cores (N, 4) uint8 dos pontos
+            offsets: Array (S + 1,) com o início de cada seção
+            samples: Amostras por perfil
+            min_spacing: Distância mínima em Z entre seções usadas (m); seções
+                mais próximas que isto são puladas antes da reamostragem
+            tolerance: Desvio máximo (m) ao descartar seções de trechos planos
+            color_tolerance: Desvio máximo de cor (0-1) ao descartar seções
+            max_gap: Distância máxima em Z entre seções ligadas (m); vãos
+                maiores (falta de dados) ficam abertos
+            max_edge: Arestas de perfil maiores que isto (m) não viram
+                triângulos (aberturas e saltos do perfil)
+            block_pairs: Pares de seções por bloco de culling
+        
+        Returns:
+            TunnelMesh (sem triângulos se nenhuma seção tiver perfil)
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        z_sections = vertices[offsets[:-1][np.diff(offsets) > 0], 2]
+        
+        # Espaçamento mínimo: primeira seção de cada passo de min_spacing
+        used = np.flatnonzero(np.diff(offsets) > 0)
+        if min_spacing > 0 and len(used) > 1:
+            steps = np.floor((z_sections - z_sections[0]) / min_spacing)
+            used = used[np.r_[True, steps[1:] != steps[:-1]]]
+        starts, ends = offsets[used], offsets[used + 1]
+        sub_offsets = np.r_[0, np.cumsum(ends - starts)]
+        take = np.repeat(starts - sub_offsets[:-1], ends - starts) + np.arange(sub_offsets[-1])
+        profile_points = vertices[take]
+        profile_colors = rgba[take, :3]
+        
+        sections, left, frac = resample_profiles(profile_points, sub_offsets, samples)
+        if len(sections) == 0:
+            empty = np.zeros((0, 3), dtype=np.float32)
+            return cls(empty, empty, np.zeros((0, 4), dtype=np.uint8), np.zeros(0, dtype=np.uint32),
+                       np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), empty, empty)
+        
+        f = frac[..., None]
+        grid = profile_points[left] * (1.0 - f) + profile_points[left + 1] * f
+        colors = (profile_colors[left] * (1.0 - f) + profile_colors[left + 1] * f) / 255.0
+        z = grid[:, :, 2].mean(axis=1)
+        
+        keep = simplify_sections(grid, colors, z, tolerance, color_tolerance, max_gap)
+        grid, colors, z = grid[keep], colors[keep], z[keep]
+        n_sections = len(grid)
+        
+        # Quads (seção j, amostra k) -> (j + 1, k + 1); saem os de vãos sem
+        # dados e os com aresta de perfil longa demais
+        quads = np.ones((max(n_sections - 1, 0), samples - 1), dtype=bool)
+        if n_sections > 1:
+            edge = np.linalg.norm(np.diff(grid, axis=1), axis=2) <= max_edge
+            quads = edge[:-1] & edge[1:] & (np.diff(z) <= max_gap)[:, None]
+        pair, k = np.nonzero(quads)
+        a = (pair * samples + k).astype(np.uint32)
+        b, c = a + 1, a + samples
+        indices = np.stack([a, c, b, b, c, c + 1], axis=1).reshape(-1)
+        
+        # Blocos de block_pairs pares: intervalo de indices e caixa das seções
+        quad_counts = quads.sum(axis=1)
+        block_of_pair = np.arange(len(quad_counts)) // block_pairs
+        n_blocks = -(-len(quad_counts) // block_pairs)
+        block_counts = np.bincount(block_of_pair, weights=quad_counts, minlength=n_blocks).astype(np.int64) * 6
+        block_starts = np.cumsum(block_counts) - block_counts
+        first_rows = np.arange(n_blocks) * block_pairs
+        row_mins, row_maxs = grid.min(axis=1), grid.max(axis=1)
+        block_mins = np.minimum.reduceat(row_mins, first_rows, axis=0) if n_blocks else row_mins[:0]
+        block_maxs = np.maximum.reduceat(row_maxs, first_rows, axis=0) if n_blocks else row_maxs[:0]
+        if n_blocks:
+            # A última seção de cada bloco é a primeira do seguinte
+            next_rows = np.minimum(first_rows + block_pairs, n_sections - 1)
+            block_mins = np.minimum(block_mins, row_mins[next_rows])
+            block_maxs = np.maximum(block_maxs, row_maxs[next_rows])
+        
+        rgba_out = np.empty((grid.shape[0] * samples, 4), dtype=np.uint8)
+        rgba_out[:, :3] = (np.clip(colors, 0.0, 1.0) * 255.0 + 0.5).reshape(-1, 3)
+        rgba_out[:, 3] = 255
+        return cls(grid.reshape(-1, 3).astype(np.float32), grid_normals(grid).reshape(-1, 3),
+                   rgba_out, indices, block_starts, block_counts, block_mins, block_maxs)
+    
+    def visible_ranges(self, planes):
+        """
+        Intervalos de indices dos blocos dentro do frustum
+        
+        Args:
+            planes: Planos (M, 4) com normal para dentro (None = todos)
+        
+        Returns:
+            Tupla (starts, counts) juntando blocos vizinhos
+        """
+        if planes is None:
+            visible = self.block_counts > 0
+        else:
+            visible = boxes_in_frustum(planes, self.block_mins, self.block_maxs) & (self.block_counts > 0)
+        return merge_ranges(self.block_starts[visible], self.block_counts[visible])
+
+
+class TunnelMeshRenderer:
+    """
+    Desenha uma TunnelMesh a partir de um VBO e de um buffer de índices
+    
+    Iluminação simples de farol (luz na câmera, dos dois lados) para dar
+    relevo à superfície; as cores são as dos pontos (classificação).
+    """
+    
+    def __init__(self):
+        self.mesh = None
+        self.vbo = None
+        self.ibo = None
+        self.visible = False
+        self.enable_culling = True
+        self.version = 0  # Muda a cada set_mesh (invalida imagem acumulada)
+    
+    def set_mesh(self, mesh):
+        """
+        Envia a malha à GPU
+        
+        Args:
+            mesh: TunnelMesh
+        """
+        self.cleanup()
+        self.mesh = mesh
+        self.version += 1
+        if mesh.n_triangles == 0:
+            return
+        
+        n = len(mesh.positions)
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, n * (POSITION_BYTES + NORMAL_BYTES + COLOR_BYTES), None, GL_STATIC_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, mesh.positions.nbytes, mesh.positions)
+        glBufferSubData(GL_ARRAY_BUFFER, n * POSITION_BYTES, mesh.normals.nbytes, mesh.normals)
+        glBufferSubData(GL_ARRAY_BUFFER, n * (POSITION_BYTES + NORMAL_BYTES), mesh.rgba.nbytes, mesh.rgba)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        
+        self.ibo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, mesh.indices.nbytes, mesh.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        
+        print(f"🔺 Malha do túnel: {mesh.n_triangles:,} triângulos, {n:,} vértices")
+    
+    def render(self, camera=None, z_range=None):
+        """
+        Desenha os blocos visíveis da malha
+        
+        Args:
+            camera: Camera3D para frustum culling (None = todos os blocos)
+            z_range: Trecho em Z visível (mesmo filtro da nuvem, ver
+                PointCloudRenderer.set_z_range)
+        """
+        if not self.visible or self.vbo is None:
+            return
+        
+        planes = camera.get_frustum_planes() if camera is not None and self.enable_culling else None
+        starts, counts = self.mesh.visible_ranges(planes)
+        if len(starts) == 0:
+            return
+        
+        n = len(self.mesh.positions)
+        glPushAttrib(GL_ENABLE_BIT | GL_LIGHTING_BIT)
+        glEnable(GL_LIGHTING)
+        glEnable(GL_LIGHT0)
+        glEnable(GL_COLOR_MATERIAL)
+        glEnable(GL_NORMALIZE)
+        glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+        glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE)
+        glLightfv(GL_LIGHT0, GL_AMBIENT, (0.35, 0.35, 0.35, 1.0))
+        glLightfv(GL_LIGHT0, GL_DIFFUSE, (0.75, 0.75, 0.75, 1.0))
+        
+        # Farol: direção fixa no espaço da câmera
+        glPushMatrix()
+        glLoadIdentity()
+        glLightfv(GL_LIGHT0, GL_POSITION, (0.0, 0.0, 1.0, 0.0))
+        glPopMatrix()
+        enable_z_clip(z_range)
+        
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glNormalPointer(GL_FLOAT, 0, ctypes.c_void_p(n * POSITION_BYTES))
+        glColorPointer(4, GL_UNSIGNED_BYTE, 0, ctypes.c_void_p(n * (POSITION_BYTES + NORMAL_BYTES)))
+        
+        # Blocos vizinhos já foram juntados: poucas chamadas por frame
+        for start, count in zip(starts, counts):
+            glDrawElements(GL_TRIANGLES, int(count), GL_UNSIGNED_INT, ctypes.c_void_p(int(start) * 4))
+        
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        disable_z_clip(z_range)
+        glPopAttrib()
+    
+    def cleanup(self):
+        """Libera VBO e buffer de índices"""
+        try:
+            if self.vbo is not None:
+                glDeleteBuffers(1, [self.vbo])
+            if self.ibo is not None:
+                glDeleteBuffers(1, [self.ibo])
+        except Exception:
+            pass
+        self.vbo = None
+        self.ibo = None
@@ -0,0 +1,481 @@
+"""
+Vista desenrolada da parede do túnel
+A parede vira uma imagem 2D (ângulo × km) colorida por folga ou por classe,
+calculada da grade angular das seções (utils.section_grid) e guardada em
+disco como pirâmide de tiles; o visualizador desenha só os tiles visíveis no
+nível de zoom atual, como quads texturizados em projeção ortográfica
+"""
+
+from OpenGL.GL import *
+from collections import OrderedDict
+import json
+import math
+import os
+import numpy as np
+
+from utils.tunnel_templates import CLASS_COLORS
+
+
+# Colunas (ao longo da via) por tile; a altura do tile é a imagem inteira
+WALL_TILE = 256
+
+# Modos de cor: folga com sinal (float, NaN = vazio) ou classe + 1 (uint8, 0 = vazio)
+WALL_MODES = ('folga', 'classe')
+
+# Folga (m) a partir da qual a parede fica totalmente verde
+CLEARANCE_MARGIN = 0.5
+
+# Seções convertidas por lote (limita temporários)
+WALL_SECTION_BATCH = 4096
+
+# Versão do formato em disco (muda = pirâmide refeita)
+WALL_FORMAT = 1
+
+
+def default_column_m(section_z):
+    """Comprimento de coluna padrão: espaçamento mediano entre seções (mínimo 1 cm)"""
+    spacing = np.diff(np.asarray(section_z, dtype=np.float64))
+    spacing = spacing[spacing > 0]
+    return max(float(np.median(spacing)), 0.01) if len(spacing) else 1.0
+
+
+def wall_image(grid, section_z, template, mode='folga', column_m=0.25, max_gap=1.0):
+    """
+    Desenrola a grade angular numa imagem (bins × colunas)
+    
+    Cada célula da grade vira um ponto (centro do bin no raio medido),
+    medido contra o gabarito; as seções caem na coluna do seu km e a
+    coluna guarda o pior valor (menor folga ou maior classe). Colunas sem
+    seção repetem a anterior se o vão for até max_gap; vãos maiores ficam
+    vazios (falta de dados). A linha 0 é o piso sob o centro; subindo:
+    parede direita, teto, parede esquerda.
+    
+    Args:
+        grid: SectionGrid
+        section_z: Posição (m) de cada seção, crescente (S,)
+        template: TunnelTemplate usado na folga/classificação
+        mode: 'folga' ou 'classe'
+        column_m: Comprimento (m) de via por coluna (ver default_column_m)
+        max_gap: Vão (m) máximo preenchido com a seção anterior
+    
+    Returns:
+        Array (bins, colunas): float32 com a folga (NaN sem pontos) ou
+        uint8 com classe + 1 (0 sem pontos)
+    """
+    z = np.asarray(section_z, dtype=np.float64)
+    column = ((z - z[0]) / column_m).astype(np.int64)
+    bins = grid.bins
+    width = int(column[-1]) + 1 if len(column) else 0
+    
+    if mode == 'folga':
+        image = np.full((bins, width), np.nan, dtype=np.float32)
+    else:
+        image = np.zeros((bins, width), dtype=np.uint8)
+    
+    angles = grid.angles()
+    row_of_bin = (np.arange(bins) + bins // 4) % bins  # Bin de 270° (piso) na linha 0
+    for start in range(0, grid.n_sections, WALL_SECTION_BATCH):
+        valid = grid.valid[start:start + WALL_SECTION_BATCH]
+        section, cell = np.nonzero(valid)
+        radius = grid.radius[start:start + WALL_SECTION_BATCH][valid]
+        xs = grid.center[0] + radius * np.cos(angles[cell])
+        ys = grid.center[1] + radius * np.sin(angles[cell])
+        
+        where = (row_of_bin[cell], column[start + section])
+        if mode == 'folga':
+            np.fmin.at(image, where, template.clearance(xs, ys).astype(np.float32))
+        else:
+            np.maximum.at(image, where, template.classify_points(xs, ys) + 1)
+    
+    # Colunas entre seções próximas: cópia da última coluna com seção
+    occupied = np.zeros(width, dtype=bool)
+    occupied[column] = True
+    index = np.arange(width)
+    previous = np.maximum.accumulate(np.where(occupied, index, -1))
+    fill = ~occupied & (previous >= 0) & ((index - previous) * column_m <= max_gap)
+    image[:, fill] = image[:, previous[fill]]
+    return image
+
+
+def reduce_columns(image, mode):
+    """Metade das colunas: cada par vira o pior dos dois (vazio não conta)"""
+    if image.shape[1] % 2:
+        empty = np.nan if mode == 'folga' else 0
+        image = np.concatenate((image, np.full((image.shape[0], 1), empty, dtype=image.dtype)), axis=1)
+    pairs = image.reshape(image.shape[0], -1, 2)
+    if mode == 'folga':
+        return np.fmin(pairs[:, :, 0], pairs[:, :, 1])
+    return pairs.max(axis=2)
+
+
+def wall_colors(values, mode):
+    """
+    Cores RGBA uint8 de um tile de valores
+    
+    Folga: vermelho dentro do gabarito, de amarelo (0) a verde (CLEARANCE_MARGIN)
+    fora; classe: as cores da nuvem. Células vazias ficam transparentes.
+    
+    Returns:
+        Array (linhas, colunas, 4) uint8
+    """
+    if mode == 'classe':
+        lut = np.zeros((256, 4), dtype=np.uint8)
+        lut[1:len(CLASS_COLORS) + 1, :3] = CLASS_COLORS * 255
+        lut[1:len(CLASS_COLORS) + 1, 3] = 255
+        lut[len(CLASS_COLORS) + 1:] = lut[len(CLASS_COLORS)]
+        return lut[values]
+    
+    values = values.astype(np.float32)
+    t = np.clip(np.nan_to_num(values) / CLEARANCE_MARGIN, 0.0, 1.0)
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = np.where(values < 0, 255, (1.0 - t) * 255)
+    rgba[..., 1] = np.where(values < 0, 0, 255)
+    rgba[..., 3] = np.where(np.isnan(values), 0, 255)
+    return rgba
+
+
+class WallPyramid:
+    """
+    Pirâmide de tiles da vista desenrolada em disco
+    
+    Cada nível tem metade das colunas do anterior (o eixo de ângulo, com
+    poucas linhas, fica inteiro); níveis são divididos em tiles de
+    WALL_TILE colunas gravados como .npy em <diretório>/<nível>/<tile>.npy.
+    O meta.json é gravado por último, então pirâmide incompleta não abre.
+    
+    Atributos:
+        directory: Diretório da pirâmide
+        mode: 'folga' ou 'classe'
+        widths: Colunas de cada nível
+        height: Linhas (bins angulares)
+        z0: Posição (m) da primeira coluna
+        column_m: Comprimento (m) de via por coluna do nível 0
+    """
+    
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.mode = meta['mode']
+        self.widths = meta['widths']
+        self.height = meta['height']
+        self.tile = meta['tile']
+        self.z0 = meta['z0']
+        self.column_m = meta['column_m']
+    
+    @classmethod
+    def build(cls, image, directory, mode, z0, column_m, key=None, tile=WALL_TILE):
+        """
+        Grava a pirâmide de uma imagem de wall_image
+        
+        Args:
+            image: Array (bins, colunas) do nível 0
+            directory: Diretório de destino (criado se faltar)
+            mode: 'folga' ou 'classe' (define a redução e as cores)
+            z0: Posição (m) da primeira coluna
+            column_m: Comprimento (m) por coluna
+            key: Dicionário JSON que identifica a origem (ver open)
+            tile: Colunas por tile
+        
+        Returns:
+            WallPyramid
+        """
+        # Sem meta.json até o fim: uma gravação interrompida não é aberta
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        
+        widths = []
+        level = 0
+        while True:
+            os.makedirs(os.path.join(directory, str(level)), exist_ok=True)
+            for tx in range(0, max(image.shape[1], 1), tile):
+                np.save(os.path.join(directory, str(level), f"{tx // tile}.npy"), image[:, tx:tx + tile])
+            widths.append(int(image.shape[1]))
+            if image.shape[1] <= tile:
+                break
+            image = reduce_columns(image, mode)
+            level += 1
+        
+        meta = {
+            'format': WALL_FORMAT, 'key': key, 'mode': mode, 'widths': widths,
+            'height': int(image.shape[0]), 'tile': tile, 'z0': float(z0), 'column_m': float(column_m),
+        }
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return cls(directory, meta)
+    
+    @classmethod
+    def open(cls, directory, key=None):
+        """
+        Abre uma pirâmide gravada
+        
+        Returns:
+            WallPyramid ou None se faltar, for de outro formato ou de outra origem
+        """
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != WALL_FORMAT or meta.get('key') != key:
+            return None
+        return cls(directory, meta)
+    
+    @property
+    def levels(self):
+        """Número de níveis"""
+        return len(self.widths)
+    
+    @property
+    def width(self):
+        """Colunas do nível 0"""
+        return self.widths[0]
+    
+    def level_for(self, zoom):
+        """
+        Nível mais grosso que ainda tem pelo menos uma coluna por pixel
+        
+        Args:
+            zoom: Pixels de tela por coluna do nível 0
+        """
+        if zoom >= 1.0:
+            return 0
+        return min(int(math.floor(math.log2(1.0 / zoom))), self.levels - 1)
+    
+    def visible_tiles(self, level, column_start, column_end):
+        """
+        Tiles de um nível que cobrem as colunas [column_start, column_end) do nível 0
+        
+        Returns:
+            range de índices de tile
+        """
+        span = self.tile << level
+        first = max(int(column_start // span), 0)
+        last = min(int(math.ceil(column_end / span)), -(-self.widths[level] // self.tile))
+        return range(first, max(first, last))
+    
+    def tile_columns(self, level, tx):
+        """Colunas do nível 0 cobertas pelo tile (início, fim)"""
+        start = (tx * self.tile) << level
+        return start, min((min((tx + 1) * self.tile, self.widths[level])) << level, self.width)
+    
+    def load_tile(self, level, tx):
+        """Valores (bins, colunas) de um tile"""
+        return np.load(os.path.join(self.directory, str(level), f"{tx}.npy"))
+    
+    def km_of_column(self, column):
+        """Km do início de uma coluna do nível 0"""
+        return (self.z0 + column * self.column_m) / 1000.0
+
+
+class WallViewRenderer:
+    """
+    Desenha uma WallPyramid em projeção ortográfica com pan e zoom ao longo da via
+    
+    O eixo de ângulo ocupa sempre a altura da área de desenho; o zoom é em
+    colunas. Tiles viram texturas sob demanda (no máximo uploads_per_frame
+    por frame, com cache LRU de max_textures); enquanto um tile do nível
+    atual não chega, aparecem os de níveis mais grossos já carregados.
+    """
+    
+    # Margens (px) da área de desenho: esquerda, direita, baixo, cima
+    MARGINS = (70, 20, 45, 60)
+    
+    def __init__(self, font, max_textures=256, uploads_per_frame=8):
+        self.font = font
+        self.max_textures = max_textures
+        self.uploads_per_frame = uploads_per_frame
+        self.pyramid = None
+        self.visible = False
+        self.center = 0.0  # Coluna (nível 0) no centro da área
+        self.zoom = 1.0    # Pixels por coluna do nível 0
+        self._textures = OrderedDict()  # (nível, tile) -> (textura, coluna_inicial, coluna_final)
+        self._pending = False
+    
+    def set_pyramid(self, pyramid, width, height):
+        """Troca a pirâmide e enquadra a via inteira"""
+        self.cleanup()
+        self.pyramid = pyramid
+        self.fit(width, height)
+    
+    def area(self, width, height):
+        """Área de desenho (x, y, largura, altura) em coordenadas de tela"""
+        left, right, bottom, top = self.MARGINS
+        return left, bottom, max(1, width - left - right), max(1, height - bottom - top)
+    
+    def fit(self, width, height):
+        """Zoom para a via inteira caber na área"""
+        if self.pyramid is None:
+            return
+        area_width = self.area(width, height)[2]
+        self.zoom = area_width / max(self.pyramid.width, 1)
+        self.center = self.pyramid.width / 2.0
+    
+    def pan(self, dx):
+        """Arrasta a imagem dx pixels (positivo = para a direita)"""
+        if self.pyramid is None:
+            return
+        self.center = float(np.clip(self.center - dx / self.zoom, 0.0, self.pyramid.width))
+    
+    def zoom_at(self, factor, x, width, height):
+        """
+        Multiplica o zoom mantendo fixa a coluna sob o cursor
+        
+        Args:
+            factor: Fator de zoom (> 1 aproxima)
+            x: Posição do cursor na tela
+        """
+        if self.pyramid is None:
+            return
+        column = self.column_at(x, width, height)
+        ax, _, aw, _ = self.area(width, height)
+        # Entre metade da via inteira na área e 32 pixels por coluna
+        self.zoom = float(np.clip(self.zoom * factor, aw / max(self.pyramid.width, 1) / 2, 32.0))
+        self.center = column
+        self.pan(x - ax - aw / 2.0)
+    
+    def column_at(self, x, width, height):
+        """Coluna do nível 0 sob uma posição x da tela"""
+        ax, _, aw, _ = self.area(width, height)
+        return self.center + (x - ax - aw / 2.0) / self.zoom
+    
+    def _screen_x(self, column, width, height):
+        """Posição x na tela de uma coluna do nível 0"""
+        ax, _, aw, _ = self.area(width, height)
+        return ax + aw / 2.0 + (column - self.center) * self.zoom
+    
+    def needs_redraw(self):
+        """True enquanto faltam tiles visíveis (carregados nos próximos frames)"""
+        return self.visible and self._pending
+    
+    def render(self, width, height):
+        """Desenha os tiles visíveis, a escala de km e os rótulos de ângulo (projeção 2D já ativa)"""
+        if not self.visible or self.pyramid is None:
+            return
+        
+        pyramid = self.pyramid
+        ax, ay, aw, ah = self.area(width, height)
+        column_start = self.column_at(ax, width, height)
+        column_end = self.column_at(ax + aw, width, height)
+        level = pyramid.level_for(self.zoom)
+        
+        # Nível mais grosso sempre carregado; o atual, aos poucos
+        uploads = self.uploads_per_frame
+        self._pending = False
+        for lvl in (pyramid.levels - 1, level):
+            for tx in pyramid.visible_tiles(lvl, column_start, column_end):
+                if (lvl, tx) in self._textures:
+                    continue
+                if uploads <= 0:
+                    self._pending = True
+                    break
+                self._upload(lvl, tx)
+                uploads -= 1
+        
+        glEnable(GL_SCISSOR_TEST)
+        glScissor(int(ax), int(ay), int(aw), int(ah))
+        glColor3f(0.12, 0.12, 0.15)
+        glBegin(GL_QUADS)
+        glVertex2f(ax, ay)
+        glVertex2f(ax + aw, ay)
+        glVertex2f(ax + aw, ay + ah)
+        glVertex2f(ax, ay + ah)
+        glEnd()
+        
+        glEnable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glColor4f(1.0, 1.0, 1.0, 1.0)
+        # Do mais grosso ao atual: o nível atual cobre os de baixo
+        for lvl in range(pyramid.levels - 1, level - 1, -1):
+            for tx in pyramid.visible_tiles(lvl, column_start, column_end):
+                entry = self._textures.get((lvl, tx))
+                if entry is None:
+                    continue
+                self._textures.move_to_end((lvl, tx))
+                texture, first, last = entry
+                x0 = self._screen_x(first, width, height)
+                x1 = self._screen_x(last, width, height)
+                glBindTexture(GL_TEXTURE_2D, texture)
+                glBegin(GL_QUADS)
+                glTexCoord2f(0.0, 0.0)
+                glVertex2f(x0, ay)
+                glTexCoord2f(1.0, 0.0)
+                glVertex2f(x1, ay)
+                glTexCoord2f(1.0, 1.0)
+                glVertex2f(x1, ay + ah)
+                glTexCoord2f(0.0, 1.0)
+                glVertex2f(x0, ay + ah)
+                glEnd()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_TEXTURE_2D)
+        glDisable(GL_SCISSOR_TEST)
+        
+        self._render_labels(width, height, column_start, column_end, level)
+        glDisable(GL_BLEND)
+        self._evict()
+    
+    def _render_labels(self, width, height, column_start, column_end, level):
+        """Escala de km embaixo, ângulos à esquerda e título"""
+        pyramid = self.pyramid
+        ax, ay, aw, ah = self.area(width, height)
+        color = (0.9, 0.9, 0.9)
+        
+        # Passo "redondo" (1, 2 ou 5 × 10^n m) com pelo menos 120 px entre marcas
+        min_step = 120.0 / self.zoom * pyramid.column_m
+        step = 10.0 ** math.floor(math.log10(max(min_step, 1e-3)))
+        for factor in (1, 2, 5, 10):
+            if step * factor >= min_step:
+                step *= factor
+                break
+        z_start = pyramid.z0 + max(column_start, 0) * pyramid.column_m
+        z_end = pyramid.z0 + min(column_end, pyramid.width) * pyramid.column_m
+        decimals = max(0, 3 - int(math.floor(math.log10(step))))
+        
+        glColor3f(*color)
+        z = math.ceil(z_start / step) * step
+        while z <= z_end:
+            x = self._screen_x((z - pyramid.z0) / pyramid.column_m, width, height)
+            glBegin(GL_LINES)
+            glVertex2f(x, ay)
+            glVertex2f(x, ay - 6)
+            glEnd()
+            self.font.draw_text(x - 25, ay - 22, f"KM {z / 1000.0:.{decimals}f}", color=color, font_size=0.6)
+            z += step
+        
+        for fraction, label in ((0.0, "PISO"), (0.25, "DIR"), (0.5, "TETO"), (0.75, "ESQ"), (1.0, "PISO")):
+            self.font.draw_text(8, ay + fraction * ah - 4, label, color=color, font_size=0.6)
+        
+        title = "VISTA DESENROLADA - " + ("FOLGA" if pyramid.mode == 'folga' else "CLASSE")
+        self.font.draw_text(ax, ay + ah + 12, f"{title}  (NIVEL {level})", color=(1, 1, 0.6), font_size=0.8)
+    
+    def _upload(self, level, tx):
+        """Lê um tile do disco e envia como textura RGBA"""
+        rgba = np.ascontiguousarray(wall_colors(self.pyramid.load_tile(level, tx), self.pyramid.mode))
+        texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, rgba.shape[1], rgba.shape[0], 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, rgba)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self._textures[(level, tx)] = (texture,) + self.pyramid.tile_columns(level, tx)
+    
+    def _evict(self):
+        """Libera as texturas menos usadas acima de max_textures"""
+        while len(self._textures) > self.max_textures:
+            _, (texture, _, _) = self._textures.popitem(last=False)
+            glDeleteTextures([texture])
+    
+    def cleanup(self):
+        """Libera todas as texturas"""
+        for texture, _, _ in self._textures.values():
+            try:
+                glDeleteTextures([texture])
+            except Exception:
+                pass
+        self._textures.clear()
+        self._pending = False
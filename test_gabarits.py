@@ -11,7 +11,7 @@ import numpy as np
 
 def test_imports():
     """Testa se todos os imports funcionam"""
-    print("\n[1/5] Testando imports...")
+    print("\n[1/9] Testando imports...")
     try:
         from utils.tunnel_templates import TemplateRegistry, FerroviaTunel, RodoviaDupla, TuneloAqued
         from utils.tunnel_templates import GabaritPersonalizado, classify_points_with_template, colors_from_classification
@@ -27,7 +27,7 @@ def test_imports():
 
 def test_gabarits():
     """Testa funcionamento dos gabaritos"""
-    print("\n[2/5] Testando gabaritos...")
+    print("\n[2/9] Testando gabaritos...")
     try:
         from utils.tunnel_templates import TemplateRegistry
         
@@ -55,7 +55,7 @@ def test_gabarits():
 
 def test_classification():
     """Testa classificação de múltiplos pontos"""
-    print("\n[3/5] Testando classificação de pontos...")
+    print("\n[3/9] Testando classificação de pontos...")
     try:
         from utils.tunnel_templates import TemplateRegistry, classify_points_with_template, colors_from_classification
         
@@ -83,7 +83,7 @@ def test_classification():
 
 def test_data_loader():
     """Testa carregador UPL com gabarito"""
-    print("\n[4/5] Testando carregador UPL...")
+    print("\n[4/9] Testando carregador UPL...")
     try:
         from loaders.data_loader import UPLLoader
         from utils.tunnel_templates import TemplateRegistry
@@ -117,7 +117,7 @@ def test_data_loader():
 
 def test_registry():
     """Testa registro de novo gabarito"""
-    print("\n[5/5] Testando registro de gabarito customizado...")
+    print("\n[5/9] Testando registro de gabarito customizado...")
     try:
         from utils.tunnel_templates import GabaritPersonalizado, TemplateRegistry
         
@@ -147,6 +147,346 @@ def test_registry():
         return False
 
 
+def test_multi_template():
+    """Testa classificação vetorizada e multi-gabarito"""
+    print("\n[6/9] Testando classificação multi-gabarito...")
+    try:
+        from utils.tunnel_templates import (
+            TemplateRegistry, classify_points_multi, colors_from_classification
+        )
+        
+        rng = np.random.default_rng(0)
+        xs = rng.uniform(-6.0, 6.0, 5000)
+        ys = rng.uniform(-1.0, 9.0, 5000)
+        
+        # Uma coluna uint8 por gabarito, em uma única passada
+        keys, classes = classify_points_multi(xs, ys, chunk_size=1000)
+        assert keys == TemplateRegistry.list_all(), "Chaves fora de ordem"
+        assert classes.shape == (len(keys), len(xs)), "Shape incorreto"
+        assert classes.dtype == np.uint8, "Dtype incorreto"
+        
+        # Versão vetorizada deve concordar com a classificação ponto a ponto
+        for row, key in enumerate(keys):
+            gabarit = TemplateRegistry.get(key)
+            expected = [gabarit.classify_point(x, y) for x, y in zip(xs, ys)]
+            assert np.array_equal(classes[row], expected), f"Divergência em '{key}'"
+        
+        # Modo paralelo (pool de processos + memória compartilhada)
+        _, classes_par = classify_points_multi(xs, ys, chunk_size=1000, parallel=True, workers=2)
+        assert np.array_equal(classes, classes_par), "Modo paralelo divergiu"
+        
+        # Saída em memória compartilhada do chamador: escrita direto pelos processos
+        from utils.tunnel_templates import (SharedPointArray, _init_classify_worker,
+                                            _classify_shared_chunk)
+        with SharedPointArray(classes.shape, np.uint8) as saida:
+            _, classes_sh = classify_points_multi(xs, ys, chunk_size=1000, parallel=True,
+                                                  workers=2, out=saida)
+            assert classes_sh is saida.array and np.array_equal(classes, saida.array), \
+                "Saída compartilhada não preenchida"
+        
+        # Erro num bloco chega intacto (handles fechados mesmo com views no traceback)
+        class GabaritoComErro:
+            def classify_points(self, xs, ys):
+                raise ArithmeticError("falha de teste")
+        with SharedPointArray.from_array(xs) as xs_sh, SharedPointArray.from_array(ys) as ys_sh, \
+                SharedPointArray((len(xs),), np.uint8) as saida:
+            _init_classify_worker([xs_sh.spec(), ys_sh.spec(), saida.spec()], [GabaritoComErro()])
+            try:
+                _classify_shared_chunk((0, 1000))
+                raise AssertionError("Erro do gabarito não propagado")
+            except ArithmeticError:
+                pass
+        
+        colors = colors_from_classification(classes[0])
+        assert colors.shape == (len(xs), 3), "Shape de cores incorreto"
+        
+        print(f"    Gabaritos: {keys}")
+        print("    [OK] Multi-gabarito OK")
+        return True
+    except Exception as e:
+        print(f"    [ERRO] {e}")
+        return False
+
+
+def test_curve_gauge():
+    """Testa estimativa de curvatura e gabarito por seção"""
+    print("\n[7/9] Testando gabarito por seção em curvas...")
+    try:
+        from utils.tunnel_templates import (
+            TemplateRegistry, estimate_section_curvature,
+            curve_gauge_params, apply_section_transform
+        )
+        
+        # Arco de raio 500 m, seções a cada 0.5 m
+        raio = 500.0
+        s = np.arange(0.0, 400.0, 0.5)
+        lats = -20.0 + raio * np.sin(s / raio) / 111000
+        lons = -43.0 + raio * (1 - np.cos(s / raio)) / (111000 * np.cos(np.radians(-20.0)))
+        
+        curvature = estimate_section_curvature(lats, lons)
+        assert abs(abs(curvature[len(s) // 2]) - 1 / raio) < 1e-5, "Curvatura incorreta"
+        
+        params = curve_gauge_params(curvature)
+        assert np.all(params['widening'] > 0), "Sobrelargura ausente na curva"
+        
+        # Parâmetros nulos = gabarito estático
+        offsets = np.array([0, 2, 4])
+        zeros = {key: np.zeros(2) for key in ('offset', 'rotation', 'widening')}
+        xs = np.array([0.0, 2.0, 2.5, 3.0])
+        ys = np.array([3.0, 4.0, 4.0, 4.0])
+        xg, yg = apply_section_transform(xs, ys, offsets, zeros)
+        assert np.allclose(xg, xs) and np.allclose(yg, ys), "Transformação nula alterou pontos"
+        
+        # Sobrelargura de 0.5 m leva à invasão um ponto que estava na margem
+        gabarit = TemplateRegistry.get('ferrovia')
+        widened = dict(zeros, widening=np.array([0.0, 0.5]))
+        xg, yg = apply_section_transform(xs, ys, offsets, widened)
+        assert gabarit.classify_points(xs, ys)[2] == 1, "Ponto de teste deveria estar na margem"
+        assert gabarit.classify_points(xg, yg)[2] == 2, "Sobrelargura não aplicada"
+        
+        print(f"    Curvatura no meio do arco: {curvature[len(s) // 2]:.5f} 1/m")
+        print("    [OK] Gabarito por seção OK")
+        return True
+    except Exception as e:
+        print(f"    [ERRO] {e}")
+        return False
+
+
+def test_template_file():
+    """Testa gabaritos em arquivo e reclassificação memoizada"""
+    print("\n[8/9] Testando gabaritos em arquivo (recarga)...")
+    try:
+        import time
+        from utils.tunnel_templates import GabaritPersonalizado
+        from utils.template_config import load_template_file, TemplateReclassifier
+        
+        templates = load_template_file('gabaritos_exemplo.json')
+        assert 'reto_3m' in templates, "Gabarito do arquivo não carregado"
+        
+        # Gabarito definido por dados classifica igual ao nativo equivalente
+        reto = templates['reto_3m']
+        nativo = GabaritPersonalizado(
+            name="Túnel Reto 3m",
+            safe_bounds=reto.safe_zone['bounds'],
+            warning_bounds=reto.warning_zone['bounds']
+        )
+        xs = np.random.uniform(-4, 4, 5000)
+        ys = np.random.uniform(-1, 5, 5000)
+        assert np.array_equal(reto.classify_points(xs, ys), nativo.classify_points(xs, ys)), \
+            "Classificação do gabarito em arquivo diverge"
+        
+        # Segunda requisição do mesmo conteúdo vem do cache
+        reclassifier = TemplateReclassifier(xs, ys)
+        assert reclassifier.request('reto_3m', reto) is None
+        done = []
+        while not done:
+            time.sleep(0.01)
+            done = reclassifier.poll()
+        again = load_template_file('gabaritos_exemplo.json')['reto_3m']
+        cached = reclassifier.request('reto_3m', again)
+        assert cached is not None and np.array_equal(cached, done[0][1]), "Cache por hash falhou"
+        reclassifier.shutdown()
+        
+        print(f"    Gabaritos no arquivo: {', '.join(templates)}")
+        print("    [OK] Gabaritos em arquivo OK")
+        return True
+    except Exception as e:
+        print(f"    [ERRO] {e}")
+        return False
+
+
+def test_gabarit_app_load():
+    """Testa carga de UPL pela aplicação de gabaritos (camada ativa da cena)"""
+    print("\n[9/9] Testando carga pela aplicação de gabaritos...")
+    try:
+        import os
+        import tempfile
+        from main_gabarit import GabaritVisualizerApp
+        from core.camera import Camera3D
+        from core.configuration import Configuration
+        from core.redraw_scheduler import RedrawScheduler
+        from core.scene import Scene, SceneLayer
+        from loaders.data_loader import DataLoaderFactory
+        from renderers.point_cloud import PointCloudRenderer, pack_rgba
+        from renderers.tunnel_mesh import TunnelMeshRenderer
+        from renderers.wall_view import WallViewRenderer
+        from ui.km_window_panel import KmWindowPanel
+        from ui.menu_bar import MenuBar
+        from ui.overview_panel import OverviewPanel
+        from utils.tunnel_templates import TemplateRegistry, colors_from_classification
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)  # Cache e configuração no diretório temporário
+            app = None
+            try:
+                # 50 seções de 40 pontos num arco de 3 m de raio
+                arquivo = os.path.join(tmp, 'trecho.upl')
+                angulos = np.linspace(0.1, np.pi - 0.1, 40)
+                with open(arquivo, 'w') as f:
+                    for k in range(50):
+                        f.write(';'.join(['EFVM', 'RH-1'] + ['0'] * 9 + ['12', str(k), '0', '-20,0', '-43,0']) + '\n')
+                        f.write(';'.join(f"{3000 * np.cos(a):.1f};{3000 * np.sin(a):.1f}" for a in angulos) + '\n')
+                
+                # Aplicação sem janela: só os componentes usados na carga (sem OpenGL)
+                app = GabaritVisualizerApp.__new__(GabaritVisualizerApp)
+                app.config = Configuration(os.path.join(tmp, 'config.json'))
+                app.data_loader = DataLoaderFactory()
+                app.scene = Scene()
+                app.scene.add_layer(SceneLayer("vazia", PointCloudRenderer()))
+                app.camera = Camera3D()
+                app.scheduler = RedrawScheduler()
+                app.menu_bar = MenuBar(800, 600)
+                app.km_panel = KmWindowPanel(800, 600, font=None)
+                app.overview_panel = OverviewPanel(800, 600, font=None)
+                app.mesh_renderer = TunnelMeshRenderer()
+                app.wall_view = WallViewRenderer(font=None)
+                app.current_gabarit = TemplateRegistry.get('ferrovia')
+                app.current_gabarit_key = 'ferrovia'
+                app.class_columns = {}
+                app._shown_classes = None
+                app.reclassifier = None
+                app.upl_data_loaded = False
+                
+                assert app.load_file(arquivo), "Carga pela aplicação de gabaritos falhou"
+                assert app.current_file == arquivo and app.point_renderer.n_vertices == 2000, \
+                    "Camada ativa sem os dados do arquivo"
+                assert app.upl_data_loaded and app.reclassifier is not None, "Reclassificação não preparada"
+                assert {'ferrovia', 'rodovia'} <= set(app.class_columns), "Colunas de classe ausentes"
+                
+                # Troca de gabarito com coluna pronta: só as cores da camada mudam
+                app._on_gabarit_selected('rodovia')
+                esperado = pack_rgba(colors_from_classification(app.class_columns['rodovia']))
+                assert np.array_equal(app.point_renderer.load_order_arrays()[1], esperado), \
+                    "Cores do gabarito selecionado não aplicadas"
+                
+                # Reclassificação concluída: cores, estatísticas por km e visão geral acompanham
+                classes = app.class_columns['rodovia'].copy()
+                classes[:100] = 2
+                visao_anterior = app.loader.overview
+                app._apply_class_column('rodovia', classes)
+                esperado = pack_rgba(colors_from_classification(classes))
+                assert np.array_equal(app.point_renderer.load_order_arrays()[1], esperado), \
+                    "Cores da reclassificação não aplicadas"
+                bins = app.loader.section_stats.get_bins()
+                assert int(bins['invasao'].sum()) == int(np.count_nonzero(classes == 2)), \
+                    "Estatísticas por km não recalculadas"
+                assert app.loader.overview is not visao_anterior and \
+                    app.overview_panel.raster is app.loader.overview, "Visão geral não recalculada"
+                
+                # Recarga com o gabarito atual substitui a camada ativa
+                app._reload_upl_with_gabarit()
+                assert len(app.scene.layers) == 1 and app.loader.template is app.current_gabarit, \
+                    "Recarga não usou o gabarito atual"
+                
+                # Compensação de curva vem da configuração e faz parte da chave do cache
+                fabrica = DataLoaderFactory(curve_compensation=True, design_speed_kmh=80.0)
+                loader = fabrica.create_loader(arquivo)
+                assert loader.curve_compensation and loader.design_speed_kmh == 80.0, \
+                    "Opções de curva não repassadas pela fábrica"
+                vertices, _ = loader.load(arquivo)
+                with np.load(os.path.join('.cache', 'trecho.npz')) as cache:
+                    assert bool(cache['curve_compensation']) and float(cache['design_speed_kmh']) == 80.0, \
+                        "Cache com outra compensação de curva não foi recalculado"
+                
+                # Lotes de seções: mesmas coordenadas e estatísticas da expansão inteira
+                from utils.tunnel_templates import apply_section_transform
+                antes = loader.section_stats.get_bins()
+                loader.STATS_SECTION_BATCH = 7
+                xs, ys = loader.get_gauge_coordinates(vertices)
+                xs_inteiro = vertices[:, 0] - np.repeat(loader.section_desvios, np.diff(loader.section_offsets))
+                esperado = apply_section_transform(xs_inteiro, vertices[:, 1], loader.section_offsets,
+                                                   loader.get_section_gauge_params())
+                assert np.allclose(xs, esperado[0]) and np.allclose(ys, esperado[1]), \
+                    "Coordenadas do gabarito em lotes incorretas"
+                loader._compute_section_stats_from_cache(vertices)
+                depois = loader.section_stats.get_bins()
+                assert all(np.allclose(antes[k], depois[k], equal_nan=True) for k in antes), \
+                    "Estatísticas por km em lotes incorretas"
+                
+                # Cache sem a coluna do gabarito pedido: reclassifica a partir do cache
+                from loaders.data_loader import UPLLoader
+                rodovia = TemplateRegistry.get('rodovia')
+                opcoes = dict(template=rodovia, curve_compensation=True, design_speed_kmh=80.0)
+                loader = UPLLoader(**opcoes)
+                loader.load(arquivo)
+                assert loader.classifications is not None, "Cache sem a coluna não reclassificou"
+                with np.load(os.path.join('.cache', 'trecho.npz')) as cache:
+                    assert {'ferrovia', 'rodovia'} <= set(str(k) for k in cache['class_keys']), \
+                        "Coluna reclassificada não gravada no cache"
+                os.remove(os.path.join('.cache', 'trecho.npz'))
+                do_arquivo = UPLLoader(**opcoes)
+                do_arquivo.load(arquivo)
+                assert np.array_equal(loader.classifications, do_arquivo.classifications), \
+                    "Reclassificação do cache diverge da leitura do arquivo"
+                
+                # Leitura do arquivo também expande a compensação de curva por lotes de seções
+                import utils.tunnel_templates as tunnel_templates
+                original, lotes = tunnel_templates.apply_section_transform, []
+                def transform_espiao(xs, ys, offsets, params):
+                    lotes.append(len(xs))
+                    return original(xs, ys, offsets, params)
+                os.remove(os.path.join('.cache', 'trecho.npz'))
+                em_lotes = UPLLoader(**opcoes)
+                em_lotes.STATS_SECTION_BATCH = 7
+                tunnel_templates.apply_section_transform = transform_espiao
+                try:
+                    em_lotes.load(arquivo)
+                finally:
+                    tunnel_templates.apply_section_transform = original
+                assert lotes and max(lotes) <= 7 * 40, "Compensação de curva expandida na nuvem inteira"
+                assert np.array_equal(em_lotes.classifications, do_arquivo.classifications), \
+                    "Classes da leitura em lotes divergem"
+                
+                # Arquivo regravado com o mesmo nome: cache de outra versão é ignorado
+                with open(arquivo) as f:
+                    linhas = f.readlines()
+                with open(arquivo, 'w') as f:
+                    f.writelines(linhas[:60])
+                vertices, _ = UPLLoader(**opcoes).load(arquivo)
+                assert len(vertices) == 30 * 40, "Cache de outra versão do arquivo reaproveitado"
+                with np.load(os.path.join('.cache', 'trecho.npz')) as cache:
+                    assert int(cache['source_size']) == os.path.getsize(arquivo), \
+                        "Cache sem a versão do arquivo de origem"
+                
+                # Gabarito redefinido na mesma chave: coluna em cache (outro hash) é reclassificada
+                from utils.tunnel_templates import GabaritDefinido
+                def retangulo(x_max, y_max):
+                    return {'type': 'rectangle', 'bounds': {'x_min': 0.0, 'x_max': x_max,
+                                                            'y_min': 0.0, 'y_max': y_max}}
+                largo = GabaritDefinido("Largo", retangulo(9.0, 9.0), retangulo(9.5, 9.5))
+                TemplateRegistry.register('teste_cache', largo)
+                try:
+                    loader = UPLLoader(template=largo)
+                    loader.load(arquivo)
+                    assert np.all(loader.classifications == 2), "Gabarito largo deveria invadir tudo"
+                    estreito = GabaritDefinido("Estreito", retangulo(1.0, 1.0), retangulo(1.5, 1.5))
+                    TemplateRegistry.register('teste_cache', estreito)
+                    loader = UPLLoader(template=estreito)
+                    loader.load(arquivo)
+                    assert not np.any(loader.classifications == 2), \
+                        "Coluna de outra versão do gabarito reaproveitada"
+                    with np.load(os.path.join('.cache', 'trecho.npz')) as cache:
+                        hashes = dict(zip((str(k) for k in cache['class_keys']),
+                                          (str(h) for h in cache['class_hashes'])))
+                    assert hashes == {'teste_cache': estreito.content_hash}, \
+                        "Hash do gabarito não gravado com a coluna"
+                finally:
+                    TemplateRegistry._templates.pop('teste_cache', None)
+            finally:
+                if app is not None and app.reclassifier is not None:
+                    app.reclassifier.shutdown()
+                os.chdir(cwd)
+        
+        print("    [OK] Carga pela aplicação de gabaritos OK")
+        return True
+    except Exception as e:
+        print(f"    [ERRO] {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def main():
     """Função principal"""
     print("="*70)
@@ -159,6 +499,10 @@ def main():
     results.append(("Classificacao", test_classification()))
     results.append(("Data Loader", test_data_loader()))
     results.append(("Registry", test_registry()))
+    results.append(("Multi-gabarito", test_multi_template()))
+    results.append(("Curvas", test_curve_gauge()))
+    results.append(("Arquivo gabaritos", test_template_file()))
+    results.append(("App gabaritos", test_gabarit_app_load()))
     
     # Resumo
     print("\n" + "="*70)
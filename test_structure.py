@@ -161,6 +161,7 @@ def test_point_cloud_renderer():
         renderer.set_data(vertices, colors)
         
         assert renderer.n_vertices == 3, "Número de vértices incorreto"
+        assert np.shares_memory(renderer.vertices, vertices), "float32 contíguo deveria ser usado sem cópia"
         
         # Testa bounds
         mins, maxs = renderer.get_bounds()
@@ -174,6 +175,49 @@ def test_point_cloud_renderer():
         renderer.set_point_size(5.0)
         assert renderer.get_point_size() == 5.0, "Point size falhou"
         
+        # Layout do VBO: 16 bytes/ponto, bloco de cores RGBA uint8
+        from renderers.point_cloud import pack_rgba, POINT_BYTES
+        packed = pack_rgba(colors)
+        assert POINT_BYTES == 16, "Layout do VBO deveria ter 16 bytes"
+        assert packed[1].tolist() == [0, 255, 0, 255], "Cor empacotada incorreta"
+        
+        # Envio incremental: só o prefixo já enviado é desenhado
+        from renderers.point_cloud import clip_ranges
+        starts, counts = clip_ranges(np.array([0, 10, 50]), np.array([5, 20, 5]), 20)
+        assert starts.tolist() == [0, 10] and counts.tolist() == [5, 10], "Corte no prefixo incorreto"
+        
+        # Streaming: append_data acrescenta pontos e atualiza o centro
+        renderer.append_data(np.array([[3, 3, 3]], dtype=np.float32),
+                             np.array([[1, 1, 1]], dtype=np.float32))
+        assert renderer.n_vertices == 4, "append_data não acrescentou pontos"
+        assert abs(renderer.get_center()[0] - 1.5) < 0.01, "Centro após append_data incorreto"
+        
+        # Recoloração parcial: só os pontos indicados mudam
+        renderer.update_colors(np.array([0, 3]), np.array([[0, 0, 0], [0, 1, 0]], dtype=np.float32))
+        new_colors = renderer.colors.reshape(-1, 3)
+        assert new_colors[0].tolist() == [0, 0, 0] and new_colors[3].tolist() == [0, 1, 0], \
+            "update_colors não trocou as cores"
+        assert new_colors[1].tolist() == [0, 1, 0], "update_colors alterou outros pontos"
+        
+        # Nuvem em VBO: RAM na ordem original, só o envio segue a ordem do buffer
+        from renderers.culling import ChunkIndex
+        rng = np.random.default_rng(3)
+        big = rng.uniform(-50, 50, (150000, 3)).astype(np.float32)
+        renderer = PointCloudRenderer()
+        renderer.verbose = False
+        renderer.set_data(big, np.ones_like(big), defer_vbo=True)
+        order = renderer._buffer_order
+        assert order is not None and np.shares_memory(renderer.vertices, big), \
+            "Nuvem em VBO não deveria ter cópia permutada na RAM"
+        assert np.array_equal(renderer.vertices.reshape(-1, 3), big), "vertices deveria estar na ordem original"
+        assert np.array_equal(renderer._host_rows(renderer._positions, 1000, 2000), big[order[1000:2000]]), \
+            "Envio deveria seguir a ordem do buffer"
+        expected = ChunkIndex(big[order], renderer.chunk_points)
+        assert np.array_equal(renderer.chunks.mins, expected.mins) and \
+            np.array_equal(renderer.chunks.maxs, expected.maxs), "Blocos em Z incorretos"
+        renderer.update_colors(np.array([7]), np.array([[0, 0, 0]], dtype=np.float32))
+        assert renderer.colors.reshape(-1, 3)[7].tolist() == [0, 0, 0], "update_colors na ordem original falhou"
+        
         print("  ✅ Todos os testes de PointCloudRenderer passaram!\n")
         return True
         
@@ -184,6 +228,999 @@ def test_point_cloud_renderer():
         return False
 
 
+def test_octree_lod():
+    """Testa octree de LOD (seleção por distância à câmera)"""
+    print("🧪 Testando PointOctree...")
+    
+    try:
+        from renderers.octree import PointOctree, merge_ranges
+        import numpy as np
+        
+        # Túnel sintético: meia casca de raio 3 m ao longo de 500 m
+        rng = np.random.default_rng(0)
+        z = rng.uniform(0, 500, 200000)
+        a = rng.uniform(0, np.pi, 200000)
+        vertices = np.c_[3 * np.cos(a), 3 * np.sin(a), z]
+        
+        octree = PointOctree(vertices)
+        assert np.array_equal(np.sort(octree.order), np.arange(len(vertices))), "Ordem inválida"
+        assert octree.node_count.sum() == len(vertices), "Nós não cobrem todos os pontos"
+        assert octree.order.dtype == np.int32, "Índices da octree deveriam ser int32"
+        
+        # Construção em lotes: mesmos nós e caixas justas, com nós cortados entre lotes
+        import renderers.octree as octree_module
+        batch = octree_module.BUILD_BATCH
+        octree_module.BUILD_BATCH = 3001
+        try:
+            batched = PointOctree(vertices)
+        finally:
+            octree_module.BUILD_BATCH = batch
+        assert all(np.array_equal(getattr(octree, k), getattr(batched, k))
+                   for k in ('order', 'node_start', 'node_key', 'node_min', 'node_max')), \
+            "Construção em lotes diverge"
+        ordered = vertices[octree.order]
+        assert np.array_equal(octree.node_min, np.minimum.reduceat(ordered, octree.node_start, axis=0)) and \
+            np.array_equal(octree.node_max, np.maximum.reduceat(ordered, octree.node_start, axis=0)), \
+            "Caixas dos nós incorretas"
+        
+        # Câmera no meio do túnel, orçamento de 50k pontos
+        budget = 50000
+        starts, counts = merge_ranges(*octree.select((0, 1, 250), budget, 1000.0))
+        assert 0 < counts.sum() <= budget, "Orçamento de pontos excedido"
+        
+        drawn = np.concatenate([np.arange(s, s + c) for s, c in zip(starts, counts)])
+        drawn_z = vertices[octree.order[drawn], 2]
+        near = np.mean(np.abs(drawn_z - 250) < 10) / np.mean(np.abs(z - 250) < 10)
+        far = np.mean(np.abs(drawn_z - 250) > 200) / np.mean(np.abs(z - 250) > 200)
+        assert near > far, "Geometria próxima deveria ter mais densidade"
+        
+        print(f"  ✅ Octree: {octree.n_nodes} nós, {counts.sum():,} pontos desenhados\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de octree: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_frustum_culling():
+    """Testa frustum culling por blocos em Z"""
+    print("🧪 Testando frustum culling...")
+    
+    try:
+        from core.camera import Camera3D
+        from renderers.culling import ChunkIndex
+        import numpy as np
+        
+        # Túnel de 5 km ordenado em Z; câmera olhando um trecho no km 1
+        rng = np.random.default_rng(0)
+        z = np.sort(rng.uniform(0, 5000, 300000))
+        a = rng.uniform(0, np.pi, 300000)
+        vertices = np.c_[3 * np.cos(a), 3 * np.sin(a), z]
+        
+        cam = Camera3D(distance=50.0, pitch=10.0, yaw=0.0)
+        cam.set_target(0, 2, 1000)
+        planes = cam.get_frustum_planes()
+        
+        chunks = ChunkIndex(vertices, chunk_size=4096)
+        starts, counts = chunks.visible_ranges(planes)
+        drawn = np.concatenate([np.arange(s, s + c) for s, c in zip(starts, counts)])
+        
+        # Todo ponto dentro do frustum está em um bloco desenhado
+        inside = np.all(vertices @ planes[:, :3].T + planes[:, 3] >= 0, axis=1)
+        assert inside[drawn].sum() == inside.sum(), "Bloco visível descartado"
+        assert len(starts) < chunks.n_chunks // 2, "Culling não descartou blocos"
+        
+        print(f"  ✅ Culling: {len(starts)}/{chunks.n_chunks} blocos visíveis\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de culling: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_progressive_order():
+    """Testa ordem progressiva (prefixo do buffer = amostra uniforme)"""
+    print("🧪 Testando ordem progressiva...")
+    
+    try:
+        from renderers.octree import progressive_order
+        import numpy as np
+        
+        rng = np.random.default_rng(1)
+        z = rng.uniform(0, 2000, 400000)
+        a = rng.uniform(0, np.pi, 400000)
+        vertices = np.c_[3 * np.cos(a), 3 * np.sin(a), z]
+        
+        order = progressive_order(vertices)
+        assert np.array_equal(np.sort(order), np.arange(len(vertices))), "Ordem inválida"
+        assert np.array_equal(order, progressive_order(vertices)), "Ordem não reprodutível"
+        
+        # Prefixo de 2% cobre a via inteira de forma uniforme
+        prefix = vertices[order[:8000], 2]
+        counts = np.histogram(prefix, bins=20, range=(0, 2000))[0]
+        assert counts.min() > 0.7 * counts.mean(), "Prefixo não é uniforme"
+        
+        print(f"  ✅ Prefixo de 8000 pontos: {counts.min()}-{counts.max()} por 100 m\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de ordem progressiva: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_adaptive_budget():
+    """Testa orçamento adaptativo de pontos"""
+    print("🧪 Testando AdaptivePointBudget...")
+    
+    try:
+        from renderers.frame_budget import AdaptivePointBudget
+        
+        # Modelo de custo: 2 ms fixos + 10 ns por ponto; alvo 60 FPS (16.7 ms)
+        budget = AdaptivePointBudget(target_fps=60, max_points=10000000)
+        now = 0.0
+        for _ in range(300):
+            frame_time = 0.002 + budget.budget * 1e-8
+            now += frame_time
+            budget.update(frame_time, True, now)
+        
+        frame_time = 0.002 + budget.budget * 1e-8
+        assert abs(frame_time - 1 / 60) < 0.15 / 60, "Orçamento não convergiu para o alvo"
+        interactive = budget.budget
+        
+        # Câmera parada: densidade total; ao mover, volta ao orçamento interativo
+        for _ in range(20):
+            now += 0.05
+            budget.update(0.05, False, now)
+        assert budget.budget == 10000000 and budget.state == 'parado', "Densidade total não liberada"
+        assert budget.update(0.5, True, now + 0.5) == interactive, "Orçamento interativo perdido"
+        
+        print(f"  ✅ Orçamento convergiu para {interactive:,} pontos\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de orçamento adaptativo: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_progressive_refinement():
+    """Testa refinamento progressivo (lotes após o frame de LOD)"""
+    print("🧪 Testando refinamento progressivo...")
+    
+    try:
+        from renderers.octree import PointOctree
+        from renderers.point_cloud import PointCloudRenderer
+        from renderers.frame_budget import AdaptivePointBudget
+        import numpy as np
+        
+        rng = np.random.default_rng(2)
+        z = rng.uniform(0, 500, 200000)
+        a = rng.uniform(0, np.pi, 200000)
+        vertices = np.c_[3 * np.cos(a), 3 * np.sin(a), z].astype(np.float32)
+        
+        # A seleção de LOD é um prefixo da ordem de refinamento, que cobre tudo
+        octree = PointOctree(vertices)
+        nodes, spacing = octree.rank((0, 1, 250), 1000.0)
+        base = octree.prefix_length(nodes, spacing, 50000)
+        assert np.array_equal(np.concatenate(octree.select((0, 1, 250), 50000, 1000.0)),
+                              np.concatenate(octree.node_ranges(nodes[:base]))), \
+            "Seleção de LOD difere do prefixo da ordem"
+        assert octree.node_count[nodes].sum() == len(vertices), "Ordem não cobre todos os nós"
+        
+        # Lotes continuam o prefixo progressivo até o fim, sem sobrepor
+        renderer = PointCloudRenderer()
+        renderer.use_vbo = False
+        renderer.set_data(vertices, np.ones_like(vertices), draw_order=np.arange(len(vertices)))
+        renderer.enable_lod = True
+        renderer.max_points_render = 50000
+        renderer.refine_batch_points = 40000
+        renderer.set_progressive_refinement(True)
+        renderer.vbo = 0  # Simula VBO já enviado (sem contexto OpenGL)
+        renderer._uploaded = renderer.n_vertices
+        renderer.start_refinement()
+        
+        drawn = np.zeros(len(vertices), dtype=int)
+        drawn[:50000] += 1
+        while renderer.refinement_pending():
+            starts, counts = renderer._next_refine_batch()
+            assert counts.sum() <= 40000, "Lote maior que o tamanho pedido"
+            for start, count in zip(starts, counts):
+                drawn[start:start + count] += 1
+        renderer.vbo = None
+        assert (drawn == 1).all(), "Lotes não cobrem os pontos exatamente uma vez"
+        
+        # Com refinamento, parar não salta para densidade total
+        budget = AdaptivePointBudget(max_points=10000000, full_density_when_still=False)
+        for i in range(20):
+            budget.update(0.05, False, 0.05 * i)
+        assert budget.state == 'parado' and budget.budget == budget.interactive_budget, \
+            "Orçamento parado deveria continuar interativo"
+        
+        print(f"  ✅ Refinamento: {base} nós no LOD, {len(nodes)} na ordem completa\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de refinamento progressivo: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_point_picking():
+    """Testa seleção de ponto por raio (clique na vista 3D)"""
+    print("🧪 Testando seleção de pontos...")
+    
+    try:
+        from core.camera import Camera3D
+        from renderers.point_cloud import PointCloudRenderer
+        from renderers.picking import nearest_on_ray
+        import numpy as np
+        
+        rng = np.random.default_rng(3)
+        z = rng.uniform(0, 100, 80000)
+        a = rng.uniform(0, np.pi, 80000)
+        vertices = np.c_[3 * np.cos(a), 3 * np.sin(a), z].astype(np.float32)
+        
+        cam = Camera3D(distance=20.0, pitch=20.0, yaw=30.0)
+        cam.set_target(0, 2, 50)
+        cam.aspect = 1.5
+        
+        # Raio do centro da tela passa pelo target
+        origin, direction = cam.screen_ray(600, 400, 1200, 800)
+        to_target = np.array([0, 2, 50]) - origin
+        assert np.allclose(direction, to_target / np.linalg.norm(to_target), atol=1e-6), \
+            "Raio do centro não aponta para o target"
+        
+        # Octree (limiar baixo): mesmo ponto que a busca exaustiva
+        renderer = PointCloudRenderer()
+        renderer.lod_threshold = 10000
+        renderer.set_data(vertices, np.ones_like(vertices))
+        assert renderer.octree is not None, "Octree não construída"
+        
+        tolerance = 4.0 / cam.pixels_per_radian(800)
+        for x, y in [(600, 400), (500, 300), (700, 450)]:
+            origin, direction = cam.screen_ray(x, y, 1200, 800)
+            hit = renderer.pick(origin, direction, tolerance)
+            expected = nearest_on_ray(vertices, origin, direction, tolerance)
+            assert hit is not None and expected is not None, "Nenhum ponto selecionado"
+            assert hit['index'] == expected[0], "Ponto diferente da busca exaustiva"
+            assert np.allclose(hit['position'], vertices[hit['index']]), "Posição incorreta"
+        
+        # Raio para fora da nuvem não seleciona nada
+        assert renderer.pick(origin, -direction, tolerance) is None, "Seleção fora da nuvem"
+        
+        print(f"  ✅ Ponto {hit['index']} a {hit['distance']:.1f} m\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de seleção: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_visibility_filters():
+    """Testa filtros por classe e trecho em Z (intervalos do buffer agrupado por classe)"""
+    print("🧪 Testando filtros de visibilidade...")
+    
+    try:
+        from renderers.point_cloud import PointCloudRenderer
+        from renderers.octree import expand_ranges, progressive_order
+        from renderers.picking import nearest_on_ray
+        from core.camera import Camera3D
+        import numpy as np
+        
+        rng = np.random.default_rng(5)
+        z = rng.uniform(0, 100, 80000)
+        a = rng.uniform(0, np.pi, 80000)
+        vertices = np.c_[3 * np.cos(a), 3 * np.sin(a), z].astype(np.float32)
+        classes = rng.choice(3, 80000, p=[0.8, 0.15, 0.05]).astype(np.uint8)
+        
+        # Octree: só invasões, sem LOD (todos os nós)
+        renderer = PointCloudRenderer()
+        renderer.lod_threshold = 10000
+        renderer.set_data(vertices, np.ones_like(vertices), classes=classes)
+        renderer.set_class_filter({2})
+        shown = renderer._buffer_order[expand_ranges(*renderer._select_ranges(None))]
+        assert np.array_equal(np.sort(shown), np.flatnonzero(classes == 2)), "Filtro por classe incorreto"
+        
+        # Trecho em Z: nós fora dos planos do trecho não entram
+        renderer.set_class_filter(None)
+        renderer.set_z_range(40.0, 45.0)
+        starts, counts = renderer.octree.visible_ranges(renderer._culling_planes(None))
+        kept = renderer._buffer_order[expand_ranges(starts, counts)]
+        inside = np.flatnonzero((z >= 40.0) & (z <= 45.0))
+        assert np.isin(inside, kept).all() and len(kept) < len(z) / 2, "Culling do trecho incorreto"
+        
+        # Sem câmera: nós do trecho mapeados direto em intervalos, prefixo por nível no LOD
+        starts, counts = renderer._section_span()
+        window = renderer._buffer_order[expand_ranges(starts, counts)]
+        assert np.isin(inside, window).all() and len(window) < len(z) / 2, "Nós do trecho incorretos"
+        assert np.all(starts[1:] > starts[:-1] + counts[:-1]), "Intervalos do trecho não fundidos"
+        renderer.enable_lod, renderer.max_points_render = True, 5000
+        starts, counts = renderer._select_ranges(None)
+        assert counts.sum() == 5000 and np.isin(renderer._buffer_order[expand_ranges(starts, counts)],
+                                                window).all(), "Orçamento do trecho incorreto"
+        renderer.enable_lod = False
+        
+        # Seleção ignora pontos escondidos
+        renderer.set_z_range(None)
+        renderer.set_class_filter({1, 2})
+        cam = Camera3D(distance=20.0, pitch=20.0, yaw=30.0)
+        cam.set_target(0, 2, 50)
+        cam.aspect = 1.5
+        origin, direction = cam.screen_ray(600, 400, 1200, 800)
+        tolerance = 8.0 / cam.pixels_per_radian(800)
+        hit = renderer.pick(origin, direction, tolerance)
+        subset = np.flatnonzero(classes > 0)
+        expected = nearest_on_ray(vertices[subset], origin, direction, tolerance)
+        assert hit is not None and hit['index'] == subset[expected[0]], "Seleção com filtro incorreta"
+        
+        # Ordem progressiva: prefixo proporcional por classe
+        renderer = PointCloudRenderer()
+        renderer.set_data(vertices, np.ones_like(vertices),
+                          draw_order=progressive_order(vertices), classes=classes)
+        renderer.set_class_filter({0, 2})
+        starts, counts = renderer._filter_ranges(*renderer._prefix_ranges(8000))
+        sample = classes[renderer._buffer_order[expand_ranges(starts, counts)]]
+        assert set(np.unique(sample)) == {0, 2}, "Classes filtradas no prefixo"
+        assert abs((sample == 2).sum() - 8000 * (classes == 2).mean()) <= 1, "Prefixo não proporcional"
+        
+        # Buffer ordenado por Z: janela de km = um único intervalo de blocos
+        from renderers.culling import ChunkIndex
+        from ui.km_window_panel import KmWindowPanel
+        ordered = vertices[np.argsort(z, kind='stable')]
+        chunks = ChunkIndex(ordered, chunk_size=1000)
+        first, last = chunks.z_span(40.0, 45.0)
+        inside = np.flatnonzero((ordered[:, 2] >= 40.0) & (ordered[:, 2] <= 45.0))
+        assert chunks.starts[first] <= inside[0] and inside[-1] < chunks.starts[first] + chunks.counts[first:last].sum(), \
+            "Trecho fora dos blocos"
+        assert last - first <= len(inside) // 1000 + 2, "Blocos demais no trecho"
+        
+        # Buffer na ordem das seções: janela de km = um único intervalo de pontos
+        section_z = np.arange(100.0)
+        offsets = np.searchsorted(ordered[:, 2], section_z).astype(np.int64)
+        renderer = PointCloudRenderer()
+        renderer.verbose = False
+        renderer.set_data(np.floor(ordered), np.ones_like(ordered),
+                          sections=(section_z, np.append(offsets, len(ordered))))
+        renderer.set_z_range(40.0, 45.0)
+        starts, counts = renderer._section_span()
+        inside = np.flatnonzero((np.floor(ordered[:, 2]) >= 40.0) & (np.floor(ordered[:, 2]) <= 45.0))
+        assert len(starts) == 1 and (starts[0], starts[0] + counts[0]) == (inside[0], inside[-1] + 1), \
+            "Intervalo das seções do trecho incorreto"
+        hit = renderer.pick(np.array([0.0, -5.0, 42.0]), np.array([0.0, 1.0, 0.0]), 0.01)
+        assert hit is not None and 40.0 <= hit['position'][2] <= 45.0, "Seleção no trecho incorreta"
+        
+        # Sliders: arrastar o fim para antes do início empurra o início
+        windows = []
+        panel = KmWindowPanel(1200, 800, font=None)
+        panel.visible = True
+        panel.set_range(120.0, 130.0)
+        panel.on_change = lambda start, end: windows.append((start, end))
+        panel.handle_click(panel.start_slider.x + 0.7 * panel.start_slider.width, panel.start_slider.y + 10)
+        panel.handle_drag(panel.start_slider.x + 0.8 * panel.start_slider.width, 0)
+        panel.handle_release()
+        assert np.allclose(windows[-1], (128.0, 130.0)) and not panel.is_full(), "Janela de km incorreta"
+        panel.handle_click(panel.end_slider.x + 0.5 * panel.end_slider.width, panel.end_slider.y + 10)
+        panel.handle_release()
+        assert np.allclose(windows[-1], (125.0, 125.0)), "Início não acompanhou o fim"
+        
+        print(f"  ✅ {len(shown):,} invasões, {len(kept):,} pontos no trecho\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de filtros: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_tunnel_mesh():
+    """Testa malha do túnel (reamostragem, costura de seções e simplificação)"""
+    print("🧪 Testando malha do túnel...")
+    
+    try:
+        from renderers.tunnel_mesh import TunnelMesh, resample_profiles
+        import numpy as np
+        
+        # Túnel reto (seções a cada 0.1 m) com um ressalto em z = 100 m
+        n_sections, n_profile = 2000, 200
+        z = np.arange(n_sections) * 0.1
+        angle = np.linspace(-0.2 * np.pi, 1.2 * np.pi, n_profile)
+        radius = 3.0 + 0.3 * np.exp(-((z - 100.0) / 2.0) ** 2)[:, None]
+        vertices = np.stack([radius * np.cos(angle), radius * np.sin(angle),
+                             np.repeat(z[:, None], n_profile, axis=1)], axis=2).reshape(-1, 3)
+        vertices = vertices.astype(np.float32)
+        rgba = np.full((len(vertices), 4), 200, dtype=np.uint8)
+        offsets = np.arange(n_sections + 1) * n_profile
+        
+        # Reamostragem por arco: extremos do perfil nos extremos originais
+        sections, left, frac = resample_profiles(vertices, offsets, 16)
+        first = vertices[left[:, 0]] * (1 - frac[:, :1]) + vertices[left[:, 0] + 1] * frac[:, :1]
+        assert len(sections) == n_sections and np.allclose(first, vertices[offsets[:-1]], atol=1e-4), \
+            "Reamostragem incorreta"
+        
+        mesh = TunnelMesh.build(vertices, rgba, offsets, samples=32, min_spacing=0.0,
+                                tolerance=0.01, max_gap=20.0)
+        rows = mesh.positions.reshape(-1, 32, 3)
+        kept_z = rows[:, 0, 2]
+        assert mesh.n_triangles < len(vertices) / 50, "Malha não simplificou o trecho reto"
+        assert np.diff(kept_z).max() <= 20.0 + 1e-3, "Vão maior que max_gap"
+        
+        # Ressalto preservado: perfil interpolado no pico com o raio certo
+        peak = np.searchsorted(kept_z, 100.0)
+        w = (100.0 - kept_z[peak - 1]) / (kept_z[peak] - kept_z[peak - 1])
+        profile = rows[peak - 1] * (1 - w) + rows[peak] * w
+        assert abs(np.hypot(profile[:, 0], profile[:, 1]).mean() - 3.3) < 0.015, "Ressalto perdido"
+        
+        # Blocos cobrem todos os triângulos; índices válidos
+        starts, counts = mesh.visible_ranges(None)
+        assert counts.sum() == len(mesh.indices) and mesh.indices.max() < len(mesh.positions), \
+            "Blocos da malha incorretos"
+        
+        print(f"  ✅ {mesh.n_triangles:,} triângulos para {len(vertices):,} pontos\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste da malha: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_section_grid():
+    """Testa grade angular das seções (bins por seção, vazios e cache)"""
+    print("🧪 Testando SectionGrid...")
+    
+    try:
+        import numpy as np
+        import utils.section_grid as section_grid
+        from utils.section_grid import SectionGrid
+        from utils.tunnel_templates import TemplateRegistry
+        
+        # Seções circulares de raio 2 + s / 10 em torno de (0, 5), só a metade de cima
+        center = (0.0, 5.0)
+        n_sections, n_profile, bins = 30, 400, 36
+        angle = np.linspace(0.01, np.pi - 0.01, n_profile)
+        radius = 2.0 + np.arange(n_sections)[:, None] / 10.0
+        xs = (center[0] + radius * np.cos(angle)).ravel()
+        ys = (center[1] + radius * np.sin(angle)).ravel()
+        # Ponto mais interno na seção 3, bin do topo
+        xs = np.insert(xs, 4 * n_profile, -0.01)
+        ys = np.insert(ys, 4 * n_profile, 6.0)
+        offsets = np.arange(n_sections + 1) * n_profile
+        offsets[4:] += 1
+        
+        # Blocos pequenos: seções atravessam a fronteira entre blocos
+        chunk = section_grid.GRID_CHUNK
+        section_grid.GRID_CHUNK = 777
+        try:
+            grid = SectionGrid.compute(xs, ys, offsets, bins, center=center)
+        finally:
+            section_grid.GRID_CHUNK = chunk
+        
+        assert grid.radius.shape == (n_sections, bins) and grid.radius.dtype == np.float32, \
+            "Formato da grade incorreto"
+        assert grid.valid[:, :bins // 2].all() and not grid.valid[:, bins // 2:].any(), \
+            "Bins vazios marcados como válidos"
+        expected = np.repeat(radius, bins // 2, axis=1)
+        expected[3, bins // 4] = 1.0
+        assert np.allclose(grid.radius[:, :bins // 2], expected, atol=1e-3), "Raio mínimo incorreto"
+        
+        gx, gy = grid.points()
+        assert np.isnan(gx[0, -1]) and abs(gy[3, bins // 4] - 6.0) < 0.01, "Posições das células incorretas"
+        
+        restored = SectionGrid.from_arrays(grid.to_arrays())
+        assert np.array_equal(restored.radius, grid.radius) and restored.bins == bins, \
+            "Grade restaurada difere"
+        assert SectionGrid.from_arrays({}) is None, "Cache sem grade deveria dar None"
+        
+        # Centro do gabarito no eixo da via
+        cx, cy = TemplateRegistry.get('ferrovia').gauge_center()
+        assert abs(cx) < 0.05 and 2.5 < cy < 8.0, "Centro do gabarito fora da zona"
+        
+        print(f"  ✅ Grade {grid.n_sections} × {grid.bins} ({grid.nbytes:,} bytes)\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste da grade angular: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_wall_view():
+    """Testa vista desenrolada (imagem da parede, pirâmide em disco e zoom)"""
+    print("🧪 Testando vista desenrolada...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        from renderers.wall_view import (WallPyramid, WallViewRenderer, wall_image,
+                                         wall_colors, reduce_columns)
+        from utils.section_grid import SectionGrid
+        from utils.tunnel_templates import TemplateRegistry
+        
+        # Parede circular de raio 4 m; seção 10 com invasão no teto; vão de 5 m depois da 30
+        template = TemplateRegistry.get('ferrovia')
+        n_sections, bins = 60, 36
+        radius = np.full((n_sections, bins), 4.0, dtype=np.float32)
+        radius[10, bins // 4] = 0.5
+        valid = np.ones((n_sections, bins), dtype=bool)
+        grid = SectionGrid(radius, valid, template.gauge_center())
+        section_z = 1000.0 + np.arange(n_sections) * 0.5
+        section_z[31:] += 5.0
+        
+        image = wall_image(grid, section_z, template, 'folga', column_m=0.25)
+        assert image.shape == (bins, int((section_z[-1] - section_z[0]) / 0.25) + 1), "Tamanho da imagem incorreto"
+        assert image[bins // 2, 20] < 0 and np.nanmin(np.delete(image, [20, 21], axis=1)) > 0, \
+            "Invasão fora da coluna da seção"
+        assert not np.isnan(image[:, 21]).any() and np.isnan(image[:, 70]).all(), \
+            "Preenchimento entre seções incorreto"
+        classes = wall_image(grid, section_z, template, 'classe', column_m=0.25)
+        assert classes[bins // 2, 20] == 3 and classes[0, 0] == 1, "Classes da imagem incorretas"
+        assert wall_colors(classes, 'classe')[0, 70, 3] == 0, "Célula vazia deveria ser transparente"
+        
+        with tempfile.TemporaryDirectory() as directory:
+            key = {'sections': n_sections}
+            pyramid = WallPyramid.build(image, directory, 'folga', section_z[0], 0.25, key, tile=16)
+            assert pyramid.widths == [139, 70, 35, 18, 9], "Níveis da pirâmide incorretos"
+            
+            # Nível 2 = pior valor de cada grupo de 4 colunas
+            level2 = np.concatenate([pyramid.load_tile(2, tx) for tx in range(-(-pyramid.widths[2] // 16))], axis=1)
+            assert np.array_equal(level2, reduce_columns(reduce_columns(image, 'folga'), 'folga'), equal_nan=True), \
+                "Redução entre níveis incorreta"
+            assert np.nanmin(level2) == np.nanmin(image), "Invasão perdida no nível grosso"
+            
+            assert WallPyramid.open(directory, key) is not None, "Pirâmide gravada não abriu"
+            assert WallPyramid.open(directory, {'sections': 1}) is None, "Pirâmide de outra origem abriu"
+            assert list(pyramid.visible_tiles(1, 40, 70)) == [1, 2], "Tiles visíveis incorretos"
+            assert pyramid.level_for(2.0) == 0 and pyramid.level_for(0.3) == 1 and pyramid.level_for(0.01) == 4, \
+                "Escolha de nível incorreta"
+            
+            # Zoom mantém a coluna sob o cursor
+            view = WallViewRenderer(font=None)
+            view.set_pyramid(pyramid, 800, 600)
+            before = view.column_at(300, 800, 600)
+            view.zoom_at(4.0, 300, 800, 600)
+            assert abs(view.column_at(300, 800, 600) - before) < 1e-6, "Zoom deslocou a coluna sob o cursor"
+        
+        print(f"  ✅ Imagem {image.shape[0]} × {image.shape[1]}, {pyramid.levels} níveis\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste da vista desenrolada: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_overview_raster():
+    """Testa raster de visão geral (densidade, pior classe, níveis e clique no painel)"""
+    print("🧪 Testando visão geral...")
+    
+    try:
+        import numpy as np
+        import utils.overview_raster as overview_raster
+        from utils.overview_raster import OverviewRaster
+        from ui.overview_panel import OverviewPanel
+        
+        rng = np.random.default_rng(5)
+        n = 20000
+        zs = np.sort(rng.uniform(0.0, 500.0, n)).astype(np.float32)
+        xs = rng.uniform(-10.0, 10.0, n).astype(np.float32)
+        classes = np.zeros(n, dtype=np.uint8)
+        classes[(zs > 200) & (zs < 201) & (xs > 0) & (xs < 0.25)] = 2
+        
+        # Blocos pequenos: células atravessam a fronteira entre blocos
+        chunk = overview_raster.OVERVIEW_CHUNK
+        overview_raster.OVERVIEW_CHUNK = 777
+        try:
+            raster = OverviewRaster.compute(xs, zs, classes, cell_z=1.0, cell_x=0.25)
+        finally:
+            overview_raster.OVERVIEW_CHUNK = chunk
+        
+        density, worst = raster.levels[0]
+        inside = np.abs(xs) < 8.0
+        assert density.sum() == inside.sum() and raster.cols == 64, "Densidade incorreta"
+        expected = np.histogram2d(zs[inside], xs[inside], bins=(raster.rows, 64),
+                                  range=(raster.z_extent, raster.x_extent))[0]
+        assert np.array_equal(density, expected), "Contagem por célula incorreta"
+        assert worst[200, 32] == 3 and worst.max() == 3 and np.array_equal(worst > 0, density > 0), \
+            "Pior classe incorreta"
+        
+        # Níveis: somam densidade e guardam a invasão
+        for level_density, level_worst in raster.levels[1:]:
+            assert level_density.sum() == density.sum() and level_worst.max() == 3, "Nível perdeu pontos ou invasão"
+        assert len(raster.levels[-1][0]) <= overview_raster.OVERVIEW_MIN_ROWS, "Níveis insuficientes"
+        assert len(raster.levels[raster.level_for(200)][0]) <= 200, "Nível com mais linhas que pixels"
+        assert raster.rgba(0)[..., 3].astype(bool).sum() == (density > 0).sum(), "Células vazias visíveis"
+        
+        restored = OverviewRaster.from_arrays(raster.to_arrays())
+        assert np.array_equal(restored.levels[2][0], raster.levels[2][0]), "Raster restaurado difere"
+        assert OverviewRaster.from_arrays({}) is None, "Cache sem raster deveria dar None"
+        
+        # Clique no centro da imagem: meio da via, eixo da via
+        panel = OverviewPanel(1000, 800, font=None)
+        panel.set_raster(raster)
+        panel.visible = True
+        jumps = []
+        panel.on_jump = lambda x, z: jumps.append((x, z))
+        ix, iy, iw, ih = panel.image_rect()
+        assert panel.handle_click(ix + iw / 2, iy + ih / 2) and not panel.handle_click(10, 10), \
+            "Clique no painel não reconhecido"
+        assert abs(jumps[0][0]) < 1e-6 and abs(jumps[0][1] - sum(raster.z_extent) / 2) < 1e-6, \
+            "Clique levou a outro ponto"
+        
+        print(f"  ✅ {raster.rows} × {raster.cols} células, {len(raster.levels)} níveis\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste da visão geral: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_scene_layers():
+    """Testa cena com camadas (orçamentos, câmera deslocada, seleção, liberação da GPU)"""
+    print("🧪 Testando camadas da cena...")
+    
+    try:
+        from core.camera import Camera3D
+        from core.scene import Scene, SceneLayer, LayerCamera, MIN_LAYER_POINTS
+        import renderers.point_cloud as point_cloud
+        from renderers.point_cloud import PointCloudRenderer, POINT_BYTES
+        import numpy as np
+        
+        rng = np.random.default_rng(6)
+        scene = Scene(point_budget=100000, gpu_budget=1)
+        sizes = (50000, 90000)
+        for name, n in zip(("passagem1", "passagem2"), sizes):
+            z = rng.uniform(0, 100, n)
+            a = rng.uniform(0, np.pi, n)
+            renderer = PointCloudRenderer()
+            renderer.set_data(np.c_[3 * np.cos(a), 3 * np.sin(a), z].astype(np.float32),
+                              np.ones((n, 3), dtype=np.float32))
+            scene.add_layer(SceneLayer(name, renderer))
+        first, second = scene.layers
+        
+        # Orçamento repartido pelo tamanho (com mínimo) e refeito ao esconder
+        assert scene.active is second, "Camada nova deveria ficar ativa"
+        assert first.renderer.max_points_render == MIN_LAYER_POINTS, "Mínimo por camada não aplicado"
+        assert second.renderer.max_points_render == 100000 * 90000 // 140000, "Fração do orçamento incorreta"
+        assert second.memory_usage()['host'] >= 90000 * 16 and second.memory_usage()['gpu'] == 0, \
+            "Memória da camada incorreta"
+        
+        # Câmera no referencial da camada: mesmo teste de visibilidade
+        cam = Camera3D(distance=30.0, pitch=15.0, yaw=20.0)
+        cam.set_target(10, 2, 40)
+        offset = np.array([10.0, 0.5, -5.0])
+        layer_cam = LayerCamera(cam, offset)
+        points = rng.uniform(-20, 60, (1000, 3))
+        world = cam.get_frustum_planes()
+        local = layer_cam.get_frustum_planes()
+        assert np.allclose((points + offset) @ world[:, :3].T + world[:, 3],
+                           points @ local[:, :3].T + local[:, 3]), "Planos deslocados incorretos"
+        assert np.allclose(layer_cam.get_position(), np.subtract(cam.get_position(), offset)) \
+            and abs(layer_cam.target_z - 45.0) < 1e-9 and layer_cam.aspect == cam.aspect, \
+            "Posição/alvo da câmera deslocada incorretos"
+        
+        # Seleção: raio passando só pela camada deslocada acha o ponto dela
+        second.offset[:] = (50.0, 0.0, 0.0)
+        found = scene.pick((50.0, 1.0, -10.0), (0.0, 0.0, 1.0), 0.05)
+        assert found is not None and found[0] == 1 and abs(found[1]['position'][0]) < 3.1, \
+            "Seleção não achou a camada deslocada"
+        
+        # Escondida acima do orçamento de GPU: VBO liberado, volta ao mostrar
+        delete_buffers = point_cloud.glDeleteBuffers
+        point_cloud.glDeleteBuffers = lambda n, buffers: None  # Sem contexto OpenGL
+        try:
+            for layer in scene.layers:
+                layer.renderer.vbo = 0  # Simula VBO já enviado
+                layer.renderer._capacity = layer.renderer._uploaded = layer.renderer.n_vertices
+            assert scene.memory_usage()[1]['gpu'] == 90000 * POINT_BYTES, "Memória de GPU incorreta"
+            scene.set_visible(0, False)
+            assert first.renderer.vbo is None and first.renderer._gpu_released, "VBO da escondida não liberado"
+            assert second.renderer.vbo == 0, "VBO da camada visível liberado"
+            assert second.renderer.max_points_render == 90000, "Orçamento não refeito ao esconder"
+            second.renderer.vbo = None
+        finally:
+            point_cloud.glDeleteBuffers = delete_buffers
+        
+        print(f"  ✅ {len(scene.layers)} camadas, orçamentos {first.renderer.max_points_render:,}"
+              f" / {second.renderer.max_points_render:,}\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de camadas: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_km_tiles():
+    """Testa tiles de km em disco (gravação, abertura, leitura em fundo, LRU, seleção)"""
+    print("🧪 Testando tiles de km...")
+    
+    try:
+        import os
+        import tempfile
+        import time
+        from loaders.data_loader import UPLLoader
+        from loaders.km_tiles import KmTileStore
+        from renderers.tile_streaming import TiledPointCloud, TILE_POINT_BYTES
+        from utils.dataset_stats import DatasetStats
+        import numpy as np
+        
+        # 2000 seções de 100 pontos a partir do km 1,0 (um tile a cada 250 m)
+        rng = np.random.default_rng(11)
+        section_z = 1000.0 + np.arange(2000, dtype=np.float64)
+        offsets = np.arange(0, 200001, 100, dtype=np.int64)
+        a = rng.uniform(0, np.pi, 200000)
+        vertices = np.c_[3 * np.cos(a), 3 * np.sin(a), np.repeat(section_z - 1000.0, 100)].astype(np.float32)
+        colors = rng.uniform(0, 1, (200000, 3)).astype(np.float32)
+        classes = rng.integers(0, 3, 200000).astype(np.uint8)
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)  # Cache do loader no diretório temporário
+            try:
+                # Loader: grava uma vez, abre depois só com o índice
+                source = os.path.join(tmp, "trecho.upl")
+                with open(source, 'w') as f:
+                    f.write("dados")
+                loader = UPLLoader()
+                loader.section_z, loader.section_offsets = section_z, offsets
+                loader.section_desvios = loader.section_lats = loader.section_lons = np.zeros(2000)
+                loader.stats = DatasetStats.compute(vertices, offsets)
+                loader.classifications = classes
+                store = loader.build_tiles(source, vertices, colors, tile_m=250.0)
+                assert store.n_tiles == 8 and store.n_points == 200000, "Tiles gravados incorretos"
+                assert np.array_equal(store.index, np.arange(4, 12)), "Número dos tiles em km absoluto incorreto"
+                
+                reopened = UPLLoader()
+                store = reopened.open_tiles(source, tile_m=250.0)
+                assert store is not None and reopened.classifications is None, "Abertura dos tiles falhou"
+                assert np.array_equal(reopened.section_offsets, offsets) and reopened.stats.count == 200000, \
+                    "Índice das seções não restaurado"
+                assert reopened.open_tiles(source, tile_m=500.0) is None, "Tiles de outro tamanho aceitos"
+                
+                # Conjunto aberto direto: caixa de cada tile = limites dos seus pontos
+                direct = KmTileStore.open(store.directory, loader._tiles_key(source, 250.0))
+                assert direct is not None and KmTileStore.open(store.directory, {'outra': 'origem'}) is None, \
+                    "Chave de origem dos tiles ignorada"
+                for t in range(direct.n_tiles):
+                    points = vertices[direct.start[t]:direct.start[t] + direct.count[t]]
+                    assert np.allclose(direct.mins[t], points.min(axis=0)) and \
+                        np.allclose(direct.maxs[t], points.max(axis=0)), f"Caixa do tile {t} incorreta"
+                
+                # Trecho e leitura de um tile
+                assert list(store.tiles_near(300.0, 0.0)) == [1], "Tile do trecho incorreto"
+                assert list(store.tiles_near(300.0, 300.0)[:3]) == [1, 0, 2], "Tiles fora de ordem de distância"
+                tile = store.read(2)
+                start, count = store.start[2], store.count[2]
+                assert np.array_equal(tile['positions'], vertices[start:start + count]) \
+                    and np.array_equal(np.sort(tile['order']), np.arange(count)) \
+                    and np.array_equal(tile['classes'], classes[start:start + count]), "Tile lido incorreto"
+                
+                # Leitura em fundo e LRU: cabem dois tiles estimados
+                cloud = TiledPointCloud(store, reopened.stats, radius_m=0.0,
+                                        max_bytes=2 * 25000 * TILE_POINT_BYTES)
+                manager = cloud.manager
+                
+                def load_around(z):
+                    manager.update(z)
+                    deadline = time.time() + 10.0
+                    while manager.pending and time.time() < deadline:
+                        for adopted in manager.collect():
+                            cloud._configure(manager.resident[adopted].renderer)
+                        time.sleep(0.005)
+                
+                load_around(10.0)
+                load_around(300.0)
+                assert list(manager.resident) == [0, 1], "Tiles não adotados"
+                load_around(600.0)
+                assert 2 in manager.resident and 0 not in manager.resident and manager.evicted_count >= 1, \
+                    "Tile menos usado não liberado"
+                
+                # Seleção: índice no array original e classe lida do tile
+                hit = cloud.pick((0.0, 10.0, 620.0), (0.0, -1.0, 0.0), 0.05)
+                assert hit is not None and np.allclose(vertices[hit['index']], hit['position']), \
+                    "Índice global da seleção incorreto"
+                assert hit['class_id'] == classes[hit['index']], "Classe da seleção incorreta"
+                
+                cloud.clear()
+                assert not manager.resident and cloud.n_vertices == 0, "Tiles não liberados"
+            finally:
+                os.chdir(cwd)
+        
+        print(f"  ✅ {store.n_tiles} tiles, {manager.loaded_count} lidos em fundo, "
+              f"{manager.evicted_count} liberados\n")
+        return True
+    
+    except Exception as e:
+        print(f"  ❌ Erro no teste de tiles de km: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_stream_tiles():
+    """Testa gravação dos tiles em fluxo (mesmo resultado de load() + build_tiles())"""
+    print("🧪 Testando tiles de km em fluxo...")
+    
+    try:
+        import os
+        import shutil
+        import tempfile
+        from loaders.data_loader import UPLLoader
+        from loaders.km_tiles import KmTileStore
+        import numpy as np
+        
+        # 300 seções fora de ordem de km, algumas em dois registros, com GPS
+        # em curva, pontos (0, 0) e pontos acima de Y = 10 m (filtrados)
+        rng = np.random.default_rng(5)
+        records = [k for k in range(300)] + [7, 150, 299]
+        rng.shuffle(records)
+        linhas = []
+        for k in records:
+            lat, lon = -20.0 - k * 1e-4, -43.0 + 1e-3 * np.sin(k / 50.0)
+            linhas.append(';'.join(['EFVM', 'RH-1'] + ['0'] * 9 + [str(12 + k // 1000), str(k % 1000), '0',
+                                    f"{lat:.7f}".replace('.', ','), f"{lon:.7f}".replace('.', ',')]))
+            a = rng.uniform(0, np.pi, 30)
+            r = np.where(rng.random(30) < 0.1, 12000.0, 3000.0)
+            pares = [f"{r[j] * np.cos(a[j]):.1f};{r[j] * np.sin(a[j]):.1f}" for j in range(30)] + ["0;0"]
+            linhas.append(';'.join(pares))
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)  # Cache do loader no diretório temporário
+            try:
+                source = os.path.join(tmp, "trecho.upl")
+                with open(source, 'w') as f:
+                    f.write('\n'.join(linhas) + '\n')
+                
+                options = [{}, {'max_points': 4000}, {'curve_compensation': True, 'section_grid_bins': 32}]
+                for kwargs in options:
+                    # Referência: nuvem inteira em memória
+                    loader = UPLLoader(**kwargs)
+                    vertices, colors = loader.load(source)
+                    expected = loader.build_tiles(source, vertices, colors, tile_m=50.0)
+                    tiles = [expected.read(t) for t in range(expected.n_tiles)]
+                    shutil.rmtree(".cache")
+                    
+                    # Em fluxo, com lotes pequenos de seções
+                    streamed = UPLLoader(**kwargs)
+                    streamed.STATS_SECTION_BATCH = 7
+                    store = streamed.stream_tiles(source, tile_m=50.0)
+                    assert store is not None and store.n_points == len(vertices), f"Tiles em fluxo incorretos {kwargs}"
+                    assert not os.path.exists(streamed.cache_dir_for(source, 'stream')), "Temporários não apagados"
+                    for name in ('section_z', 'section_offsets', 'section_desvios', 'section_lats', 'section_lons'):
+                        assert np.array_equal(getattr(streamed, name), getattr(loader, name)), \
+                            f"Tabela de seções diferente ({name}, {kwargs})"
+                    assert np.allclose(streamed.stats.mins, loader.stats.mins) and \
+                        np.allclose(streamed.stats.maxs, loader.stats.maxs), f"Estatísticas diferentes {kwargs}"
+                    overview = streamed.overview.to_arrays()
+                    assert all(np.array_equal(overview[name], value)
+                               for name, value in loader.overview.to_arrays().items()), f"Visão geral diferente {kwargs}"
+                    if loader.section_grid is not None:
+                        assert np.array_equal(streamed.section_grid.radius, loader.section_grid.radius), \
+                            f"Grade angular diferente {kwargs}"
+                    assert store.n_tiles == len(tiles), f"Número de tiles diferente {kwargs}"
+                    for t, tile in enumerate(tiles):
+                        read = store.read(t)
+                        for name in ('positions', 'rgba', 'classes', 'order'):
+                            assert np.array_equal(read[name], tile[name]), f"Tile {t} difere em {name} ({kwargs})"
+                    assert UPLLoader(**kwargs).open_tiles(source, tile_m=50.0) is not None, "Tiles não reabertos"
+                    shutil.rmtree(".cache")
+            finally:
+                os.chdir(cwd)
+        
+        print(f"  ✅ {store.n_tiles} tiles em fluxo iguais aos de load() em {len(options)} configurações\n")
+        return True
+    
+    except Exception as e:
+        print(f"  ❌ Erro no teste de tiles em fluxo: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_dataset_stats():
+    """Testa estatísticas da nuvem (passada única por blocos e seções)"""
+    print("🧪 Testando DatasetStats...")
+    
+    try:
+        import numpy as np
+        import utils.dataset_stats as dataset_stats
+        from utils.dataset_stats import DatasetStats
+        
+        rng = np.random.default_rng(3)
+        vertices = rng.normal(size=(10000, 3)).astype(np.float32)
+        offsets = np.concatenate(([0], np.sort(rng.choice(np.arange(1, 10000), 40, replace=False)), [10000]))
+        
+        # Blocos pequenos: seções atravessam a fronteira entre blocos
+        chunk = dataset_stats.STATS_CHUNK
+        dataset_stats.STATS_CHUNK = 777
+        try:
+            stats = DatasetStats.compute(vertices, offsets)
+        finally:
+            dataset_stats.STATS_CHUNK = chunk
+        
+        assert np.allclose(stats.mins, vertices.min(axis=0)), "Mínimos incorretos"
+        assert np.allclose(stats.maxs, vertices.max(axis=0)), "Máximos incorretos"
+        assert np.allclose(stats.center, vertices.mean(axis=0, dtype=np.float64)), "Centro incorreto"
+        assert np.allclose(stats.percentile(50), np.median(vertices, axis=0)), "Mediana incorreta"
+        expected = np.maximum.reduceat(vertices, offsets[:-1], axis=0)
+        assert np.allclose(stats.section_maxs, expected), "Extensão por seção incorreta"
+        
+        # Ida e volta pelo formato do cache
+        restored = DatasetStats.from_arrays(stats.to_arrays())
+        assert restored.count == 10000 and np.allclose(restored.section_mins, stats.section_mins), \
+            "Estatísticas restauradas diferem"
+        assert DatasetStats.from_arrays({}) is None, "Cache sem estatísticas deveria dar None"
+        
+        print("  ✅ Todos os testes de DatasetStats passaram!\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste de estatísticas: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_redraw_scheduler():
+    """Testa agendador de redesenho por eventos"""
+    print("🧪 Testando RedrawScheduler...")
+    
+    try:
+        from core.redraw_scheduler import RedrawScheduler
+        
+        scheduler = RedrawScheduler(max_wait=0.5)
+        assert scheduler.needs_redraw(), "Primeiro frame deveria ser desenhado"
+        scheduler.frame_drawn()
+        assert not scheduler.needs_redraw(), "Cena parada não deveria redesenhar"
+        
+        # Espera até o timeout: continua ocioso; acordar cedo = evento
+        scheduler.record_wait(0.5, 0.5)
+        assert not scheduler.needs_redraw(), "Timeout sem evento pediu redesenho"
+        scheduler.record_wait(0.1, 0.5)
+        assert scheduler.needs_redraw(), "Evento durante a espera não pediu redesenho"
+        scheduler.frame_drawn()
+        
+        # Fonte contínua: desenha até ser desligada
+        scheduler.set_animating('auto_rotate', True)
+        scheduler.frame_drawn()
+        assert scheduler.needs_redraw(), "Animação ativa deveria redesenhar"
+        scheduler.set_animating('auto_rotate', False)
+        assert not scheduler.needs_redraw(), "Animação desligada ainda redesenha"
+        
+        scheduler.take_stats(0.0)
+        scheduler.record_wait(0.6, 0.5)
+        scheduler.frame_drawn()
+        stats = scheduler.take_stats(1.0)
+        assert stats['frames'] == 1 and abs(stats['idle_percent'] - 60.0) < 1e-6, "Estatísticas incorretas"
+        
+        print("  ✅ Todos os testes de RedrawScheduler passaram!\n")
+        return True
+        
+    except Exception as e:
+        print(f"  ❌ Erro no teste do agendador: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def main():
     """Executa todos os testes"""
     print("\n" + "="*60)
@@ -197,6 +1234,22 @@ def main():
     results.append(("Configuration", test_configuration()))
     results.append(("VectorFont", test_vector_font()))
     results.append(("PointCloudRenderer", test_point_cloud_renderer()))
+    results.append(("PointOctree", test_octree_lod()))
+    results.append(("FrustumCulling", test_frustum_culling()))
+    results.append(("ProgressiveOrder", test_progressive_order()))
+    results.append(("AdaptiveBudget", test_adaptive_budget()))
+    results.append(("ProgressiveRefinement", test_progressive_refinement()))
+    results.append(("PointPicking", test_point_picking()))
+    results.append(("VisibilityFilters", test_visibility_filters()))
+    results.append(("TunnelMesh", test_tunnel_mesh()))
+    results.append(("SectionGrid", test_section_grid()))
+    results.append(("WallView", test_wall_view()))
+    results.append(("OverviewRaster", test_overview_raster()))
+    results.append(("SceneLayers", test_scene_layers()))
+    results.append(("KmTiles", test_km_tiles()))
+    results.append(("StreamTiles", test_stream_tiles()))
+    results.append(("DatasetStats", test_dataset_stats()))
+    results.append(("RedrawScheduler", test_redraw_scheduler()))
     
     print("="*60)
     print("📊 RESULTADOS")
@@ -37,6 +37,12 @@ class GabaritSelectorMenu:
         # Callback quando gabarito é selecionado
         self.on_gabarit_selected = None
     
+    def refresh(self):
+        """Relê a lista de gabaritos do registro (após registrar/recarregar gabaritos)"""
+        self.gabarits = TemplateRegistry.list_all()
+        self.gabarits_names = TemplateRegistry.get_names()
+        self.selected_index = min(self.selected_index, max(len(self.gabarits) - 1, 0))
+    
     def toggle(self):
         """Abre/fecha o menu"""
         self.visible = not self.visible
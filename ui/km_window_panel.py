@@ -0,0 +1,133 @@
+"""
+Janela de km na parte inferior da tela
+Par de sliders (início e fim) que limita a nuvem desenhada a um trecho da via
+"""
+
+from OpenGL.GL import *
+
+from ui.components import Panel, Slider
+
+
+class KmWindowPanel:
+    """Painel com dois sliders de km; arrastar um deles muda o trecho visível"""
+    
+    def __init__(self, width, height, font):
+        """
+        Inicializa painel
+        
+        Args:
+            width, height: Dimensões da tela
+            font: VectorFont para renderizar texto
+        """
+        self.font = font
+        self.visible = False
+        self.km_min = 0.0
+        self.km_max = 1.0
+        
+        self.panel_height = 110
+        self.panel = Panel(0, 0, 0, self.panel_height, bg_color=(0.05, 0.05, 0.1, 0.85))
+        self.start_slider = Slider(0, 0, 0, 20, min_value=0.0, max_value=1.0, value=0.0)
+        self.end_slider = Slider(0, 0, 0, 20, min_value=0.0, max_value=1.0, value=1.0)
+        self.start_slider.on_change_callback = lambda s, value: self._on_slider(s)
+        self.end_slider.on_change_callback = lambda s, value: self._on_slider(s)
+        self.panel.add_component(self.start_slider)
+        self.panel.add_component(self.end_slider)
+        self.dragging = None  # Slider sendo arrastado
+        
+        # Callback on_change(km_inicial, km_final)
+        self.on_change = None
+        
+        self.update_size(width, height)
+    
+    def update_size(self, width, height):
+        """Reposiciona o painel (centralizado, acima da borda inferior)"""
+        panel_width = min(800, max(300, width - 380))
+        self.panel.x = (width - panel_width) / 2
+        self.panel.y = 20
+        self.panel.width = panel_width
+        
+        for row, slider in enumerate((self.end_slider, self.start_slider)):
+            slider.x = self.panel.x + 80
+            slider.y = self.panel.y + 15 + row * 35
+            slider.width = panel_width - 100
+    
+    def set_range(self, km_min, km_max):
+        """
+        Define os limites dos sliders (extensão da via carregada) e abre a janela inteira
+        
+        Args:
+            km_min, km_max: Primeiro e último km do arquivo
+        """
+        self.km_min = float(km_min)
+        self.km_max = float(max(km_max, km_min + 1e-3))
+        for slider in (self.start_slider, self.end_slider):
+            slider.min_value, slider.max_value = self.km_min, self.km_max
+        self.start_slider.value = self.km_min
+        self.end_slider.value = self.km_max
+    
+    def window(self):
+        """Trecho atual (km_inicial, km_final)"""
+        return self.start_slider.value, self.end_slider.value
+    
+    def is_full(self):
+        """True se a janela cobre a via inteira (sem filtro)"""
+        return self.start_slider.value <= self.km_min and self.end_slider.value >= self.km_max
+    
+    def _on_slider(self, slider):
+        """Mantém início <= fim (o slider arrastado empurra o outro) e avisa"""
+        if slider is self.start_slider:
+            self.end_slider.value = max(self.end_slider.value, slider.value)
+        else:
+            self.start_slider.value = min(self.start_slider.value, slider.value)
+        if self.on_change:
+            self.on_change(*self.window())
+    
+    def handle_click(self, x, y):
+        """
+        Processa clique (coordenadas OpenGL)
+        
+        Returns:
+            True se o clique foi no painel
+        """
+        if not self.visible or not self.panel.contains_point(x, y):
+            return False
+        for slider in (self.start_slider, self.end_slider):
+            # Área de toque um pouco maior que a barra (alça circular)
+            if slider.x - 10 <= x <= slider.x + slider.width + 10 and abs(y - slider.y - slider.height / 2) <= 15:
+                self.dragging = slider
+                slider.on_click(x, y)
+                break
+        return True
+    
+    def handle_drag(self, x, y):
+        """
+        Arrasta o slider pressionado
+        
+        Returns:
+            True se havia slider sendo arrastado
+        """
+        if self.dragging is None:
+            return False
+        self.dragging.on_click(x, y)
+        return True
+    
+    def handle_release(self):
+        """Solta o slider arrastado"""
+        self.dragging = None
+    
+    def render(self):
+        """Renderiza o painel"""
+        if not self.visible:
+            return
+        
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.panel.draw()
+        
+        start, end = self.window()
+        x, top = self.panel.x, self.panel.y + self.panel_height
+        self.font.draw_text(x + 10, top - 22, f"TRECHO KM {start:.3f} A {end:.3f}",
+                            color=(1, 1, 0.6), font_size=0.8)
+        self.font.draw_text(x + 10, self.start_slider.y + 4, "INICIO", color=(0.9, 0.9, 0.9), font_size=0.7)
+        self.font.draw_text(x + 10, self.end_slider.y + 4, "FIM", color=(0.9, 0.9, 0.9), font_size=0.7)
+        glDisable(GL_BLEND)
@@ -0,0 +1,137 @@
+"""
+Painel de camadas da cena
+Uma linha por camada: caixa de visibilidade, nome (clique = camada ativa),
+pontos e memória ocupada na GPU e na RAM, com o total contra o orçamento
+"""
+
+from OpenGL.GL import *
+
+from ui.components import Panel
+
+
+MB = 1024.0 * 1024.0
+
+
+class LayersPanel:
+    """Lista das camadas à esquerda, acima da janela de km"""
+    
+    def __init__(self, width, height, font):
+        """
+        Inicializa painel
+        
+        Args:
+            width, height: Dimensões da tela
+            font: VectorFont para renderizar texto
+        """
+        self.font = font
+        self.visible = False
+        self.scene = None
+        
+        self.panel_width = 420
+        self.row_height = 22
+        self.panel = Panel(10, 0, self.panel_width, 0, bg_color=(0.05, 0.05, 0.1, 0.85))
+        
+        # Callbacks on_toggle(índice) e on_select(índice)
+        self.on_toggle = None
+        self.on_select = None
+        
+        self.update_size(width, height)
+    
+    def update_size(self, width, height):
+        """Reposiciona o painel (à esquerda, acima da janela de km)"""
+        self._layout()
+    
+    def _layout(self):
+        """Altura pelo número de camadas (cresce para cima)"""
+        rows = len(self.scene.layers) if self.scene is not None else 0
+        self.panel.height = 55 + max(rows, 1) * self.row_height
+        self.panel.y = 140
+    
+    def set_scene(self, scene):
+        """Cena cujas camadas são listadas"""
+        self.scene = scene
+        self._layout()
+    
+    def _row_y(self, index):
+        """Base (y) da linha de uma camada"""
+        return self.panel.y + self.panel.height - 30 - (index + 1) * self.row_height
+    
+    def handle_click(self, x, y):
+        """
+        Processa clique (coordenadas OpenGL)
+        
+        Returns:
+            True se o clique foi no painel
+        """
+        if not self.visible or self.scene is None or not self.panel.contains_point(x, y):
+            return False
+        for index in range(len(self.scene.layers)):
+            row_y = self._row_y(index)
+            if not row_y <= y < row_y + self.row_height:
+                continue
+            if x < self.panel.x + 30:
+                if self.on_toggle:
+                    self.on_toggle(index)
+            elif self.on_select:
+                self.on_select(index)
+            break
+        return True
+    
+    def render(self):
+        """Renderiza o painel"""
+        if not self.visible or self.scene is None:
+            return
+        self._layout()
+        
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.panel.draw()
+        
+        x, top = self.panel.x, self.panel.y + self.panel.height
+        self.font.draw_text(x + 10, top - 22, "CAMADAS", color=(1, 1, 0.6), font_size=0.8)
+        
+        usage = self.scene.memory_usage()
+        for index, layer in enumerate(self.scene.layers):
+            row_y = self._row_y(index)
+            active = index == self.scene.active_index
+            if active:
+                glColor4f(0.3, 0.5, 0.9, 0.35)
+                glBegin(GL_QUADS)
+                glVertex2f(x + 4, row_y)
+                glVertex2f(x + self.panel_width - 4, row_y)
+                glVertex2f(x + self.panel_width - 4, row_y + self.row_height)
+                glVertex2f(x + 4, row_y + self.row_height)
+                glEnd()
+            
+            # Caixa de visibilidade
+            bx, by = x + 10, row_y + 5
+            glColor3f(0.9, 0.9, 0.9)
+            glBegin(GL_LINE_LOOP)
+            glVertex2f(bx, by)
+            glVertex2f(bx + 12, by)
+            glVertex2f(bx + 12, by + 12)
+            glVertex2f(bx, by + 12)
+            glEnd()
+            if layer.visible:
+                glColor3f(0.4, 1.0, 0.4)
+                glBegin(GL_QUADS)
+                glVertex2f(bx + 3, by + 3)
+                glVertex2f(bx + 9, by + 3)
+                glVertex2f(bx + 9, by + 9)
+                glVertex2f(bx + 3, by + 9)
+                glEnd()
+            
+            color = (1, 1, 1) if active else (0.8, 0.8, 0.8)
+            self.font.draw_text(x + 32, row_y + 6, layer.name[:18].upper(), color=color, font_size=0.65)
+            info = (f"{layer.renderer.n_vertices / 1e6:.1f}M GPU {usage[index]['gpu'] / MB:.0f} "
+                    f"RAM {usage[index]['host'] / MB:.0f} MB")
+            self.font.draw_text(x + 190, row_y + 6, info, color=(0.7, 0.9, 1.0), font_size=0.6)
+        
+        # Totais contra o orçamento
+        gpu = sum(u['gpu'] for u in usage) / MB
+        host = sum(u['host'] for u in usage) / MB
+        gpu_text = f"GPU {gpu:.0f}" + (f" DE {self.scene.gpu_budget / MB:.0f}" if self.scene.gpu_budget else "")
+        host_text = f"RAM {host:.0f}" + (f" DE {self.scene.host_budget / MB:.0f}" if self.scene.host_budget else "")
+        self.font.draw_text(x + 10, self.panel.y + 8, f"TOTAL {gpu_text} MB  {host_text} MB",
+                            color=(0.9, 0.9, 0.9), font_size=0.6)
+        glDisable(GL_BLEND)
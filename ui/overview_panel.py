@@ -0,0 +1,171 @@
+"""
+Painel de visão geral da via
+Raster da nuvem vista de cima (densidade e pior classe) como textura, com a
+posição da câmera; clicar leva o alvo da câmera ao km clicado
+"""
+
+from OpenGL.GL import *
+import numpy as np
+
+from ui.components import Panel
+
+
+class OverviewPanel:
+    """Faixa vertical à direita com a via inteira (Z para cima, X lateral na largura)"""
+    
+    def __init__(self, width, height, font):
+        """
+        Inicializa painel
+        
+        Args:
+            width, height: Dimensões da tela
+            font: VectorFont para renderizar texto
+        """
+        self.font = font
+        self.visible = False
+        self.raster = None
+        self.z_to_km = None   # Converte Z dos vértices em km (rótulos)
+        self.camera = None    # ((x, z) da câmera, (x, z) do alvo) no referencial do raster
+        self._texture = None
+        self._texture_level = None
+        
+        self.panel_width = 130
+        self.panel = Panel(0, 0, self.panel_width, 0, bg_color=(0.05, 0.05, 0.1, 0.85))
+        
+        # Callback on_jump(x, z): clique no mapa (referencial do raster)
+        self.on_jump = None
+        
+        self.update_size(width, height)
+    
+    def update_size(self, width, height):
+        """Reposiciona o painel (à direita, entre a janela de km e a barra de menu)"""
+        self.panel.x = width - self.panel_width - 10
+        self.panel.y = 140
+        self.panel.height = max(100, height - 140 - 40)
+    
+    def image_rect(self):
+        """Área da imagem dentro do painel (x, y, largura, altura)"""
+        return (self.panel.x + 10, self.panel.y + 25,
+                self.panel_width - 20, self.panel.height - 50)
+    
+    def set_raster(self, raster, z_to_km=None):
+        """
+        Troca o raster mostrado
+        
+        Args:
+            raster: OverviewRaster ou None
+            z_to_km: Função Z -> km para os rótulos (None = mostra Z em m)
+        """
+        self.cleanup()
+        self.raster = raster
+        self.z_to_km = z_to_km
+    
+    def set_camera(self, eye, target):
+        """Posição (x, z) da câmera e do alvo, no referencial do raster"""
+        self.camera = (eye, target)
+    
+    def _to_screen(self, x, z):
+        """Ponto (x, z) do raster em coordenadas de tela (preso à área da imagem)"""
+        ix, iy, iw, ih = self.image_rect()
+        (x0, x1), (z0, z1) = self.raster.x_extent, self.raster.z_extent
+        fx = min(max((x - x0) / (x1 - x0), 0.0), 1.0)
+        fz = min(max((z - z0) / (z1 - z0), 0.0), 1.0)
+        return ix + fx * iw, iy + fz * ih
+    
+    def handle_click(self, x, y):
+        """
+        Processa clique (coordenadas OpenGL)
+        
+        Returns:
+            True se o clique foi no painel
+        """
+        if not self.visible or self.raster is None or not self.panel.contains_point(x, y):
+            return False
+        ix, iy, iw, ih = self.image_rect()
+        if ix <= x <= ix + iw and iy <= y <= iy + ih and self.on_jump:
+            (x0, x1), (z0, z1) = self.raster.x_extent, self.raster.z_extent
+            self.on_jump(x0 + (x - ix) / iw * (x1 - x0), z0 + (y - iy) / ih * (z1 - z0))
+        return True
+    
+    def render(self):
+        """Renderiza o painel"""
+        if not self.visible or self.raster is None:
+            return
+        
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.panel.draw()
+        
+        ix, iy, iw, ih = self.image_rect()
+        level = self.raster.level_for(ih)
+        if self._texture is None or self._texture_level != level:
+            self._upload(level)
+        
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self._texture)
+        glColor4f(1.0, 1.0, 1.0, 1.0)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0.0, 0.0)
+        glVertex2f(ix, iy)
+        glTexCoord2f(1.0, 0.0)
+        glVertex2f(ix + iw, iy)
+        glTexCoord2f(1.0, 1.0)
+        glVertex2f(ix + iw, iy + ih)
+        glTexCoord2f(0.0, 1.0)
+        glVertex2f(ix, iy + ih)
+        glEnd()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_TEXTURE_2D)
+        
+        # Câmera: linha até o alvo e marca no km do alvo
+        if self.camera is not None:
+            (ex, ez), (tx, tz) = self.camera
+            eye = self._to_screen(ex, ez)
+            target = self._to_screen(tx, tz)
+            glColor3f(0.3, 0.8, 1.0)
+            glLineWidth(1.5)
+            glBegin(GL_LINES)
+            glVertex2f(*eye)
+            glVertex2f(*target)
+            glVertex2f(ix, target[1])
+            glVertex2f(ix + iw, target[1])
+            glEnd()
+            glLineWidth(1.0)
+            glPointSize(6.0)
+            glBegin(GL_POINTS)
+            glVertex2f(*eye)
+            glEnd()
+            glPointSize(1.0)
+        
+        z0, z1 = self.raster.z_extent
+        labels = ((z0, iy - 15), (z1, iy + ih + 6))
+        for z, y in labels:
+            text = f"KM {self.z_to_km(z):.3f}" if self.z_to_km else f"Z {z:.0f}"
+            self.font.draw_text(ix, y, text, color=(0.9, 0.9, 0.9), font_size=0.6)
+        glDisable(GL_BLEND)
+    
+    def _upload(self, level):
+        """Envia a imagem de um nível do raster como textura"""
+        if self._texture is None:
+            self._texture = glGenTextures(1)
+        rgba = np.ascontiguousarray(self.raster.rgba(level))
+        glBindTexture(GL_TEXTURE_2D, self._texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, rgba.shape[1], rgba.shape[0], 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, rgba)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self._texture_level = level
+    
+    def cleanup(self):
+        """Libera a textura"""
+        if self._texture is not None:
+            try:
+                glDeleteTextures([self._texture])
+            except Exception:
+                pass
+        self._texture = None
+        self._texture_level = None
@@ -0,0 +1,154 @@
+"""
+Estatísticas de classificação por faixa de km ao longo da via
+Agrega contagens seguro/alerta/invasão e folga mínima em bins (ex: 100 m)
+"""
+
+import csv
+import json
+import numpy as np
+
+
+CLASS_NAMES = ('seguro', 'alerta', 'invasao')
+
+
+class SectionStatsAggregator:
+    """
+    Agregador incremental de estatísticas por bin de km
+    
+    Recebe lotes de seções já classificadas (add_sections) e acumula, por bin
+    de tamanho fixo ao longo de Z, as contagens de cada classe e a folga mínima.
+    O trabalho por ponto é só uma redução por seção (reduceat sobre os offsets);
+    o agrupamento em bins usa bincount sobre o km de cada seção.
+    
+    Uso:
+        stats = SectionStatsAggregator(bin_size=100.0)
+        stats.add_sections(section_z, offsets, classes, clearance)
+        stats.to_csv("relatorio.csv")
+    """
+    
+    def __init__(self, bin_size=100.0):
+        """
+        Args:
+            bin_size: Tamanho de cada bin ao longo da via, em metros
+        """
+        self.bin_size = float(bin_size)
+        
+        # Bins acumulados: índice absoluto do primeiro bin + arrays por bin
+        self._first_bin = None
+        self._counts = np.zeros((len(CLASS_NAMES), 0), dtype=np.int64)
+        self._min_clearance = np.zeros(0, dtype=np.float64)
+    
+    def _ensure_bins(self, bin_min, bin_max):
+        """Expande os arrays para cobrir os bins [bin_min, bin_max]"""
+        if self._first_bin is None:
+            self._first_bin = bin_min
+        
+        pad_before = max(0, self._first_bin - bin_min)
+        last_bin = self._first_bin + self._counts.shape[1] - 1
+        pad_after = max(0, bin_max - last_bin)
+        
+        if pad_before or pad_after:
+            self._counts = np.pad(self._counts, ((0, 0), (pad_before, pad_after)))
+            self._min_clearance = np.pad(self._min_clearance, (pad_before, pad_after),
+                                         constant_values=np.inf)
+            self._first_bin -= pad_before
+    
+    def add_sections(self, section_z, section_offsets, classifications, clearance=None):
+        """
+        Acumula um lote de seções classificadas
+        
+        Args:
+            section_z: Array (S,) com a posição de cada seção ao longo da via (m)
+            section_offsets: Array (S+1,) com o início de cada seção em
+                classifications/clearance (pontos de uma seção são contíguos)
+            classifications: Array (N,) de classes 0/1/2 do lote
+            clearance: Array (N,) opcional com a folga de cada ponto (m)
+        """
+        section_z = np.asarray(section_z, dtype=np.float64)
+        section_offsets = np.asarray(section_offsets)
+        
+        # reduceat não aceita segmentos vazios: descarta seções sem pontos
+        nonempty = np.diff(section_offsets) > 0
+        if not nonempty.any():
+            return
+        starts = section_offsets[:-1][nonempty]
+        section_z = section_z[nonempty]
+        
+        bins = np.floor(section_z / self.bin_size).astype(np.int64)
+        self._ensure_bins(int(bins.min()), int(bins.max()))
+        local = bins - self._first_bin
+        n_bins = self._counts.shape[1]
+        
+        for cls in range(len(CLASS_NAMES)):
+            per_section = np.add.reduceat(classifications == cls, starts, dtype=np.int64)
+            self._counts[cls] += np.bincount(local, weights=per_section,
+                                             minlength=n_bins).astype(np.int64)
+        
+        if clearance is not None:
+            per_section = np.minimum.reduceat(clearance, starts)
+            np.minimum.at(self._min_clearance, local, per_section)
+    
+    def get_bins(self):
+        """
+        Retorna as estatísticas acumuladas (somente bins com pontos)
+        
+        Returns:
+            Dicionário de arrays: z_start, z_end, seguro, alerta, invasao,
+            total e min_clearance (NaN quando a folga não foi informada)
+        """
+        if self._first_bin is None:
+            empty = np.zeros(0)
+            return {key: empty for key in
+                    ('z_start', 'z_end') + CLASS_NAMES + ('total', 'min_clearance')}
+        
+        total = self._counts.sum(axis=0)
+        used = total > 0
+        z_start = (np.arange(self._counts.shape[1]) + self._first_bin) * self.bin_size
+        
+        min_clearance = self._min_clearance.copy()
+        min_clearance[np.isinf(min_clearance)] = np.nan
+        
+        result = {
+            'z_start': z_start[used],
+            'z_end': z_start[used] + self.bin_size,
+        }
+        for cls, name in enumerate(CLASS_NAMES):
+            result[name] = self._counts[cls][used]
+        result['total'] = total[used]
+        result['min_clearance'] = min_clearance[used]
+        return result
+    
+    def to_rows(self):
+        """Retorna as estatísticas como lista de dicionários (um por bin)"""
+        bins = self.get_bins()
+        keys = list(bins.keys())
+        rows = []
+        for i in range(len(bins['z_start'])):
+            row = {}
+            for key in keys:
+                value = bins[key][i]
+                if key == 'min_clearance':
+                    row[key] = None if np.isnan(value) else round(float(value), 4)
+                elif key in ('z_start', 'z_end'):
+                    row[key] = float(value)
+                else:
+                    row[key] = int(value)
+            rows.append(row)
+        return rows
+    
+    def to_csv(self, filepath):
+        """Exporta estatísticas por bin para CSV"""
+        rows = self.to_rows()
+        fieldnames = ['z_start', 'z_end', *CLASS_NAMES, 'total', 'min_clearance']
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"📄 Estatísticas por km exportadas: {filepath} ({len(rows)} bins)")
+    
+    def to_json(self, filepath):
+        """Exporta estatísticas por bin para JSON"""
+        rows = self.to_rows()
+        with open(filepath, 'w') as f:
+            json.dump({'bin_size': self.bin_size, 'bins': rows}, f, indent=2)
+        print(f"📄 Estatísticas por km exportadas: {filepath} ({len(rows)} bins)")
@@ -0,0 +1,164 @@
+"""
+Estatísticas de uma nuvem de pontos calculadas uma vez por carga
+Limites, centro, percentis por eixo e extensão de cada seção, guardados no
+cache junto com os vértices para enquadramento de câmera e HUD sem custo
+"""
+
+import numpy as np
+
+
+# Pontos por bloco da passada única (limita temporários e fica no cache da CPU)
+STATS_CHUNK = 1 << 20
+
+# Percentis por eixo calculados por padrão (1% e 99% ignoram pontos espúrios)
+DEFAULT_PERCENTILES = (1.0, 50.0, 99.0)
+
+
+class DatasetStats:
+    """
+    Estatísticas imutáveis de uma nuvem (N, 3)
+    
+    Calcule com DatasetStats.compute() ao carregar os dados e descarte quando
+    eles mudarem; to_arrays()/from_arrays() guardam e restauram pelo .npz do cache.
+    
+    Atributos:
+        count: Número de pontos
+        mins, maxs: Arrays (3,) com os limites
+        center: Array (3,) com a média dos pontos
+        percentile_q: Percentis calculados (ex: (1, 50, 99))
+        percentile_values: Array (len(q), 3) com os valores por eixo
+        section_mins, section_maxs: Arrays (S, 3) por seção, ou None
+    """
+    
+    def __init__(self, count, mins, maxs, center, percentile_q, percentile_values,
+                 section_mins=None, section_maxs=None):
+        self.count = int(count)
+        self.mins = np.asarray(mins, dtype=np.float64)
+        self.maxs = np.asarray(maxs, dtype=np.float64)
+        self.center = np.asarray(center, dtype=np.float64)
+        self.percentile_q = tuple(float(q) for q in percentile_q)
+        self.percentile_values = np.asarray(percentile_values, dtype=np.float64)
+        self.section_mins = section_mins
+        self.section_maxs = section_maxs
+    
+    @classmethod
+    def compute(cls, vertices, section_offsets=None, percentiles=DEFAULT_PERCENTILES,
+                sample_size=1000000):
+        """
+        Calcula as estatísticas em uma passada por blocos
+        
+        Cada bloco dá mínimo, máximo e soma; com tabela de seções, o mínimo e o
+        máximo do bloco saem das extensões parciais das seções que ele cobre
+        (reduceat), sem varrer os pontos de novo. Percentis usam uma amostra
+        regular de até sample_size pontos (exatos abaixo disso).
+        
+        Args:
+            vertices: Array (N, 3), inclusive np.memmap
+            section_offsets: Offsets (S + 1,) de seções contíguas e não vazias
+                (ver UPLLoader.section_offsets), ou None
+            percentiles: Percentis por eixo a calcular
+            sample_size: Máximo de pontos usados nos percentis
+        
+        Returns:
+            DatasetStats
+        """
+        n = len(vertices)
+        if n == 0:
+            zeros = np.zeros(3)
+            return cls(0, zeros, zeros, zeros, percentiles, np.zeros((len(percentiles), 3)))
+        
+        mins = np.full(3, np.inf)
+        maxs = np.full(3, -np.inf)
+        total = np.zeros(3)
+        
+        section_mins = section_maxs = None
+        if section_offsets is not None:
+            offsets = np.asarray(section_offsets, dtype=np.int64)
+            section_mins = np.full((len(offsets) - 1, 3), np.inf)
+            section_maxs = np.full((len(offsets) - 1, 3), -np.inf)
+        
+        for start in range(0, n, STATS_CHUNK):
+            block = vertices[start:start + STATS_CHUNK]
+            end = start + len(block)
+            total += block.sum(axis=0, dtype=np.float64)
+            
+            if section_mins is None:
+                block_min = block.min(axis=0)
+                block_max = block.max(axis=0)
+            else:
+                # Seções que cruzam o bloco [start, end)
+                first = np.searchsorted(offsets, start, side='right') - 1
+                last = np.searchsorted(offsets, end, side='left')
+                local = np.maximum(offsets[first:last], start) - start
+                part_min = np.minimum.reduceat(block, local, axis=0)
+                part_max = np.maximum.reduceat(block, local, axis=0)
+                np.minimum(section_mins[first:last], part_min, out=section_mins[first:last])
+                np.maximum(section_maxs[first:last], part_max, out=section_maxs[first:last])
+                block_min = part_min.min(axis=0)
+                block_max = part_max.max(axis=0)
+            
+            np.minimum(mins, block_min, out=mins)
+            np.maximum(maxs, block_max, out=maxs)
+        
+        step = max(1, n // sample_size)
+        sample = np.asarray(vertices[::step], dtype=np.float64)
+        values = np.percentile(sample, percentiles, axis=0)
+        
+        return cls(n, mins, maxs, total / n, percentiles, values, section_mins, section_maxs)
+    
+    @property
+    def size(self):
+        """Dimensões da caixa envolvente (3,)"""
+        return self.maxs - self.mins
+    
+    def bounds(self):
+        """Limites no formato de PointCloudRenderer.get_bounds()"""
+        return tuple(self.mins), tuple(self.maxs)
+    
+    def percentile(self, q):
+        """
+        Valores (3,) de um percentil já calculado
+        
+        Raises:
+            KeyError se q não estiver em percentile_q
+        """
+        try:
+            row = self.percentile_q.index(float(q))
+        except ValueError:
+            raise KeyError(f"Percentil {q} não calculado (disponíveis: {self.percentile_q})")
+        return self.percentile_values[row]
+    
+    def to_arrays(self, prefix='stats_'):
+        """Dicionário de arrays para np.savez (ver from_arrays)"""
+        arrays = {
+            prefix + 'count': np.array(self.count, dtype=np.int64),
+            prefix + 'mins': self.mins,
+            prefix + 'maxs': self.maxs,
+            prefix + 'center': self.center,
+            prefix + 'percentile_q': np.array(self.percentile_q),
+            prefix + 'percentile_values': self.percentile_values,
+        }
+        if self.section_mins is not None:
+            arrays[prefix + 'section_mins'] = self.section_mins
+            arrays[prefix + 'section_maxs'] = self.section_maxs
+        return arrays
+    
+    @classmethod
+    def from_arrays(cls, cached, prefix='stats_'):
+        """
+        Restaura de um .npz (ou dicionário) gravado com to_arrays
+        
+        Returns:
+            DatasetStats ou None se o cache não tiver as estatísticas
+        """
+        keys = cached.files if hasattr(cached, 'files') else cached.keys()
+        if prefix + 'count' not in keys:
+            return None
+        
+        section_mins = section_maxs = None
+        if prefix + 'section_mins' in keys:
+            section_mins = cached[prefix + 'section_mins']
+            section_maxs = cached[prefix + 'section_maxs']
+        return cls(cached[prefix + 'count'], cached[prefix + 'mins'], cached[prefix + 'maxs'],
+                   cached[prefix + 'center'], cached[prefix + 'percentile_q'],
+                   cached[prefix + 'percentile_values'], section_mins, section_maxs)
@@ -0,0 +1,177 @@
+"""
+Raster de visão geral da nuvem vista de cima
+Grade (Z ao longo da via × X lateral no referencial do gabarito) com a
+densidade de pontos e a pior classe de cada célula, em níveis que dividem Z
+por 2; calculada uma vez por carga e guardada no cache com os vértices
+"""
+
+import numpy as np
+
+from utils.tunnel_templates import CLASS_COLORS
+
+
+# Pontos por bloco na passada de agregação (limita temporários)
+OVERVIEW_CHUNK = 1 << 20
+
+# Níveis são reduzidos até ter no máximo tantas linhas
+OVERVIEW_MIN_ROWS = 64
+
+
+class OverviewRaster:
+    """
+    Densidade e pior classe por célula da planta (linhas = Z, colunas = X)
+    
+    Calcule com OverviewRaster.compute() ao carregar os dados; to_arrays()/
+    from_arrays() guardam e restauram o nível 0 pelo .npz do cache e os
+    demais níveis são refeitos na criação.
+    
+    Atributos:
+        levels: Lista de tuplas (density uint32, worst uint8) por nível;
+            worst é a classe + 1 (0 = célula vazia)
+        z0, x0: Coordenadas da borda da primeira linha e da primeira coluna
+        cell_z, cell_x: Tamanho (m) da célula no nível 0
+    """
+    
+    def __init__(self, density, worst, z0, x0, cell_z, cell_x):
+        self.z0 = float(z0)
+        self.x0 = float(x0)
+        self.cell_z = float(cell_z)
+        self.cell_x = float(cell_x)
+        
+        density = np.asarray(density, dtype=np.uint32)
+        worst = np.asarray(worst, dtype=np.uint8)
+        self.levels = [(density, worst)]
+        while len(density) > OVERVIEW_MIN_ROWS:
+            if len(density) % 2:
+                density = np.concatenate((density, np.zeros((1, density.shape[1]), dtype=density.dtype)))
+                worst = np.concatenate((worst, np.zeros((1, worst.shape[1]), dtype=worst.dtype)))
+            density = density[0::2] + density[1::2]
+            worst = np.maximum(worst[0::2], worst[1::2])
+            self.levels.append((density, worst))
+    
+    @classmethod
+    def compute(cls, xs, zs, classes=None, cell_z=1.0, cell_x=0.25, x_range=(-8.0, 8.0)):
+        """
+        Agrega os pontos na grade numa passada por blocos
+        
+        Uma contagem (bincount) por classe dá a densidade e a pior classe de
+        cada célula sem ufunc.at; cada bloco conta só nas linhas que cobre
+        (poucas, com os pontos em ordem de seção). Pontos fora de x_range
+        são ignorados.
+        
+        Args:
+            xs: Coordenada lateral (N,) no referencial do gabarito
+                (ver UPLLoader.get_gauge_coordinates)
+            zs: Posição ao longo da via (N,)
+            classes: Classes uint8 (N,) ou None (tudo Seguro)
+            cell_z, cell_x: Tamanho (m) da célula
+            x_range: Faixa lateral (m) coberta
+        
+        Returns:
+            OverviewRaster
+        """
+        n = len(zs)
+        z0 = float(np.min(zs)) if n else 0.0
+        rows = int((float(np.max(zs)) - z0) // cell_z) + 1 if n else 1
+        cols = int(np.ceil((x_range[1] - x_range[0]) / cell_x))
+        density = np.zeros(rows * cols, dtype=np.uint32)
+        worst = np.zeros(rows * cols, dtype=np.uint8)
+        
+        for start in range(0, n, OVERVIEW_CHUNK):
+            stop = min(start + OVERVIEW_CHUNK, n)
+            row = ((np.asarray(zs[start:stop], dtype=np.float64) - z0) // cell_z).astype(np.int64)
+            col = np.floor((np.asarray(xs[start:stop], dtype=np.float64) - x_range[0]) / cell_x).astype(np.int64)
+            inside = (col >= 0) & (col < cols)
+            if not inside.any():
+                continue
+            key = row[inside] * cols + col[inside]
+            first, last = key.min(), key.max() + 1
+            key -= first
+            
+            density[first:last] += np.bincount(key, minlength=last - first).astype(np.uint32)
+            block_worst = worst[first:last]
+            if classes is None:
+                block_worst[density[first:last] > 0] = np.maximum(block_worst[density[first:last] > 0], 1)
+                continue
+            block_classes = np.asarray(classes[start:stop])[inside]
+            for c in np.unique(block_classes):
+                present = np.bincount(key[block_classes == c], minlength=last - first) > 0
+                block_worst[present] = np.maximum(block_worst[present], min(int(c), len(CLASS_COLORS) - 1) + 1)
+        
+        return cls(density.reshape(rows, cols), worst.reshape(rows, cols), z0, x_range[0], cell_z, cell_x)
+    
+    @property
+    def rows(self):
+        """Linhas do nível 0"""
+        return self.levels[0][0].shape[0]
+    
+    @property
+    def cols(self):
+        """Colunas (iguais em todos os níveis)"""
+        return self.levels[0][0].shape[1]
+    
+    @property
+    def z_extent(self):
+        """(z inicial, z final) cobertos"""
+        return self.z0, self.z0 + self.rows * self.cell_z
+    
+    @property
+    def x_extent(self):
+        """(x inicial, x final) cobertos"""
+        return self.x0, self.x0 + self.cols * self.cell_x
+    
+    def level_for(self, pixels):
+        """
+        Nível mais fino com no máximo uma linha por pixel
+        
+        Desenhado sem filtragem, nenhuma linha some (a redução entre níveis
+        já guarda a pior classe).
+        
+        Args:
+            pixels: Altura (px) em que a via inteira será desenhada
+        """
+        level = 0
+        while level + 1 < len(self.levels) and len(self.levels[level][0]) > pixels:
+            level += 1
+        return level
+    
+    def rgba(self, level):
+        """
+        Imagem RGBA uint8 (linhas, colunas, 4) de um nível
+        
+        Cor da pior classe, com brilho pela densidade (escala log);
+        células vazias transparentes.
+        """
+        density, worst = self.levels[level]
+        lut = np.zeros((len(CLASS_COLORS) + 1, 3), dtype=np.float32)
+        lut[1:] = CLASS_COLORS
+        scale = np.log1p(density.astype(np.float32)) / max(np.log1p(float(density.max())), 1e-6)
+        rgb = lut[worst] * (0.35 + 0.65 * scale)[..., None]
+        
+        image = np.zeros(density.shape + (4,), dtype=np.uint8)
+        image[..., :3] = rgb * 255
+        image[..., 3] = np.where(worst > 0, 255, 0)
+        return image
+    
+    def to_arrays(self, prefix='overview_'):
+        """Dicionário de arrays para np.savez (ver from_arrays)"""
+        density, worst = self.levels[0]
+        return {
+            prefix + 'density': density,
+            prefix + 'worst': worst,
+            prefix + 'origin': np.array([self.z0, self.x0, self.cell_z, self.cell_x]),
+        }
+    
+    @classmethod
+    def from_arrays(cls, cached, prefix='overview_'):
+        """
+        Restaura de um .npz (ou dicionário) gravado com to_arrays
+        
+        Returns:
+            OverviewRaster ou None se o cache não tiver o raster
+        """
+        keys = cached.files if hasattr(cached, 'files') else cached.keys()
+        if prefix + 'density' not in keys:
+            return None
+        z0, x0, cell_z, cell_x = cached[prefix + 'origin']
+        return cls(cached[prefix + 'density'], cached[prefix + 'worst'], z0, x0, cell_z, cell_x)
@@ -0,0 +1,148 @@
+"""
+Grade de seções reamostradas em bins angulares
+Cada seção vira um perfil de tamanho fixo: o raio (distância ao centro do
+gabarito) em cada faixa de ângulo. O array denso (seções × bins) troca
+operações por ponto por operações 2D (folga por ângulo, comparação entre
+passagens, vista desenrolada da parede)
+"""
+
+import numpy as np
+
+
+# Pontos por bloco na passada de agregação (limita temporários)
+GRID_CHUNK = 1 << 20
+
+# Bins por volta (2° cada)
+DEFAULT_BINS = 180
+
+
+def angular_bins(xs, ys, center, bins):
+    """
+    Bin angular e raio de cada ponto em torno de center
+    
+    O ângulo cresce no sentido anti-horário a partir de +X (0 = parede
+    direita, bins/4 = topo, bins/2 = parede esquerda).
+    
+    Args:
+        xs, ys: Arrays de coordenadas no referencial do gabarito
+        center: (x, y) do centro
+        bins: Bins por volta
+    
+    Returns:
+        Tupla (bin int64, raio float32)
+    """
+    dx = np.asarray(xs, dtype=np.float32) - np.float32(center[0])
+    dy = np.asarray(ys, dtype=np.float32) - np.float32(center[1])
+    angle = np.arctan2(dy, dx)
+    angle[angle < 0] += np.float32(2.0 * np.pi)
+    
+    index = (angle * np.float32(bins / (2.0 * np.pi))).astype(np.int64)
+    np.minimum(index, bins - 1, out=index)  # 2π arredondado em float32
+    return index, np.hypot(dx, dy)
+
+
+class SectionGrid:
+    """
+    Raio por (seção, bin angular) de uma nuvem com seções contíguas
+    
+    Calcule com SectionGrid.compute() ao carregar os dados; to_arrays()/
+    from_arrays() guardam e restauram pelo .npz do cache.
+    
+    Atributos:
+        radius: Array (S, bins) float32 com o menor raio dos pontos do bin
+            (a superfície mais próxima do centro; 0 onde não há pontos)
+        valid: Array (S, bins) bool, True onde o bin tem pontos
+        center: Array (2,) com o centro (x, y) no referencial do gabarito
+    """
+    
+    def __init__(self, radius, valid, center):
+        self.radius = np.asarray(radius, dtype=np.float32)
+        self.valid = np.asarray(valid, dtype=bool)
+        self.center = np.asarray(center, dtype=np.float64)
+    
+    @classmethod
+    def compute(cls, xs, ys, section_offsets, bins=DEFAULT_BINS, center=(0.0, 0.0)):
+        """
+        Agrega os pontos em (seção, bin) numa passada por blocos
+        
+        A chave seção * bins + bin é crescente dentro de cada seção, então
+        um np.minimum.at por bloco resolve todas as seções de uma vez.
+        
+        Args:
+            xs, ys: Arrays (N,) no referencial do gabarito
+                (ver UPLLoader.get_gauge_coordinates)
+            section_offsets: Offsets (S + 1,) de seções contíguas
+            bins: Bins por volta
+            center: (x, y) do centro (ver TunnelTemplate.gauge_center)
+        
+        Returns:
+            SectionGrid
+        """
+        offsets = np.asarray(section_offsets, dtype=np.int64)
+        n_sections = len(offsets) - 1
+        radius = np.full(n_sections * bins, np.inf, dtype=np.float32)
+        
+        for start in range(0, int(offsets[-1]), GRID_CHUNK):
+            stop = min(start + GRID_CHUNK, int(offsets[-1]))
+            index, r = angular_bins(xs[start:stop], ys[start:stop], center, bins)
+            section = np.searchsorted(offsets, np.arange(start, stop), side='right') - 1
+            index += section * bins
+            np.minimum.at(radius, index, r)
+        
+        radius = radius.reshape(n_sections, bins)
+        valid = np.isfinite(radius)
+        radius[~valid] = 0.0
+        return cls(radius, valid, center)
+    
+    @property
+    def n_sections(self):
+        """Número de seções (linhas)"""
+        return self.radius.shape[0]
+    
+    @property
+    def bins(self):
+        """Bins por volta (colunas)"""
+        return self.radius.shape[1]
+    
+    @property
+    def nbytes(self):
+        """Memória ocupada pela grade"""
+        return self.radius.nbytes + self.valid.nbytes
+    
+    def angles(self):
+        """Ângulo (rad) do centro de cada bin (bins,)"""
+        return (np.arange(self.bins) + 0.5) * (2.0 * np.pi / self.bins)
+    
+    def points(self):
+        """
+        Posição de cada célula no referencial do gabarito
+        
+        Returns:
+            Tupla (xs, ys) de arrays (S, bins) float32, NaN nas células sem pontos
+        """
+        angles = self.angles()
+        radius = np.where(self.valid, self.radius, np.nan)
+        xs = (self.center[0] + radius * np.cos(angles)).astype(np.float32)
+        ys = (self.center[1] + radius * np.sin(angles)).astype(np.float32)
+        return xs, ys
+    
+    def to_arrays(self, prefix='grid_'):
+        """Dicionário de arrays para np.savez (ver from_arrays)"""
+        return {
+            prefix + 'radius': self.radius,
+            prefix + 'valid': self.valid,
+            prefix + 'center': self.center,
+        }
+    
+    @classmethod
+    def from_arrays(cls, cached, prefix='grid_'):
+        """
+        Restaura de um .npz (ou dicionário) gravado com to_arrays
+        
+        Returns:
+            SectionGrid ou None se o cache não tiver a grade
+        """
+        keys = cached.files if hasattr(cached, 'files') else cached.keys()
+        if prefix + 'radius' not in keys:
+            return None
+        return cls(cached[prefix + 'radius'], cached[prefix + 'valid'], cached[prefix + 'center'])
@@ -0,0 +1,185 @@
+"""
+Definições de gabaritos em arquivo (JSON/YAML) com recarga automática
+Permite ajustar gabaritos sem editar tunnel_templates.py nem reiniciar o visualizador
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.tunnel_templates import GabaritDefinido
+
+
+def load_template_file(filepath):
+    """
+    Carrega gabaritos de um arquivo JSON ou YAML
+    
+    Formato:
+        {"gabaritos": {"chave": {"name": "...", "safe_zone": {...}, "warning_zone": {...}}}}
+    
+    Args:
+        filepath: Caminho do arquivo (.json, .yml ou .yaml)
+    
+    Returns:
+        Dicionário {chave: GabaritDefinido}
+    
+    Raises:
+        ImportError se for YAML e o PyYAML não estiver instalado
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        if filepath.lower().endswith(('.yml', '.yaml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML não instalado: use JSON ou 'pip install pyyaml'")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    
+    definitions = data.get('gabaritos', data)
+    return {key.lower(): GabaritDefinido.from_dict(definition)
+            for key, definition in definitions.items()}
+
+
+class TemplateFileWatcher:
+    """
+    Observa um arquivo de gabaritos e recarrega quando ele muda
+    
+    Baseado em polling do mtime: chame poll() a cada frame do loop principal;
+    o stat do arquivo só é feito a cada interval segundos.
+    """
+    
+    def __init__(self, filepath, on_change, interval=0.5):
+        """
+        Args:
+            filepath: Arquivo de gabaritos
+            on_change: Callback(templates) chamado com {chave: GabaritDefinido}
+            interval: Intervalo mínimo entre verificações (s)
+        """
+        self.filepath = filepath
+        self.on_change = on_change
+        self.interval = interval
+        self._last_mtime = None
+        self._last_check = float('-inf')
+    
+    def poll(self, now):
+        """
+        Verifica mudanças no arquivo
+        
+        Args:
+            now: Tempo atual em segundos (ex: glfw.get_time())
+        
+        Returns:
+            True se o arquivo foi recarregado
+        """
+        if now - self._last_check < self.interval:
+            return False
+        self._last_check = now
+        
+        try:
+            mtime = os.path.getmtime(self.filepath)
+        except OSError:
+            return False
+        if mtime == self._last_mtime:
+            return False
+        self._last_mtime = mtime
+        
+        try:
+            templates = load_template_file(self.filepath)
+        except Exception as e:
+            # Arquivo pode estar sendo salvo pela metade: tenta de novo na próxima mudança
+            print(f"⚠️  Erro ao ler gabaritos de {self.filepath}: {e}")
+            return False
+        
+        print(f"🔁 Gabaritos recarregados de {self.filepath}: {', '.join(templates)}")
+        self.on_change(templates)
+        return True
+
+
+class TemplateReclassifier:
+    """
+    Reclassifica a nuvem carregada em segundo plano, com memoização por gabarito
+    
+    Resultados ficam em cache pelo hash do conteúdo do gabarito, então alternar
+    entre versões já calculadas é instantâneo. O trabalho roda em uma thread
+    (as operações NumPy liberam o GIL); o resultado é entregue por poll() na
+    thread principal, que é quem pode atualizar buffers OpenGL.
+    """
+    
+    def __init__(self, xs, ys, max_cached=16):
+        """
+        Args:
+            xs, ys: Coordenadas no referencial do gabarito
+                (ver UPLLoader.get_gauge_coordinates)
+            max_cached: Quantas colunas de classes manter em memória
+        """
+        self.xs = xs
+        self.ys = ys
+        self.max_cached = max_cached
+        self._cache = {}  # {hash: classes uint8}, em ordem de uso
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = []  # [(key, hash, future)]
+    
+    @staticmethod
+    def template_hash(template):
+        """Hash do gabarito (conteúdo para GabaritDefinido, identidade nos demais)"""
+        return getattr(template, 'content_hash', None) or f"id-{id(template)}"
+    
+    def request(self, key, template):
+        """
+        Pede a classificação da nuvem com um gabarito
+        
+        Args:
+            key: Chave do gabarito (devolvida em poll)
+            template: TunnelTemplate
+        
+        Returns:
+            Array de classes se já estava em cache, senão None (resultado chega por poll)
+        """
+        digest = self.template_hash(template)
+        if digest in self._cache:
+            classes = self._cache.pop(digest)
+            self._cache[digest] = classes  # Marca como usado recentemente
+            return classes
+        
+        future = self._executor.submit(template.classify_points, self.xs, self.ys)
+        self._pending.append((key, digest, future))
+        return None
+    
+    def poll(self):
+        """
+        Coleta classificações concluídas
+        
+        Returns:
+            Lista de (key, classes) prontos desde a última chamada
+        """
+        done = []
+        still_pending = []
+        for key, digest, future in self._pending:
+            if not future.done():
+                still_pending.append((key, digest, future))
+                continue
+            try:
+                classes = future.result()
+            except Exception as e:
+                print(f"❌ Erro ao reclassificar com '{key}': {e}")
+                continue
+            self._store(digest, classes)
+            done.append((key, classes))
+        self._pending = still_pending
+        return done
+    
+    def seed(self, template, classes):
+        """Registra uma classificação já calculada (ex: colunas do UPLLoader)"""
+        self._store(self.template_hash(template), classes)
+    
+    def _store(self, digest, classes):
+        """Guarda resultado no cache, descartando o menos usado se cheio"""
+        self._cache[digest] = classes
+        while len(self._cache) > self.max_cached:
+            self._cache.pop(next(iter(self._cache)))
+    
+    def shutdown(self):
+        """Encerra a thread de trabalho (descarta pendências)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pending = []
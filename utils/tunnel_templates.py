@@ -3,8 +3,14 @@ Sistema de Gabaritos de Túnel (Tunnel Templates)
 Define as zonas de segurança, alerta e invasão para diferentes tipos de túneis
 """
 
+import hashlib
+import json
+import os
+import traceback
 import numpy as np
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
 
 class TunnelTemplate(ABC):
@@ -47,16 +53,135 @@ class TunnelTemplate(ABC):
         else:
             return 0  # SEGURO - fora do gabarito
     
+    def classify_points(self, xs, ys):
+        """
+        Versão vetorizada de classify_point para arrays de coordenadas
+        
+        Args:
+            xs, ys: Arrays de coordenadas (mesmo comprimento)
+            
+        Returns:
+            Array uint8 com 0 = Seguro, 1 = Alerta, 2 = Invasão
+        """
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        
+        classifications = np.zeros(len(xs), dtype=np.uint8)
+        # Ordem importa: invasão sobrescreve alerta (mesma prioridade de classify_point)
+        classifications[self._points_in_zone(xs, ys, self.warning_zone)] = 1
+        classifications[self._points_in_zone(xs, ys, self.safe_zone)] = 2
+        return classifications
+    
+    def clearance(self, xs, ys):
+        """
+        Folga de cada ponto em relação ao gabarito (zona segura)
+        
+        Args:
+            xs, ys: Arrays de coordenadas
+            
+        Returns:
+            Array float com a distância em metros até a zona segura:
+            positiva fora do gabarito, negativa dentro (profundidade da invasão)
+        """
+        return self._zone_distance(np.asarray(xs), np.asarray(ys), self.safe_zone)
+    
+    def gauge_center(self, step=0.05):
+        """
+        Centro do gabarito: centroide da zona segura
+        
+        Amostra a zona numa grade regular (x em ±10 m, y de 0 a 12 m); usado
+        como origem dos bins angulares (ver utils.section_grid).
+        
+        Args:
+            step: Espaçamento (m) da grade de amostragem
+        
+        Returns:
+            Tupla (x, y); (0, 0) se a zona não tiver pontos na grade
+        """
+        gx, gy = np.meshgrid(np.linspace(-10.0, 10.0, int(round(20.0 / step)) + 1),
+                             np.linspace(0.0, 12.0, int(round(12.0 / step)) + 1))
+        gx, gy = gx.ravel(), gy.ravel()
+        inside = self._points_in_zone(gx, gy, self.safe_zone)
+        if not inside.any():
+            return 0.0, 0.0
+        return float(gx[inside].mean()), float(gy[inside].mean())
+    
     @staticmethod
     def _point_in_zone(x, y, zone):
         """Verifica se ponto está dentro de uma zona (genérico)"""
         return False  # Deve ser sobrescrito
     
+    @staticmethod
+    def _zone_distance(xs, ys, zone):
+        """Distância com sinal até a zona (NaN = não suportado pelo gabarito)"""
+        return np.full(len(xs), np.nan)
+    
+    def _points_in_zone(self, xs, ys, zone):
+        """
+        Verifica quais pontos estão dentro de uma zona (vetorizado)
+        
+        Fallback ponto a ponto para gabaritos que só implementam
+        _point_in_zone; as subclasses do módulo sobrescrevem com numpy puro.
+        
+        Returns:
+            Array booleano (N,)
+        """
+        check = np.vectorize(lambda x, y: self._point_in_zone(x, y, zone), otypes=[bool])
+        return check(xs, ys)
+    
     def get_description(self):
         """Retorna descrição do gabarito"""
         return f"{self.name}"
 
 
+def _polygon_distance(xs, ys, vertices):
+    """
+    Distância com sinal até um polígono convexo (negativa dentro)
+    
+    Args:
+        xs, ys: Arrays de coordenadas
+        vertices: Lista de (x, y) em sentido anti-horário
+    """
+    dist_sq = None
+    inside = np.ones(len(xs), dtype=bool)
+    
+    for (ax, ay), (bx, by) in zip(vertices, vertices[1:] + vertices[:1]):
+        ex, ey = bx - ax, by - ay
+        px, py = xs - ax, ys - ay
+        
+        # Ponto mais próximo no segmento
+        t = np.clip((px * ex + py * ey) / (ex * ex + ey * ey), 0.0, 1.0)
+        dx = px - t * ex
+        dy = py - t * ey
+        d = dx * dx + dy * dy
+        dist_sq = d if dist_sq is None else np.minimum(dist_sq, d)
+        
+        # À esquerda de todas as arestas = dentro
+        inside &= (ex * py - ey * px) >= 0
+    
+    dist = np.sqrt(dist_sq)
+    return np.where(inside, -dist, dist)
+
+
+def _abs_rect_distance(xs, ys, bounds):
+    """Distância até retângulo definido em |x| (como em _point_in_zone)"""
+    if bounds['x_min'] <= 0:
+        # Faixa contínua [-x_max, x_max]
+        x0, x1 = -bounds['x_max'], bounds['x_max']
+    else:
+        # Dois retângulos espelhados: mede no semiplano |x|
+        xs = np.abs(xs)
+        x0, x1 = bounds['x_min'], bounds['x_max']
+    y0, y1 = bounds['y_min'], bounds['y_max']
+    return _polygon_distance(xs, ys, [(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+
+
+def _arc_distance(xs, ys, x_center, y_center, radius, y_min=-np.inf, y_max=np.inf):
+    """Distância até disco recortado na faixa [y_min, y_max] (aproximada na interseção)"""
+    dist = np.hypot(xs - x_center, ys - y_center) - radius
+    return np.maximum(dist, np.maximum(y_min - ys, ys - y_max))
+
+
 class FerroviaTunel(TunnelTemplate):
     """Gabarito para túnel ferroviário - seção simples"""
     
@@ -109,6 +234,47 @@ class FerroviaTunel(TunnelTemplate):
                     return True
         
         return False
+    
+    @staticmethod
+    def _points_in_zone(xs, ys, zone):
+        """Versão vetorizada de _point_in_zone (ferroviária)"""
+        if zone['type'] != 'composite':
+            return np.zeros(len(xs), dtype=bool)
+        
+        x_abs = np.abs(xs)
+        
+        # Retângulo
+        rect = zone['rect']
+        inside = ((x_abs >= rect['x_min']) & (x_abs <= rect['x_max']) &
+                  (ys >= rect['y_min']) & (ys <= rect['y_max']))
+        
+        # Semicírculo superior (compara distâncias ao quadrado, sem sqrt)
+        if 'semicircle' in zone:
+            semi = zone['semicircle']
+            y_center = semi['y_center']
+            radius = semi['radius']
+            y_min = semi.get('y_min', y_center)
+            y_max = semi.get('y_max', float('inf'))
+            
+            inside |= ((ys >= y_min) & (ys <= y_max) &
+                       (xs * xs + (ys - y_center) ** 2 <= radius * radius))
+        
+        return inside
+    
+    @staticmethod
+    def _zone_distance(xs, ys, zone):
+        """Distância com sinal até a zona ferroviária (retângulo ∪ semicírculo)"""
+        if zone['type'] != 'composite':
+            return np.full(len(xs), np.nan)
+        
+        dist = _abs_rect_distance(xs, ys, zone['rect'])
+        if 'semicircle' in zone:
+            semi = zone['semicircle']
+            dist = np.minimum(dist, _arc_distance(
+                xs, ys, semi['x_center'], semi['y_center'], semi['radius'],
+                semi.get('y_min', semi['y_center']), semi.get('y_max', np.inf)
+            ))
+        return dist
 
 
 class RodoviaDupla(TunnelTemplate):
@@ -149,6 +315,37 @@ class RodoviaDupla(TunnelTemplate):
                     return True
         
         return False
+    
+    @staticmethod
+    def _points_in_zone(xs, ys, zone):
+        """Versão vetorizada de _point_in_zone (rodovia dupla)"""
+        inside = np.zeros(len(xs), dtype=bool)
+        if zone['type'] != 'two_rectangles':
+            return inside
+        
+        for pista_key in ['pista1', 'pista2']:
+            if pista_key in zone:
+                rect = zone[pista_key]
+                inside |= ((xs >= rect['x_min']) & (xs <= rect['x_max']) &
+                           (ys >= rect['y_min']) & (ys <= rect['y_max']))
+        
+        return inside
+    
+    @staticmethod
+    def _zone_distance(xs, ys, zone):
+        """Distância com sinal até a pista mais próxima"""
+        dist = np.full(len(xs), np.inf)
+        if zone['type'] != 'two_rectangles':
+            return np.full(len(xs), np.nan)
+        
+        for pista_key in ['pista1', 'pista2']:
+            if pista_key in zone:
+                r = zone[pista_key]
+                dist = np.minimum(dist, _polygon_distance(xs, ys, [
+                    (r['x_min'], r['y_min']), (r['x_max'], r['y_min']),
+                    (r['x_max'], r['y_max']), (r['x_min'], r['y_max'])
+                ]))
+        return dist
 
 
 class TuneloAqued(TunnelTemplate):
@@ -211,6 +408,50 @@ class TuneloAqued(TunnelTemplate):
                 return True
         
         return False
+    
+    @staticmethod
+    def _points_in_zone(xs, ys, zone):
+        """Versão vetorizada de _point_in_zone (aqüeduto)"""
+        if zone['type'] != 'trapezoid':
+            return np.zeros(len(xs), dtype=bool)
+        
+        x_abs = np.abs(xs)
+        trapez = zone
+        
+        y_min = trapez['y_min']
+        y_max = trapez['y_max'] - 0.1  # Antes do arco
+        
+        # Trapézio: limites X interpolados conforme Y
+        ratio = (ys - y_min) / (y_max - y_min)
+        x_min_interp = trapez['x_min_bottom'] + ratio * (trapez['x_min_top'] - trapez['x_min_bottom'])
+        x_max_interp = trapez['x_max_bottom'] + ratio * (trapez['x_max_top'] - trapez['x_max_bottom'])
+        inside = ((ys >= y_min) & (ys < y_max) &
+                  (x_abs >= x_min_interp) & (x_abs <= x_max_interp))
+        
+        # Arco superior
+        arch_center_y = trapez['arch_center_y']
+        arch_radius = trapez['arch_radius']
+        inside |= ((ys >= y_max) &
+                   (xs * xs + (ys - arch_center_y) ** 2 <= arch_radius * arch_radius))
+        
+        return inside
+    
+    @staticmethod
+    def _zone_distance(xs, ys, zone):
+        """Distância com sinal até a zona de aqüeduto (trapézio ∪ arco)"""
+        if zone['type'] != 'trapezoid':
+            return np.full(len(xs), np.nan)
+        
+        # Trapézio simétrico em X (limites em |x|)
+        y_min = zone['y_min']
+        y_max = zone['y_max'] - 0.1
+        xb = zone['x_max_bottom']
+        xt = zone['x_max_top']
+        dist = _polygon_distance(xs, ys, [(-xb, y_min), (xb, y_min), (xt, y_max), (-xt, y_max)])
+        
+        return np.minimum(dist, _arc_distance(
+            xs, ys, 0.0, zone['arch_center_y'], zone['arch_radius'], y_min=y_max
+        ))
 
 
 class GabaritPersonalizado(TunnelTemplate):
@@ -250,6 +491,90 @@ class GabaritPersonalizado(TunnelTemplate):
         
         return (bounds['x_min'] <= x_abs <= bounds['x_max'] and
                 bounds['y_min'] <= y <= bounds['y_max'])
+    
+    @staticmethod
+    def _points_in_zone(xs, ys, zone):
+        """Versão vetorizada de _point_in_zone (retangular)"""
+        if zone['type'] != 'rectangle':
+            return np.zeros(len(xs), dtype=bool)
+        
+        bounds = zone['bounds']
+        x_abs = np.abs(xs)
+        
+        return ((x_abs >= bounds['x_min']) & (x_abs <= bounds['x_max']) &
+                (ys >= bounds['y_min']) & (ys <= bounds['y_max']))
+    
+    @staticmethod
+    def _zone_distance(xs, ys, zone):
+        """Distância com sinal até a zona retangular"""
+        if zone['type'] != 'rectangle':
+            return np.full(len(xs), np.nan)
+        return _abs_rect_distance(xs, ys, zone['bounds'])
+
+
+class GabaritDefinido(TunnelTemplate):
+    """
+    Gabarito definido por dados (ex: arquivo JSON/YAML de gabaritos)
+    
+    As zonas usam os mesmos dicionários dos gabaritos nativos; o campo 'type'
+    de cada zona escolhe a geometria ('composite', 'two_rectangles',
+    'trapezoid' ou 'rectangle').
+    """
+    
+    # Tipo de zona -> gabarito nativo que sabe testar essa geometria
+    ZONE_TYPES = {
+        'composite': FerroviaTunel,
+        'two_rectangles': RodoviaDupla,
+        'trapezoid': TuneloAqued,
+        'rectangle': GabaritPersonalizado,
+    }
+    
+    def __init__(self, name, safe_zone, warning_zone):
+        """
+        Args:
+            name: Nome do gabarito
+            safe_zone: Dicionário da zona segura (com 'type')
+            warning_zone: Dicionário da zona de alerta (com 'type')
+        """
+        for zone in (safe_zone, warning_zone):
+            if zone.get('type') not in self.ZONE_TYPES:
+                raise ValueError(f"Tipo de zona desconhecido: {zone.get('type')}")
+        
+        self._name = name
+        self._safe_zone = safe_zone
+        self._warning_zone = warning_zone
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Cria gabarito a partir de {'name', 'safe_zone', 'warning_zone'}"""
+        return cls(data['name'], data['safe_zone'], data['warning_zone'])
+    
+    @property
+    def name(self):
+        return self._name
+    
+    @property
+    def safe_zone(self):
+        return self._safe_zone
+    
+    @property
+    def warning_zone(self):
+        return self._warning_zone
+    
+    @property
+    def content_hash(self):
+        """Hash do conteúdo geométrico (mesmas zonas = mesma classificação)"""
+        content = json.dumps([self._safe_zone, self._warning_zone], sort_keys=True)
+        return hashlib.sha1(content.encode()).hexdigest()
+    
+    def _point_in_zone(self, x, y, zone):
+        return self.ZONE_TYPES[zone['type']]._point_in_zone(x, y, zone)
+    
+    def _points_in_zone(self, xs, ys, zone):
+        return self.ZONE_TYPES[zone['type']]._points_in_zone(xs, ys, zone)
+    
+    def _zone_distance(self, xs, ys, zone):
+        return self.ZONE_TYPES[zone['type']]._zone_distance(xs, ys, zone)
 
 
 class TemplateRegistry:
@@ -280,25 +605,416 @@ class TemplateRegistry:
     def get_names(cls):
         """Retorna nome formatado de cada gabarito"""
         return {key: template.name for key, template in cls._templates.items()}
+    
+    @classmethod
+    def items(cls):
+        """Retorna lista de pares (chave, gabarito) na ordem de registro"""
+        return list(cls._templates.items())
+    
+    @classmethod
+    def key_of(cls, template):
+        """Retorna a chave de um gabarito registrado (None se não registrado)"""
+        for key, registered in cls._templates.items():
+            if registered is template:
+                return key
+        return None
+
+
+# Cores por classe (0=seguro, 1=alerta, 2=invasão) - usada como LUT
+CLASS_COLORS = np.array([
+    [0.0, 1.0, 0.0],  # Verde
+    [1.0, 1.0, 0.0],  # Amarelo
+    [1.0, 0.0, 0.0],  # Vermelho
+], dtype=np.float32)
+
+# Nomes das classes, na mesma ordem (índice = classificação)
+CLASS_NAMES = ('Seguro', 'Alerta', 'Invasão')
+
+# Pontos processados por bloco na classificação multi-gabarito
+# (mantém xs/ys do bloco no cache da CPU enquanto todos os gabaritos são testados)
+CLASSIFY_CHUNK_SIZE = 1_000_000
+
+
+class SharedPointArray:
+    """
+    Array NumPy alocado em multiprocessing.shared_memory
+    
+    Processos do pool anexam o mesmo bloco pelo nome, sem copiar nem serializar
+    os dados. Jobs em lote podem alocar xs/ys (e a saída, via out=) direto
+    aqui e passá-los para classify_points_with_template(..., parallel=True)
+    sem nenhuma cópia.
+    
+    Uso:
+        with SharedPointArray((n,), np.float64) as xs:
+            xs.array[:] = ...
+    """
+    
+    def __init__(self, shape, dtype):
+        """
+        Args:
+            shape: Shape do array
+            dtype: Tipo NumPy dos elementos
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+    
+    @classmethod
+    def from_array(cls, array):
+        """Cria bloco compartilhado com uma cópia de um array comum"""
+        array = np.asarray(array)
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+    
+    def spec(self):
+        """Descrição serializável (nome, shape, dtype) para anexar em outro processo"""
+        return (self.shm.name, self.array.shape, self.array.dtype.str)
+    
+    def close(self):
+        """Libera o bloco compartilhado"""
+        if self.shm is None:
+            return
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def __len__(self):
+        return len(self.array)
+
+
+# Estado de cada processo do pool (descrição dos blocos e gabaritos, do initializer)
+_worker_state = {}
 
 
-def classify_points_with_template(xs, ys, template):
+def _init_classify_worker(specs, templates):
+    """Initializer do pool: guarda como anexar entradas e saída compartilhadas"""
+    _worker_state['specs'] = specs
+    _worker_state['templates'] = templates
+
+
+def _classify_shared_chunk(bounds):
+    """
+    Classifica o intervalo [start, stop) escrevendo direto na saída compartilhada
+    
+    Os blocos são anexados a cada tarefa e fechados no finally; o unlink
+    fica com o processo pai, dono dos blocos (os processos do pool
+    compartilham o resource tracker dele).
+    """
+    start, stop = bounds
+    handles = []
+    try:
+        for name, _, _ in _worker_state['specs']:
+            handles.append(shared_memory.SharedMemory(name=name))
+        _classify_range(handles, start, stop)
+        return stop - start
+    except BaseException as exc:
+        # Views dos blocos presas nos frames do erro impediriam o close()
+        traceback.clear_frames(exc.__traceback__)
+        raise
+    finally:
+        for shm in handles:
+            shm.close()
+
+
+def _classify_range(handles, start, stop):
+    """Classifica [start, stop) sobre views dos blocos anexados (soltas ao retornar)"""
+    templates = _worker_state['templates']
+    xs, ys, out = [np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+                   for shm, (_, shape, dtype) in zip(handles, _worker_state['specs'])]
+    out = out.reshape(len(templates), -1)
+    xs_chunk = xs[start:stop]
+    ys_chunk = ys[start:stop]
+    for row, template in enumerate(templates):
+        out[row, start:stop] = template.classify_points(xs_chunk, ys_chunk)
+
+
+def _output_array(out, shape):
+    """Array de saída da classificação: o de out (ou seu bloco compartilhado) ou um novo"""
+    if out is None:
+        return np.empty(shape, dtype=np.uint8)
+    array = out.array if isinstance(out, SharedPointArray) else out
+    if array.size != int(np.prod(shape)) or array.dtype != np.uint8:
+        raise ValueError(f"Saída deve ser uint8 com {int(np.prod(shape))} elementos")
+    return array
+
+
+def _classify_parallel(xs, ys, templates, workers=None, chunk_size=CLASSIFY_CHUNK_SIZE, out=None):
+    """
+    Classifica pontos em um pool de processos sobre memória compartilhada
+    
+    Args:
+        xs, ys: Arrays ou SharedPointArray (estes são usados sem cópia)
+        templates: Lista de TunnelTemplate
+        workers: Número de processos (None = núcleos disponíveis)
+        chunk_size: Pontos por tarefa
+        out: SharedPointArray uint8 escrito direto pelos processos (sem
+            cópia), array uint8 preenchido com uma cópia do bloco temporário,
+            ou None (array novo)
+        
+    Returns:
+        np.array uint8 (len(templates), N), ou o array de out
+    """
+    workers = workers or os.cpu_count() or 1
+    owned = []
+    
+    def as_shared(array):
+        if isinstance(array, SharedPointArray):
+            return array
+        shared = SharedPointArray.from_array(array)
+        owned.append(shared)
+        return shared
+    
+    try:
+        xs_shared = as_shared(xs)
+        ys_shared = as_shared(ys)
+        n = len(xs_shared)
+        result = _output_array(out, (len(templates), n))
+        if isinstance(out, SharedPointArray):
+            out_shared = out
+        else:
+            out_shared = SharedPointArray((len(templates), n), np.uint8)
+            owned.append(out_shared)
+        
+        bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+        specs = [xs_shared.spec(), ys_shared.spec(), out_shared.spec()]
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(bounds)),
+            initializer=_init_classify_worker,
+            initargs=(specs, list(templates))
+        ) as pool:
+            for _ in pool.map(_classify_shared_chunk, bounds):
+                pass
+        
+        # Saída fora da memória compartilhada: uma cópia do bloco temporário
+        if out_shared is not out:
+            result.reshape(out_shared.array.shape)[...] = out_shared.array
+        return result
+    finally:
+        for shared in owned:
+            shared.close()
+
+
+def classify_points_with_template(xs, ys, template, parallel=False, workers=None,
+                                  chunk_size=CLASSIFY_CHUNK_SIZE, out=None):
     """
     Classifica pontos usando um gabarito
     
     Args:
-        xs, ys: Arrays de coordenadas
+        xs, ys: Arrays de coordenadas (ou SharedPointArray no modo paralelo)
         template: Instância de TunnelTemplate
+        parallel: Divide os pontos em blocos processados em um pool de
+                  processos sobre memória compartilhada
+        workers: Processos do pool (None = núcleos disponíveis)
+        chunk_size: Pontos por bloco no modo paralelo
+        out: Saída uint8 (N,) opcional; um SharedPointArray é escrito direto
+             pelos processos do pool, sem cópia
         
     Returns:
-        Array de classificações (0=seguro, 1=alerta, 2=invasão)
+        Array uint8 de classificações (0=seguro, 1=alerta, 2=invasão)
+    """
+    if parallel and len(xs) > chunk_size:
+        return _classify_parallel(xs, ys, [template], workers, chunk_size, out).reshape(-1)
+    
+    if isinstance(xs, SharedPointArray):
+        xs, ys = xs.array, ys.array
+    classes = template.classify_points(xs, ys)
+    if out is None:
+        return classes
+    result = _output_array(out, (len(classes),)).reshape(-1)
+    result[...] = classes
+    return result
+
+
+def classify_points_multi(xs, ys, templates=None, chunk_size=CLASSIFY_CHUNK_SIZE,
+                          parallel=False, workers=None, out=None):
     """
-    classifications = np.zeros(len(xs), dtype=np.int32)
+    Classifica pontos contra vários gabaritos em uma única passada
     
-    for i in range(len(xs)):
-        classifications[i] = template.classify_point(xs[i], ys[i])
+    Os pontos são percorridos uma vez, em blocos; cada bloco é testado contra
+    todos os gabaritos antes de avançar. O resultado tem uma coluna de classes
+    uint8 por gabarito, de modo que trocar de gabarito na UI é só trocar qual
+    coluna alimenta a LUT de cores (ver colors_from_classification).
+    
+    Args:
+        xs, ys: Arrays de coordenadas
+        templates: Lista de pares (chave, TunnelTemplate) ou dict
+                   (None = todos os gabaritos do TemplateRegistry)
+        chunk_size: Pontos por bloco
+        parallel: Processa os blocos em um pool de processos (memória compartilhada)
+        workers: Processos do pool (None = núcleos disponíveis)
+        out: Saída uint8 (len(keys), N) opcional; um SharedPointArray é
+             escrito direto pelos processos do pool, sem cópia
+        
+    Returns:
+        Tupla (keys, classes) onde:
+            keys: Lista de chaves dos gabaritos
+            classes: np.array uint8 shape (len(keys), N)
+    """
+    if templates is None:
+        templates = TemplateRegistry.items()
+    elif isinstance(templates, dict):
+        templates = list(templates.items())
     
-    return classifications
+    keys = [key for key, _ in templates]
+    
+    if parallel and len(xs) > chunk_size:
+        classes = _classify_parallel(xs, ys, [t for _, t in templates], workers, chunk_size, out)
+        return keys, classes
+    
+    if isinstance(xs, SharedPointArray):
+        xs, ys = xs.array, ys.array
+    xs = np.asarray(xs)
+    ys = np.asarray(ys)
+    n = len(xs)
+    
+    classes = _output_array(out, (len(templates), n)).reshape(len(templates), n)
+    
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        xs_chunk = xs[start:stop]
+        ys_chunk = ys[start:stop]
+        for row, (_, template) in enumerate(templates):
+            classes[row, start:stop] = template.classify_points(xs_chunk, ys_chunk)
+    
+    return keys, classes
+
+
+def estimate_section_curvature(section_lats, section_lons, smoothing_length=20.0):
+    """
+    Estima a curvatura horizontal da via em cada seção a partir de lat/lon
+    
+    Usa a variação do rumo (heading) entre seções vizinhas, medida em uma
+    janela de smoothing_length metros para filtrar o ruído do GPS.
+    Tudo vetorizado sobre as seções.
+    
+    Args:
+        section_lats, section_lons: Arrays (S,) com lat/lon de cada seção (graus)
+        smoothing_length: Comprimento da janela de estimativa (m)
+        
+    Returns:
+        Array (S,) com curvatura em 1/m (positiva = curva à esquerda)
+    """
+    section_lats = np.asarray(section_lats, dtype=np.float64)
+    section_lons = np.asarray(section_lons, dtype=np.float64)
+    n = len(section_lats)
+    curvature = np.zeros(n)
+    if n < 3 or np.all(section_lats == 0) or np.all(section_lons == 0):
+        return curvature
+    
+    # Plano local em metros (mesma aproximação do desvio lateral do UPLLoader)
+    lat_mid = np.radians(section_lats.mean())
+    px = (section_lons - section_lons[0]) * 111000 * np.cos(lat_mid)
+    py = (section_lats - section_lats[0]) * 111000
+    
+    # Comprimento acumulado e rumo de cada trecho entre seções consecutivas
+    dx, dy = np.diff(px), np.diff(py)
+    ds = np.hypot(dx, dy)
+    s = np.concatenate(([0.0], np.cumsum(ds)))
+    if s[-1] <= 0:
+        return curvature
+    
+    heading = np.arctan2(dy, dx)
+    # Trechos sem deslocamento (GPS repetido) herdam o último rumo válido
+    valid = ds > 1e-6
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(ds)), 0))
+    heading = np.unwrap(heading[last_valid])
+    # Rumo em cada seção: o do trecho que começa nela (última herda o anterior)
+    heading = np.concatenate((heading, heading[-1:]))
+    
+    # Diferença de rumo na janela [s - L/2, s + L/2]
+    half = smoothing_length / 2.0
+    i0 = np.searchsorted(s, s - half, side='left')
+    i1 = np.clip(np.searchsorted(s, s + half, side='right') - 1, 0, n - 1)
+    span = s[i1] - s[i0]
+    np.divide(heading[i1] - heading[i0], span, out=curvature, where=span > 1e-3)
+    return curvature
+
+
+def curve_gauge_params(curvature, speed_kmh=60.0, rail_spacing=1.07, max_cant=0.12,
+                       vehicle_base=12.0, offsets=None):
+    """
+    Parâmetros do gabarito por seção em curvas (superelevação e sobrelargura)
+    
+    - Rotação: superelevação de equilíbrio e = G·v²/(g·R), limitada a max_cant;
+      ângulo = asin(e / G). O topo do gabarito inclina para o lado interno.
+    - Sobrelargura: flecha do veículo na curva, base² / (8·R), aplicada dos
+      dois lados.
+    - Deslocamento lateral: opcional (ex: levantamento topográfico da via).
+    
+    Args:
+        curvature: Array (S,) em 1/m (ver estimate_section_curvature)
+        speed_kmh: Velocidade de projeto
+        rail_spacing: Distância entre eixos dos trilhos G (m; bitola métrica ≈ 1.07)
+        max_cant: Superelevação máxima (m)
+        vehicle_base: Distância entre centros de truque do veículo (m)
+        offsets: Array (S,) opcional de deslocamento lateral (m)
+        
+    Returns:
+        Dicionário de arrays (S,): 'offset' (m), 'rotation' (rad, anti-horário
+        no plano x/y da seção) e 'widening' (m)
+    """
+    curvature = np.asarray(curvature, dtype=np.float64)
+    abs_k = np.abs(curvature)
+    v = speed_kmh / 3.6
+    
+    cant = np.minimum(rail_spacing * v * v * abs_k / 9.81, max_cant)
+    # X positivo aponta para a esquerda do sentido de km: numa curva à esquerda
+    # o trilho externo (direito) sobe e o topo inclina para +X
+    rotation = -np.sign(curvature) * np.arcsin(cant / rail_spacing)
+    widening = vehicle_base * vehicle_base * abs_k / 8.0
+    
+    if offsets is None:
+        offsets = np.zeros_like(curvature)
+    
+    return {
+        'offset': np.asarray(offsets, dtype=np.float64),
+        'rotation': rotation,
+        'widening': widening,
+    }
+
+
+def apply_section_transform(xs, ys, section_offsets, params):
+    """
+    Leva os pontos para o referencial do gabarito de cada seção
+    
+    Em vez de instanciar um gabarito por seção, aplica a transformação inversa
+    (deslocamento, rotação e sobrelargura) aos pontos, com os parâmetros de
+    cada seção expandidos sobre os offsets (np.repeat). O resultado pode ser
+    classificado com o gabarito estático normalmente.
+    
+    Args:
+        xs, ys: Arrays (N,) de coordenadas (X relativo ao eixo da via)
+        section_offsets: Array (S+1,) com o início de cada seção
+        params: Dicionário de curve_gauge_params
+        
+    Returns:
+        Tupla (xs_gauge, ys_gauge)
+    """
+    lengths = np.diff(section_offsets)
+    offset = np.repeat(params['offset'], lengths)
+    rotation = np.repeat(params['rotation'], lengths)
+    widening = np.repeat(params['widening'], lengths)
+    
+    # Desfaz deslocamento e rotação do gabarito
+    cos_r = np.cos(rotation)
+    sin_r = np.sin(rotation)
+    x = xs - offset
+    xs_gauge = x * cos_r + ys * sin_r
+    ys_gauge = -x * sin_r + ys * cos_r
+    
+    # Sobrelargura: aproxima o ponto do eixo (gabarito alargado dos dois lados)
+    xs_gauge = np.sign(xs_gauge) * np.maximum(np.abs(xs_gauge) - widening, 0.0)
+    
+    return xs_gauge, ys_gauge
 
 
 def colors_from_classification(classifications):
@@ -311,17 +1027,9 @@ def colors_from_classification(classifications):
     Returns:
         Array de cores (N, 3) em formato RGB float [0, 1]
     """
-    colors = np.zeros((len(classifications), 3), dtype=np.float32)
-    
-    for i, cls in enumerate(classifications):
-        if cls == 0:  # SEGURO
-            colors[i] = [0.0, 1.0, 0.0]  # Verde
-        elif cls == 1:  # ALERTA
-            colors[i] = [1.0, 1.0, 0.0]  # Amarelo
-        else:  # INVASÃO (2)
-            colors[i] = [1.0, 0.0, 0.0]  # Vermelho
-    
-    return colors
+    # Valores acima de 2 são tratados como invasão (vermelho)
+    classifications = np.minimum(np.asarray(classifications), 2)
+    return CLASS_COLORS[classifications]
 
 
 if __name__ == '__main__':